@@ -1,9 +1,33 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 import os
+import sys
+
+# Adicionar o diretório Core ao path (módulos compartilhados entre as tarefas)
+for core_path in (os.path.join(os.getcwd(), 'Core'), os.path.join(os.getcwd(), '..', 'Core')):
+    if os.path.exists(core_path):
+        core_path = os.path.abspath(core_path)
+        if core_path not in sys.path:
+            sys.path.append(core_path)
+        break
+
+from transaction_store import MINUTES_PER_DAY, TransactionStore, format_minutes
+from transaction_ingest import ingest_alert_sources
+from db_access import timed_query
+from status_engine import status_volume, status_rate
+from stream_aggregate import StatusAggregate, aggregate_csv, file_signature
+from online_detector import OnlineDetector
+from seasonal_baseline import SeasonalBaseline, BASELINE_PATH
+from alert_rules import load_rules, SEVERITY_LABELS
+from changepoint import CusumDetector, detect_history, CHANGE_COLUMNS
+from correlation import CorrelationEngine
+from status_drift import status_drift, drift_summary
+from integrated_analysis import database_signature
+import alert_store
 
 # 🎨 Configuração da página (apenas quando executado individualmente)
 try:
@@ -40,22 +64,133 @@ def get_data_path(filename):
     return filename
 
 
-# 📊 Carregar os dados
-@st.cache_data
+SOURCE_FILES = {
+    'transactions_1': 'data/transactions_1.csv',
+    'transactions_2': 'data/transactions_2.csv'
+}
+
+# 📊 Linhas brutas (armazenamento colunar memory-mapped, ver Core/transaction_store.py)
+# O store fica em cache_resource (sem cópia/pickle); só as linhas exibidas viram DataFrame
+@st.cache_resource
+def load_store(csv_path, signature):
+    """Armazenamento colunar do CSV (a assinatura reabre o store quando o arquivo muda)"""
+    return TransactionStore.load(csv_path)
+
 def load_data():
+    """Stores das duas fontes, abertos apenas quando 'Carregar linhas brutas' é marcado"""
     try:
-        df1 = pd.read_csv(get_data_path('data/transactions_1.csv'))
-        df2 = pd.read_csv(get_data_path('data/transactions_2.csv'))
-        return df1, df2
+        return tuple(
+            load_store(csv_path, file_signature(csv_path))
+            for csv_path in (get_data_path(filename) for filename in SOURCE_FILES.values())
+        )
     except Exception as e:
         st.error(f"Erro ao carregar dados: {str(e)}")
-        return pd.DataFrame(), pd.DataFrame()
+        return None, None
+
+# 🗃️ Rollups pré-agregados do alert_data.db (mantidos pela ingestão incremental)
+# A página só lê: a ingestão roda no worker de saúde/daemon (ou no botão "Ingerir agora"),
+# e a assinatura do banco invalida o cache quando chegam linhas novas.
+@st.cache_data
+def load_rollups(resolution, signature):
+    """Carrega os agregados por minuto, as séries por status e os totais a partir dos rollups"""
+    with timed_query('alert_data', f"rollups {resolution}") as conn:
+        aggregates = {
+            source: StatusAggregate.from_rollup(alert_store.load_rollup(conn, source, '1m'))
+            for source in ('transactions_1', 'transactions_2')
+        }
+        pivots = {
+            source: alert_store.rollup_pivot(conn, source, resolution)
+            for source in ('transactions_1', 'transactions_2')
+        }
+        totals = {
+            source: alert_store.status_totals(conn, source)
+            for source in ('transactions_1', 'transactions_2')
+        }
+    return aggregates, pivots, totals
+
+@st.cache_data
+def rollups_available(signature):
+    """True se o alert_data.db já tem rollups das duas fontes (banco distribuído vem sem eles)"""
+    try:
+        with timed_query('alert_data', "rollups ready") as conn:
+            return alert_store.rollups_ready(conn, SOURCE_FILES)
+    except Exception:
+        return False
+
+# 🌊 Agregação em streaming: CSVs lidos em blocos, memória constante
+@st.cache_data(show_spinner=False)
+def stream_aggregate(csv_path, signature):
+    """Agrega um CSV em blocos (a assinatura invalida o cache quando o arquivo muda)"""
+    return aggregate_csv(csv_path)
+
+def load_stream_aggregates(resolution):
+    """Agregados, séries por status e totais calculados direto dos CSVs"""
+    aggregates = {}
+    for source, filename in SOURCE_FILES.items():
+        csv_path = get_data_path(filename)
+        aggregates[source] = stream_aggregate(csv_path, file_signature(csv_path))
+    pivots = {source: aggregate.pivot(resolution) for source, aggregate in aggregates.items()}
+    totals = {source: aggregate.totals() for source, aggregate in aggregates.items()}
+    return aggregates, pivots, totals
+
+# 🎮 Controles interativos na sidebar
+st.sidebar.header("🎮 Controles do Dashboard")
+st.sidebar.markdown("---")
+
+# Origem dos agregados que alimentam o dashboard (padrão: rollups, se já ingeridos)
+aggregate_options = {"🗃️ Rollups (alert_data.db)": 'rollups', "🌊 Streaming dos CSVs": 'stream'}
+rollups_loaded = rollups_available(database_signature('alert_data'))
+aggregate_source = aggregate_options[st.sidebar.selectbox(
+    "💾 Fonte dos Agregados:",
+    list(aggregate_options.keys()),
+    index=0 if rollups_loaded else 1
+)]
+
+# Resolução das séries temporais (tabelas de rollup)
+resolution_options = {"1 minuto": '1m', "15 minutos": '15m', "1 hora": '1h'}
+temporal_resolution = resolution_options[st.sidebar.selectbox(
+    "⏱️ Resolução Temporal:",
+    list(resolution_options.keys())
+)]
+
+# Pontos de mudança de nível sobrepostos aos gráficos temporais
+changepoint_options = {"Ambos": ('cusum', 'pelt'), "CUSUM (incremental)": ('cusum',),
+                       "PELT (histórico)": ('pelt',), "Ocultar": ()}
+changepoint_methods = changepoint_options[st.sidebar.selectbox(
+    "📍 Mudanças de Nível (falhas/negações):",
+    list(changepoint_options.keys())
+)]
+
+# Ingestão manual (a automática fica com o worker de saúde / Core/monitor_daemon.py)
+if aggregate_source == 'rollups' and st.sidebar.button("📥 Ingerir agora"):
+    try:
+        imported = ingest_alert_sources()
+        st.sidebar.success(f"📥 {sum(imported.values()):,} linhas importadas")
+    except Exception as e:
+        st.sidebar.error(f"❌ Falha na ingestão: {str(e)}")
+
+# Sem rollups ainda (banco sem ingestão): usar os CSVs em vez de parar a página
+if aggregate_source == 'rollups' and not rollups_available(database_signature('alert_data')):
+    st.sidebar.info("🗃️ alert_data.db ainda sem rollups: usando o streaming dos CSVs até a primeira ingestão")
+    aggregate_source = 'stream'
 
-# Carregar dados
-df1, df2 = load_data()
+# Carregar agregados (volume por minuto x status); as linhas brutas ficam para a aba de dados
+try:
+    if aggregate_source == 'stream':
+        aggregates, rollup_pivots, rollup_totals = load_stream_aggregates(temporal_resolution)
+    else:
+        aggregates, rollup_pivots, rollup_totals = load_rollups(temporal_resolution,
+                                                                database_signature('alert_data'))
+    agg1 = aggregates['transactions_1'].frame()
+    agg2 = aggregates['transactions_2'].frame()
+except Exception as e:
+    st.error(f"❌ Erro: Não foi possível carregar os dados das transações: {str(e)}")
+    st.info("Verifique se os arquivos transactions_1.csv e transactions_2.csv estão na pasta data/ "
+            "e, com a fonte Rollups, use \"📥 Ingerir agora\" se o worker de saúde ainda não rodou")
+    st.stop()
 
 # Verificar se os dados foram carregados corretamente
-if df1.empty or df2.empty:
+if agg1.empty or agg2.empty:
     st.error("❌ Erro: Não foi possível carregar os dados das transações!")
     st.info("Verifique se os arquivos transactions_1.csv e transactions_2.csv estão na pasta data/")
     st.stop()
@@ -72,31 +207,30 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# 📊 Métricas principais no topo
+# 📊 Métricas principais no topo (ponderadas pelo volume de cada linha)
+volume_1 = status_volume(agg1)
+volume_2 = status_volume(agg2)
+
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_trans_1 = len(df1)
+    total_trans_1 = int(volume_1.sum())
     st.metric("📊 Total Transações T1", total_trans_1, delta=f"+{(total_trans_1/1000):.1f}K")
 
 with col2:
-    total_trans_2 = len(df2)
+    total_trans_2 = int(volume_2.sum())
     st.metric("📊 Total Transações T2", total_trans_2, delta=f"+{(total_trans_2/1000):.1f}K")
 
 with col3:
-    approved_rate_1 = (df1['status'] == 'approved').mean() * 100
+    approved_rate_1 = status_rate(volume_1, 'approved')
     st.metric("✅ Taxa Aprovação T1", f"{approved_rate_1:.1f}%", delta=f"{approved_rate_1-85:.1f}%")
 
 with col4:
-    failed_rate_2 = (df2['status'] == 'failed').mean() * 100 
+    failed_rate_2 = status_rate(volume_2, 'failed')
     st.metric("❌ Taxa Falhas T2", f"{failed_rate_2:.1f}%", delta=f"-{failed_rate_2:.1f}%")
 
 st.markdown("---")
 
-# 🎮 Controles interativos na sidebar
-st.sidebar.header("🎮 Controles do Dashboard")
-st.sidebar.markdown("---")
-
 # Seleção de dataset
 dataset_option = st.sidebar.selectbox(
     "📊 Selecionar Dataset:",
@@ -105,7 +239,7 @@ dataset_option = st.sidebar.selectbox(
 
 # Filtros de status
 st.sidebar.subheader("🔍 Filtros de Status")
-all_statuses = list(set(df1['status'].unique()) | set(df2['status'].unique()))
+all_statuses = list(set(agg1['status'].unique()) | set(agg2['status'].unique()))
 selected_statuses = st.sidebar.multiselect(
     "Status para análise:",
     all_statuses,
@@ -125,15 +259,21 @@ show_detailed = st.sidebar.checkbox("📋 Mostrar Análise Detalhada", value=Tru
 st.header("📊 Visualizações Interativas")
 
 # Filtrar dados pelos status selecionados
-df1_filtered = df1[df1['status'].isin(selected_statuses)]
-df2_filtered = df2[df2['status'].isin(selected_statuses)]
+def filter_by_status(df, statuses):
+    """Filtra os status selecionados descartando categorias sem linhas"""
+    filtered = df[df['status'].isin(statuses)].copy()
+    filtered['status'] = filtered['status'].cat.remove_unused_categories()
+    return filtered
+
+df1_filtered = filter_by_status(agg1, selected_statuses)
+df2_filtered = filter_by_status(agg2, selected_statuses)
 
 if dataset_option == "Ambos" or dataset_option == "Transactions 1":
     st.subheader("📈 Transactions 1 - Distribuição de Status")
     
     if chart_type == "Barras Interativas":
         # Gráfico de barras moderno com cores customizadas
-        status_counts_1 = df1_filtered['status'].value_counts()
+        status_counts_1 = status_volume(df1_filtered)
         
         colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2']
         
@@ -163,7 +303,7 @@ if dataset_option == "Ambos" or dataset_option == "Transactions 1":
         )
         
     elif chart_type == "Pizza":
-        status_counts_1 = df1_filtered['status'].value_counts()
+        status_counts_1 = status_volume(df1_filtered)
         fig1 = px.pie(
             values=status_counts_1.values,
             names=status_counts_1.index,
@@ -179,12 +319,13 @@ if dataset_option == "Ambos" or dataset_option == "Transactions 1":
         fig1 = px.sunburst(
             df1_sun, 
             path=['dataset', 'status'], 
+            values='count',
             title="Análise Hierárquica - Transactions 1",
             color_discrete_sequence=px.colors.qualitative.Pastel
         )
     
     elif chart_type == "Treemap":
-        status_counts_1 = df1_filtered['status'].value_counts()
+        status_counts_1 = status_volume(df1_filtered)
         fig1 = px.treemap(
             names=status_counts_1.index,
             values=status_counts_1.values,
@@ -199,7 +340,7 @@ if dataset_option == "Ambos" or dataset_option == "Transactions 2":
     st.subheader("📈 Transactions 2 - Distribuição de Status")
     
     if chart_type == "Barras Interativas":
-        status_counts_2 = df2_filtered['status'].value_counts()
+        status_counts_2 = status_volume(df2_filtered)
         
         colors = ['#ff6b6b', '#4ecdc4', '#45b7d1', '#f39c12', '#9b59b6', '#1abc9c', '#e74c3c']
         
@@ -229,7 +370,7 @@ if dataset_option == "Ambos" or dataset_option == "Transactions 2":
         )
         
     elif chart_type == "Pizza":
-        status_counts_2 = df2_filtered['status'].value_counts()
+        status_counts_2 = status_volume(df2_filtered)
         fig2 = px.pie(
             values=status_counts_2.values,
             names=status_counts_2.index,
@@ -244,12 +385,13 @@ if dataset_option == "Ambos" or dataset_option == "Transactions 2":
         fig2 = px.sunburst(
             df2_sun, 
             path=['dataset', 'status'], 
+            values='count',
             title="Análise Hierárquica - Transactions 2",
             color_discrete_sequence=px.colors.qualitative.Set1
         )
         
     elif chart_type == "Treemap":
-        status_counts_2 = df2_filtered['status'].value_counts()
+        status_counts_2 = status_volume(df2_filtered)
         fig2 = px.treemap(
             names=status_counts_2.index,
             values=status_counts_2.values,
@@ -264,12 +406,69 @@ if dataset_option == "Ambos" or dataset_option == "Transactions 2":
 st.markdown("---")
 st.header("📈 Análise Temporal de Transações")
 
-# Reorganizar os dados usando pivot_table
+# 📍 Mudanças de nível nas taxas de falha/negação (Core/changepoint.py)
+@st.cache_data(show_spinner=False)
+def detect_changepoints(source, volume, statuses, methods):
+    """CUSUM incremental e/ou PELT sobre a matriz minuto x status de uma fonte"""
+    frames = [pd.DataFrame(columns=CHANGE_COLUMNS)]
+    if 'cusum' in methods:
+        frames.append(CusumDetector().process(source, volume, statuses))
+    if 'pelt' in methods:
+        frames.append(detect_history(source, volume, statuses))
+    return pd.concat(frames, ignore_index=True)
+
+def add_changepoint_markers(fig, changes, y_top, row=None, col=None):
+    """Linhas verticais nos inícios das mudanças, no bucket da resolução escolhida"""
+    if changes.empty:
+        return
+    width = alert_store.ROLLUP_RESOLUTIONS[temporal_resolution]
+    labels = format_minutes(changes['minute'].to_numpy() // width * width)
+    for label, change in zip(labels, changes.itertuples()):
+        fig.add_vline(x=label, line_width=1.5, opacity=0.7,
+                      line_dash='dash' if change.method == 'pelt' else 'dot',
+                      line_color=status_colors.get(change.status, '#3498db'),
+                      row=row, col=col)
+    hover = [
+        f"{c.method.upper()} · {c.status} em {c.direction}: {c.rate_before:.1f}% → {c.rate_after:.1f}%"
+        f"<br>Início {c.time} · detectado {c.detected_time}"
+        for c in changes.itertuples()
+    ]
+    marker_trace = go.Scatter(
+        x=labels, y=[y_top] * len(labels), mode='markers', name='📍 Mudanças de nível',
+        marker=dict(symbol='triangle-down', size=12, color='#2c3e50'),
+        hovertext=hover, hoverinfo='text', showlegend=row is None or col == 1
+    )
+    if row is None:
+        fig.add_trace(marker_trace)
+    else:
+        fig.add_trace(marker_trace, row=row, col=col)
+
+# 🔗 Correlação entre os datasets (Core/correlation.py), em cache por janela
+@st.cache_data(show_spinner=False)
+def correlate_datasets(volume_1, statuses_1, volume_2, statuses_2, window, max_lag):
+    """Correlação móvel, correlação por defasagem e episódios de degradação classificados"""
+    engine = CorrelationEngine(volume_1, statuses_1, volume_2, statuses_2)
+    return engine.rolling(window), engine.lags(max_lag), engine.segments(window)
+
+status_colors = {
+    'approved': '#2ecc71',
+    'denied': '#e74c3c', 
+    'refunded': '#f39c12',
+    'reversed': '#9b59b6',
+    'backend_reversed': '#34495e',
+    'failed': '#c0392b'
+}
+
+changepoints = {
+    source: detect_changepoints(source, aggregates[source].volume, tuple(aggregates[source].statuses),
+                                changepoint_methods)
+    for source in ('transactions_1', 'transactions_2')
+}
+
+# Séries por status vindas dos agregados (sem pivot_table sobre os dados brutos)
 try:
-    df1_pivot = df1.pivot_table(index='time', columns='status', values='f0_',
-                                aggfunc='sum', fill_value=0).reset_index()
-    df2_pivot = df2.pivot_table(index='time', columns='status', values='count',
-                                aggfunc='sum', fill_value=0).reset_index()
+    df1_pivot = rollup_pivots['transactions_1']
+    df2_pivot = rollup_pivots['transactions_2']
     
     # Criar gráficos temporais interativos
     temporal_tab1, temporal_tab2, comparison_tab = st.tabs(["📊 Transactions 1", "📊 Transactions 2", "🔄 Comparação"])
@@ -280,15 +479,6 @@ try:
         # Gráfico de linha temporal moderno
         fig_temp1 = go.Figure()
         
-        status_colors = {
-            'approved': '#2ecc71',
-            'denied': '#e74c3c', 
-            'refunded': '#f39c12',
-            'reversed': '#9b59b6',
-            'backend_reversed': '#34495e',
-            'failed': '#c0392b'
-        }
-        
         for status in df1_pivot.columns[1:]:  # Skip 'time' column
             if status in df1_pivot.columns:
                 fig_temp1.add_trace(go.Scatter(
@@ -301,6 +491,9 @@ try:
                     hovertemplate=f'<b>{status.title()}</b><br>Tempo: %{{x}}<br>Quantidade: %{{y}}<extra></extra>'
                 ))
         
+        add_changepoint_markers(fig_temp1, changepoints['transactions_1'],
+                                df1_pivot.iloc[:, 1:].to_numpy().max() if len(df1_pivot) else 0)
+        
         fig_temp1.update_layout(
             title='Evolução Temporal dos Status - Transactions 1',
             xaxis_title='Horário',
@@ -311,6 +504,12 @@ try:
         )
         
         st.plotly_chart(fig_temp1, use_container_width=True)
+        
+        if changepoint_methods:
+            with st.expander(f"📍 Mudanças de nível detectadas ({len(changepoints['transactions_1'])})"):
+                st.dataframe(changepoints['transactions_1'][['time', 'detected_time', 'status', 'direction',
+                                                            'rate_before', 'rate_after', 'method']],
+                             use_container_width=True, hide_index=True)
     
     with temporal_tab2:
         st.subheader("⏰ Evolução Temporal - Transactions 2")
@@ -330,6 +529,9 @@ try:
                     hovertemplate=f'<b>{status.title()}</b><br>Tempo: %{{x}}<br>Quantidade: %{{y}}<extra></extra>'
                 ))
         
+        add_changepoint_markers(fig_temp2, changepoints['transactions_2'],
+                                df2_pivot.iloc[:, 1:].to_numpy().max() if len(df2_pivot) else 0)
+        
         fig_temp2.update_layout(
             title='Evolução Temporal dos Status - Transactions 2',
             xaxis_title='Horário',
@@ -340,6 +542,12 @@ try:
         )
         
         st.plotly_chart(fig_temp2, use_container_width=True)
+        
+        if changepoint_methods:
+            with st.expander(f"📍 Mudanças de nível detectadas ({len(changepoints['transactions_2'])})"):
+                st.dataframe(changepoints['transactions_2'][['time', 'detected_time', 'status', 'direction',
+                                                            'rate_before', 'rate_after', 'method']],
+                             use_container_width=True, hide_index=True)
     
     with comparison_tab:
         st.subheader("🔄 Comparação entre Datasets")
@@ -369,9 +577,70 @@ try:
                     row=1, col=2
                 )
         
+        for col, (source, pivot) in enumerate((('transactions_1', df1_pivot), ('transactions_2', df2_pivot)), start=1):
+            columns = [status for status in ['approved', 'failed', 'denied'] if status in pivot.columns]
+            y_top = pivot[columns].to_numpy().max() if columns and len(pivot) else 0
+            add_changepoint_markers(fig_comparison, changepoints[source], y_top, row=1, col=col)
+        
         fig_comparison.update_layout(height=600, title_text="Comparação Temporal entre Datasets")
         st.plotly_chart(fig_comparison, use_container_width=True)
         
+        # 🔗 Degradação compartilhada x local
+        st.markdown("#### 🔗 Correlação entre Datasets")
+        st.caption("Quando as taxas sobem juntas e correlacionadas a causa tende a ser comum (adquirente, rede); "
+                   "quando só um dataset degrada, a causa é local.")
+        
+        col_window, col_lag = st.columns(2)
+        with col_window:
+            correlation_window = st.select_slider("🪟 Janela da correlação (min):", options=[15, 30, 60, 120], value=60)
+        with col_lag:
+            max_lag = st.slider("↔️ Defasagem máxima (min):", min_value=5, max_value=60, value=30, step=5)
+        
+        rolling_corr, lag_corr, degradation = correlate_datasets(
+            aggregates['transactions_1'].volume, tuple(aggregates['transactions_1'].statuses),
+            aggregates['transactions_2'].volume, tuple(aggregates['transactions_2'].statuses),
+            correlation_window, max_lag
+        )
+        
+        scope_counts = degradation['scope'].value_counts()
+        col_shared, col_simultaneous, col_local = st.columns(3)
+        col_shared.metric("🌐 Compartilhados", int(scope_counts.get('compartilhado', 0)))
+        col_simultaneous.metric("⏸️ Simultâneos sem correlação", int(scope_counts.get('simultâneo', 0)))
+        col_local.metric("📍 Locais", int(scope_counts.get('local', 0)))
+        
+        fig_correlation = make_subplots(
+            rows=1, cols=2, column_widths=[0.7, 0.3],
+            subplot_titles=(f'Correlação móvel ({correlation_window} min)', 'Correlação por defasagem (T2 após T1)')
+        )
+        for status in ['approved', 'failed', 'denied']:
+            fig_correlation.add_trace(
+                go.Scatter(x=rolling_corr['time'], y=rolling_corr[status], name=f'r {status}',
+                           line=dict(color=status_colors.get(status), width=1.5)),
+                row=1, col=1
+            )
+            fig_correlation.add_trace(
+                go.Scatter(x=lag_corr['lag'], y=lag_corr[status], name=f'lag {status}', showlegend=False,
+                           line=dict(color=status_colors.get(status))),
+                row=1, col=2
+            )
+        
+        scope_colors = {'compartilhado': '#c0392b', 'simultâneo': '#95a5a6', 'local': '#f39c12'}
+        for segment in degradation.itertuples():
+            fig_correlation.add_vrect(x0=segment.start_time, x1=segment.end_time, line_width=0, opacity=0.15,
+                                      fillcolor=scope_colors[segment.scope], row=1, col=1)
+        fig_correlation.add_hline(y=0, line_width=1, line_color='#7f8c8d', row=1, col=1)
+        fig_correlation.update_yaxes(range=[-1, 1])
+        fig_correlation.update_layout(height=450, hovermode='x unified')
+        st.plotly_chart(fig_correlation, use_container_width=True)
+        
+        if len(degradation) > 0:
+            with st.expander(f"🚨 Episódios de degradação ({len(degradation)})"):
+                st.dataframe(
+                    degradation[['status', 'start_time', 'end_time', 'scope', 'sources', 'correlation',
+                                 'rate_1', 'rate_2']].round(3),
+                    use_container_width=True, hide_index=True
+                )
+        
 except Exception as e:
     st.error(f"Erro na análise temporal: {str(e)}")
     st.info("Verificando estrutura dos dados para análise temporal...")
@@ -379,43 +648,109 @@ except Exception as e:
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("Estrutura Transactions 1")
-        st.write("Colunas:", df1.columns.tolist())
-        st.write("Amostra:", df1.head(3))
+        st.write("Colunas:", agg1.columns.tolist())
+        st.write("Amostra:", agg1.head(3))
     
     with col2:
         st.subheader("Estrutura Transactions 2") 
-        st.write("Colunas:", df2.columns.tolist())
-        st.write("Amostra:", df2.head(3))
+        st.write("Colunas:", agg2.columns.tolist())
+        st.write("Amostra:", agg2.head(3))
 
 # 🚨 SISTEMA INTELIGENTE DE ALERTAS E ANÁLISES
 st.markdown("---")
 st.header("🚨 Sistema Inteligente de Detecção de Anomalias")
 
+@st.cache_resource
+def load_seasonal_baseline(signature):
+    """Índice pré-calculado (Core/seasonal_baseline.py); a assinatura recarrega quando o arquivo muda"""
+    return SeasonalBaseline.load(BASELINE_PATH)
+
+# 🧪 Desvio do mix de status por janela (Core/status_drift.py)
+@st.cache_data(show_spinner=False)
+def compute_status_drift(volumes, sources, statuses, width, baseline_signature, day):
+    """Qui-quadrado / Jensen-Shannon de todas as janelas das duas fontes em uma passada"""
+    baseline = load_seasonal_baseline(baseline_signature) if baseline_signature else None
+    return status_drift(volumes, list(sources), list(statuses), width, baseline, day)
+
+# Ações imediatas recomendadas por regra disparada (name em Core/alert_rules.json) e, sem
+# ação própria, pelo status da regra; regras de severidade 'info' não geram ação imediata
+RULE_ACTIONS = {
+    'failed_rate': ["🔧 Verificar sistema de pagamento", "📞 Contatar suporte técnico"],
+    'denied_rate': ["🔍 Revisar regras de validação", "📋 Analisar logs de negação"]
+}
+STATUS_ACTIONS = {
+    'failed': RULE_ACTIONS['failed_rate'],
+    'denied': RULE_ACTIONS['denied_rate']
+}
+
 # Análise automática de anomalias
-def detect_anomalies(df, dataset_name):
-    """Detecta anomalias automaticamente nos dados"""
-    analysis = {
-        'total_transactions': len(df),
-        'approved_rate': (df['status'] == 'approved').mean() * 100,
-        'failed_rate': (df['status'] == 'failed').mean() * 100,
-        'denied_rate': (df['status'] == 'denied').mean() * 100,
-        'dataset_name': dataset_name
-    }
+def detect_anomalies(totals_by_source, dataset_names, drift=None, aggregates=None):
+    """
+    Detecta anomalias a partir dos totais por status (rollups), com taxas ponderadas pelo volume
+    
+    Os limites vêm de Core/alert_rules.json e todas as fontes são avaliadas
+    em uma única passada vetorizada. Regras de janela deslizante (15m, 1h...)
+    são avaliadas sobre os agregados por minuto (`aggregates`). Com `drift`
+    (saída de status_drift) as mudanças no mix de status entram como alertas
+    adicionais. As regras disparadas ficam em analysis['fired_rules'].
+    """
+    rules = load_rules()
+    volumes = {source: totals['count'] for source, totals in totals_by_source.items()}
+    fired = rules.evaluate_totals(volumes)
+    windowed = rules.evaluate_windows({source: aggregates[source] for source in volumes}) \
+        if aggregates is not None else pd.DataFrame(columns=fired.columns)
     
-    # Detecção de alertas baseada em thresholds
-    alerts = []
-    if analysis['failed_rate'] > 10:
-        alerts.append(('🔴 CRÍTICO', f"Alta taxa de falhas: {analysis['failed_rate']:.1f}%"))
-    if analysis['denied_rate'] > 15:
-        alerts.append(('🟡 ATENÇÃO', f"Taxa elevada de negações: {analysis['denied_rate']:.1f}%"))
-    if analysis['approved_rate'] < 70:
-        alerts.append(('🟠 ALERTA', f"Taxa de aprovação baixa: {analysis['approved_rate']:.1f}%"))
+    results = {}
+    for source, volume in volumes.items():
+        analysis = {
+            'total_transactions': int(volume.sum()),
+            'approved_rate': status_rate(volume, 'approved'),
+            'failed_rate': status_rate(volume, 'failed'),
+            'denied_rate': status_rate(volume, 'denied'),
+            'dataset_name': dataset_names[source]
+        }
+        source_fired = fired[fired['source'] == source]
+        alerts = [(SEVERITY_LABELS[row.severity], row.message) for row in source_fired.itertuples()]
+        # Janelas deslizantes: um alerta por regra, com o número de minutos e o último disparo
+        source_windowed = windowed[windowed['source'] == source]
+        for rule, rows in source_windowed.groupby('rule', sort=False):
+            last = rows.iloc[-1]
+            alerts.append((SEVERITY_LABELS[last['severity']],
+                           f"{last['message']} em {len(rows)} minuto(s), último às "
+                           f"{format_minutes([int(last['minute'])])[0]}"))
+        analysis['fired_rules'] = {
+            row.rule: (row.status, row.severity)
+            for row in pd.concat([source_fired, source_windowed]).itertuples()
+        }
+        if drift is not None:
+            summary = drift_summary(drift, source)
+            analysis['drift_windows'] = int(((drift['source'] == source) & drift['severity'].notna()).sum())
+            if summary:
+                alerts.append((SEVERITY_LABELS[summary[0]], summary[1]))
+        results[source] = (analysis, alerts)
     
-    return analysis, alerts
+    return results
+
+# Mix de status de cada janela contra a linha de base sazonal (ou o mix do dia, sem histórico)
+drift_sources = ('transactions_1', 'transactions_2')
+drift_statuses = list(SeasonalBaseline().statuses)
+drift_statuses += [s for source in drift_sources for s in aggregates[source].statuses if s not in drift_statuses]
+drift_width = st.select_slider("🧪 Janela do mix de status (min):", options=[5, 15, 30, 60], value=15)
+status_mix_drift = compute_status_drift(
+    np.stack([aggregates[source].volume_matrix(drift_statuses) for source in drift_sources]),
+    drift_sources, tuple(drift_statuses), drift_width,
+    file_signature(BASELINE_PATH) if os.path.exists(BASELINE_PATH) else None,
+    st.session_state.get('baseline_day')
+)
 
 # Análise para ambos datasets
-analysis_1, alerts_1 = detect_anomalies(df1, "Transactions 1")
-analysis_2, alerts_2 = detect_anomalies(df2, "Transactions 2")
+anomaly_results = detect_anomalies(
+    {source: rollup_totals[source] for source in ('transactions_1', 'transactions_2')},
+    {'transactions_1': "Transactions 1", 'transactions_2': "Transactions 2"},
+    drift=status_mix_drift, aggregates=aggregates
+)
+analysis_1, alerts_1 = anomaly_results['transactions_1']
+analysis_2, alerts_2 = anomaly_results['transactions_2']
 
 # Dashboard de alertas
 alert_col1, alert_col2 = st.columns(2)
@@ -446,6 +781,18 @@ with alert_col1:
     </ul>
     </div>
     """, unsafe_allow_html=True)
+    
+    # Janelas com mudança no mix de status
+    drifted = status_mix_drift[(status_mix_drift['source'] == 'transactions_1') & status_mix_drift['severity'].notna()]
+    with st.expander(f"🧪 Mix de status: {analysis_1['drift_windows']} janelas com desvio"):
+        if drifted.empty:
+            st.success("✅ Mix de status dentro do esperado em todas as janelas")
+        else:
+            st.dataframe(
+                drifted[['time', 'end_time', 'top_status', 'observed_share', 'expected_share', 'z', 'js',
+                         'reference', 'severity']].round(3),
+                use_container_width=True, hide_index=True
+            )
 
 with alert_col2:
     st.subheader("🔍 Análise Transactions 2")
@@ -473,6 +820,65 @@ with alert_col2:
     </ul>
     </div>
     """, unsafe_allow_html=True)
+    
+    # Janelas com mudança no mix de status
+    drifted = status_mix_drift[(status_mix_drift['source'] == 'transactions_2') & status_mix_drift['severity'].notna()]
+    with st.expander(f"🧪 Mix de status: {analysis_2['drift_windows']} janelas com desvio"):
+        if drifted.empty:
+            st.success("✅ Mix de status dentro do esperado em todas as janelas")
+        else:
+            st.dataframe(
+                drifted[['time', 'end_time', 'top_status', 'observed_share', 'expected_share', 'z', 'js',
+                         'reference', 'severity']].round(3),
+                use_container_width=True, hide_index=True
+            )
+
+# ⏱️ Linha do tempo: detector online minuto a minuto (janela deslizante + EWMA por status)
+st.subheader("⏱️ Linha do Tempo de Anomalias (minuto a minuto)")
+st.caption("Taxas de cada status comparadas com a média móvel da última hora e com a EWMA; "
+           "um alerta indica quando o desvio começou.")
+
+detector = OnlineDetector()
+timeline_col1, timeline_col2 = st.columns(2)
+for column, source, label in ((timeline_col1, 'transactions_1', "Transactions 1"),
+                              (timeline_col2, 'transactions_2', "Transactions 2")):
+    with column:
+        timeline = detector.process_aggregate(source, aggregates[source])
+        critical = int((timeline['severity'] == 'critical').sum())
+        st.metric(f"🚨 Alertas {label}", len(timeline), delta=f"{critical} críticos", delta_color="inverse")
+        if timeline.empty:
+            st.success("✅ Nenhum desvio detectado ao longo do dia")
+        else:
+            st.dataframe(
+                timeline[['time', 'status', 'rate', 'baseline', 'z_window', 'severity', 'message']],
+                use_container_width=True, hide_index=True
+            )
+
+# 📐 Linha de base sazonal: cada minuto comparado com a mediana/MAD do mesmo minuto em dias anteriores
+st.subheader("📐 Desvios da Linha de Base Sazonal")
+if os.path.exists(BASELINE_PATH):
+    baseline = load_seasonal_baseline(file_signature(BASELINE_PATH))
+    baseline_day = st.date_input("📅 Dia dos dados (define o dia da semana da linha de base)", key="baseline_day")
+    baseline_col1, baseline_col2 = st.columns(2)
+    for column, source, label in ((baseline_col1, 'transactions_1', "Transactions 1"),
+                                  (baseline_col2, 'transactions_2', "Transactions 2")):
+        with column:
+            if source not in baseline.sources:
+                st.info(f"📋 Linha de base sem histórico de {label}")
+                continue
+            deviations = baseline.deviations(
+                source, baseline_day, np.arange(MINUTES_PER_DAY),
+                aggregates[source].volume_matrix(baseline.statuses)
+            )
+            st.metric(f"📐 Minutos fora do padrão {label}", deviations['minute'].nunique())
+            if not deviations.empty:
+                st.dataframe(
+                    deviations[['time', 'channel', 'value', 'median', 'z', 'severity']],
+                    use_container_width=True, hide_index=True
+                )
+else:
+    st.info("📋 Linha de base sazonal ainda não construída. "
+            "Use `python Core/seasonal_baseline.py build --source transactions_1=<csv> ...`")
 
 # 💡 RECOMENDAÇÕES INTELIGENTES
 st.markdown("---")
@@ -483,14 +889,15 @@ rec_col1, rec_col2 = st.columns(2)
 with rec_col1:
     st.subheader("🎯 Ações Imediatas")
     
+    # Ações das regras que dispararam (Core/alert_rules.json): pelo nome da regra ou pelo status
     immediate_actions = []
-    if analysis_1['failed_rate'] > 10 or analysis_2['failed_rate'] > 10:
-        immediate_actions.append("🔧 Verificar sistema de pagamento")
-        immediate_actions.append("📞 Contatar suporte técnico")
-    
-    if analysis_1['denied_rate'] > 15 or analysis_2['denied_rate'] > 15:
-        immediate_actions.append("🔍 Revisar regras de validação")
-        immediate_actions.append("📋 Analisar logs de negação")
+    fired_rules = {**analysis_1['fired_rules'], **analysis_2['fired_rules']}
+    for rule, (status, severity) in fired_rules.items():
+        if severity == 'info':
+            continue
+        for action in RULE_ACTIONS.get(rule) or STATUS_ACTIONS.get(status) or [f"🚨 Investigar a regra '{rule}'"]:
+            if action not in immediate_actions:
+                immediate_actions.append(action)
     
     if not immediate_actions:
         immediate_actions.append("✅ Sistema operando normalmente")
@@ -560,74 +967,84 @@ if show_detailed:
     st.markdown("---")
     st.header("📋 Análise Exploratória dos Dados")
     
+    # Linhas brutas sob demanda: o restante do dashboard usa apenas os agregados
+    load_raw = st.checkbox("📥 Carregar linhas brutas (amostras e estatísticas numéricas)", False)
+    store_1, store_2 = load_data() if load_raw else (None, None)
+    
     data_tab1, data_tab2, stats_tab = st.tabs(["📊 Dataset 1", "📊 Dataset 2", "📈 Estatísticas"])
     
     with data_tab1:
         st.subheader("🔍 Transactions 1 - Amostra dos Dados")
         
-        # Filtros interativos
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            n_rows = st.slider("Número de linhas para exibir:", 5, min(100, len(df1)), 10)
-        with col2:
-            show_all_cols = st.checkbox("Mostrar todas as colunas", False)
-        
-        if show_all_cols:
-            st.dataframe(df1.head(n_rows), use_container_width=True)
+        if store_1 is None:
+            st.info("📥 Marque 'Carregar linhas brutas' para ver a amostra dos dados")
         else:
-            display_cols = ['time', 'status'] + [col for col in df1.columns if col not in ['time', 'status']][:3]
-            st.dataframe(df1[display_cols].head(n_rows), use_container_width=True)
+            # Filtros interativos
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                n_rows = st.slider("Número de linhas para exibir:", 5, min(100, len(store_1)), 10)
+            with col2:
+                show_all_cols = st.checkbox("Mostrar todas as colunas", False)
         
-        # Informações do dataset
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("📊 Total Registros", len(df1))
-        with col2:
-            st.metric("📝 Colunas", len(df1.columns))
-        with col3:
-            unique_status = df1['status'].nunique()
-            st.metric("🏷️ Status Únicos", unique_status)
+            sample = store_1.to_frame(0, n_rows)
+            if show_all_cols:
+                st.dataframe(sample, use_container_width=True)
+            else:
+                display_cols = ['time', 'status'] + [col for col in sample.columns if col not in ['time', 'status']][:3]
+                st.dataframe(sample[display_cols], use_container_width=True)
+        
+            # Informações do dataset (calculadas nas colunas do store)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("📊 Total Registros", len(store_1))
+            with col2:
+                st.metric("📝 Colunas", len(sample.columns))
+            with col3:
+                unique_status = len(store_1.present_statuses())
+                st.metric("🏷️ Status Únicos", unique_status)
     
     with data_tab2:
         st.subheader("🔍 Transactions 2 - Amostra dos Dados")
         
-        # Filtros interativos
-        col1, col2 = st.columns([2, 1])
-        with col1:
-            n_rows_2 = st.slider("Número de linhas para exibir:", 5, min(100, len(df2)), 10, key="rows_2")
-        with col2:
-            show_all_cols_2 = st.checkbox("Mostrar todas as colunas", False, key="cols_2")
-        
-        if show_all_cols_2:
-            st.dataframe(df2.head(n_rows_2), use_container_width=True)
+        if store_2 is None:
+            st.info("📥 Marque 'Carregar linhas brutas' para ver a amostra dos dados")
         else:
-            display_cols_2 = ['time', 'status'] + [col for col in df2.columns if col not in ['time', 'status']][:3]
-            st.dataframe(df2[display_cols_2].head(n_rows_2), use_container_width=True)
+            # Filtros interativos
+            col1, col2 = st.columns([2, 1])
+            with col1:
+                n_rows_2 = st.slider("Número de linhas para exibir:", 5, min(100, len(store_2)), 10, key="rows_2")
+            with col2:
+                show_all_cols_2 = st.checkbox("Mostrar todas as colunas", False, key="cols_2")
         
-        # Informações do dataset
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("📊 Total Registros", len(df2))
-        with col2:
-            st.metric("📝 Colunas", len(df2.columns))
-        with col3:
-            unique_status_2 = df2['status'].nunique()
-            st.metric("🏷️ Status Únicos", unique_status_2)
+            sample_2 = store_2.to_frame(0, n_rows_2)
+            if show_all_cols_2:
+                st.dataframe(sample_2, use_container_width=True)
+            else:
+                display_cols_2 = ['time', 'status'] + [col for col in sample_2.columns if col not in ['time', 'status']][:3]
+                st.dataframe(sample_2[display_cols_2], use_container_width=True)
+        
+            # Informações do dataset (calculadas nas colunas do store)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("📊 Total Registros", len(store_2))
+            with col2:
+                st.metric("📝 Colunas", len(sample_2.columns))
+            with col3:
+                unique_status_2 = len(store_2.present_statuses())
+                st.metric("🏷️ Status Únicos", unique_status_2)
     
     with stats_tab:
         st.subheader("📈 Estatísticas Descritivas")
         
-        # Análise de colunas numéricas
-        numeric_cols_1 = df1.select_dtypes(include=['int64', 'float64']).columns
-        numeric_cols_2 = df2.select_dtypes(include=['int64', 'float64']).columns
-        
-        if len(numeric_cols_1) > 0:
+        # Análise de colunas numéricas (requer as linhas brutas)
+        if store_1 is None or store_2 is None:
+            st.info("📥 Marque 'Carregar linhas brutas' para ver as estatísticas numéricas")
+        else:
             st.markdown("**📊 Transactions 1 - Estatísticas Numéricas:**")
-            st.dataframe(df1[numeric_cols_1].describe(), use_container_width=True)
-        
-        if len(numeric_cols_2) > 0:
+            st.dataframe(store_1.describe(), use_container_width=True)
+            
             st.markdown("**📊 Transactions 2 - Estatísticas Numéricas:**")
-            st.dataframe(df2[numeric_cols_2].describe(), use_container_width=True)
+            st.dataframe(store_2.describe(), use_container_width=True)
         
         # Distribuição de status
         st.markdown("---")
@@ -637,21 +1054,23 @@ if show_detailed:
         
         with col1:
             st.markdown("**Transactions 1:**")
-            status_dist_1 = df1['status'].value_counts()
+            status_dist_1 = status_volume(agg1)
             status_df_1 = pd.DataFrame({
                 'Status': status_dist_1.index,
-                'Quantidade': status_dist_1.values,
-                'Percentual': (status_dist_1.values / len(df1) * 100).round(2)
+                'Registros': rollup_totals['transactions_1']['rows'].reindex(status_dist_1.index).values,
+                'Volume': status_dist_1.values,
+                'Percentual': (status_dist_1.values / status_dist_1.sum() * 100).round(2)
             })
             st.dataframe(status_df_1, use_container_width=True)
         
         with col2:
             st.markdown("**Transactions 2:**")
-            status_dist_2 = df2['status'].value_counts()
+            status_dist_2 = status_volume(agg2)
             status_df_2 = pd.DataFrame({
                 'Status': status_dist_2.index,
-                'Quantidade': status_dist_2.values,
-                'Percentual': (status_dist_2.values / len(df2) * 100).round(2)
+                'Registros': rollup_totals['transactions_2']['rows'].reindex(status_dist_2.index).values,
+                'Volume': status_dist_2.values,
+                'Percentual': (status_dist_2.values / status_dist_2.sum() * 100).round(2)
             })
             st.dataframe(status_df_2, use_container_width=True)
 
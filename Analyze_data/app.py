@@ -1,9 +1,20 @@
 import pandas as pd
 import streamlit as st
-import sqlite3
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
+import sys
+
+# Adicionar o diretório Core ao path (módulos compartilhados entre as tarefas)
+for core_path in (os.path.join(os.getcwd(), 'Core'), os.path.join(os.getcwd(), '..', 'Core')):
+    if os.path.exists(core_path):
+        core_path = os.path.abspath(core_path)
+        if core_path not in sys.path:
+            sys.path.append(core_path)
+        break
+
+from db_access import get_connection, read_sql
+from hourly_history import ComparisonEngine
 
 # Disable warning for st.pyplot()
 # option deprecated in newer Streamlit versions
@@ -35,15 +46,10 @@ def get_db_path(db_filename):
 def load_data_from_databases():
     """Carrega dados diretamente dos bancos SQLite"""
     try:
-        # Conectar aos bancos de dados existentes
-        conn_main = sqlite3.connect(get_db_path('data.db'))
-        
-        # Carregar dados das tabelas existentes
-        df_checkout1 = pd.read_sql_query("SELECT * FROM data_table_1", conn_main)
-        df_checkout2 = pd.read_sql_query("SELECT * FROM data_table_2", conn_main)
-        df_general = pd.read_sql_query("SELECT * FROM data_table", conn_main)
-        
-        conn_main.close()
+        # Carregar dados das tabelas existentes (pool somente leitura)
+        df_checkout1 = read_sql('data', "SELECT * FROM data_table_1")
+        df_checkout2 = read_sql('data', "SELECT * FROM data_table_2")
+        df_general = read_sql('data', "SELECT * FROM data_table")
         
         return df_checkout1, df_checkout2, df_general
         
@@ -59,15 +65,13 @@ def load_data_from_databases():
 # Carregar dados dos bancos SQLite
 df1, df2, df_general = load_data_from_databases()
 
-# Criar conexões para análises em tempo real (se necessário)
-@st.cache_resource
+# Conexões para análises em tempo real (se necessário)
+# Sem st.cache_resource: conexões sqlite3 não podem ser compartilhadas entre
+# as threads de script do Streamlit, então o pool mantém uma por thread
 def get_database_connections():
-    """Retorna conexões ativas para os bancos"""
+    """Retorna conexões somente leitura da thread atual para os bancos"""
     try:
-        conn_main = sqlite3.connect(get_db_path('data.db'))
-        conn1 = sqlite3.connect(get_db_path('data1.db'))
-        conn2 = sqlite3.connect(get_db_path('data2.db'))
-        return conn_main, conn1, conn2
+        return get_connection('data'), get_connection('data1'), get_connection('data2')
     except Exception as e:
         st.error(f"Erro ao conectar bancos: {str(e)}")
         return None, None, None
@@ -114,6 +118,37 @@ except st.errors.StreamlitAPIException:
     # Já foi configurado pelo main.py
     pass
 
+# 🗓️ Fonte dos dados: export estático (data.db) ou histórico horário bruto (history.db)
+@st.cache_resource
+def get_comparison_engine():
+    """Motor de comparações compartilhado (memoriza as janelas entre execuções)"""
+    return ComparisonEngine()
+
+def get_history_range():
+    """Intervalo de dias disponível no histórico horário ou (None, None)"""
+    try:
+        return get_comparison_engine().day_range()
+    except Exception:
+        return None, None
+
+history_first, history_last = get_history_range()
+if history_last is not None:
+    st.sidebar.subheader("🗓️ Fonte dos Dados")
+    data_source = st.sidebar.radio(
+        "Origem das comparações:", ["Export (data.db)", "Histórico horário"], key="data_source"
+    )
+    if data_source == "Histórico horário":
+        history_day = st.sidebar.date_input(
+            "📅 Dia analisado", value=history_last,
+            min_value=history_first, max_value=history_last, key="history_day"
+        )
+        engine = get_comparison_engine()
+        df1 = engine.compare(1, history_day)
+        df2 = engine.compare(2, history_day)
+        df_general = engine.compare(None, history_day)
+        results_df1, results_df2 = prepare_analysis_data()
+    st.sidebar.markdown("---")
+
 # 🎯 TÍTULO PRINCIPAL
 st.markdown("""
 <div style='background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 2rem; border-radius: 15px; margin-bottom: 2rem;'>
@@ -0,0 +1,360 @@
+import os
+import sys
+import json
+import argparse
+from fnmatch import fnmatchcase
+import numpy as np
+import pandas as pd
+from db_access import PROJECT_ROOT
+from transaction_store import STATUS_CATEGORIES
+
+
+RULES_PATH = os.path.join(PROJECT_ROOT, 'Core', 'alert_rules.json')
+
+# Severidades em ordem crescente, com o ícone/rótulo usado nos dashboards
+SEVERITIES = ['info', 'warning', 'critical']
+SEVERITY_ICONS = {'info': '🟠', 'warning': '🟡', 'critical': '🔴'}
+SEVERITY_LABELS = {'info': '🟠 ALERTA', 'warning': '🟡 ATENÇÃO', 'critical': '🔴 CRÍTICO'}
+
+# Métricas: taxa (%) do status, volume do status ou volume total da janela
+METRICS = ['rate', 'volume', 'total']
+
+# Comparador -> (sinal, estrito): a regra dispara quando sinal * (valor - limite) > 0
+COMPARATORS = {
+    '>': (1, True),
+    '>=': (1, False),
+    '<': (-1, True),
+    '<=': (-1, False)
+}
+
+FIRED_COLUMNS = [
+    'rule', 'source', 'status', 'metric', 'window', 'minute', 'value', 'threshold',
+    'severity', 'penalty', 'message'
+]
+
+
+def parse_window(window):
+    """
+    Converte a janela de uma regra em minutos
+
+    'total' (ou 0) é o período inteiro; '15m', '1h' ou um inteiro são
+    janelas deslizantes que terminam em cada minuto.
+    """
+    if window in (None, 'total', 0):
+        return 0
+    if isinstance(window, (int, np.integer)):
+        minutes = int(window)
+    else:
+        text = str(window).strip().lower()
+        if text.endswith('h'):
+            minutes = int(text[:-1]) * 60
+        elif text.endswith('m'):
+            minutes = int(text[:-1])
+        else:
+            minutes = int(text)
+    if minutes <= 0:
+        raise ValueError(f"Janela inválida: {window}")
+    return minutes
+
+
+def normalize_rule(rule):
+    """Valida uma regra do arquivo de configuração e preenche os padrões"""
+    rule = dict(rule)
+    for field in ('name', 'metric', 'comparator', 'threshold'):
+        if field not in rule:
+            raise ValueError(f"Regra sem o campo '{field}': {rule}")
+    if rule['metric'] not in METRICS:
+        raise ValueError(f"Métrica desconhecida em '{rule['name']}': {rule['metric']}")
+    if rule['metric'] != 'total' and not rule.get('status'):
+        raise ValueError(f"Regra '{rule['name']}' precisa de 'status'")
+    if rule['comparator'] not in COMPARATORS:
+        raise ValueError(f"Comparador desconhecido em '{rule['name']}': {rule['comparator']}")
+
+    rule.setdefault('status', '*')
+    rule.setdefault('severity', 'warning')
+    if rule['severity'] not in SEVERITIES:
+        raise ValueError(f"Severidade desconhecida em '{rule['name']}': {rule['severity']}")
+    rule.setdefault('window', 'total')
+    rule['window_minutes'] = parse_window(rule['window'])
+    rule.setdefault('min_volume', 0)
+    rule.setdefault('penalty', 0)
+    rule.setdefault('sources', ['*'])
+    rule.setdefault('message', f"{rule['name']} {rule['comparator']} {rule['threshold']} ({{value:.1f}})")
+    return rule
+
+
+class RuleSet:
+    """
+    Regras de alerta compiladas para avaliação vetorizada
+
+    Na compilação cada regra vira uma posição em arrays paralelos
+    (janela, status, métrica, sinal, limite). A avaliação calcula uma
+    única soma acumulada dos volumes por fonte/minuto/status; cada
+    janela distinta é uma diferença dessa soma, e todas as regras são
+    comparadas de uma vez sobre o tensor (regra, fonte, minuto). Mais
+    regras não geram novas leituras dos dados.
+    """
+
+    def __init__(self, rules):
+        self.rules = [normalize_rule(rule) for rule in rules]
+        names = [rule['name'] for rule in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Nomes de regra duplicados")
+
+        self.statuses = list(STATUS_CATEGORIES)
+        for rule in self.rules:
+            if rule['status'] != '*' and rule['status'] not in self.statuses:
+                self.statuses.append(rule['status'])
+
+        self.windows = sorted({rule['window_minutes'] for rule in self.rules})
+        self.window_index = np.array([self.windows.index(r['window_minutes']) for r in self.rules], dtype=np.int64)
+        self.status_index = np.array([
+            self.statuses.index(r['status']) if r['status'] != '*' else 0 for r in self.rules
+        ], dtype=np.int64)
+        self.metric = np.array([METRICS.index(r['metric']) for r in self.rules], dtype=np.int64)
+        self.sign = np.array([COMPARATORS[r['comparator']][0] for r in self.rules], dtype=np.float64)
+        self.strict = np.array([COMPARATORS[r['comparator']][1] for r in self.rules])
+        self.threshold = np.array([float(r['threshold']) for r in self.rules])
+        self.min_volume = np.array([float(r['min_volume']) for r in self.rules])
+        self._source_masks = {}
+
+    @property
+    def names(self):
+        return [rule['name'] for rule in self.rules]
+
+    @classmethod
+    def from_file(cls, path=RULES_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get('rules', []))
+
+    def source_mask(self, sources):
+        """Matriz (regra, fonte) das fontes às quais cada regra se aplica"""
+        key = tuple(sources)
+        mask = self._source_masks.get(key)
+        if mask is None:
+            mask = np.array([
+                [any(fnmatchcase(str(source), pattern) for pattern in rule['sources']) for source in sources]
+                for rule in self.rules
+            ], dtype=bool).reshape(len(self.rules), len(sources))
+            self._source_masks[key] = mask
+        return mask
+
+    def _window_sums(self, volumes, running_total=False):
+        """
+        Somas de cada janela a partir de uma única soma acumulada
+
+        Args:
+            volumes: Array (fonte, minuto, status)
+            running_total: Janela 'total' acumulada até cada minuto (replay)
+                em vez de apenas no último minuto
+
+        Returns:
+            (status, total): arrays (janela, fonte, minuto, status) e
+            (janela, fonte, minuto); NaN onde a janela ainda não está completa
+        """
+        n_sources, n_minutes, n_statuses = volumes.shape
+        cumulative = np.zeros((n_sources, n_minutes + 1, n_statuses))
+        np.cumsum(volumes, axis=1, out=cumulative[:, 1:])
+
+        status_sums = np.full((len(self.windows), n_sources, n_minutes, n_statuses), np.nan)
+        for w, width in enumerate(self.windows):
+            if width == 0 and running_total:
+                status_sums[w] = cumulative[:, 1:]
+            elif width == 0:
+                status_sums[w, :, -1] = cumulative[:, -1]
+            elif width <= n_minutes:
+                status_sums[w, :, width - 1:] = cumulative[:, width:] - cumulative[:, :-width]
+        return status_sums, status_sums.sum(axis=-1)
+
+    def metric_values(self, volumes, statuses, running_total=False):
+        """
+        Valor da métrica de cada regra em cada fonte e minuto
+
+        Args:
+            volumes: Array (fonte, minuto, status) com o volume de cada status
+            statuses: Status de cada coluna (eixo 2)
+            running_total: Ver _window_sums
+
+        Returns:
+            (value, total): arrays (regra, fonte, minuto) com a métrica e o
+            volume total da janela
+        """
+        volumes = np.asarray(volumes, dtype=np.float64)
+        if volumes.ndim != 3:
+            raise ValueError("volumes deve ter o formato (fonte, minuto, status)")
+        n_sources, n_minutes, _ = volumes.shape
+
+        # Colunas na ordem das regras (status ausentes valem zero); a última
+        # coluna soma os status que nenhuma regra conhece, para o total
+        aligned = np.zeros((n_sources, n_minutes, len(self.statuses) + 1))
+        for i, status in enumerate(statuses):
+            j = self.statuses.index(status) if status in self.statuses else -1
+            aligned[:, :, j] += volumes[:, :, i]
+
+        status_sums, totals = self._window_sums(aligned, running_total)
+
+        value = status_sums[self.window_index, :, :, self.status_index]
+        total = totals[self.window_index]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate = np.where(total > 0, value / total * 100, np.nan)
+        metric = self.metric[:, None, None]
+        return np.where(metric == 0, rate, np.where(metric == 1, value, total)), total
+
+    def compare(self, value, total, sources, thresholds=None):
+        """
+        Máscara (regra, fonte, minuto) das regras disparadas
+
+        Args:
+            value, total: Saída de metric_values
+            sources: Nome de cada fonte (eixo 1)
+            thresholds: Limites por regra (padrão: os do arquivo)
+        """
+        thresholds = self.threshold if thresholds is None else np.asarray(thresholds, dtype=np.float64)
+        delta = self.sign[:, None, None] * (value - thresholds[:, None, None])
+        fired = (delta > 0) | (~self.strict[:, None, None] & (delta == 0))
+        fired &= total >= self.min_volume[:, None, None]
+        fired &= self.source_mask(sources)[:, :, None]
+        return fired
+
+    def evaluate(self, volumes, sources, statuses, minutes=None, last_only=False, total_only=False,
+                 running_total=False):
+        """
+        Avalia todas as regras sobre todas as fontes e janelas
+
+        Args:
+            volumes: Array (fonte, minuto, status) com o volume de cada status
+            sources: Nome de cada fonte (eixo 0)
+            statuses: Status de cada coluna (eixo 2)
+            minutes: Rótulo de cada minuto (padrão: 0..n-1)
+            last_only: Avaliar apenas o último minuto
+            total_only: Avaliar apenas regras de janela 'total'
+            running_total: Janela 'total' acumulada até cada minuto
+
+        Returns:
+            DataFrame com FIRED_COLUMNS, uma linha por (regra, fonte, minuto) disparado
+        """
+        volumes = np.asarray(volumes, dtype=np.float64)
+        if volumes.ndim != 3:
+            raise ValueError("volumes deve ter o formato (fonte, minuto, status)")
+        n_sources, n_minutes, _ = volumes.shape
+        if not self.rules or n_sources == 0 or n_minutes == 0:
+            return pd.DataFrame(columns=FIRED_COLUMNS)
+
+        # Tensor (regra, fonte, minuto)
+        value, total = self.metric_values(volumes, statuses, running_total)
+        fired = self.compare(value, total, sources)
+        if total_only:
+            fired &= (np.array(self.windows)[self.window_index] == 0)[:, None, None]
+        if last_only:
+            fired[:, :, :-1] = False
+
+        rule_idx, source_idx, minute_idx = np.nonzero(fired)
+        labels = np.arange(n_minutes) if minutes is None else np.asarray(minutes)
+        rows = []
+        for r, s, t in zip(rule_idx, source_idx, minute_idx):
+            rule = self.rules[r]
+            observed = float(value[r, s, t])
+            context = {'value': observed, 'threshold': rule['threshold'], 'source': sources[s],
+                       'status': rule['status'], 'window': rule['window']}
+            rows.append({
+                'rule': rule['name'], 'source': sources[s], 'status': rule['status'],
+                'metric': rule['metric'], 'window': rule['window'], 'minute': labels[t],
+                'value': observed, 'threshold': rule['threshold'], 'severity': rule['severity'],
+                'penalty': rule['penalty'], 'message': rule['message'].format(**context)
+            })
+        return pd.DataFrame(rows, columns=FIRED_COLUMNS)
+
+    def evaluate_totals(self, totals):
+        """
+        Avalia as regras de janela 'total' sobre volumes já totalizados
+
+        Args:
+            totals: dict fonte -> Series/dict de volume por status
+
+        Returns:
+            DataFrame com FIRED_COLUMNS
+        """
+        sources = list(totals)
+        frame = pd.DataFrame({source: pd.Series(totals[source], dtype=np.float64) for source in sources})
+        frame = frame.fillna(0.0)
+        volumes = frame.to_numpy().T[:, np.newaxis, :]
+        return self.evaluate(volumes, sources, [str(s) for s in frame.index], total_only=True)
+
+    def evaluate_aggregates(self, aggregates, last_only=False):
+        """
+        Avalia as regras sobre StatusAggregate/matrizes por minuto do dia
+
+        Args:
+            aggregates: dict fonte -> StatusAggregate
+            last_only: Avaliar apenas o último minuto com volume
+
+        Returns:
+            DataFrame com FIRED_COLUMNS (minute = minuto do dia)
+        """
+        sources = list(aggregates)
+        volumes = np.stack([aggregates[source].volume_matrix(self.statuses) for source in sources])
+        if last_only:
+            active = np.flatnonzero(volumes.sum(axis=(0, 2)) > 0)
+            volumes = volumes[:, :active[-1] + 1] if len(active) else volumes[:, :0]
+        return self.evaluate(volumes, sources, self.statuses, last_only=last_only)
+
+    def evaluate_windows(self, aggregates):
+        """
+        Avalia apenas as regras de janela deslizante (15m, 1h...) sobre os minutos do dia
+
+        Complementa evaluate_totals(), que só cobre as regras 'total'.
+
+        Args:
+            aggregates: dict fonte -> StatusAggregate
+
+        Returns:
+            DataFrame com FIRED_COLUMNS, uma linha por (regra, fonte, minuto) disparado
+        """
+        windowed = [rule['name'] for rule in self.rules if rule['window_minutes']]
+        if not windowed or not aggregates:
+            return pd.DataFrame(columns=FIRED_COLUMNS)
+        fired = self.evaluate_aggregates(aggregates)
+        return fired[fired['rule'].isin(windowed)].reset_index(drop=True)
+
+
+_cache = {}
+
+
+def load_rules(path=RULES_PATH):
+    """
+    RuleSet compilado do arquivo de configuração
+
+    A compilação é reaproveitada enquanto o arquivo não muda (mtime/tamanho),
+    então os dashboards podem chamar a cada rerun.
+    """
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(path)
+    if cached is None or cached[0] != signature:
+        cached = _cache[path] = (signature, RuleSet.from_file(path))
+    return cached[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Avaliação das regras de alerta declarativas")
+    parser.add_argument('csv', nargs='*', help="CSVs de transações (fonte = nome do arquivo)")
+    parser.add_argument('--rules', default=RULES_PATH, help="Arquivo JSON de regras")
+    parser.add_argument('--last', action='store_true', help="Apenas o último minuto")
+    args = parser.parse_args(argv)
+
+    from stream_aggregate import aggregate_csv
+
+    rules = RuleSet.from_file(args.rules)
+    print(f"📏 {len(rules.rules)} regras, janelas {rules.windows} (0 = total)")
+    if args.csv:
+        aggregates = {
+            os.path.splitext(os.path.basename(path))[0]: aggregate_csv(path) for path in args.csv
+        }
+        fired = rules.evaluate_aggregates(aggregates, last_only=args.last)
+        print(fired.to_string(index=False) if len(fired) else "✅ Nenhuma regra disparada")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
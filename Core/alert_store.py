@@ -0,0 +1,193 @@
+import pandas as pd
+from transaction_store import COUNT_COLUMNS, parse_minutes, format_minutes
+
+
+# Versão do schema do alert_data.db (PRAGMA user_version)
+SCHEMA_VERSION = 2
+
+# Resoluções das tabelas de rollup (nome -> tamanho do bucket em minutos)
+ROLLUP_RESOLUTIONS = {
+    '1m': 1,
+    '15m': 15,
+    '1h': 60
+}
+
+
+def rollup_table(resolution):
+    """Nome da tabela de rollup de uma resolução"""
+    if resolution not in ROLLUP_RESOLUTIONS:
+        raise ValueError(f"Resolução '{resolution}' não suportada")
+    return f"rollup_{resolution}"
+
+
+def migrate_schema(conn):
+    """
+    Cria as tabelas de rollup e atualiza a versão do schema
+
+    Args:
+        conn: Conexão de escrita com o alert_data.db
+
+    Returns:
+        True se o banco estava em uma versão anterior e as tabelas de
+        transações precisam ser reimportadas
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+    for resolution in ROLLUP_RESOLUTIONS:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {rollup_table(resolution)} (
+                source TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                PRIMARY KEY (source, bucket, status)
+            ) WITHOUT ROWID
+        ''')
+
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return True
+    return False
+
+
+def create_transactions_table(conn, table, header):
+    """
+    Cria a tabela de transações com tipos explícitos e minuto inteiro
+
+    Mantém as colunas originais do CSV (time, status, f0_/count) para
+    compatibilidade com as consultas existentes e adiciona `minute`
+    (minuto do dia) com índice composto (minute, status).
+    """
+    columns = []
+    for name in header:
+        column_type = 'INTEGER' if name in COUNT_COLUMNS else 'TEXT'
+        columns.append(f'"{name}" {column_type}')
+    columns.append('minute INTEGER NOT NULL')
+
+    conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({", ".join(columns)})')
+    conn.execute(
+        f'CREATE INDEX IF NOT EXISTS "idx_{table}_minute_status" ON "{table}" (minute, status)'
+    )
+
+
+def clear_source(conn, table):
+    """Remove a tabela de transações e os rollups de uma fonte"""
+    conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+    for resolution in ROLLUP_RESOLUTIONS:
+        conn.execute(f"DELETE FROM {rollup_table(resolution)} WHERE source = ?", (table,))
+
+
+def insert_transactions(conn, table, df):
+    """
+    Insere um lote de transações e atualiza os rollups da fonte
+
+    Args:
+        conn: Conexão de escrita (a transação fica a cargo do chamador)
+        table: Tabela de destino (também usada como nome da fonte)
+        df: DataFrame com as colunas do CSV
+    """
+    count_column = next(name for name in COUNT_COLUMNS if name in df.columns)
+    batch = df.copy()
+    batch['minute'] = parse_minutes(batch['time'].to_numpy()).astype(int)
+
+    columns = ', '.join(f'"{name}"' for name in batch.columns)
+    placeholders = ', '.join('?' for _ in batch.columns)
+    conn.executemany(
+        f'INSERT INTO "{table}" ({columns}) VALUES ({placeholders})',
+        batch.itertuples(index=False, name=None)
+    )
+
+    update_rollups(conn, table, batch['minute'], batch['status'], batch[count_column])
+
+
+def update_rollups(conn, source, minute, status, count):
+    """
+    Soma um lote às tabelas de rollup (upsert incremental)
+
+    O lote é agregado em memória por (bucket, status) antes da gravação,
+    então cada rollup recebe no máximo uma linha por bucket e status.
+    """
+    batch = pd.DataFrame({
+        'minute': pd.Series(minute).to_numpy(),
+        'status': pd.Series(status).astype(str).to_numpy(),
+        'count': pd.Series(count).fillna(0).astype(int).to_numpy()
+    })
+    if batch.empty:
+        return
+
+    for resolution, size in ROLLUP_RESOLUTIONS.items():
+        batch['bucket'] = batch['minute'] // size * size
+        grouped = batch.groupby(['bucket', 'status'], sort=False)['count'].agg(['sum', 'size'])
+
+        conn.executemany(f'''
+            INSERT INTO {rollup_table(resolution)} (source, bucket, status, count, rows)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(source, bucket, status) DO UPDATE SET
+                count = count + excluded.count,
+                rows = rows + excluded.rows
+        ''', [
+            (source, int(bucket), status, int(total), int(rows))
+            for (bucket, status), total, rows in zip(grouped.index, grouped['sum'], grouped['size'])
+        ])
+
+
+def rollups_ready(conn, sources):
+    """
+    True se todas as tabelas de rollup existem e cada fonte já tem buckets
+
+    O alert_data.db distribuído com o repositório não tem rollups: até a
+    primeira ingestão as páginas devem usar a agregação dos CSVs.
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if any(rollup_table(resolution) not in tables for resolution in ROLLUP_RESOLUTIONS):
+        return False
+    return all(
+        conn.execute(f"SELECT 1 FROM {rollup_table('1m')} WHERE source = ? LIMIT 1", (source,)).fetchone()
+        for source in sources
+    )
+
+
+def load_rollup(conn, source, resolution='1m'):
+    """
+    Lê um rollup no formato longo
+
+    Returns:
+        DataFrame com colunas bucket, status, count e rows
+    """
+    return pd.read_sql_query(
+        f"SELECT bucket, status, count, rows FROM {rollup_table(resolution)} "
+        "WHERE source = ? ORDER BY bucket",
+        conn, params=(source,)
+    )
+
+
+def rollup_pivot(conn, source, resolution='1m', value='count'):
+    """
+    Série temporal por status a partir de um rollup
+
+    Substitui o pivot_table sobre as linhas brutas: o rollup já está
+    agregado, então basta reorganizar bucket x status.
+
+    Returns:
+        DataFrame com a coluna time ("00h 00") e uma coluna por status
+    """
+    rollup = load_rollup(conn, source, resolution)
+    pivot = rollup.pivot(index='bucket', columns='status', values=value).fillna(0).astype(int)
+    pivot.columns.name = 'status'
+    pivot.insert(0, 'time', format_minutes(pivot.index.to_numpy()))
+    return pivot.reset_index(drop=True)
+
+
+def status_totals(conn, source):
+    """
+    Totais por status de uma fonte (lidos do rollup horário)
+
+    Returns:
+        DataFrame indexado por status com as colunas count e rows
+    """
+    return pd.read_sql_query(
+        f"SELECT status, SUM(count) AS count, SUM(rows) AS rows FROM {rollup_table('1h')} "
+        "WHERE source = ? GROUP BY status",
+        conn, params=(source,), index_col='status'
+    )
@@ -0,0 +1,417 @@
+import os
+import ast
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import tempfile
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from db_access import PROJECT_ROOT, register_database
+from transaction_store import STATUS_CATEGORIES, MINUTES_PER_DAY, format_minutes, load_transactions
+from status_engine import status_volume, status_rate
+from synthetic_data import BASE_STATUS_MIX
+from stream_aggregate import aggregate_csv
+from alert_rules import load_rules, SEVERITY_LABELS
+from integrated_analysis import analyze_sources, clear_cache
+
+
+DEFAULT_HISTORY = os.path.join(PROJECT_ROOT, 'Core', 'benchmark_history.json')
+
+# Tamanhos de cada nível: linhas para os caminhos de dados, horas para as simulações
+SIZES = {
+    'small': {'rows': 10_000, 'hours': 24},
+    'medium': {'rows': 1_000_000, 'hours': 24 * 7},
+    'large': {'rows': 10_000_000, 'hours': 24 * 30}
+}
+
+
+def load_function(path, name, namespace):
+    """
+    Extrai uma função de um script Streamlit sem executar a página
+
+    Os apps (Alert_Incident, Monitoring, Analyze_data) são scripts que
+    renderizam ao serem importados; aqui apenas a definição da função é
+    compilada, com as dependências fornecidas em namespace.
+
+    Args:
+        path: Caminho do script
+        name: Nome da função
+        namespace: Dict com os nomes globais usados pela função
+
+    Returns:
+        A função compilada
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == name:
+            module = ast.Module(body=[node], type_ignores=[])
+            exec(compile(module, path, 'exec'), namespace)
+            return namespace[name]
+
+    raise ValueError(f"Função '{name}' não encontrada em {path}")
+
+
+def make_transactions(n, seed=0):
+    """DataFrame com n linhas no layout de transactions_*.csv (time, status, count)"""
+    rng = np.random.default_rng(seed)
+    mix = np.array([BASE_STATUS_MIX[s] for s in STATUS_CATEGORIES])
+    minutes = np.sort(rng.integers(0, MINUTES_PER_DAY, n))
+    statuses = rng.choice(len(STATUS_CATEGORIES), n, p=mix / mix.sum())
+    return pd.DataFrame({
+        'time': format_minutes(minutes),
+        'status': np.array(STATUS_CATEGORIES, dtype=object)[statuses],
+        'count': rng.poisson(20, n) + 1
+    })
+
+
+def make_hourly(n, seed=0):
+    """DataFrame com n linhas no layout de data_table_* (time "00h" + comparações)"""
+    rng = np.random.default_rng(seed)
+    hours = np.arange(n) % 24
+    return pd.DataFrame({
+        'time': np.array([f"{h:02d}h" for h in range(24)], dtype=object)[hours],
+        'today': rng.poisson(10, n),
+        'yesterday': rng.poisson(10, n),
+        'same_day_last_week': rng.poisson(10, n),
+        'avg_last_week': rng.random(n) * 10,
+        'avg_last_month': rng.random(n) * 10
+    })
+
+
+# ---------------------------------------------------------------------------
+# Casos de benchmark: setup(tamanho, diretório) -> contexto; run(contexto)
+# O setup não entra na medição.
+# ---------------------------------------------------------------------------
+
+def setup_alert_load_pivot(size, workdir):
+    csv_path = os.path.join(workdir, f"transactions_{size['rows']}.csv")
+    if not os.path.exists(csv_path):
+        make_transactions(size['rows']).to_csv(csv_path, index=False)
+    load_transactions(csv_path)  # constrói o armazenamento colunar
+    return {'csv_path': csv_path}
+
+
+def run_alert_load_pivot(ctx):
+    df = load_transactions(ctx['csv_path'])
+    return df.pivot_table(index='time', columns='status', values='count',
+                          aggfunc='sum', fill_value=0, observed=True).reset_index()
+
+
+def run_stream_aggregate(ctx):
+    aggregate = aggregate_csv(ctx['csv_path'])
+    return aggregate.pivot('1m')
+
+
+def setup_analyze_integrated_data(size, workdir):
+    # As duas fontes de alerta em um banco SQLite temporário (tabelas completas, sem rollups)
+    db_path = os.path.join(workdir, f"integrated_{size['rows']}.db")
+    if not os.path.exists(db_path):
+        df = make_transactions(size['rows'])
+        with sqlite3.connect(db_path) as conn:
+            df.to_sql('transactions_1', conn, index=False)
+            df.to_sql('transactions_2', conn, index=False)
+    register_database('benchmark_integrated', db_path)
+    sources = {
+        'alert_transactions_1': ('benchmark_integrated', 'transactions_1'),
+        'alert_transactions_2': ('benchmark_integrated', 'transactions_2')
+    }
+    return {'sources': sources}
+
+
+def run_analyze_integrated_data(ctx):
+    # Leitura a frio: GROUP BY status sobre as tabelas completas
+    clear_cache()
+    return analyze_sources(ctx['sources'])
+
+
+def run_analyze_integrated_cached(ctx):
+    # Rerun do dashboard: contagens reaproveitadas pela assinatura do banco
+    return analyze_sources(ctx['sources'])
+
+
+def setup_detect_anomalies(size, workdir):
+    detect = load_function(
+        os.path.join(PROJECT_ROOT, 'Alert_Incident', 'app.py'), 'detect_anomalies',
+        {'pd': pd, 'np': np, 'status_rate': status_rate,
+         'load_rules': load_rules, 'SEVERITY_LABELS': SEVERITY_LABELS, 'format_minutes': format_minutes}
+    )
+    return {'detect': detect, 'df': make_transactions(size['rows'])}
+
+
+def run_detect_anomalies(ctx):
+    # Totais por status (o que os rollups fornecem) + avaliação dos limites
+    totals = status_volume(ctx['df']).to_frame('count')
+    return ctx['detect']({'transactions_1': totals}, {'transactions_1': 'benchmark'})
+
+
+def setup_prepare_analysis_data(size, workdir):
+    namespace = {'pd': pd, 'df1': make_hourly(size['rows']), 'df2': make_hourly(size['rows'], seed=1)}
+    prepare = load_function(
+        os.path.join(PROJECT_ROOT, 'Analyze_data', 'app.py'), 'prepare_analysis_data', namespace
+    )
+    return {'prepare': prepare}
+
+
+def run_prepare_analysis_data(ctx):
+    return ctx['prepare']()
+
+
+def _import_simulation(module_name, class_name):
+    simulacoes_path = os.path.join(PROJECT_ROOT, 'Simulacoes')
+    if simulacoes_path not in sys.path:
+        sys.path.append(simulacoes_path)
+    module = __import__(module_name)
+    return getattr(module, class_name)
+
+
+def setup_checkout_simulation(size, workdir):
+    return {'cls': _import_simulation('checkout_simulation', 'CheckoutSimulation'), 'hours': size['hours']}
+
+
+def run_checkout_simulation(ctx):
+    return ctx['cls']().run_simulation(duration_hours=ctx['hours'])
+
+
+def setup_anomaly_simulation(size, workdir):
+    return {'cls': _import_simulation('anomaly_simulation', 'AnomalySimulation'), 'hours': size['hours']}
+
+
+def run_anomaly_simulation(ctx):
+    return ctx['cls']().run_simulation(duration_hours=ctx['hours'])
+
+
+# Nome -> (setup, run, unidade do tamanho)
+CASES = {
+    'alert_load_pivot': (setup_alert_load_pivot, run_alert_load_pivot, 'rows'),
+    'stream_aggregate': (setup_alert_load_pivot, run_stream_aggregate, 'rows'),
+    'analyze_integrated_data': (setup_analyze_integrated_data, run_analyze_integrated_data, 'rows'),
+    'analyze_integrated_cached': (setup_analyze_integrated_data, run_analyze_integrated_cached, 'rows'),
+    'detect_anomalies': (setup_detect_anomalies, run_detect_anomalies, 'rows'),
+    'prepare_analysis_data': (setup_prepare_analysis_data, run_prepare_analysis_data, 'rows'),
+    'checkout_simulation': (setup_checkout_simulation, run_checkout_simulation, 'hours'),
+    'anomaly_simulation': (setup_anomaly_simulation, run_anomaly_simulation, 'hours')
+}
+
+
+def measure(run, ctx, repeat=3):
+    """
+    Mede o melhor tempo em `repeat` execuções e o pico de memória
+
+    O pico é medido em uma execução separada com tracemalloc, para que o
+    rastreamento não distorça o tempo.
+
+    Returns:
+        Tupla (segundos, pico em MB)
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(ctx)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run(ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak / (1024 * 1024)
+
+
+def run_suite(cases=None, sizes=None, repeat=3, workdir=None, verbose=True):
+    """
+    Executa os casos selecionados em cada tamanho
+
+    Returns:
+        Lista de resultados {case, size, param, seconds, peak_mb, error}
+    """
+    cases = cases or list(CASES)
+    sizes = sizes or ['small']
+    own_workdir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix='benchmark_')
+
+    results = []
+    try:
+        for name in cases:
+            setup, run, unit = CASES[name]
+            for label in sizes:
+                size = SIZES[label]
+                result = {'case': name, 'size': label, 'param': f"{size[unit]:,} {unit}"}
+                try:
+                    ctx = setup(size, workdir)
+                    result['seconds'], result['peak_mb'] = measure(run, ctx, repeat)
+                except Exception as e:
+                    result['error'] = f"{type(e).__name__}: {e}"
+                results.append(result)
+
+                if verbose:
+                    if 'error' in result:
+                        print(f"⚠️  {name:<26} {label:<7} {result['param']:>18}  {result['error']}")
+                    else:
+                        print(f"⏱️  {name:<26} {label:<7} {result['param']:>18}  "
+                              f"{result['seconds'] * 1000:>10.1f} ms  {result['peak_mb']:>8.1f} MB")
+    finally:
+        if own_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+def load_history(path):
+    """Histórico de execuções (lista de runs) gravado em JSON"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def append_history(path, results):
+    """Acrescenta uma execução ao histórico"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+
+    history = load_history(path)
+    history.append({
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'machine': platform.node(),
+        'results': results
+    })
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+
+
+# Métricas comparadas com o histórico e a variação absoluta mínima de cada uma
+# (picos de memória de poucos KB variam muito em %, sem significar regressão)
+REGRESSION_METRICS = {
+    'seconds': 0.0,
+    'peak_mb': 1.0
+}
+
+
+def find_regressions(history, results, threshold=20.0, window=5, memory_threshold=None):
+    """
+    Compara tempo e pico de memória com a mediana das últimas execuções
+
+    Args:
+        history: Execuções anteriores (sem a atual)
+        results: Resultados da execução atual
+        threshold: Aumento percentual tolerado no tempo
+        window: Número de execuções anteriores na linha de base
+        memory_threshold: Aumento percentual tolerado no pico de memória (padrão: threshold)
+
+    Returns:
+        Lista de regressões {case, size, metric, value, baseline, change_pct}
+    """
+    limits = {'seconds': threshold, 'peak_mb': threshold if memory_threshold is None else memory_threshold}
+    regressions = []
+    for result in results:
+        for metric, min_delta in REGRESSION_METRICS.items():
+            if metric not in result:
+                continue
+
+            previous = [
+                r[metric]
+                for run in history[-window:]
+                for r in run['results']
+                if r['case'] == result['case'] and r['size'] == result['size'] and metric in r
+            ]
+            if not previous:
+                continue
+
+            baseline = statistics.median(previous)
+            change = (result[metric] / baseline - 1) * 100 if baseline > 0 else 0.0
+            if change > limits[metric] and result[metric] - baseline > min_delta:
+                regressions.append({
+                    'case': result['case'], 'size': result['size'], 'metric': metric,
+                    'value': result[metric], 'baseline': baseline, 'change_pct': change
+                })
+    return regressions
+
+
+def format_metric(metric, value):
+    """Valor de uma métrica para exibição (ms ou MB)"""
+    return f"{value * 1000:.1f} ms" if metric == 'seconds' else f"{value:.1f} MB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark dos caminhos críticos do projeto")
+    parser.add_argument('--cases', default='all',
+                        help=f"Casos separados por vírgula ({', '.join(CASES)}) ou 'all'")
+    parser.add_argument('--sizes', default='small',
+                        help="Tamanhos separados por vírgula (small, medium, large) ou 'all'")
+    parser.add_argument('--repeat', type=int, default=3, help="Execuções por medição (melhor tempo)")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="Arquivo JSON de histórico")
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help="Regressão tolerada em %% sobre a mediana das últimas execuções")
+    parser.add_argument('--memory-threshold', type=float, default=None,
+                        help="Regressão tolerada em %% no pico de memória (padrão: --threshold)")
+    parser.add_argument('--window', type=int, default=5, help="Execuções usadas na linha de base")
+    parser.add_argument('--skip', default='',
+                        help="Casos ignorados, separados por vírgula (ex.: simulações sem simpy)")
+    parser.add_argument('--no-save', action='store_true', help="Não gravar no histórico")
+    args = parser.parse_args(argv)
+
+    cases = list(CASES) if args.cases == 'all' else args.cases.split(',')
+    skipped = [name for name in args.skip.split(',') if name]
+    sizes = list(SIZES) if args.sizes == 'all' else args.sizes.split(',')
+    for name in cases:
+        if name not in CASES:
+            parser.error(f"Caso desconhecido: {name}")
+    for label in sizes:
+        if label not in SIZES:
+            parser.error(f"Tamanho desconhecido: {label}")
+    for name in skipped:
+        if name not in CASES:
+            parser.error(f"Caso desconhecido em --skip: {name}")
+    cases = [name for name in cases if name not in skipped]
+    if skipped:
+        print(f"⏭️  Ignorados: {', '.join(skipped)}")
+
+    results = run_suite(cases, sizes, args.repeat)
+
+    history = load_history(args.history)
+    regressions = find_regressions(history, results, args.threshold, args.window, args.memory_threshold)
+    if not args.no_save:
+        append_history(args.history, results)
+
+    # Um caso que falha não mede nada: o gate falha (use --skip para excluí-lo de propósito)
+    errors = [r for r in results if 'error' in r]
+    if errors:
+        print(f"\n❌ {len(errors)} caso(s) com erro:")
+        for r in errors:
+            print(f"   {r['case']} [{r['size']}]: {r['error']}")
+
+    if regressions:
+        print(f"\n🔴 {len(regressions)} regressão(ões) acima do limite:")
+        for r in regressions:
+            label = 'tempo' if r['metric'] == 'seconds' else 'memória'
+            print(f"   {r['case']} [{r['size']}] {label}: {format_metric(r['metric'], r['value'])} "
+                  f"(base {format_metric(r['metric'], r['baseline'])}, +{r['change_pct']:.0f}%)")
+
+    if errors or regressions:
+        return 1
+
+    print("\n✅ Nenhuma regressão detectada")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,400 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from transaction_store import MINUTES_PER_DAY, format_minutes
+
+
+# Status cujas taxas são acompanhadas (falhas e negações)
+CHANGEPOINT_STATUSES = ['failed', 'denied']
+
+CHANGE_COLUMNS = [
+    'source', 'status', 'minute', 'time', 'detected_minute', 'detected_time',
+    'direction', 'rate_before', 'rate_after', 'method'
+]
+
+
+def _xlogy(x, y):
+    """x * log(y) com 0 * log(0) = 0"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(x > 0, x * np.log(np.where(y > 0, y, 1.0)), 0.0)
+
+
+def rate_dispersion(status_volume, total_volume):
+    """
+    Sobredispersão das taxas por minuto em relação ao ruído binomial
+
+    Usa diferenças entre minutos consecutivos (cada mudança de nível afeta
+    uma só diferença): sob taxa constante cada diferença padronizada tem
+    variância igual à dispersão. Volumes agregados (várias transações por
+    linha) costumam ter dispersão bem acima de 1.
+
+    Args:
+        status_volume: Volume do status por minuto
+        total_volume: Volume total por minuto
+
+    Returns:
+        Fator de dispersão (>= 1)
+    """
+    k = np.asarray(status_volume, dtype=np.float64)
+    n = np.asarray(total_volume, dtype=np.float64)
+    valid = n > 0
+    k, n = k[valid], n[valid]
+    if len(n) < 3 or k.sum() == 0:
+        return 1.0
+
+    p = k.sum() / n.sum()
+    rate = k / n
+    scale = np.sqrt(p * (1 - p) * (1 / n[1:] + 1 / n[:-1]))
+    d = np.diff(rate) / scale
+    return float(max(np.mean(d * d), 1.0))
+
+
+class _CusumState:
+    """Estado O(1) de uma fonte: referência, somas CUSUM e acumuladores por status"""
+
+    def __init__(self, n_statuses):
+        # Referência: volume do status e total desde a última mudança
+        self.ref_status = np.zeros(n_statuses)
+        self.ref_total = np.zeros(n_statuses)
+        self.ref_minutes = np.zeros(n_statuses, dtype=np.int64)
+        # Dispersão: soma das diferenças consecutivas padronizadas ao quadrado
+        self.d2 = np.zeros(n_statuses)
+        self.pairs = 0
+        self.previous = None
+        self.upper = np.zeros(n_statuses)
+        self.lower = np.zeros(n_statuses)
+        # Início e somas desde a última vez em que cada soma esteve zerada
+        self.upper_start = np.zeros(n_statuses, dtype=np.int64)
+        self.lower_start = np.zeros(n_statuses, dtype=np.int64)
+        self.upper_status = np.zeros(n_statuses)
+        self.upper_total = np.zeros(n_statuses)
+        self.lower_status = np.zeros(n_statuses)
+        self.lower_total = np.zeros(n_statuses)
+
+    @property
+    def dispersion(self):
+        return np.maximum(self.d2 / max(self.pairs, 1), 1.0)
+
+
+class CusumDetector:
+    """
+    CUSUM incremental das taxas de status por minuto
+
+    A referência de cada status é a taxa acumulada desde a última mudança
+    (CUSUM autoajustável) e a sobredispersão vem das diferenças entre
+    minutos consecutivos. Cada minuto soma às estatísticas para cima e
+    para baixo a razão de log-verossimilhança entre a referência e uma
+    taxa `shift` vezes maior (ou menor); quando uma soma passa de `h` há
+    uma mudança sustentada de nível, que começa no minuto seguinte à
+    última vez em que a soma esteve zerada. Os minutos desde então viram
+    a nova referência. Custo O(1) por minuto e fonte.
+    """
+
+    def __init__(self, statuses=None, shift=1.3, h=6.0, warmup=30, min_volume=20, min_count=10):
+        """
+        Inicializa o detector
+
+        Args:
+            statuses: Status acompanhados (padrão: CHANGEPOINT_STATUSES)
+            shift: Mudança relativa a detectar (taxa x shift para cima, / shift para baixo)
+            h: Limite de decisão das somas (log-verossimilhança)
+            warmup: Minutos de referência antes de avaliar mudanças
+            min_volume: Volume mínimo no minuto para atualizar o estado
+            min_count: Volume mínimo do status na referência para avaliar quedas
+        """
+        self.statuses = list(CHANGEPOINT_STATUSES if statuses is None else statuses)
+        self.shift = shift
+        self.h = h
+        self.warmup = warmup
+        self.min_volume = min_volume
+        self.min_count = min_count
+        self._states = {}
+
+    def state(self, source):
+        """Estado da fonte (criado na primeira atualização)"""
+        if source not in self._states:
+            self._states[source] = _CusumState(len(self.statuses))
+        return self._states[source]
+
+    def reset(self, source=None):
+        """Descarta o estado de uma fonte (ou de todas)"""
+        if source is None:
+            self._states.clear()
+        else:
+            self._states.pop(source, None)
+
+    def _calibrate(self, state, status, total):
+        """Acumula a diferença padronizada entre este minuto e o anterior"""
+        if state.previous is not None:
+            prev_status, prev_total = state.previous
+            p = np.clip(state.ref_status / np.maximum(state.ref_total, 1.0), 1e-4, 1 - 1e-4)
+            scale = np.sqrt(p * (1 - p) * (1 / total + 1 / prev_total))
+            d = (status / total - prev_status / prev_total) / scale
+            state.d2 += d * d
+            state.pairs += 1
+        state.previous = (status, total)
+
+    def update(self, source, minute, volumes):
+        """
+        Processa um minuto de uma fonte
+
+        Args:
+            source: Nome da fonte
+            minute: Minuto (inteiro crescente)
+            volumes: Volume por status (dict/Series com todos os status do minuto)
+
+        Returns:
+            Lista de mudanças detectadas (dicts com as chaves de CHANGE_COLUMNS)
+        """
+        volumes = pd.Series(volumes, dtype=np.float64)
+        total = float(volumes.sum())
+        status = np.array([float(volumes.get(s, 0.0)) for s in self.statuses])
+        return self._step(self.state(source), source, int(minute), status, total)
+
+    def _step(self, state, source, minute, status, total):
+        if total < self.min_volume:
+            return []
+
+        self._calibrate(state, status, total)
+        active = state.ref_minutes >= self.warmup
+        # Queda só é avaliável com ocorrências na referência: com taxa no piso
+        # do clip (status quase sempre zero) cada minuto somaria ganho à soma
+        # para baixo e geraria uma "queda" falsa
+        active_lower = active & (state.ref_status >= self.min_count)
+
+        # Razão de log-verossimilhança (quasi-binomial) entre a referência e
+        # taxas `shift` vezes maior/menor; contagens esparsas e assimétricas
+        # (falhas) não geram os falsos alarmes de um z gaussiano
+        p0 = np.clip(state.ref_status / np.maximum(state.ref_total, 1.0), 1e-4, 1 - 1e-4)
+        p_up = np.minimum(p0 * self.shift, 0.999)
+        p_down = p0 / self.shift
+        rest = total - status
+        dispersion = state.dispersion
+        gain_up = (status * np.log(p_up / p0) + rest * np.log((1 - p_up) / (1 - p0))) / dispersion
+        gain_down = (status * np.log(p_down / p0) + rest * np.log((1 - p_down) / (1 - p0))) / dispersion
+
+        # A referência é autoajustável: taxa de tudo desde a última mudança
+        state.ref_status += status
+        state.ref_total += total
+        state.ref_minutes += 1
+
+        # Reinício dos acumuladores onde a soma estava zerada
+        restart_upper = active & (state.upper == 0)
+        restart_lower = active_lower & (state.lower == 0)
+        state.upper_start[restart_upper] = minute
+        state.upper_status[restart_upper] = 0.0
+        state.upper_total[restart_upper] = 0.0
+        state.lower_start[restart_lower] = minute
+        state.lower_status[restart_lower] = 0.0
+        state.lower_total[restart_lower] = 0.0
+
+        state.upper = np.where(active, np.maximum(0.0, state.upper + gain_up), 0.0)
+        state.lower = np.where(active_lower, np.maximum(0.0, state.lower + gain_down), 0.0)
+        state.upper_status += status
+        state.upper_total += total
+        state.lower_status += status
+        state.lower_total += total
+
+        changes = []
+        for i in np.flatnonzero((state.upper > self.h) | (state.lower > self.h)):
+            upward = state.upper[i] > self.h
+            start = state.upper_start[i] if upward else state.lower_start[i]
+            acc_status = state.upper_status[i] if upward else state.lower_status[i]
+            acc_total = state.upper_total[i] if upward else state.lower_total[i]
+            changes.append(_change(source, self.statuses[i], start, minute, upward,
+                                   p0[i], acc_status / acc_total, 'cusum'))
+
+            # Nova referência: os minutos desde o início da mudança
+            state.ref_status[i] = acc_status
+            state.ref_total[i] = acc_total
+            state.ref_minutes[i] = minute - start + 1
+            state.upper[i] = 0.0
+            state.lower[i] = 0.0
+        return changes
+
+    def process(self, source, matrix, statuses, minutes=None):
+        """
+        Processa uma sequência de minutos (equivale a update() minuto a minuto)
+
+        Args:
+            source: Nome da fonte
+            matrix: Array (minutos, len(statuses)) de volumes
+            statuses: Status das colunas de matrix (todos, para o total)
+            minutes: Minuto de cada linha (padrão: 0..n-1)
+
+        Returns:
+            DataFrame de mudanças (colunas CHANGE_COLUMNS)
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        minutes = np.arange(len(matrix)) if minutes is None else np.asarray(minutes)
+        columns = [list(statuses).index(s) if s in statuses else None for s in self.statuses]
+        tracked = np.column_stack([
+            matrix[:, c] if c is not None else np.zeros(len(matrix)) for c in columns
+        ]) if len(matrix) else np.zeros((0, len(self.statuses)))
+        totals = matrix.sum(axis=1)
+
+        state = self.state(source)
+        changes = []
+        for minute, status, total in zip(minutes, tracked, totals):
+            changes.extend(self._step(state, source, int(minute), status, float(total)))
+        return pd.DataFrame(changes, columns=CHANGE_COLUMNS)
+
+    def process_aggregate(self, source, aggregate):
+        """Processa os 1440 minutos de um StatusAggregate (ver stream_aggregate.py)"""
+        return self.process(source, aggregate.volume, aggregate.statuses)
+
+
+def _change(source, status, minute, detected, upward, rate_before, rate_after, method):
+    return {
+        'source': source,
+        'status': status,
+        'minute': int(minute),
+        'time': format_minutes([minute % MINUTES_PER_DAY])[0],
+        'detected_minute': int(detected),
+        'detected_time': format_minutes([detected % MINUTES_PER_DAY])[0],
+        'direction': 'alta' if upward else 'queda',
+        'rate_before': round(float(rate_before) * 100, 2),
+        'rate_after': round(float(rate_after) * 100, 2),
+        'method': method
+    }
+
+
+def pelt(status_volume, total_volume, penalty=None, min_size=5, dispersion=None):
+    """
+    Pontos de mudança ótimos da taxa de um status (PELT)
+
+    Minimiza a soma dos custos de segmento (log-verossimilhança binomial
+    negativa da taxa constante no segmento, dividida pela dispersão) mais
+    `penalty` por mudança. Os custos saem de somas acumuladas e a poda do
+    PELT descarta inícios que não podem mais ser ótimos, então o custo é
+    quase linear no número de minutos.
+
+    Args:
+        status_volume: Volume do status por minuto
+        total_volume: Volume total por minuto
+        penalty: Penalidade por mudança (padrão: 3 * log(n))
+        min_size: Minutos mínimos por segmento
+        dispersion: Sobredispersão (padrão: rate_dispersion)
+
+    Returns:
+        Lista de índices (posição do primeiro minuto de cada novo segmento)
+    """
+    k = np.asarray(status_volume, dtype=np.float64)
+    n = np.asarray(total_volume, dtype=np.float64)
+    size = len(n)
+    if size < 2 * min_size:
+        return []
+    if penalty is None:
+        penalty = 3 * np.log(size)
+    if dispersion is None:
+        dispersion = rate_dispersion(k, n)
+
+    cum_k = np.concatenate([[0.0], np.cumsum(k)])
+    cum_n = np.concatenate([[0.0], np.cumsum(n)])
+
+    def cost(starts, end):
+        seg_k = cum_k[end] - cum_k[starts]
+        seg_n = cum_n[end] - cum_n[starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            p = np.where(seg_n > 0, seg_k / seg_n, 0.0)
+        return -(_xlogy(seg_k, p) + _xlogy(seg_n - seg_k, 1 - p)) / dispersion
+
+    best = np.full(size + 1, np.inf)
+    best[0] = -penalty
+    previous = np.zeros(size + 1, dtype=np.int64)
+    candidates = np.array([0], dtype=np.int64)
+
+    for end in range(min_size, size + 1):
+        # Inícios que já completaram min_size entram como candidatos
+        new_start = end - min_size
+        if new_start >= min_size and np.isfinite(best[new_start]):
+            candidates = np.append(candidates, new_start)
+
+        values = best[candidates] + cost(candidates, end) + penalty
+        j = int(np.argmin(values))
+        best[end] = values[j]
+        previous[end] = candidates[j]
+        candidates = candidates[values - penalty <= best[end]]
+
+    points = []
+    end = size
+    while end > 0:
+        start = previous[end]
+        if start > 0:
+            points.append(int(start))
+        end = start
+    return sorted(points)
+
+
+def detect_history(source, matrix, statuses, minutes=None, tracked=None, penalty=None, min_size=5):
+    """
+    Mudanças de nível em um histórico completo (PELT por status)
+
+    Args:
+        source: Nome da fonte
+        matrix: Array (minutos, len(statuses)) de volumes
+        statuses: Status das colunas de matrix
+        minutes: Minuto de cada linha (padrão: 0..n-1)
+        tracked: Status analisados (padrão: CHANGEPOINT_STATUSES)
+        penalty: Penalidade por mudança (ver pelt)
+        min_size: Minutos mínimos por segmento
+
+    Returns:
+        DataFrame de mudanças (colunas CHANGE_COLUMNS)
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    minutes = np.arange(len(matrix)) if minutes is None else np.asarray(minutes)
+    totals = matrix.sum(axis=1)
+    active = totals > 0
+    matrix, totals, minutes = matrix[active], totals[active], minutes[active]
+
+    changes = []
+    for status in (CHANGEPOINT_STATUSES if tracked is None else tracked):
+        if status not in statuses:
+            continue
+        volume = matrix[:, list(statuses).index(status)]
+        bounds = [0] + pelt(volume, totals, penalty, min_size) + [len(totals)]
+        rates = [volume[a:b].sum() / totals[a:b].sum() for a, b in zip(bounds[:-1], bounds[1:])]
+        for i, point in enumerate(bounds[1:-1]):
+            changes.append(_change(source, status, minutes[point], minutes[point],
+                                   rates[i + 1] > rates[i], rates[i], rates[i + 1], 'pelt'))
+    return pd.DataFrame(changes, columns=CHANGE_COLUMNS)
+
+
+def detect_aggregate(source, aggregate, penalty=None, min_size=5):
+    """PELT sobre os 1440 minutos de um StatusAggregate"""
+    return detect_history(source, aggregate.volume, aggregate.statuses, penalty=penalty, min_size=min_size)
+
+
+def main(argv=None):
+    from stream_aggregate import aggregate_csv
+    from transaction_ingest import ALERT_SOURCES
+
+    parser = argparse.ArgumentParser(description="Mudanças de nível nas taxas de falha/negação (CUSUM e PELT)")
+    parser.add_argument('--method', choices=['cusum', 'pelt', 'both'], default='both')
+    parser.add_argument('--shift', type=float, default=1.3, help="Mudança relativa detectada pelo CUSUM")
+    parser.add_argument('--h', type=float, default=6.0, help="Limite do CUSUM (log-verossimilhança)")
+    parser.add_argument('--penalty', type=float, default=None, help="Penalidade do PELT")
+    parser.add_argument('--min-size', type=int, default=5, help="Minutos mínimos por segmento (PELT)")
+    args = parser.parse_args(argv)
+
+    for source, csv_path in ALERT_SOURCES.items():
+        aggregate = aggregate_csv(csv_path)
+        frames = []
+        if args.method in ('cusum', 'both'):
+            start = time.perf_counter()
+            frames.append(CusumDetector(shift=args.shift, h=args.h).process_aggregate(source, aggregate))
+            print(f"📉 {source}: CUSUM em {(time.perf_counter() - start) * 1000:.1f} ms")
+        if args.method in ('pelt', 'both'):
+            start = time.perf_counter()
+            frames.append(detect_aggregate(source, aggregate, args.penalty, args.min_size))
+            print(f"📉 {source}: PELT em {(time.perf_counter() - start) * 1000:.1f} ms")
+        changes = pd.concat(frames, ignore_index=True)
+        print(changes.to_string(index=False) if len(changes) else "✅ Nenhuma mudança de nível")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,348 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from transaction_store import MINUTES_PER_DAY, format_minutes
+from changepoint import rate_dispersion
+
+
+# Status cujas taxas por minuto são correlacionadas entre as fontes
+CORRELATION_STATUSES = ['approved', 'failed', 'denied']
+
+# Status cuja alta caracteriza degradação
+DEGRADATION_STATUSES = ['failed', 'denied']
+
+# Minutos agregados por ponto antes de correlacionar (reduz o ruído binomial
+# dos minutos com pouco volume)
+SMOOTH_MINUTES = 5
+
+SEGMENT_COLUMNS = [
+    'status', 'start', 'end', 'start_time', 'end_time', 'minutes', 'scope', 'sources',
+    'correlation', 'rate_1', 'rate_2'
+]
+
+
+def _window_sums(values, window):
+    """Somas móveis (janelas completas) ao longo do eixo 0 a partir de uma soma acumulada"""
+    cumulative = np.zeros((values.shape[0] + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=cumulative[1:])
+    sums = np.full(values.shape, np.nan)
+    if window <= values.shape[0]:
+        sums[window - 1:] = cumulative[window:] - cumulative[:-window]
+    return sums
+
+
+def rolling_correlation(x, y, window, min_periods=None):
+    """
+    Correlação de Pearson móvel entre duas séries
+
+    Todas as janelas saem de seis somas acumuladas (n, x, y, x², y², xy),
+    O(T) independente do tamanho da janela. Minutos com NaN em qualquer
+    das séries são ignorados dentro da janela.
+
+    Args:
+        x, y: Arrays (minuto,) ou (minuto, série)
+        window: Tamanho da janela em minutos (termina no minuto corrente)
+        min_periods: Pares válidos mínimos por janela (padrão: metade da janela)
+
+    Returns:
+        Array com o formato de x; NaN onde a janela está incompleta ou uma
+        das séries é constante
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    min_periods = max(2, window // 2 if min_periods is None else min_periods)
+
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x0 = np.where(valid, x, 0.0)
+    y0 = np.where(valid, y, 0.0)
+
+    n = _window_sums(valid.astype(np.float64), window)
+    sx, sy = _window_sums(x0, window), _window_sums(y0, window)
+    sxx, syy, sxy = _window_sums(x0 * x0, window), _window_sums(y0 * y0, window), _window_sums(x0 * y0, window)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        scale = np.sqrt(var_x * var_y)
+        # Variância residual de arredondamento conta como série constante
+        flat = (var_x <= 1e-12 * np.maximum(sxx, 1)) | (var_y <= 1e-12 * np.maximum(syy, 1))
+        corr = np.where((n >= min_periods) & ~flat, cov / scale, np.nan)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def lagged_correlation(x, y, max_lag, min_periods=30):
+    """
+    Correlação cruzada de Pearson para defasagens de -max_lag a +max_lag
+
+    Defasagem positiva = y atrasado em relação a x (x[t] contra y[t + lag]).
+    As séries defasadas são views (sliding_window_view) sobre y com NaN
+    nas bordas; todas as defasagens são calculadas de uma vez.
+
+    Args:
+        x, y: Arrays (minuto,) ou (minuto, série)
+        max_lag: Maior defasagem em minutos
+        min_periods: Pares válidos mínimos por defasagem
+
+    Returns:
+        (lags, corr): lags (2L+1,) e corr (2L+1,) ou (2L+1, série)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    vector = x.ndim == 1
+    if vector:
+        x, y = x[:, None], y[:, None]
+    n_minutes = x.shape[0]
+    max_lag = int(min(max_lag, n_minutes - 1))
+
+    padded = np.full((n_minutes + 2 * max_lag, y.shape[1]), np.nan)
+    padded[max_lag:max_lag + n_minutes] = y
+    shifted = sliding_window_view(padded, n_minutes, axis=0)   # (lag, série, minuto)
+    base = np.broadcast_to(x.T, shifted.shape)
+
+    valid = ~(np.isnan(base) | np.isnan(shifted))
+    n = valid.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(valid, base, 0).sum(axis=-1) / n
+        mean_y = np.where(valid, shifted, 0).sum(axis=-1) / n
+        dx = np.where(valid, base - mean_x[..., None], 0)
+        dy = np.where(valid, shifted - mean_y[..., None], 0)
+        corr = (dx * dy).sum(axis=-1) / np.sqrt((dx * dx).sum(axis=-1) * (dy * dy).sum(axis=-1))
+    corr = np.where(n >= min_periods, np.clip(corr, -1.0, 1.0), np.nan)
+
+    lags = np.arange(-max_lag, max_lag + 1)
+    return lags, corr[:, 0] if vector else corr
+
+
+def _runs(mask):
+    """Início e fim (inclusivo) de cada sequência de True"""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+
+
+class CorrelationEngine:
+    """
+    Correlação entre as taxas por minuto de duas fontes
+
+    Quando as duas fontes degradam juntas a causa costuma ser comum
+    (adquirente, rede); quando só uma degrada, a causa é local. As taxas
+    e somas acumuladas são calculadas uma vez na criação; os resultados
+    de cada tamanho de janela ficam em cache no próprio objeto.
+    """
+
+    def __init__(self, volume_1, statuses_1, volume_2, statuses_2,
+                 sources=('transactions_1', 'transactions_2'), statuses=None):
+        """
+        Args:
+            volume_1, volume_2: Matrizes minuto x status (StatusAggregate.volume)
+            statuses_1, statuses_2: Status de cada coluna
+            sources: Nomes das duas fontes
+            statuses: Status correlacionados (padrão: CORRELATION_STATUSES)
+        """
+        self.sources = tuple(sources)
+        self.statuses = list(CORRELATION_STATUSES if statuses is None else statuses)
+        self.counts = [self._align(volume_1, statuses_1), self._align(volume_2, statuses_2)]
+        self.totals = [np.asarray(volume_1, dtype=np.float64).sum(axis=1),
+                       np.asarray(volume_2, dtype=np.float64).sum(axis=1)]
+        self.n_minutes = len(self.totals[0])
+        self._cache = {}
+
+    def _align(self, volume, statuses):
+        volume = np.asarray(volume, dtype=np.float64)
+        columns = [list(statuses).index(s) if s in statuses else None for s in self.statuses]
+        return np.stack([volume[:, c] if c is not None else np.zeros(len(volume)) for c in columns], axis=1)
+
+    def rates(self, smooth=1):
+        """
+        Taxas (%) de cada status nas duas fontes
+
+        Args:
+            smooth: Minutos agregados por ponto (razão das somas na janela,
+                ponderada pelo volume); 1 = taxa do próprio minuto
+
+        Returns:
+            Lista com um array (minuto, status) por fonte; NaN sem volume
+        """
+        key = ('rates', smooth)
+        if key not in self._cache:
+            result = []
+            for counts, totals in zip(self.counts, self.totals):
+                if smooth > 1:
+                    counts, totals = _window_sums(counts, smooth), _window_sums(totals, smooth)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    result.append(np.where(totals[:, None] > 0, counts / totals[:, None] * 100, np.nan))
+            self._cache[key] = result
+        return self._cache[key]
+
+    def rolling(self, window, smooth=SMOOTH_MINUTES):
+        """
+        Correlação móvel por status
+
+        Returns:
+            DataFrame com minute, time e uma coluna por status
+        """
+        key = ('rolling', window, smooth)
+        if key not in self._cache:
+            rate_1, rate_2 = self.rates(smooth)
+            corr = rolling_correlation(rate_1, rate_2, window)
+            frame = pd.DataFrame(corr, columns=self.statuses)
+            frame.insert(0, 'time', format_minutes(np.arange(self.n_minutes)))
+            frame.insert(0, 'minute', np.arange(self.n_minutes))
+            self._cache[key] = frame
+        return self._cache[key]
+
+    def lags(self, max_lag, smooth=SMOOTH_MINUTES):
+        """
+        Correlação cruzada do dia inteiro por defasagem e status
+
+        Args:
+            max_lag: Maior defasagem em minutos
+            smooth: Minutos agregados por ponto antes da correlação
+
+        Returns:
+            DataFrame com lag e uma coluna por status (lag > 0 = a segunda
+            fonte acompanha a primeira com atraso)
+        """
+        key = ('lags', max_lag, smooth)
+        if key not in self._cache:
+            rate_1, rate_2 = self.rates(smooth)
+            lags, corr = lagged_correlation(rate_1, rate_2, max_lag)
+            frame = pd.DataFrame(corr, columns=self.statuses)
+            frame.insert(0, 'lag', lags)
+            self._cache[key] = frame
+        return self._cache[key]
+
+    def degraded(self, window, z=3.0):
+        """
+        Minutos em que a taxa de cada status na janela está acima da taxa do dia
+
+        A taxa da janela é comparada à do dia com o desvio binomial do
+        volume da janela, corrigido pela sobredispersão de cada status
+        (changepoint.rate_dispersion): (p_janela - p_dia) / sqrt(D p (1 - p) / n) > z.
+
+        Returns:
+            Lista com um array bool (minuto, status) por fonte
+        """
+        key = ('degraded', window, z)
+        if key not in self._cache:
+            result = []
+            for counts, totals in zip(self.counts, self.totals):
+                window_counts, window_totals = _window_sums(counts, window), _window_sums(totals, window)
+                day_rate = counts.sum(axis=0) / max(totals.sum(), 1)
+                dispersion = np.array([rate_dispersion(counts[:, j], totals) for j in range(counts.shape[1])])
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    rate = window_counts / window_totals[:, None]
+                    variance = dispersion * day_rate * (1 - day_rate) / window_totals[:, None]
+                    score = (rate - day_rate) / np.sqrt(variance)
+                result.append(np.nan_to_num(score, nan=0.0, posinf=0.0, neginf=0.0) > z)
+            self._cache[key] = result
+        return self._cache[key]
+
+    def segments(self, window, z=3.0, min_correlation=0.3, min_minutes=5, max_gap=None):
+        """
+        Episódios de degradação classificados por escopo
+
+        Um episódio é uma sequência de minutos em que ao menos uma fonte
+        está degradada (intervalos de até `max_gap` minutos são unidos).
+        É 'compartilhado' quando as duas fontes degradam juntas em ao menos
+        um quarto do episódio e a correlação móvel média passa de
+        `min_correlation`; 'simultâneo' quando degradam juntas sem
+        correlação; e 'local' quando a degradação é de uma fonte só.
+
+        Returns:
+            DataFrame com SEGMENT_COLUMNS
+        """
+        max_gap = window // 4 if max_gap is None else max_gap
+        key = ('segments', window, z, min_correlation, min_minutes, max_gap)
+        if key in self._cache:
+            return self._cache[key]
+
+        degraded_1, degraded_2 = self.degraded(window, z)
+        corr = self.rolling(window)
+        rows = []
+        for j, status in enumerate(self.statuses):
+            if status not in DEGRADATION_STATUSES:
+                continue
+            starts, ends = _runs(degraded_1[:, j] | degraded_2[:, j])
+            if len(starts) == 0:
+                continue
+            # Une episódios separados por intervalos curtos
+            keep = np.concatenate([[True], starts[1:] - ends[:-1] - 1 > max_gap])
+            starts, ends = starts[keep], np.concatenate([ends[:-1][keep[1:]], ends[-1:]])
+
+            for start, end in zip(starts, ends):
+                if end - start + 1 < min_minutes:
+                    continue
+                span = slice(start, end + 1)
+                minutes_1, minutes_2 = degraded_1[span, j].sum(), degraded_2[span, j].sum()
+                together = (degraded_1[span, j] & degraded_2[span, j]).sum()
+                values = corr[status].to_numpy()[span]
+                mean_corr = float(np.nanmean(values)) if np.isfinite(values).any() else np.nan
+                if together >= 0.25 * (end - start + 1):
+                    scope = 'compartilhado' if mean_corr >= min_correlation else 'simultâneo'
+                    involved = ', '.join(self.sources)
+                else:
+                    scope = 'local'
+                    involved = self.sources[0] if minutes_1 >= minutes_2 else self.sources[1]
+                window_rates = [
+                    counts[span, j].sum() / max(totals[span].sum(), 1) * 100
+                    for counts, totals in zip(self.counts, self.totals)
+                ]
+                rows.append({
+                    'status': status, 'start': int(start), 'end': int(end),
+                    'minutes': int(end - start + 1), 'scope': scope, 'sources': involved,
+                    'correlation': mean_corr, 'rate_1': window_rates[0], 'rate_2': window_rates[1]
+                })
+
+        frame = pd.DataFrame(rows, columns=SEGMENT_COLUMNS)
+        if len(frame):
+            frame['start_time'] = format_minutes(frame['start'].to_numpy())
+            frame['end_time'] = format_minutes(frame['end'].to_numpy())
+            frame = frame.sort_values(['start', 'status']).reset_index(drop=True)
+        self._cache[key] = frame
+        return frame
+
+    @classmethod
+    def from_aggregates(cls, aggregate_1, aggregate_2, sources=('transactions_1', 'transactions_2')):
+        """Cria o motor a partir de dois StatusAggregate (ou rollups equivalentes)"""
+        return cls(aggregate_1.volume, aggregate_1.statuses, aggregate_2.volume, aggregate_2.statuses, sources)
+
+
+def main(argv=None):
+    from stream_aggregate import aggregate_csv
+    from transaction_ingest import ALERT_SOURCES
+
+    parser = argparse.ArgumentParser(description="Correlação móvel e defasada entre transactions_1 e transactions_2")
+    parser.add_argument('--window', type=int, default=60, help="Janela da correlação móvel (minutos)")
+    parser.add_argument('--max-lag', type=int, default=30, help="Maior defasagem da correlação cruzada")
+    parser.add_argument('--z', type=float, default=3.0, help="Desvios binomiais para considerar degradação")
+    args = parser.parse_args(argv)
+
+    (source_1, path_1), (source_2, path_2) = list(ALERT_SOURCES.items())[:2]
+    engine = CorrelationEngine.from_aggregates(aggregate_csv(path_1), aggregate_csv(path_2), (source_1, source_2))
+
+    start = time.perf_counter()
+    rolling = engine.rolling(args.window)
+    lags = engine.lags(args.max_lag)
+    segments = engine.segments(args.window, args.z)
+    elapsed = time.perf_counter() - start
+
+    print(f"🔗 Correlação móvel ({args.window} min), média do dia:")
+    print(rolling[engine.statuses].mean().round(3).to_string())
+    print(f"\n🔗 Defasagem de maior correlação (±{args.max_lag} min):")
+    for status in engine.statuses:
+        column = lags[status]
+        if column.notna().any():
+            best = column.idxmax()
+            print(f"  {status}: lag {int(lags.loc[best, 'lag']):+d} min (r = {column[best]:.3f})")
+    print("\n🚨 Episódios de degradação:")
+    print(segments.to_string(index=False) if len(segments) else "  ✅ Nenhum")
+    print(f"\n⏱️ {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
+import pandas as pd
+
+
+# Raiz do projeto (os caminhos abaixo não dependem do diretório atual)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Bancos conhecidos: nome -> (caminho, imutável)
+# Bancos imutáveis são exports estáticos; os demais recebem escrita
+# (ingestão, monitoramento) e não podem ser abertos com immutable=1.
+DATABASES = {
+    'data': (os.path.join(PROJECT_ROOT, 'Analyze_data', 'data.db'), True),
+    'data1': (os.path.join(PROJECT_ROOT, 'Analyze_data', 'data1.db'), True),
+    'data2': (os.path.join(PROJECT_ROOT, 'Analyze_data', 'data2.db'), True),
+    'history': (os.path.join(PROJECT_ROOT, 'Analyze_data', 'history.db'), False),
+    'alert_data': (os.path.join(PROJECT_ROOT, 'Alert_Incident', 'alert_data.db'), False),
+    'database': (os.path.join(PROJECT_ROOT, 'Monitoring', 'database.db'), False),
+    'incidents': (os.path.join(PROJECT_ROOT, 'Monitoring', 'incidents.db'), False),
+    'notifications': (os.path.join(PROJECT_ROOT, 'Monitoring', 'notifications.db'), False)
+}
+
+# Pragmas aplicados a cada conexão de leitura
+READ_PRAGMAS = {
+    'mmap_size': 256 * 1024 * 1024,   # leitura via memory-map (256 MB)
+    'cache_size': -64 * 1024,         # cache de páginas de 64 MB (valor em KiB)
+    'temp_store': 'MEMORY',
+    'query_only': 'ON'
+}
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+_query_stats = {}
+
+
+def database_path(name):
+    """Caminho absoluto de um banco registrado"""
+    if name not in DATABASES:
+        raise ValueError(f"Banco '{name}' não registrado")
+    return DATABASES[name][0]
+
+
+def register_database(name, path, immutable=False):
+    """
+    Registra (ou substitui) um banco no pool
+
+    Args:
+        name: Nome lógico usado nas consultas
+        path: Caminho do arquivo SQLite
+        immutable: True apenas para arquivos que nunca mudam durante a execução
+    """
+    DATABASES[name] = (os.path.abspath(path), immutable)
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _open_readonly(path, immutable):
+    """Abre uma conexão somente leitura via URI (mode=ro / immutable=1)"""
+    uri = f"file:{quote(path)}?mode=ro"
+    if immutable:
+        uri += "&immutable=1"
+
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=True)
+    for pragma, value in READ_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value}")
+    return conn
+
+
+def get_connection(name):
+    """
+    Conexão somente leitura do banco para a thread atual
+
+    Cada thread (inclusive as threads de script do Streamlit) mantém seu
+    próprio conjunto de conexões, reaproveitadas entre consultas. Bancos
+    imutáveis são reabertos se o arquivo for substituído em disco.
+
+    Args:
+        name: Nome do banco (ver DATABASES)
+
+    Returns:
+        sqlite3.Connection
+    """
+    path = database_path(name)
+    immutable = DATABASES[name][1]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Banco não encontrado: {path}")
+
+    pool = getattr(_local, 'pool', None)
+    if pool is None:
+        pool = _local.pool = {}
+
+    signature = _file_signature(path) if immutable else None
+    entry = pool.get(name)
+
+    if entry is not None and (entry[1] != path or entry[2] != signature):
+        entry[0].close()
+        entry = None
+
+    if entry is None:
+        entry = (_open_readonly(path, immutable), path, signature)
+        pool[name] = entry
+
+    return entry[0]
+
+
+def close_connections():
+    """Fecha as conexões da thread atual"""
+    pool = getattr(_local, 'pool', None) or {}
+    for conn, _, _ in pool.values():
+        conn.close()
+    pool.clear()
+
+
+def _record(name, label, elapsed, rows):
+    key = (name, label)
+    with _stats_lock:
+        stats = _query_stats.get(key)
+        if stats is None:
+            stats = _query_stats[key] = {
+                'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0, 'rows': 0
+            }
+        elapsed_ms = elapsed * 1000
+        stats['calls'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        stats['last_ms'] = elapsed_ms
+        stats['rows'] += rows
+
+
+def _query_label(query):
+    return ' '.join(query.split())[:80]
+
+
+@contextmanager
+def timed_query(name, label):
+    """
+    Cronometra um bloco que usa a conexão diretamente
+
+    Exemplo:
+        with timed_query('alert_data', 'rollups') as conn:
+            pivot = alert_store.rollup_pivot(conn, 'transactions_1')
+    """
+    conn = get_connection(name)
+    start = time.perf_counter()
+    try:
+        yield conn
+    finally:
+        _record(name, label, time.perf_counter() - start, 0)
+
+
+def read_sql(name, query, params=None, label=None):
+    """
+    Executa uma consulta de leitura com cronometragem
+
+    Args:
+        name: Nome do banco (ver DATABASES)
+        query: SQL de leitura
+        params: Parâmetros da consulta
+        label: Rótulo nas estatísticas (padrão: início da consulta)
+
+    Returns:
+        DataFrame com o resultado
+    """
+    conn = get_connection(name)
+    start = time.perf_counter()
+    df = pd.read_sql_query(query, conn, params=params)
+    _record(name, label or _query_label(query), time.perf_counter() - start, len(df))
+    return df
+
+
+def query_stats():
+    """
+    Estatísticas acumuladas de tempo por consulta
+
+    Returns:
+        DataFrame com database, query, calls, total_ms, avg_ms, max_ms, last_ms e rows
+    """
+    with _stats_lock:
+        rows = [
+            {'database': name, 'query': label, **stats}
+            for (name, label), stats in _query_stats.items()
+        ]
+
+    df = pd.DataFrame(rows, columns=[
+        'database', 'query', 'calls', 'total_ms', 'max_ms', 'last_ms', 'rows'
+    ])
+    df.insert(4, 'avg_ms', df['total_ms'] / df['calls'].where(df['calls'] > 0))
+    return df.sort_values('total_ms', ascending=False).reset_index(drop=True)
+
+
+def reset_query_stats():
+    """Zera as estatísticas de tempo"""
+    with _stats_lock:
+        _query_stats.clear()
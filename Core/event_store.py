@@ -0,0 +1,563 @@
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, date
+import numpy as np
+import pandas as pd
+from db_access import database_path, read_sql
+from transaction_ingest import connect_writer
+from transaction_store import parse_minutes
+from alert_rules import SEVERITIES
+
+
+EVENT_DB_PATH = database_path('database')
+
+EVENT_TABLE = 'monitoring_events'
+
+# Versão do schema de eventos (PRAGMA user_version do database.db)
+EVENT_SCHEMA_VERSION = 1
+
+EVENT_COLUMNS = ['timestamp', 'source', 'event_type', 'severity', 'message', 'value']
+
+# Níveis de agregação (nome -> tamanho do bucket em segundos), do mais fino ao mais grosso
+EVENT_TIERS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400
+}
+
+# Retenção de cada nível em segundos (None = para sempre)
+RETENTION = {
+    'raw': 7 * 86400,
+    '1m': 30 * 86400,
+    '1h': 400 * 86400,
+    '1d': None
+}
+
+SERIES_COLUMNS = [
+    'time', 'source', 'event_type', 'events', 'value', 'value_min', 'value_max'
+] + SEVERITIES
+
+# Pontos máximos por série ao escolher o nível automaticamente (um dia em minutos)
+MAX_POINTS = 1440
+
+# Intervalo mínimo entre duas aplicações automáticas da retenção (s)
+RETENTION_CHECK = 3600
+
+
+def tier_table(tier):
+    """Nome da tabela de um nível de agregação"""
+    if tier == 'raw':
+        return EVENT_TABLE
+    if tier not in EVENT_TIERS:
+        raise ValueError(f"Nível '{tier}' não suportado")
+    return f"{EVENT_TABLE}_{tier}"
+
+
+# Rótulos horários do projeto ("00h", "00h 00")
+LABEL_PATTERN = r'^\s*\d{1,2}h(\s*\d{1,2})?\s*$'
+
+
+def local_offset():
+    """Deslocamento do fuso local em segundos (buckets de hora/dia alinhados ao horário local)"""
+    return int(datetime.now().astimezone().utcoffset().total_seconds())
+
+
+def to_epoch(values, day=None):
+    """
+    Converte horários para segundos desde a época (inteiros)
+
+    Aceita inteiros (já em epoch), datetimes/strings de data (horário
+    local) e os rótulos horários do projeto ("00h", "00h 00"), que são
+    ancorados em `day`.
+
+    Args:
+        values: Sequência de horários
+        day: Data dos rótulos "00h" (padrão: hoje); aceita uma sequência por linha
+
+    Returns:
+        Array int64
+    """
+    series = pd.Series(values)
+    if series.empty:
+        return np.empty(0, dtype=np.int64)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.to_numpy(dtype=np.int64)
+
+    offset = local_offset()
+    text = series.astype(str)
+    labels = text.str.match(LABEL_PATTERN).to_numpy()
+    result = np.empty(len(series), dtype=np.int64)
+
+    if labels.any():
+        days = pd.to_datetime(pd.Series(day if day is not None else date.today(), index=series.index))
+        midnight = days[labels].dt.normalize().to_numpy().astype('datetime64[s]').astype(np.int64)
+        result[labels] = midnight - offset + parse_minutes(text[labels].to_numpy()).astype(np.int64) * 60
+    if (~labels).any():
+        parsed = pd.to_datetime(series[~labels])
+        if parsed.dt.tz is not None:
+            result[~labels] = parsed.dt.tz_convert(None).to_numpy().astype('datetime64[s]').astype(np.int64)
+        else:
+            result[~labels] = parsed.to_numpy().astype('datetime64[s]').astype(np.int64) - offset
+    return result
+
+
+def from_epoch(values):
+    """Epoch (s) -> datetimes no horário local"""
+    return pd.to_datetime(np.asarray(values, dtype=np.int64) + local_offset(), unit='s')
+
+
+def create_event_tables(conn):
+    """Cria a tabela de eventos (epoch inteiro, índice por fonte e horário) e os níveis agregados"""
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {EVENT_TABLE} (
+            id INTEGER PRIMARY KEY,
+            timestamp INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            message TEXT NOT NULL,
+            value REAL
+        )
+    ''')
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS idx_{EVENT_TABLE}_source_timestamp ON {EVENT_TABLE} (source, timestamp)"
+    )
+    severity_columns = ''.join(f"{severity} INTEGER NOT NULL DEFAULT 0, " for severity in SEVERITIES)
+    for tier in EVENT_TIERS:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {tier_table(tier)} (
+                source TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                event_type TEXT NOT NULL,
+                events INTEGER NOT NULL,
+                value_sum REAL NOT NULL DEFAULT 0,
+                value_count INTEGER NOT NULL DEFAULT 0,
+                value_min REAL,
+                value_max REAL,
+                {severity_columns}
+                PRIMARY KEY (source, bucket, event_type)
+            ) WITHOUT ROWID
+        ''')
+
+
+def legacy_epochs(legacy):
+    """
+    Horários da tabela antiga em epoch, sem falhar em valores ilegíveis
+
+    Rótulos "00h" são ancorados no dia de created_at; datas são lidas
+    uma a uma e, se ilegíveis, o evento recebe o próprio created_at
+    (ou o horário atual, sem created_at válido).
+
+    Returns:
+        Array int64
+    """
+    created = (pd.to_datetime(legacy['created_at'], errors='coerce') if 'created_at' in legacy
+               else pd.Series(pd.NaT, index=legacy.index))
+    text = legacy['timestamp'].astype(str)
+    labels = text.str.match(LABEL_PATTERN)
+    parsed = text.where(~labels).map(lambda value: pd.to_datetime(value, errors='coerce'))
+    fallback = created.fillna(pd.Timestamp.now()).dt.strftime('%Y-%m-%d %H:%M:%S')
+    values = text.where(labels | parsed.notna(), fallback)
+    return to_epoch(values, created.fillna(pd.Timestamp(date.today())))
+
+
+def migrate_events(conn):
+    """
+    Cria/atualiza o schema de eventos
+
+    A tabela antiga (timestamp TEXT como "00h", sem índice) é convertida
+    para epoch inteiro — os rótulos são ancorados no dia de created_at —
+    e os níveis agregados são reconstruídos a partir dela. A conversão
+    acontece antes de qualquer alteração, e a troca da tabela (DROP,
+    CREATE e INSERT) roda numa única transação: uma falha no meio
+    mantém a tabela antiga intacta.
+
+    Returns:
+        Número de eventos convertidos da tabela antiga
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    columns = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({EVENT_TABLE})")}
+    converted = 0
+
+    if columns and columns.get('timestamp', '').upper() != 'INTEGER':
+        legacy = pd.read_sql_query(f"SELECT * FROM {EVENT_TABLE} ORDER BY id", conn)
+        if len(legacy):
+            legacy['timestamp'] = legacy_epochs(legacy)
+            legacy = events_frame(legacy)
+        conn.commit()
+        conn.execute("BEGIN")
+        try:
+            conn.execute(f"DROP TABLE {EVENT_TABLE}")
+            create_event_tables(conn)
+            if len(legacy):
+                converted = insert_events(conn, legacy)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    else:
+        create_event_tables(conn)
+
+    if version < EVENT_SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {EVENT_SCHEMA_VERSION}")
+    return converted
+
+
+def events_frame(events):
+    """Normaliza uma lista de dicts/DataFrame de eventos para EVENT_COLUMNS (timestamp em epoch)"""
+    frame = pd.DataFrame(events)
+    for column in EVENT_COLUMNS:
+        if column not in frame:
+            frame[column] = None
+    frame = frame[EVENT_COLUMNS].copy()
+    if frame['timestamp'].isna().any():
+        frame['timestamp'] = frame['timestamp'].fillna(int(time.time()))
+    frame['timestamp'] = to_epoch(frame['timestamp'])
+    frame['severity'] = frame['severity'].fillna('info')
+    frame['message'] = frame['message'].fillna('')
+    frame['value'] = pd.to_numeric(frame['value'], errors='coerce')
+    return frame
+
+
+def update_tiers(conn, frame):
+    """
+    Soma um lote de eventos aos níveis agregados (upsert incremental)
+
+    O lote é agregado em memória por (fonte, bucket, tipo) antes da
+    gravação, então cada nível recebe no máximo uma linha por bucket.
+    """
+    if frame.empty:
+        return
+    offset = local_offset()
+    batch = frame[['source', 'event_type', 'value']].copy()
+    for severity in SEVERITIES:
+        batch[severity] = (frame['severity'] == severity).astype(int)
+
+    severity_names = ', '.join(SEVERITIES)
+    severity_updates = ''.join(f", {s} = {s} + excluded.{s}" for s in SEVERITIES)
+    for tier, size in EVENT_TIERS.items():
+        batch['bucket'] = (frame['timestamp'] + offset) // size * size - offset
+        grouped = batch.groupby(['source', 'bucket', 'event_type'], sort=False).agg(
+            events=('value', 'size'), value_sum=('value', 'sum'), value_count=('value', 'count'),
+            value_min=('value', 'min'), value_max=('value', 'max'),
+            **{severity: (severity, 'sum') for severity in SEVERITIES}
+        ).reset_index()
+        grouped[['value_min', 'value_max']] = grouped[['value_min', 'value_max']].astype(object).where(
+            grouped[['value_min', 'value_max']].notna(), None)
+
+        conn.executemany(f'''
+            INSERT INTO {tier_table(tier)} (source, bucket, event_type, events, value_sum, value_count,
+                                            value_min, value_max, {severity_names})
+            VALUES ({', '.join('?' * (8 + len(SEVERITIES)))})
+            ON CONFLICT(source, bucket, event_type) DO UPDATE SET
+                events = events + excluded.events,
+                value_sum = value_sum + excluded.value_sum,
+                value_count = value_count + excluded.value_count,
+                value_min = MIN(COALESCE(value_min, excluded.value_min), COALESCE(excluded.value_min, value_min)),
+                value_max = MAX(COALESCE(value_max, excluded.value_max), COALESCE(excluded.value_max, value_max))
+                {severity_updates}
+        ''', [
+            (row[0], int(row[1]), row[2], int(row[3]), float(row[4]), int(row[5]), row[6], row[7],
+             *(int(v) for v in row[8:]))
+            for row in grouped.itertuples(index=False, name=None)
+        ])
+
+
+def insert_events(conn, events):
+    """
+    Insere eventos e atualiza os níveis agregados (a transação fica a cargo do chamador)
+
+    Returns:
+        Número de eventos inseridos
+    """
+    frame = events_frame(events)
+    conn.executemany(
+        f"INSERT INTO {EVENT_TABLE} ({', '.join(EVENT_COLUMNS)}) VALUES ({', '.join('?' * len(EVENT_COLUMNS))})",
+        ((int(ts), source, event_type, severity, message, None if pd.isna(value) else float(value))
+         for ts, source, event_type, severity, message, value in frame.itertuples(index=False, name=None))
+    )
+    update_tiers(conn, frame)
+    return len(frame)
+
+
+def enforce_retention(conn, now=None, retention=None):
+    """
+    Remove linhas mais antigas que a retenção de cada nível
+
+    As remoções são feitas fonte a fonte para usar os índices
+    (source, timestamp) / (source, bucket).
+
+    Returns:
+        dict nível -> linhas removidas
+    """
+    now = int(time.time() if now is None else now)
+    retention = RETENTION if retention is None else retention
+    sources = [row[0] for row in conn.execute(f"SELECT DISTINCT source FROM {tier_table('1d')}")]
+    deleted = {}
+    for tier, keep in retention.items():
+        if keep is None:
+            continue
+        column = 'timestamp' if tier == 'raw' else 'bucket'
+        deleted[tier] = 0
+        for source in sources:
+            cursor = conn.execute(f"DELETE FROM {tier_table(tier)} WHERE source = ? AND {column} < ?",
+                                  (source, now - keep))
+            deleted[tier] += cursor.rowcount
+    return deleted
+
+
+class EventStore:
+    """
+    Eventos de monitoramento com níveis agregados e retenção
+
+    Cada lote gravado entra na tabela bruta e é somado aos níveis de
+    1 minuto, 1 hora e 1 dia na mesma transação; a retenção de cada
+    nível é aplicada automaticamente (no máximo uma vez por
+    RETENTION_CHECK segundos), então o bruto pode expirar sem perder
+    os agregados.
+    """
+
+    def __init__(self, db_path=EVENT_DB_PATH, retention=None):
+        self.db_path = db_path
+        self.retention = dict(RETENTION if retention is None else retention)
+        self.conn = connect_writer(db_path)
+        self.converted = migrate_events(self.conn)
+        self.conn.commit()
+        # None: a primeira gravação sempre aplica a retenção (o zero do monotonic é arbitrário)
+        self._last_retention = None
+
+    def close(self):
+        self.conn.close()
+
+    def count(self):
+        """Total de eventos registrados (pelo nível diário, que não expira)"""
+        row = self.conn.execute(f"SELECT COALESCE(SUM(events), 0) FROM {tier_table('1d')}").fetchone()
+        return int(row[0])
+
+    def record(self, events, now=None):
+        """
+        Grava um lote de eventos (dicts ou DataFrame com EVENT_COLUMNS)
+
+        Returns:
+            Número de eventos gravados
+        """
+        with self.conn:
+            written = insert_events(self.conn, events)
+        if self._last_retention is None or time.monotonic() - self._last_retention >= RETENTION_CHECK:
+            self.apply_retention(now)
+        return written
+
+    def apply_retention(self, now=None):
+        """Aplica a retenção de todos os níveis e retorna as linhas removidas por nível"""
+        with self.conn:
+            deleted = enforce_retention(self.conn, now, self.retention)
+        self._last_retention = time.monotonic()
+        return deleted
+
+    def rebuild_tiers(self):
+        """Reconstrói os níveis agregados a partir da tabela bruta (após importações manuais)"""
+        with self.conn:
+            for tier in EVENT_TIERS:
+                self.conn.execute(f"DELETE FROM {tier_table(tier)}")
+            raw = pd.read_sql_query(f"SELECT {', '.join(EVENT_COLUMNS)} FROM {EVENT_TABLE}", self.conn)
+            update_tiers(self.conn, raw)
+        return len(raw)
+
+
+def choose_tier(start, end, resolution=None, max_points=MAX_POINTS, now=None, retention=None):
+    """
+    Nível mais grosso que atende o período pedido
+
+    Atender = o bucket não é maior que a resolução pedida (ou que
+    período / max_points) e a retenção do nível ainda cobre o início do
+    período. Sem nível fino o bastante que cubra o início, usa o mais
+    fino que o cubra.
+
+    Returns:
+        'raw', '1m', '1h' ou '1d'
+    """
+    now = time.time() if now is None else now
+    retention = RETENTION if retention is None else retention
+    wanted = resolution if resolution else (end - start) / max_points
+    sizes = {'raw': 1, **EVENT_TIERS}
+
+    covering = [tier for tier in sizes if retention.get(tier) is None or start >= now - retention[tier]]
+    if not covering:
+        return '1d'
+    fine_enough = [tier for tier in covering if sizes[tier] <= max(wanted, 1)]
+    return fine_enough[-1] if fine_enough else covering[0]
+
+
+def event_sources(db_name='database'):
+    """Fontes com eventos registrados (lidas do nível diário)"""
+    frame = read_sql(db_name, f"SELECT DISTINCT source FROM {tier_table('1d')}", label='event sources')
+    return frame['source'].tolist()
+
+
+def read_series(start, end, sources=None, resolution=None, max_points=MAX_POINTS, db_name='database'):
+    """
+    Série agregada de eventos no período, lida do nível mais grosso que o atende
+
+    Args:
+        start, end: Período (epoch, datetime ou string de data; end exclusivo)
+        sources: Fontes (padrão: todas)
+        resolution: Segundos por ponto (padrão: período / max_points)
+        max_points: Pontos máximos por série quando resolution não é dado
+        db_name: Banco registrado
+
+    Returns:
+        DataFrame com SERIES_COLUMNS (time no horário local); o nível
+        usado fica em frame.attrs['tier'] e o passo em frame.attrs['step'].
+        Nos níveis agregados, o bucket que contém o início entra inteiro.
+    """
+    start, end = (int(v) for v in to_epoch([start, end]))
+    tier = choose_tier(start, end, resolution, max_points)
+    size = 1 if tier == 'raw' else EVENT_TIERS[tier]
+    wanted = resolution if resolution else (end - start) / max_points
+    step = max(size, int(wanted // size) * size)
+    sources = event_sources(db_name) if sources is None else list(sources)
+    offset = local_offset()
+
+    if not sources:
+        frame = pd.DataFrame(columns=SERIES_COLUMNS)
+    else:
+        # Parâmetros nomeados (as fontes também, o sqlite3 não mistura com posicionais)
+        placeholders = ', '.join(f':source_{i}' for i in range(len(sources)))
+        if tier == 'raw':
+            severity_sums = ''.join(f", SUM(severity = '{s}') AS {s}" for s in SEVERITIES)
+            query = f'''
+                SELECT ((timestamp + :offset) / :step) * :step - :offset AS bucket, source, event_type,
+                       COUNT(*) AS events, SUM(value) AS value_sum, COUNT(value) AS value_count,
+                       MIN(value) AS value_min, MAX(value) AS value_max{severity_sums}
+                FROM {EVENT_TABLE}
+                WHERE source IN ({placeholders}) AND timestamp >= :start AND timestamp < :end
+                GROUP BY 1, source, event_type ORDER BY 1
+            '''
+        else:
+            severity_sums = ''.join(f", SUM({s}) AS {s}" for s in SEVERITIES)
+            query = f'''
+                SELECT ((bucket + :offset) / :step) * :step - :offset AS bucket, source, event_type,
+                       SUM(events) AS events, SUM(value_sum) AS value_sum, SUM(value_count) AS value_count,
+                       MIN(value_min) AS value_min, MAX(value_max) AS value_max{severity_sums}
+                FROM {tier_table(tier)}
+                WHERE source IN ({placeholders}) AND bucket >= :start_bucket AND bucket < :end
+                GROUP BY 1, source, event_type ORDER BY 1
+            '''
+        params = {f'source_{i}': source for i, source in enumerate(sources)}
+        params.update(offset=offset, step=step, start=start, end=end,
+                      start_bucket=(start + offset) // size * size - offset)
+        frame = read_sql(db_name, query, params=params, label=f'event series {tier}')
+        frame['time'] = from_epoch(frame['bucket'])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            frame['value'] = frame['value_sum'] / frame['value_count'].where(frame['value_count'] > 0)
+        frame = frame[SERIES_COLUMNS]
+
+    frame.attrs['tier'] = tier
+    frame.attrs['step'] = step
+    return frame
+
+
+def read_events(start=None, end=None, sources=None, limit=200, db_name='database'):
+    """
+    Eventos brutos mais recentes (dentro da retenção do bruto)
+
+    Returns:
+        DataFrame com EVENT_COLUMNS mais a coluna time (horário local),
+        mais recentes primeiro
+    """
+    sources = event_sources(db_name) if sources is None else list(sources)
+    if not sources:
+        return pd.DataFrame(columns=['time'] + EVENT_COLUMNS)
+    start = 0 if start is None else int(to_epoch([start])[0])
+    end = 2 ** 62 if end is None else int(to_epoch([end])[0])
+    query = f'''
+        SELECT {', '.join(EVENT_COLUMNS)} FROM {EVENT_TABLE}
+        WHERE source IN ({', '.join('?' * len(sources))}) AND timestamp >= ? AND timestamp < ?
+        ORDER BY timestamp DESC LIMIT ?
+    '''
+    frame = read_sql(db_name, query, params=(*sources, start, end, int(limit)), label='event list')
+    frame.insert(0, 'time', from_epoch(frame['timestamp']))
+    return frame
+
+
+def event_total(db_name='database'):
+    """Total de eventos registrados, lido do nível diário (não depende do tamanho do bruto)"""
+    frame = read_sql(db_name, f"SELECT COALESCE(SUM(events), 0) AS n FROM {tier_table('1d')}",
+                     label='event total')
+    return int(frame['n'].iloc[0])
+
+
+def schema_ready(db_name='database'):
+    """
+    True se o banco já tem o schema atual de eventos (consulta somente leitura)
+
+    Falso quando o arquivo ou as tabelas não existem ou a tabela ainda
+    está no formato antigo (timestamp TEXT): só nesses casos é preciso
+    abrir um EventStore de escrita para criar/migrar.
+    """
+    query = f'''
+        SELECT (SELECT type FROM pragma_table_info('{EVENT_TABLE}') WHERE name = 'timestamp') AS timestamp_type,
+               (SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = '{tier_table('1d')}') AS tiers
+    '''
+    try:
+        frame = read_sql(db_name, query, label='event schema')
+    except Exception:
+        return False
+    return str(frame['timestamp_type'].iloc[0]).upper() == 'INTEGER' and int(frame['tiers'].iloc[0]) > 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Eventos de monitoramento: níveis agregados e retenção")
+    parser.add_argument('--db', default=EVENT_DB_PATH, help="Banco SQLite dos eventos")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('migrate', help="Converter a tabela antiga e criar os níveis")
+
+    import_parser = subparsers.add_parser('import', help="Importar eventos de um CSV (EVENT_COLUMNS)")
+    import_parser.add_argument('csv')
+    import_parser.add_argument('--chunk-rows', type=int, default=200_000)
+
+    subparsers.add_parser('retention', help="Aplicar a retenção agora")
+    subparsers.add_parser('rebuild', help="Reconstruir os níveis a partir do bruto")
+
+    query_parser = subparsers.add_parser('query', help="Série agregada de um período")
+    query_parser.add_argument('--hours', type=float, default=24.0, help="Horas até agora")
+    query_parser.add_argument('--source', action='append', default=None)
+    query_parser.add_argument('--resolution', type=int, default=None, help="Segundos por ponto")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'query':
+        now = int(time.time())
+        start = time.perf_counter()
+        frame = read_series(now - int(args.hours * 3600), now + 1, args.source, args.resolution)
+        elapsed = time.perf_counter() - start
+        print(frame.tail(20).round({'value': 2}).to_string(index=False) if len(frame) else "📭 Nenhum evento no período")
+        print(f"\n🗂️ Nível {frame.attrs['tier']} (passo {frame.attrs['step']}s): "
+              f"{len(frame)} pontos em {elapsed * 1000:.1f} ms")
+        return 0
+
+    store = EventStore(args.db)
+    try:
+        if args.command == 'migrate':
+            print(f"✅ Schema v{EVENT_SCHEMA_VERSION}: {store.converted} eventos convertidos, {store.count():,} no total")
+        elif args.command == 'import':
+            start = time.perf_counter()
+            written = 0
+            for chunk in pd.read_csv(args.csv, chunksize=args.chunk_rows):
+                written += store.record(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"✅ {written:,} eventos importados em {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f}/s)")
+        elif args.command == 'retention':
+            print(f"🧹 Linhas removidas por nível: {store.apply_retention()}")
+        else:
+            print(f"🔁 {store.rebuild_tiers():,} eventos reagregados")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
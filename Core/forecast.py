@@ -0,0 +1,484 @@
+import os
+import sys
+import json
+import argparse
+from datetime import date
+import numpy as np
+import pandas as pd
+from db_access import PROJECT_ROOT, read_sql
+from transaction_store import MINUTES_PER_DAY, format_minutes
+
+
+FORECAST_PATH = os.path.join(PROJECT_ROOT, 'Alert_Incident', 'forecast_state.npz')
+
+# Status previstos por fonte
+FORECAST_STATUSES = ['approved', 'denied', 'failed']
+
+METHODS = ['holt_winters', 'seasonal_naive']
+
+FORECAST_COLUMNS = ['source', 'status', 'step', 'minute', 'time', 'forecast', 'lower', 'upper', 'method']
+
+BREACH_COLUMNS = ['source', 'status', 'minute', 'time', 'actual', 'forecast', 'lower', 'upper', 'direction']
+
+# z do intervalo de predição de 95%
+INTERVAL_Z = 1.96
+
+
+def _day_ordinal(day):
+    return pd.Timestamp(day).date().toordinal()
+
+
+class VolumeForecaster:
+    """
+    Previsão de curto prazo do volume por minuto de cada (fonte, status)
+
+    Holt-Winters aditivo (nível, tendência e sazonalidade do minuto do dia)
+    atualizado incrementalmente: cada minuto novo custa O(1) por fonte e
+    o estado inteiro é persistido em .npz, então nada é reajustado do zero
+    ao abrir o dashboard. Enquanto um minuto do dia ainda não foi visto a
+    componente sazonal vale zero (Holt linear). O sazonal ingênuo (mesmo
+    minuto do dia anterior) é mantido em paralelo como alternativa.
+
+    Os intervalos de predição usam a variância dos erros de um passo
+    (EWMA) propagada pelo horizonte: Var(h) = σ² [1 + Σ_{j<h} α²(1 + jβ)²].
+    """
+
+    def __init__(self, statuses=None, alpha=0.2, beta=0.01, gamma=0.1, error_weight=0.02, warmup=60):
+        """
+        Inicializa um modelo vazio
+
+        Args:
+            statuses: Status previstos (padrão: FORECAST_STATUSES)
+            alpha, beta, gamma: Suavização do nível, da tendência e da sazonalidade
+            error_weight: Peso da EWMA dos erros quadráticos de um passo
+            warmup: Minutos observados antes de sinalizar valores fora da faixa
+        """
+        self.statuses = list(FORECAST_STATUSES if statuses is None else statuses)
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.error_weight = error_weight
+        self.warmup = warmup
+        self.sources = []
+
+        k = len(self.statuses)
+        self.level = np.zeros((0, k))
+        self.trend = np.zeros((0, k))
+        self.variance = np.zeros((0, k))
+        self.season = np.zeros((0, MINUTES_PER_DAY, k))
+        self.season_seen = np.zeros((0, MINUTES_PER_DAY), dtype=bool)
+        self.previous = np.zeros((0, MINUTES_PER_DAY, k))
+        self.previous_day = np.zeros((0, MINUTES_PER_DAY), dtype=np.int64)
+        self.naive_variance = np.zeros((0, k))
+        self.observed = np.zeros(0, dtype=np.int64)
+        self.last_time = np.zeros(0, dtype=np.int64)
+        # Estado de cada fonte antes do dia em curso (para substituir o dia reingerido)
+        for name in self._MODEL:
+            setattr(self, f'day_start_{name}', getattr(self, name).copy())
+        self.rollup_day = np.zeros(0, dtype=np.int64)
+        self.rollup_bucket = np.zeros(0, dtype=np.int64)
+
+    # ------------------------------------------------------------------
+    # Estrutura
+    # ------------------------------------------------------------------
+
+    # Arrays do modelo (copiados em day_start_* no início de cada dia do rollup)
+    _MODEL = (
+        'level', 'trend', 'variance', 'season', 'season_seen', 'previous', 'previous_day',
+        'naive_variance', 'observed', 'last_time'
+    )
+
+    _ARRAYS = _MODEL + tuple(f'day_start_{name}' for name in _MODEL) + ('rollup_day', 'rollup_bucket')
+
+    # Arrays preenchidos com -1 (sem valor) em uma fonte nova
+    _UNSET = ('last_time', 'day_start_last_time', 'rollup_day', 'rollup_bucket')
+
+    def source_index(self, source, create=False):
+        """Índice da fonte nos arrays de estado (criando a linha se create=True)"""
+        if source in self.sources:
+            return self.sources.index(source)
+        if not create:
+            raise KeyError(f"Fonte '{source}' sem modelo de previsão")
+        self.sources.append(source)
+        for name in self._ARRAYS:
+            array = getattr(self, name)
+            fill = -1 if name in self._UNSET else 0
+            setattr(self, name, np.concatenate([array, np.full((1,) + array.shape[1:], fill, dtype=array.dtype)]))
+        return len(self.sources) - 1
+
+    # ------------------------------------------------------------------
+    # Atualização incremental
+    # ------------------------------------------------------------------
+
+    def update(self, source, time, values):
+        """
+        Incorpora o volume de um minuto (O(1))
+
+        Minutos sem linhas entre a última atualização e `time` contam como
+        volume zero; minutos já vistos são ignorados.
+
+        Args:
+            source: Nome da fonte
+            time: Minuto absoluto (dia ordinal * 1440 + minuto do dia)
+            values: Volume de cada status (ordem de self.statuses)
+
+        Returns:
+            (previsão, desvio) de um passo para o minuto, antes da
+            atualização; None se o minuto já foi incorporado
+        """
+        s = self.source_index(source, create=True)
+        time = int(time)
+        last = int(self.last_time[s])
+        if last >= 0 and time <= last:
+            return None
+        # Lacunas curtas viram minutos zerados; lacunas maiores que um dia reiniciam o nível
+        if last >= 0 and time - last > MINUTES_PER_DAY:
+            self.observed[s] = 0
+        elif last >= 0:
+            zeros = np.zeros(len(self.statuses))
+            for gap in range(last + 1, time):
+                self._step(s, gap, zeros)
+        return self._step(s, time, np.asarray(values, dtype=np.float64))
+
+    def mark_day_start(self, source):
+        """Guarda o estado da fonte antes de incorporar um dia novo (ver restore_day_start)"""
+        s = self.source_index(source, create=True)
+        for name in self._MODEL:
+            getattr(self, f'day_start_{name}')[s] = getattr(self, name)[s]
+
+    def restore_day_start(self, source):
+        """Volta a fonte ao estado de mark_day_start(), descartando os minutos incorporados desde então"""
+        s = self.source_index(source)
+        for name in self._MODEL:
+            getattr(self, name)[s] = getattr(self, f'day_start_{name}')[s]
+
+    def matches_day(self, source, day, minutes, volumes):
+        """True se os minutos do dia já foram incorporados exatamente com esses volumes"""
+        s = self.source_index(source)
+        minutes = np.asarray(minutes, dtype=np.int64)
+        return bool(np.all(self.previous_day[s, minutes] == _day_ordinal(day)) and
+                    np.array_equal(self.previous[s, minutes], volumes))
+
+    def _step(self, s, time, y):
+        slot = time % MINUTES_PER_DAY
+        day = time // MINUTES_PER_DAY
+        season = self.season[s, slot] if self.season_seen[s, slot] else 0.0
+
+        if self.observed[s] == 0:
+            self.level[s] = y - season
+            self.trend[s] = 0.0
+            forecast = y.copy()
+            sd = np.full(len(y), np.nan)
+        else:
+            forecast = self.level[s] + self.trend[s] + season
+            sd = np.sqrt(self.variance[s]) if self.observed[s] > 1 else np.full(len(y), np.nan)
+            error = y - forecast
+            w = self.error_weight if self.observed[s] > 1 else 1.0
+            self.variance[s] = (1 - w) * self.variance[s] + w * error * error
+
+            level = self.alpha * (y - season) + (1 - self.alpha) * (self.level[s] + self.trend[s])
+            self.trend[s] = self.beta * (level - self.level[s]) + (1 - self.beta) * self.trend[s]
+            self.level[s] = level
+
+        seasonal = y - self.level[s]
+        self.season[s, slot] = (self.gamma * seasonal + (1 - self.gamma) * self.season[s, slot]
+                                if self.season_seen[s, slot] else seasonal)
+        self.season_seen[s, slot] = True
+
+        # Sazonal ingênuo: erro contra o mesmo minuto do dia anterior
+        if self.previous_day[s, slot] == day - 1:
+            naive_error = y - self.previous[s, slot]
+            self.naive_variance[s] = (1 - self.error_weight) * self.naive_variance[s] + \
+                self.error_weight * naive_error * naive_error
+        self.previous[s, slot] = y
+        self.previous_day[s, slot] = day
+
+        self.observed[s] += 1
+        self.last_time[s] = time
+        return forecast, sd
+
+    def update_matrix(self, source, day, minutes, volumes, z=INTERVAL_Z):
+        """
+        Incorpora vários minutos de um dia e devolve os que saíram da faixa prevista
+
+        Args:
+            source: Nome da fonte
+            day: Data dos minutos
+            minutes: Minutos do dia (crescentes)
+            volumes: Array (minutos, len(self.statuses))
+            z: Largura do intervalo em desvios
+
+        Returns:
+            DataFrame com BREACH_COLUMNS
+        """
+        base = _day_ordinal(day) * MINUTES_PER_DAY
+        s = self.source_index(source, create=True)
+        rows = []
+        for minute, values in zip(np.asarray(minutes, dtype=np.int64), np.asarray(volumes, dtype=np.float64)):
+            ready = self.observed[s] >= self.warmup
+            result = self.update(source, base + minute, values)
+            if result is None or not ready:
+                continue
+            forecast, sd = result
+            lower, upper = np.maximum(forecast - z * sd, 0), forecast + z * sd
+            for k in np.flatnonzero((values < lower) | (values > upper)):
+                rows.append({
+                    'source': source, 'status': self.statuses[k], 'minute': int(minute),
+                    'time': format_minutes([minute])[0], 'actual': float(values[k]),
+                    'forecast': float(forecast[k]), 'lower': float(lower[k]), 'upper': float(upper[k]),
+                    'direction': 'acima' if values[k] > upper[k] else 'abaixo'
+                })
+        return pd.DataFrame(rows, columns=BREACH_COLUMNS)
+
+    # ------------------------------------------------------------------
+    # Previsão
+    # ------------------------------------------------------------------
+
+    def forecast(self, source, horizon=60, method='holt_winters', z=INTERVAL_Z):
+        """
+        Previsão dos próximos `horizon` minutos com intervalo de predição
+
+        Args:
+            source: Nome da fonte
+            horizon: Minutos à frente (15 a 60 na prática)
+            method: 'holt_winters' ou 'seasonal_naive' (cai para Holt-Winters
+                nos minutos sem o dia anterior)
+            z: Largura do intervalo em desvios (1.96 = 95%)
+
+        Returns:
+            DataFrame com FORECAST_COLUMNS (formato longo, uma linha por
+            status e passo)
+        """
+        if method not in METHODS:
+            raise ValueError(f"Método desconhecido: {method}")
+        s = self.source_index(source)
+        if self.observed[s] == 0:
+            return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+        steps = np.arange(1, horizon + 1)
+        times = self.last_time[s] + steps
+        slots = times % MINUTES_PER_DAY
+        season = np.where(self.season_seen[s, slots][:, None], self.season[s, slots], 0.0)
+        values = self.level[s] + steps[:, None] * self.trend[s] + season
+
+        # Var(h) = σ² (1 + Σ_{j=1}^{h-1} α² (1 + jβ)²)
+        c2 = (self.alpha * (1 + np.arange(horizon) * self.beta)) ** 2
+        c2[0] = 0.0
+        variance = self.variance[s] * (1 + np.cumsum(c2))[:, None]
+        used = np.full(horizon, 'holt_winters', dtype=object)
+
+        if method == 'seasonal_naive':
+            available = self.previous_day[s, slots] == times // MINUTES_PER_DAY - 1
+            values = np.where(available[:, None], self.previous[s, slots], values)
+            variance = np.where(available[:, None], self.naive_variance[s], variance)
+            used[available] = 'seasonal_naive'
+
+        sd = np.sqrt(variance)
+        lower = np.maximum(values - z * sd, 0)
+        upper = values + z * sd
+        values = np.maximum(values, 0)
+
+        n_statuses = len(self.statuses)
+        return pd.DataFrame({
+            'source': source,
+            'status': np.tile(self.statuses, horizon),
+            'step': np.repeat(steps, n_statuses),
+            'minute': np.repeat(slots, n_statuses),
+            'time': np.repeat(format_minutes(slots), n_statuses),
+            'forecast': values.ravel(),
+            'lower': lower.ravel(),
+            'upper': upper.ravel(),
+            'method': np.repeat(used, n_statuses)
+        }, columns=FORECAST_COLUMNS)
+
+    def last_minute(self, source, day=None):
+        """Último minuto do dia incorporado (-1 se nenhum minuto do dia)"""
+        if source not in self.sources:
+            return -1
+        last = int(self.last_time[self.source_index(source)])
+        if last < 0 or (day is not None and last // MINUTES_PER_DAY != _day_ordinal(day)):
+            return -1
+        return last % MINUTES_PER_DAY
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    def save(self, path=FORECAST_PATH):
+        """Grava o estado em .npz (escrita atômica)"""
+        meta = {
+            'statuses': self.statuses, 'sources': self.sources, 'alpha': self.alpha, 'beta': self.beta,
+            'gamma': self.gamma, 'error_weight': self.error_weight, 'warmup': self.warmup
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)),
+                     **{name: getattr(self, name) for name in self._ARRAYS})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=FORECAST_PATH):
+        """Carrega um estado gravado com save()"""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            forecaster = cls(meta['statuses'], meta['alpha'], meta['beta'], meta['gamma'],
+                             meta['error_weight'], meta['warmup'])
+            forecaster.sources = list(meta['sources'])
+            for name in cls._ARRAYS:
+                if name in data.files:
+                    setattr(forecaster, name, data[name])
+                elif name.startswith('day_start_'):
+                    # Estado gravado antes do array existir: o dia começa no estado carregado
+                    setattr(forecaster, name, getattr(forecaster, name[len('day_start_'):]).copy())
+                else:
+                    shape = (len(forecaster.sources),) + getattr(forecaster, name).shape[1:]
+                    setattr(forecaster, name, np.full(shape, -1 if name in cls._UNSET else 0, dtype=np.int64))
+        return forecaster
+
+
+def _rollup_volumes(rollup, statuses, first, last):
+    """Volumes minuto x status de first a last (minutos sem linhas valem zero)"""
+    minutes = np.arange(first, last + 1)
+    pivot = rollup.pivot_table(index='bucket', columns='status', values='count', aggfunc='sum')
+    return minutes, pivot.reindex(index=minutes, columns=statuses).fillna(0).to_numpy(dtype=np.float64)
+
+
+def update_from_rollups(forecaster, day=None, sources=('transactions_1', 'transactions_2'),
+                        db_name='alert_data', final=False):
+    """
+    Incorpora os minutos novos do rollup_1m do alert_data.db
+
+    Os buckets do rollup são apenas minutos do dia, então o modelo guarda
+    por fonte o dia atribuído ao conteúdo ingerido (rollup_day) e o último
+    bucket já consumido (rollup_bucket). Enquanto os buckets consumidos
+    continuam com os volumes incorporados, só os buckets seguintes entram,
+    no mesmo dia, mesmo que a data do relógio mude. Se algum bucket
+    consumido mudou, a fonte foi reimportada (ver TailIngester): na mesma
+    data a observação do dia é substituída (o modelo volta ao estado do
+    início do dia e o rollup é incorporado de novo desde o minuto 0); em
+    uma data posterior o conteúdo é o dia seguinte.
+
+    O bucket mais recente pode ainda receber linhas da ingestão, então
+    fica para a próxima chamada (a menos que `final=True`).
+
+    Args:
+        forecaster: Modelo a atualizar
+        day: Data do primeiro dia ingerido de cada fonte (padrão: hoje)
+
+    Returns:
+        (minutos incorporados, DataFrame de valores fora da faixa prevista)
+    """
+    first_day = _day_ordinal(day or date.today())
+    consumed, frames = 0, [pd.DataFrame(columns=BREACH_COLUMNS)]
+    for source in sources:
+        anchor, last = -1, -1
+        if source in forecaster.sources:
+            s = forecaster.source_index(source)
+            anchor, last = int(forecaster.rollup_day[s]), int(forecaster.rollup_bucket[s])
+        day_ordinal = anchor if anchor >= 0 else first_day
+        if anchor >= 0 and last >= 0:
+            fed = read_sql(
+                db_name, "SELECT bucket, status, count FROM rollup_1m WHERE source = ? AND bucket <= ?",
+                params=(source, last), label="forecast rollup"
+            )
+            minutes, volumes = _rollup_volumes(fed, forecaster.statuses, 0, last)
+            if not forecaster.matches_day(source, date.fromordinal(anchor), minutes, volumes):
+                if first_day > anchor:
+                    day_ordinal = first_day
+                else:
+                    # Mesmo dia reingerido: descarta a observação anterior do dia
+                    forecaster.restore_day_start(source)
+                    forecaster.rollup_bucket[s] = -1
+                last = -1
+
+        rollup = read_sql(
+            db_name, "SELECT bucket, status, count FROM rollup_1m WHERE source = ? AND bucket > ?",
+            params=(source, last), label="forecast rollup"
+        )
+        buckets = np.unique(rollup['bucket'].to_numpy(dtype=np.int64))
+        if not final:
+            buckets = buckets[:-1]
+        if not len(buckets):
+            continue
+        if day_ordinal != anchor:
+            forecaster.mark_day_start(source)
+        minutes, volumes = _rollup_volumes(rollup, forecaster.statuses, last + 1, int(buckets[-1]))
+        frames.append(forecaster.update_matrix(source, date.fromordinal(day_ordinal), minutes, volumes))
+        consumed += len(minutes)
+
+        s = forecaster.source_index(source)
+        forecaster.rollup_day[s] = day_ordinal
+        forecaster.rollup_bucket[s] = minutes[-1]
+    return consumed, pd.concat(frames, ignore_index=True)
+
+
+def build_from_csv(sources, default_day=None, forecaster=None):
+    """
+    Ajusta (ou continua) o modelo percorrendo o histórico de CSVs minuto a minuto
+
+    Args:
+        sources: Dict fonte -> caminho do CSV (coluna 'date' opcional)
+        default_day: Data dos CSVs sem coluna 'date'
+        forecaster: Modelo existente (padrão: novo)
+
+    Returns:
+        VolumeForecaster
+    """
+    from seasonal_baseline import daily_matrices
+
+    forecaster = forecaster or VolumeForecaster()
+    for source, csv_path in sources.items():
+        matrices = daily_matrices(csv_path, default_day, statuses=forecaster.statuses)
+        for day, matrix in sorted(matrices.items()):
+            forecaster.update_matrix(source, day, np.arange(MINUTES_PER_DAY),
+                                     matrix[:, :len(forecaster.statuses)])
+    return forecaster
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Previsão de volume por status (Holt-Winters incremental)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Ajustar a partir de CSVs de histórico")
+    build_parser.add_argument('--source', action='append', required=True, metavar='FONTE=CSV',
+                              help="Fonte e CSV (ex.: transactions_1=/tmp/carga/transactions_1.csv)")
+    build_parser.add_argument('--day', default=None, help="Data dos CSVs sem coluna 'date'")
+
+    update_parser = subparsers.add_parser('update', help="Incorporar os minutos novos do alert_data.db")
+    update_parser.add_argument('--day', default=None, help="Data do primeiro dia ingerido (padrão: hoje)")
+    update_parser.add_argument('--final', action='store_true', help="Incluir o último bucket (dia encerrado)")
+
+    forecast_parser = subparsers.add_parser('forecast', help="Prever os próximos minutos")
+    forecast_parser.add_argument('--horizon', type=int, default=60, help="Minutos à frente")
+    forecast_parser.add_argument('--method', choices=METHODS, default='holt_winters')
+
+    for sub in (build_parser, update_parser, forecast_parser):
+        sub.add_argument('--path', default=FORECAST_PATH, help="Arquivo do estado")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        sources = dict(item.split('=', 1) for item in args.source)
+        forecaster = build_from_csv(sources, args.day)
+        forecaster.save(args.path)
+        print(f"🔮 Modelo de {', '.join(forecaster.sources)} gravado em {args.path}")
+        return 0
+
+    forecaster = VolumeForecaster.load(args.path) if os.path.exists(args.path) else VolumeForecaster()
+    if args.command == 'update':
+        consumed, breaches = update_from_rollups(forecaster, args.day, final=args.final)
+        forecaster.save(args.path)
+        print(f"🔮 {consumed} minutos incorporados; {len(breaches)} valores fora da faixa prevista")
+        if len(breaches):
+            print(breaches.round(1).to_string(index=False))
+        return 0
+
+    for source in forecaster.sources:
+        frame = forecaster.forecast(source, args.horizon, args.method)
+        summary = frame.pivot_table(index=['step', 'time'], columns='status', values=['forecast', 'lower', 'upper'])
+        print(f"🔮 {source}:")
+        print(summary.iloc[[0, len(summary) // 4, len(summary) // 2, -1]].round(1).to_string())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
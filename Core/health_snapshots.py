@@ -0,0 +1,320 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+import pandas as pd
+from db_access import database_path, read_sql
+from stream_aggregate import file_signature
+from transaction_ingest import connect_writer, ingest_alert_sources, ALERT_SOURCES
+from integrated_analysis import SOURCE_TABLES, analyze_sources, database_signature
+from incident_store import IncidentStore
+from alert_rules import load_rules
+
+
+SNAPSHOT_DB_PATH = database_path('database')
+
+SNAPSHOT_COLUMNS = [
+    'version', 'created_at', 'health_score', 'total_datasets', 'total_transactions',
+    'alert_count', 'elapsed_ms', 'trigger', 'payload'
+]
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def create_snapshot_table(conn):
+    """Cria a tabela de snapshots versionados da análise consolidada"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS health_snapshots (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            health_score INTEGER NOT NULL,
+            total_datasets INTEGER NOT NULL,
+            total_transactions INTEGER NOT NULL,
+            alert_count INTEGER NOT NULL,
+            elapsed_ms REAL NOT NULL,
+            trigger TEXT NOT NULL,
+            payload TEXT NOT NULL
+        )
+    """)
+
+
+def _json_default(value):
+    # Escalares numpy (valores das regras) -> tipos nativos
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+def write_snapshot(conn, analysis, elapsed, trigger, keep=200):
+    """
+    Grava a análise como uma nova versão e descarta as mais antigas
+
+    Args:
+        conn: Conexão de escrita com o database.db
+        analysis: Dict de integrated_analysis.summarize()
+        elapsed: Segundos gastos no cálculo
+        trigger: Motivo do recálculo ('intervalo', 'arquivos', 'manual')
+        keep: Versões mantidas na tabela
+
+    Returns:
+        Número da versão gravada
+    """
+    cursor = conn.execute(
+        "INSERT INTO health_snapshots (created_at, health_score, total_datasets, total_transactions, "
+        "alert_count, elapsed_ms, trigger, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (datetime.now().strftime(TIME_FORMAT), int(analysis['health_score']), analysis['total_datasets'],
+         int(analysis['total_transactions']), len(analysis['alerts']), elapsed * 1000, trigger,
+         json.dumps(analysis, default=_json_default, ensure_ascii=False))
+    )
+    version = cursor.lastrowid
+    conn.execute("DELETE FROM health_snapshots WHERE version <= ?", (version - keep,))
+    conn.commit()
+    return version
+
+
+def latest_snapshot(db_name='database'):
+    """
+    Último snapshot pela conexão somente leitura (dashboards)
+
+    Returns:
+        Dict da análise com as chaves extras version, created_at e
+        elapsed_ms, ou None se ainda não há snapshot
+    """
+    if not os.path.exists(database_path(db_name)):
+        return None
+    try:
+        frame = read_sql(db_name, f"SELECT {', '.join(SNAPSHOT_COLUMNS)} FROM health_snapshots "
+                                  "ORDER BY version DESC LIMIT 1", label='health snapshot')
+    except Exception:
+        return None
+    if frame.empty:
+        return None
+    row = frame.iloc[0]
+    analysis = json.loads(row['payload'])
+    analysis.update(version=int(row['version']), created_at=row['created_at'],
+                    elapsed_ms=float(row['elapsed_ms']))
+    return analysis
+
+
+def snapshot_history(limit=50, db_name='database'):
+    """Versões mais recentes (sem o payload), para acompanhar a saúde ao longo do tempo"""
+    if not os.path.exists(database_path(db_name)):
+        return pd.DataFrame(columns=SNAPSHOT_COLUMNS[:-1])
+    return read_sql(db_name, f"SELECT {', '.join(SNAPSHOT_COLUMNS[:-1])} FROM health_snapshots "
+                             "ORDER BY version DESC LIMIT ?", params=(limit,), label='health history')
+
+
+class HealthWorker:
+    """
+    Recalcula a análise consolidada em segundo plano e grava snapshots
+
+    A cada `poll` segundos a thread compara as assinaturas dos bancos
+    analisados (e dos CSVs de alerta, quando `ingest=True`); um
+    recálculo acontece quando algo mudou ou quando `interval` segundos
+    passaram desde o último snapshot. Os alertas de cada snapshot também
+    são registrados no banco de incidentes. As páginas apenas leem o
+    snapshot mais recente (latest_snapshot), então o custo de
+    renderização não depende do volume de dados nem do número de usuários.
+    """
+
+    def __init__(self, db_path=SNAPSHOT_DB_PATH, interval=60.0, poll=2.0, sources=None,
+                 ingest=True, incidents=True, keep=200):
+        """
+        Args:
+            db_path: Banco onde os snapshots são gravados
+            interval: Segundos máximos entre dois snapshots
+            poll: Segundos entre verificações de mudança
+            sources: dict chave -> (banco, tabela) (padrão: SOURCE_TABLES)
+            ingest: Importar as linhas novas dos CSVs de alerta antes de recalcular
+            incidents: Registrar os alertas no banco de incidentes (deduplicados)
+            keep: Versões mantidas na tabela
+        """
+        self.db_path = db_path
+        self.interval = interval
+        self.poll = poll
+        self.sources = dict(SOURCE_TABLES if sources is None else sources)
+        self.ingest = ingest
+        self.incidents = incidents
+        self.keep = keep
+
+        self.version = None
+        self.last_cycle = {}
+        self.last_error = None
+        self.stats = {'snapshots': 0, 'skipped': 0, 'errors': 0}
+        self._seen = None
+        self._last_run = 0.0
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def signature(self):
+        """Assinaturas dos bancos analisados e dos CSVs de alerta"""
+        signature = {}
+        for name in sorted({database for database, _ in self.sources.values()}):
+            try:
+                signature[name] = database_signature(name)
+            except OSError:
+                signature[name] = None
+        if self.ingest:
+            for table, path in ALERT_SOURCES.items():
+                signature[path] = file_signature(path) if os.path.exists(path) else None
+        return signature
+
+    def refresh(self, trigger='manual'):
+        """
+        Recalcula e grava um snapshot na thread atual
+
+        Ingestão → análise + snapshot → incidentes; o tempo e os contadores
+        de cada etapa ficam em last_cycle (usado também pelo daemon).
+
+        Returns:
+            Número da versão gravada
+        """
+        with self._lock:
+            timings, result = {}, {'imported': 0, 'alerts': 0, 'auto_resolved': 0}
+
+            start = time.perf_counter()
+            if self.ingest:
+                imported = ingest_alert_sources(database_path('alert_data'))
+                result['imported'] = sum(imported.values())
+            timings['ingest'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            analysis = analyze_sources(self.sources)
+            conn = connect_writer(self.db_path)
+            try:
+                create_snapshot_table(conn)
+                self.version = write_snapshot(conn, analysis, timings['ingest'] + time.perf_counter() - start,
+                                              trigger, self.keep)
+            finally:
+                conn.close()
+            timings['analysis'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if self.incidents:
+                store = IncidentStore(database_path('incidents'))
+                try:
+                    recorded = store.record(analysis['alert_records'],
+                                            evaluated_sources=analysis['evaluated_sources'],
+                                            evaluated_rules=load_rules().names)
+                finally:
+                    store.close()
+                result.update(alerts=recorded['recorded'], auto_resolved=recorded['auto_resolved'])
+            timings['incidents'] = time.perf_counter() - start
+
+            # A própria gravação muda a assinatura do database.db: só mudanças externas disparam
+            self._seen = self.signature()
+            self._last_run = time.monotonic()
+            self.stats['snapshots'] += 1
+            self.last_cycle = {**timings, **result, 'version': self.version,
+                               'health': analysis['health_score'], 'trigger': trigger}
+            return self.version
+
+    def check(self):
+        """
+        Uma verificação do laço: recalcula se os arquivos mudaram ou o intervalo venceu
+
+        Returns:
+            Versão gravada ou None se nada precisou ser recalculado
+        """
+        if self._seen is None:
+            return self.refresh('inicial')
+        if self.signature() != self._seen:
+            return self.refresh('arquivos')
+        if time.monotonic() - self._last_run >= self.interval:
+            return self.refresh('intervalo')
+        self.stats['skipped'] += 1
+        return None
+
+    # 🧵 Ciclo de vida
+    def start(self):
+        """Inicia a thread daemon (idempotente)"""
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='health-worker', daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                self.stats['errors'] += 1
+            self._wake.wait(self.poll)
+            self._wake.clear()
+
+    def wake(self):
+        """Antecipa a próxima verificação (ex.: após uma ingestão manual)"""
+        self._wake.set()
+
+    def stop(self, timeout=5):
+        """Encerra a thread"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshots da saúde do sistema (análise consolidada em segundo plano)")
+    parser.add_argument('--db', default=SNAPSHOT_DB_PATH, help="Banco dos snapshots")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Executar o worker em primeiro plano")
+    run_parser.add_argument('--interval', type=float, default=60.0, help="Segundos máximos entre snapshots")
+    run_parser.add_argument('--poll', type=float, default=2.0, help="Segundos entre verificações de mudança")
+    run_parser.add_argument('--no-ingest', action='store_true', help="Não importar os CSVs de alerta")
+    run_parser.add_argument('--no-incidents', action='store_true', help="Não registrar incidentes")
+
+    subparsers.add_parser('once', help="Gravar um snapshot e sair")
+
+    show_parser = subparsers.add_parser('show', help="Mostrar o último snapshot e o histórico")
+    show_parser.add_argument('--limit', type=int, default=10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        snapshot = latest_snapshot()
+        if snapshot is None:
+            print("📭 Nenhum snapshot gravado")
+            return 1
+        print(f"🩺 Versão {snapshot['version']} ({snapshot['created_at']}, {snapshot['elapsed_ms']:.1f} ms): "
+              f"saúde {snapshot['health_score']}/100, {len(snapshot['alerts'])} alertas")
+        for alert in snapshot['alerts']:
+            print(f"   {alert}")
+        print(snapshot_history(args.limit).to_string(index=False))
+        return 0
+
+    if args.command == 'once':
+        worker = HealthWorker(args.db)
+        version = worker.refresh()
+        print(f"🩺 Snapshot {version} gravado")
+        return 0
+
+    worker = HealthWorker(args.db, interval=args.interval, poll=args.poll, ingest=not args.no_ingest,
+                          incidents=not args.no_incidents)
+    print(f"🩺 Worker de saúde ativo (intervalo {args.interval:.0f}s, verificação a cada {args.poll:.0f}s). Ctrl+C para sair")
+    try:
+        while True:
+            version = worker.check()
+            if version is not None:
+                print(f"   {datetime.now().strftime(TIME_FORMAT)} snapshot {version}")
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,380 @@
+import sys
+import threading
+import argparse
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from db_access import database_path, read_sql
+from transaction_ingest import connect_writer
+
+
+HISTORY_DB_PATH = database_path('history')
+
+HOURLY_COLUMNS = ['time', 'today', 'yesterday', 'same_day_last_week', 'avg_last_week', 'avg_last_month']
+
+
+def day_window(days):
+    """Janela dos `days` dias anteriores (defasagens 1..days)"""
+    return tuple(range(1, days + 1))
+
+
+def weekday_window(weeks):
+    """Janela dos `weeks` mesmos dias da semana anteriores (defasagens 7, 14, ...)"""
+    return tuple(7 * w for w in range(1, weeks + 1))
+
+
+# Colunas do export data_table_*: nome -> (defasagens em dias, agregação)
+COMPARISON_WINDOWS = {
+    'yesterday': ((1,), 'sum'),
+    'same_day_last_week': ((7,), 'sum'),
+    'avg_last_week': (day_window(7), 'mean'),
+    'avg_last_month': (day_window(28), 'mean')
+}
+
+
+def create_history_table(conn):
+    """
+    Cria a tabela de histórico horário bruto e o contador de revisão
+
+    Uma linha por checkout/dia/hora. O contador em history_meta é
+    incrementado a cada escrita e invalida as comparações memorizadas.
+    """
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS hourly_history (
+            checkout INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (checkout, day, hour)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS history_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            revision INTEGER NOT NULL
+        );
+
+        INSERT OR IGNORE INTO history_meta (id, revision) VALUES (1, 0);
+    """)
+
+
+def write_history(conn, checkout, frame):
+    """
+    Grava (ou substitui) valores horários de um checkout
+
+    Args:
+        conn: Conexão de escrita
+        checkout: Número do checkout
+        frame: DataFrame com day (date ou 'YYYY-MM-DD'), hour (0-23) e count
+
+    Returns:
+        Número de linhas gravadas
+    """
+    days = pd.to_datetime(frame['day']).dt.strftime('%Y-%m-%d')
+    rows = zip(
+        [int(checkout)] * len(frame), days,
+        frame['hour'].astype(int).tolist(), frame['count'].astype(int).tolist()
+    )
+    conn.executemany("""
+        INSERT INTO hourly_history (checkout, day, hour, count) VALUES (?, ?, ?, ?)
+        ON CONFLICT (checkout, day, hour) DO UPDATE SET count = excluded.count
+    """, rows)
+    conn.execute("UPDATE history_meta SET revision = revision + 1 WHERE id = 1")
+    return len(frame)
+
+
+def matrix_to_frame(matrix, first_day):
+    """Converte uma matriz (dias, 24) em linhas day/hour/count"""
+    n_days = matrix.shape[0]
+    days = pd.date_range(first_day, periods=n_days, freq='D').strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'day': np.repeat(days.to_numpy(), 24),
+        'hour': np.tile(np.arange(24), n_days),
+        'count': np.asarray(matrix).reshape(-1)
+    })
+
+
+def import_export_table(conn, checkout, df, day):
+    """
+    Importa uma tabela data_table_* como histórico
+
+    O export só traz valores brutos de hoje, ontem e do mesmo dia da
+    semana passada; as médias pré-calculadas não são decompostas.
+
+    Args:
+        conn: Conexão de escrita
+        checkout: Número do checkout
+        df: DataFrame no formato data_table_*
+        day: Data correspondente a 'today'
+    """
+    day = pd.Timestamp(day)
+    hours = df['time'].str.replace('h', '').astype(int)
+    frames = [
+        pd.DataFrame({'day': day - pd.Timedelta(days=lag), 'hour': hours, 'count': df[column]})
+        for column, lag in (('today', 0), ('yesterday', 1), ('same_day_last_week', 7))
+    ]
+    return write_history(conn, checkout, pd.concat(frames, ignore_index=True))
+
+
+class ComparisonEngine:
+    """
+    Comparações dia a dia calculadas a partir do histórico horário
+
+    O histórico de cada checkout é carregado como uma matriz (dias, 24)
+    com NaN nos dias ausentes; cada janela é um agregado sobre cópias
+    defasadas dessa matriz, calculado uma vez para todos os dias e
+    memorizado até a próxima escrita no banco.
+    """
+
+    def __init__(self, db_name='history'):
+        """
+        Inicializa o motor
+
+        Args:
+            db_name: Banco registrado em db_access com a tabela hourly_history
+        """
+        self.db_name = db_name
+        self._lock = threading.Lock()
+        self._revision = None
+        self._matrices = {}
+        self._windows = {}
+
+    def revision(self):
+        """Revisão atual do histórico (muda a cada escrita)"""
+        df = read_sql(self.db_name, "SELECT revision FROM history_meta WHERE id = 1",
+                      label="history revision")
+        return int(df['revision'].iloc[0]) if len(df) else 0
+
+    def _sync(self):
+        revision = self.revision()
+        with self._lock:
+            if revision != self._revision:
+                self._matrices.clear()
+                self._windows.clear()
+                self._revision = revision
+
+    def checkouts(self):
+        """Checkouts presentes no histórico"""
+        df = read_sql(self.db_name, "SELECT DISTINCT checkout FROM hourly_history ORDER BY checkout",
+                      label="history checkouts")
+        return df['checkout'].tolist()
+
+    def day_range(self):
+        """Primeiro e último dia do histórico (date) ou (None, None)"""
+        df = read_sql(self.db_name, "SELECT MIN(day) AS first, MAX(day) AS last FROM hourly_history",
+                      label="history range")
+        if df.empty or df['first'].iloc[0] is None:
+            return None, None
+        return date.fromisoformat(df['first'].iloc[0]), date.fromisoformat(df['last'].iloc[0])
+
+    def matrix(self, checkout=None):
+        """
+        Matriz de volume (dias, 24) de um checkout (None = soma de todos)
+
+        Returns:
+            Tupla (primeiro dia como date, array float64 com NaN nos dias/horas ausentes)
+        """
+        self._sync()
+        key = checkout
+        with self._lock:
+            if key in self._matrices:
+                return self._matrices[key]
+
+        if checkout is None:
+            df = read_sql(self.db_name, """
+                SELECT day, hour, SUM(count) AS count FROM hourly_history
+                GROUP BY day, hour
+            """, label="history matrix (all)")
+        else:
+            df = read_sql(self.db_name, """
+                SELECT day, hour, count FROM hourly_history WHERE checkout = ?
+            """, params=(int(checkout),), label="history matrix")
+
+        if df.empty:
+            result = (None, np.empty((0, 24)))
+        else:
+            days = pd.to_datetime(df['day'])
+            first = days.min()
+            offsets = (days - first).dt.days.to_numpy()
+            matrix = np.full((int(offsets.max()) + 1, 24), np.nan)
+            matrix[offsets, df['hour'].to_numpy()] = df['count'].to_numpy()
+            result = (first.date(), matrix)
+
+        with self._lock:
+            self._matrices[key] = result
+        return result
+
+    def window(self, checkout, lags, agg='mean'):
+        """
+        Agregado de uma janela de defasagens para todos os dias do histórico
+
+        Args:
+            checkout: Número do checkout (None = todos)
+            lags: Defasagens em dias (ex.: (1,) ontem, (7, 14, 21, 28) mesmos dias da semana)
+            agg: 'mean' (ignora dias ausentes) ou 'sum'
+
+        Returns:
+            Array (dias, 24) alinhado com matrix(); NaN quando nenhum dia da janela existe
+        """
+        lags = tuple(sorted(int(lag) for lag in lags))
+        _, matrix = self.matrix(checkout)
+        key = (checkout, lags, agg)
+        with self._lock:
+            if key in self._windows:
+                return self._windows[key]
+
+        n_days = matrix.shape[0]
+        total = np.zeros_like(matrix)
+        present = np.zeros_like(matrix)
+        for lag in lags:
+            if lag >= n_days:
+                break
+            shifted = matrix[:n_days - lag]
+            valid = ~np.isnan(shifted)
+            total[lag:] += np.where(valid, shifted, 0.0)
+            present[lag:] += valid
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if agg == 'mean':
+                result = np.where(present > 0, total / present, np.nan)
+            elif agg == 'sum':
+                result = np.where(present > 0, total, np.nan)
+            else:
+                raise ValueError(f"Agregação desconhecida: {agg}")
+
+        with self._lock:
+            self._windows[key] = result
+        return result
+
+    def compare(self, checkout=None, day=None, windows=None):
+        """
+        Tabela de comparação de um dia no formato data_table_*
+
+        Args:
+            checkout: Número do checkout (None = todos)
+            day: Dia analisado (padrão: último dia do histórico)
+            windows: Dict nome -> (defasagens, agregação) (padrão: COMPARISON_WINDOWS)
+
+        Returns:
+            DataFrame com time ("00h"), today e uma coluna por janela
+        """
+        result = self.compare_range(checkout, day, day, windows)
+        return result.drop(columns='day')
+
+    def compare_range(self, checkout=None, start=None, end=None, windows=None):
+        """
+        Tabelas de comparação de um intervalo de dias (um dia a um ano)
+
+        Returns:
+            DataFrame com day, time, today e uma coluna por janela (24 linhas por dia)
+        """
+        windows = COMPARISON_WINDOWS if windows is None else windows
+        first, matrix = self.matrix(checkout)
+        columns = ['day', 'time', 'today'] + list(windows)
+        if first is None:
+            return pd.DataFrame(columns=columns)
+
+        last = first + timedelta(days=matrix.shape[0] - 1)
+        start = pd.Timestamp(start or last).date()
+        end = pd.Timestamp(end or start).date()
+        rows = slice(max((start - first).days, 0), min((end - first).days, matrix.shape[0] - 1) + 1)
+        n_days = len(range(matrix.shape[0])[rows])
+
+        days = pd.date_range(first + timedelta(days=rows.start), periods=n_days, freq='D')
+        result = pd.DataFrame({
+            'day': np.repeat(days.date, 24),
+            'time': np.tile([f"{h:02d}h" for h in range(24)], n_days),
+            'today': matrix[rows].reshape(-1)
+        })
+        for name, (lags, agg) in windows.items():
+            values = self.window(checkout, lags, agg)[rows].reshape(-1)
+            result[name] = values.round(2) if agg == 'mean' else values
+        return result[columns]
+
+
+def seed_synthetic(db_path=HISTORY_DB_PATH, days=365, checkouts=2, end_day=None, seed=42):
+    """
+    Preenche o histórico com séries horárias sintéticas
+
+    Args:
+        db_path: Banco de destino
+        days: Dias de histórico por checkout
+        checkouts: Número de checkouts
+        end_day: Último dia (padrão: hoje)
+        seed: Semente do gerador
+
+    Returns:
+        Número de linhas gravadas
+    """
+    from synthetic_data import SyntheticDataGenerator
+
+    end_day = pd.Timestamp(end_day or date.today()).normalize()
+    generator = SyntheticDataGenerator(days=max(days - 30, 1), checkouts=checkouts, seed=seed)
+    conn = connect_writer(db_path)
+    try:
+        create_history_table(conn)
+        written = 0
+        with conn:
+            for checkout in range(1, checkouts + 1):
+                series = generator.hourly_series(checkout)[-days:]
+                first_day = end_day - pd.Timedelta(days=len(series) - 1)
+                written += write_history(conn, checkout, matrix_to_frame(series, first_day))
+        return written
+    finally:
+        conn.close()
+
+
+def import_exports(db_path=HISTORY_DB_PATH, day=None):
+    """Importa data_table_1 e data_table_2 do data.db como histórico do dia informado"""
+    day = day or date.today()
+    conn = connect_writer(db_path)
+    try:
+        create_history_table(conn)
+        written = 0
+        with conn:
+            for checkout in (1, 2):
+                df = read_sql('data', f"SELECT * FROM data_table_{checkout}")
+                written += import_export_table(conn, checkout, df, day)
+        return written
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Histórico horário bruto e comparações dia a dia")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = subparsers.add_parser('seed', help="Preencher com séries sintéticas")
+    seed_parser.add_argument('--days', type=int, default=365, help="Dias de histórico")
+    seed_parser.add_argument('--checkouts', type=int, default=2, help="Número de checkouts")
+    seed_parser.add_argument('--end-day', default=None, help="Último dia (YYYY-MM-DD)")
+    seed_parser.add_argument('--seed', type=int, default=42, help="Semente aleatória")
+
+    import_parser = subparsers.add_parser('import', help="Importar data_table_* do data.db")
+    import_parser.add_argument('--day', default=None, help="Data de 'today' no export (YYYY-MM-DD)")
+
+    compare_parser = subparsers.add_parser('compare', help="Mostrar a comparação de um dia")
+    compare_parser.add_argument('--checkout', type=int, default=None, help="Checkout (padrão: todos)")
+    compare_parser.add_argument('--day', default=None, help="Dia (padrão: último)")
+    compare_parser.add_argument('--weekdays', type=int, default=0,
+                                help="Incluir média dos últimos N mesmos dias da semana")
+
+    for sub in (seed_parser, import_parser):
+        sub.add_argument('--db', default=HISTORY_DB_PATH, help="Banco SQLite de destino")
+    args = parser.parse_args(argv)
+
+    if args.command == 'seed':
+        written = seed_synthetic(args.db, args.days, args.checkouts, args.end_day, args.seed)
+        print(f"🗓️ {written} linhas horárias gravadas em {args.db}")
+    elif args.command == 'import':
+        written = import_exports(args.db, args.day)
+        print(f"🗓️ {written} linhas horárias importadas em {args.db}")
+    else:
+        windows = dict(COMPARISON_WINDOWS)
+        if args.weekdays:
+            windows[f"avg_last_{args.weekdays}_same_weekdays"] = (weekday_window(args.weekdays), 'mean')
+        print(ComparisonEngine().compare(args.checkout, args.day, windows).to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
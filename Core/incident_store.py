@@ -0,0 +1,382 @@
+import os
+import sys
+import argparse
+from datetime import datetime, timedelta
+import pandas as pd
+from db_access import database_path, read_sql
+from transaction_ingest import connect_writer
+from alert_rules import SEVERITIES
+
+
+INCIDENT_DB_PATH = database_path('incidents')
+
+# Estados do ciclo de vida
+STATES = ['open', 'acknowledged', 'resolved']
+
+# Chave de agrupamento dos alertas
+INCIDENT_KEY = ['source', 'status', 'rule']
+
+INCIDENT_COLUMNS = [
+    'id', 'source', 'status', 'rule', 'severity', 'state', 'message', 'last_value',
+    'occurrences', 'opened_at', 'last_seen', 'acknowledged_at', 'acknowledged_by',
+    'resolved_at', 'resolved_by'
+]
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _timestamp(moment=None):
+    """Data/hora no formato texto ordenável usado nas tabelas"""
+    if moment is None:
+        moment = datetime.now()
+    if isinstance(moment, str):
+        return moment
+    return pd.Timestamp(moment).strftime(TIME_FORMAT)
+
+
+def create_incident_tables(conn):
+    """
+    Cria as tabelas de incidentes e janelas de supressão
+
+    O índice único parcial garante no máximo um incidente não resolvido
+    por (source, status, rule) e é o alvo do upsert de deduplicação:
+    cada avaliação de alerta vira uma busca indexada, não uma varredura.
+    """
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS incidents (
+            id INTEGER PRIMARY KEY,
+            source TEXT NOT NULL,
+            status TEXT NOT NULL,
+            rule TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'open'
+                CHECK (state IN ('open', 'acknowledged', 'resolved')),
+            message TEXT,
+            last_value REAL,
+            occurrences INTEGER NOT NULL DEFAULT 1,
+            opened_at TEXT NOT NULL,
+            last_seen TEXT NOT NULL,
+            acknowledged_at TEXT,
+            acknowledged_by TEXT,
+            resolved_at TEXT,
+            resolved_by TEXT
+        );
+
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_incidents_active
+            ON incidents (source, status, rule) WHERE state != 'resolved';
+
+        CREATE INDEX IF NOT EXISTS idx_incidents_state
+            ON incidents (state, last_seen);
+
+        CREATE TABLE IF NOT EXISTS incident_suppressions (
+            id INTEGER PRIMARY KEY,
+            source TEXT,
+            status TEXT,
+            rule TEXT,
+            starts_at TEXT NOT NULL,
+            until TEXT NOT NULL,
+            reason TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_suppressions_until
+            ON incident_suppressions (until);
+    """)
+
+
+def alerts_frame(alerts):
+    """
+    Normaliza alertas (lista de dicts ou DataFrame) para o formato do upsert
+
+    Campos esperados: source, status, rule; opcionais: severity
+    ('warning'), message e value.
+    """
+    frame = pd.DataFrame(alerts)
+    if frame.empty:
+        return pd.DataFrame(columns=INCIDENT_KEY + ['severity', 'message', 'value'])
+
+    missing = [column for column in INCIDENT_KEY if column not in frame.columns]
+    if missing:
+        raise ValueError(f"Alertas sem as colunas obrigatórias: {missing}")
+
+    for column, default in (('severity', 'warning'), ('message', None), ('value', None)):
+        if column not in frame.columns:
+            frame[column] = default
+    frame['severity'] = frame['severity'].fillna('warning')
+    unknown = set(frame['severity']) - set(SEVERITIES)
+    if unknown:
+        raise ValueError(f"Severidade desconhecida: {sorted(unknown)}")
+
+    frame[INCIDENT_KEY] = frame[INCIDENT_KEY].astype(str)
+    return frame[INCIDENT_KEY + ['severity', 'message', 'value']]
+
+
+class IncidentStore:
+    """
+    Incidentes persistentes agrupados por (source, status, rule)
+
+    Cada alerta avaliado é deduplicado contra o incidente não resolvido
+    da mesma chave: a primeira ocorrência abre o incidente, as seguintes
+    só atualizam last_seen, occurrences, last_value e (para cima) a
+    severidade. Incidentes reconhecidos continuam agregando ocorrências;
+    após a resolução, um novo alerta abre um novo incidente. Alertas que
+    casam com uma janela de supressão ativa são descartados.
+    """
+
+    def __init__(self, db_path=INCIDENT_DB_PATH):
+        self.db_path = db_path
+        self.conn = connect_writer(db_path)
+        create_incident_tables(self.conn)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def active_suppressions(self, now=None):
+        """Janelas de supressão vigentes em `now`"""
+        now = _timestamp(now)
+        return pd.read_sql_query(
+            "SELECT * FROM incident_suppressions WHERE until > ? AND starts_at <= ?",
+            self.conn, params=(now, now)
+        )
+
+    def _suppressed_mask(self, frame, suppressions):
+        """Máscara dos alertas cobertos por alguma supressão (NULL = qualquer valor)"""
+        mask = pd.Series(False, index=frame.index)
+        for _, window in suppressions.iterrows():
+            match = pd.Series(True, index=frame.index)
+            for column in INCIDENT_KEY:
+                if window[column] is not None and not pd.isna(window[column]):
+                    match &= frame[column] == window[column]
+            mask |= match
+        return mask
+
+    def record(self, alerts, now=None, evaluated_sources=None, evaluated_rules=None):
+        """
+        Registra um lote de alertas avaliados, deduplicando por chave
+
+        Args:
+            alerts: Lista de dicts ou DataFrame (ver alerts_frame)
+            now: Momento da avaliação (padrão: agora)
+            evaluated_sources: Fontes avaliadas neste lote; incidentes abertos
+                dessas fontes cuja condição não disparou são resolvidos
+                automaticamente (None = não resolver nada)
+            evaluated_rules: Restringe a resolução automática a estas regras
+
+        Returns:
+            dict com received, suppressed, recorded e auto_resolved
+        """
+        now = _timestamp(now)
+        frame = alerts_frame(alerts)
+        received = len(frame)
+
+        suppressions = self.active_suppressions(now)
+        if len(suppressions) and received:
+            frame = frame[~self._suppressed_mask(frame, suppressions)]
+
+        levels = frame['severity'].map(SEVERITIES.index)
+        values = frame['value'].astype(object).where(frame['value'].notna(), None)
+        rows = zip(
+            frame['source'], frame['status'], frame['rule'], frame['severity'], levels.tolist(),
+            frame['message'].astype(object).where(frame['message'].notna(), None), values,
+            [now] * len(frame), [now] * len(frame)
+        )
+
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO incidents (source, status, rule, severity, level, message,
+                                       last_value, opened_at, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (source, status, rule) WHERE state != 'resolved' DO UPDATE SET
+                    occurrences = occurrences + 1,
+                    last_seen = excluded.last_seen,
+                    last_value = excluded.last_value,
+                    message = excluded.message,
+                    severity = CASE WHEN excluded.level > level THEN excluded.severity ELSE severity END,
+                    level = MAX(level, excluded.level)
+            """, rows)
+
+            auto_resolved = 0
+            if evaluated_sources is not None:
+                auto_resolved = self._resolve_cleared(frame, evaluated_sources, evaluated_rules, now)
+
+        return {
+            'received': received,
+            'suppressed': received - len(frame),
+            'recorded': len(frame),
+            'auto_resolved': auto_resolved
+        }
+
+    def _resolve_cleared(self, frame, sources, rules, now):
+        """Resolve incidentes das fontes avaliadas cuja condição não disparou"""
+        sources = [str(source) for source in sources]
+        if not sources:
+            return 0
+        query = f"""
+            SELECT id, source, status, rule FROM incidents
+            WHERE state != 'resolved' AND source IN ({','.join('?' * len(sources))})
+        """
+        params = list(sources)
+        if rules is not None:
+            rules = list(rules)
+            query += f" AND rule IN ({','.join('?' * len(rules))})"
+            params += rules
+
+        active = self.conn.execute(query, params).fetchall()
+        firing = set(zip(frame['source'], frame['status'], frame['rule']))
+        cleared = [(now, row[0]) for row in active if tuple(row[1:]) not in firing]
+        self.conn.executemany("""
+            UPDATE incidents SET state = 'resolved', resolved_at = ?, resolved_by = 'auto'
+            WHERE id = ?
+        """, cleared)
+        return len(cleared)
+
+    def acknowledge(self, incident_id, user=None, now=None):
+        """Marca um incidente aberto como reconhecido; retorna True se mudou"""
+        with self.conn:
+            cursor = self.conn.execute("""
+                UPDATE incidents SET state = 'acknowledged', acknowledged_at = ?, acknowledged_by = ?
+                WHERE id = ? AND state = 'open'
+            """, (_timestamp(now), user, int(incident_id)))
+        return cursor.rowcount > 0
+
+    def resolve(self, incident_id, user=None, now=None, suppress_minutes=0):
+        """
+        Resolve um incidente
+
+        Args:
+            incident_id: Id do incidente
+            user: Quem resolveu
+            now: Momento da resolução
+            suppress_minutes: Se > 0, suprime a mesma chave por esse tempo
+
+        Returns:
+            True se o incidente estava aberto ou reconhecido
+        """
+        now = _timestamp(now)
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT source, status, rule FROM incidents WHERE id = ? AND state != 'resolved'",
+                (int(incident_id),)
+            ).fetchone()
+            if row is None:
+                return False
+            self.conn.execute("""
+                UPDATE incidents SET state = 'resolved', resolved_at = ?, resolved_by = ?
+                WHERE id = ?
+            """, (now, user, int(incident_id)))
+            if suppress_minutes > 0:
+                self._add_suppression(*row, now, suppress_minutes, f"resolvido #{int(incident_id)}")
+        return True
+
+    def resolve_stale(self, idle_minutes, now=None):
+        """Resolve incidentes sem ocorrências há mais de `idle_minutes`"""
+        now = pd.Timestamp(_timestamp(now))
+        cutoff = _timestamp(now - timedelta(minutes=idle_minutes))
+        with self.conn:
+            cursor = self.conn.execute("""
+                UPDATE incidents SET state = 'resolved', resolved_at = ?, resolved_by = 'stale'
+                WHERE state != 'resolved' AND last_seen < ?
+            """, (_timestamp(now), cutoff))
+        return cursor.rowcount
+
+    def _add_suppression(self, source, status, rule, now, minutes, reason):
+        until = _timestamp(pd.Timestamp(now) + timedelta(minutes=minutes))
+        cursor = self.conn.execute("""
+            INSERT INTO incident_suppressions (source, status, rule, starts_at, until, reason)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (source, status, rule, now, until, reason))
+        return cursor.lastrowid
+
+    def suppress(self, source=None, status=None, rule=None, minutes=60, reason=None, now=None):
+        """
+        Cria uma janela de supressão
+
+        Campos None valem para qualquer valor (ex.: só source suprime
+        todos os alertas daquela fonte).
+
+        Returns:
+            Id da janela criada
+        """
+        with self.conn:
+            return self._add_suppression(source, status, rule, _timestamp(now), minutes, reason)
+
+    def incidents(self, states=('open', 'acknowledged'), limit=None):
+        """Incidentes nos estados pedidos, mais graves e mais recentes primeiro"""
+        return _select_incidents(lambda query, params: pd.read_sql_query(query, self.conn, params=params),
+                                 states, limit)
+
+
+def _select_incidents(read, states, limit):
+    states = list(states)
+    query = f"""
+        SELECT {', '.join(INCIDENT_COLUMNS)} FROM incidents
+        WHERE state IN ({','.join('?' * len(states))})
+        ORDER BY level DESC, last_seen DESC
+    """
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    return read(query, states)
+
+
+def open_incidents(states=('open', 'acknowledged'), limit=None, db_name='incidents'):
+    """
+    Incidentes não resolvidos pela conexão somente leitura (dashboards)
+
+    Returns:
+        DataFrame com INCIDENT_COLUMNS (vazio se o banco ainda não existe)
+    """
+    if not os.path.exists(database_path(db_name)):
+        return pd.DataFrame(columns=INCIDENT_COLUMNS)
+    return _select_incidents(
+        lambda query, params: read_sql(db_name, query, params=params, label='open_incidents'),
+        states, limit
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incidentes persistentes (abrir/reconhecer/resolver)")
+    parser.add_argument('--db', default=INCIDENT_DB_PATH, help="Banco SQLite de incidentes")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help="Listar incidentes")
+    list_parser.add_argument('--all', action='store_true', help="Incluir resolvidos")
+    list_parser.add_argument('--limit', type=int, default=50)
+
+    for name, help_text in (('ack', "Reconhecer um incidente"), ('resolve', "Resolver um incidente")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('id', type=int)
+        sub.add_argument('--user', default=None)
+        if name == 'resolve':
+            sub.add_argument('--suppress', type=int, default=0, help="Suprimir a chave por N minutos")
+
+    suppress_parser = subparsers.add_parser('suppress', help="Criar janela de supressão")
+    for column in INCIDENT_KEY:
+        suppress_parser.add_argument(f'--{column}', default=None)
+    suppress_parser.add_argument('--minutes', type=int, default=60)
+    suppress_parser.add_argument('--reason', default=None)
+
+    stale_parser = subparsers.add_parser('stale', help="Resolver incidentes sem ocorrências recentes")
+    stale_parser.add_argument('--idle', type=int, default=60, help="Minutos sem ocorrências")
+    args = parser.parse_args(argv)
+
+    store = IncidentStore(args.db)
+    if args.command == 'list':
+        states = STATES if args.all else ('open', 'acknowledged')
+        print(store.incidents(states, args.limit).to_string(index=False))
+    elif args.command == 'ack':
+        print("🚨 reconhecido" if store.acknowledge(args.id, args.user) else "🚨 incidente não está aberto")
+    elif args.command == 'resolve':
+        resolved = store.resolve(args.id, args.user, suppress_minutes=args.suppress)
+        print("🚨 resolvido" if resolved else "🚨 incidente já resolvido ou inexistente")
+    elif args.command == 'suppress':
+        window = store.suppress(args.source, args.status, args.rule, args.minutes, args.reason)
+        print(f"🚨 supressão #{window} por {args.minutes} min")
+    else:
+        print(f"🚨 {store.resolve_stale(args.idle)} incidentes resolvidos por inatividade")
+    store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
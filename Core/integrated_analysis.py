@@ -0,0 +1,270 @@
+import os
+import sys
+import time
+import argparse
+import pandas as pd
+from db_access import read_sql, database_path
+from stream_aggregate import file_signature
+from transaction_store import COUNT_COLUMNS
+from alert_rules import load_rules, SEVERITY_ICONS, RULES_PATH
+from event_store import EVENT_TABLE, tier_table, event_total
+
+
+# Datasets da análise consolidada: chave -> (banco registrado, tabela)
+SOURCE_TABLES = {
+    'checkout1': ('data', 'data_table_1'),
+    'checkout2': ('data', 'data_table_2'),
+    'general': ('data', 'data_table'),
+    'monitoring_logs': ('database', 'monitoring_events'),
+    'alert_transactions_1': ('alert_data', 'transactions_1'),
+    'alert_transactions_2': ('alert_data', 'transactions_2')
+}
+
+# (banco, tabela) -> (assinatura, total de linhas, contagem por status ou None, volume por status ou None)
+_cache = {}
+
+# Acertos e faltas do cache desde o início do processo (exportados em /metrics)
+_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def database_signature(name):
+    """
+    Assinatura do conteúdo de um banco: (mtime, tamanho) do arquivo e do WAL
+
+    Em modo WAL as escritas da ingestão chegam primeiro ao arquivo -wal,
+    então o arquivo principal sozinho não basta para invalidar o cache.
+    """
+    path = database_path(name)
+    wal_path = path + '-wal'
+    wal = file_signature(wal_path) if os.path.exists(wal_path) else None
+    # WAL vazio (criado ao abrir um leitor ou após um checkpoint) não muda o conteúdo
+    return (file_signature(path), wal if wal and wal[1] else None)
+
+
+def _table_columns(database, table):
+    columns = read_sql(database, f'PRAGMA table_info("{table}")', label="integrated columns")
+    return set(columns['name'])
+
+
+def _has_table(database, table):
+    found = read_sql(database, "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                     params=(table,), label="integrated table check")
+    return not found.empty
+
+
+def _has_rollup(database, table):
+    if not _has_table(database, 'rollup_1h'):
+        return False
+    rows = read_sql(database, "SELECT 1 FROM rollup_1h WHERE source = ? LIMIT 1",
+                    params=(table,), label="integrated rollup check")
+    return not rows.empty
+
+
+def table_counts(database, table):
+    """
+    Total de linhas, contagem e volume por status de uma tabela, sem trazer as linhas
+
+    Fontes ingeridas no alert_data.db são lidas do rollup horário (a coluna
+    rows guarda quantas linhas caíram em cada bucket e count o volume) e
+    os eventos de monitoramento do nível diário do event_store; as demais
+    tabelas são agrupadas pelo SQLite (GROUP BY status). O volume é a soma
+    da coluna de volume (f0_/count) — o mesmo que o Alert_Incident passa às
+    regras — ou uma transação por linha quando a tabela não tem essa coluna.
+
+    Returns:
+        Tupla (total de linhas, dict status -> linhas, dict status -> volume);
+        os dicts são None sem coluna status
+    """
+    columns = _table_columns(database, table)
+    if not columns:
+        raise ValueError(f"Tabela '{table}' não encontrada em '{database}'")
+
+    if table == EVENT_TABLE and _has_table(database, tier_table('1d')):
+        return event_total(database), None, None
+
+    if 'status' not in columns:
+        total = read_sql(database, f'SELECT COUNT(*) AS n FROM "{table}"', label="integrated count")
+        return int(total['n'].iloc[0]), None, None
+
+    if _has_rollup(database, table):
+        grouped = read_sql(
+            database, "SELECT status, SUM(rows) AS n, SUM(count) AS volume FROM rollup_1h "
+                      "WHERE source = ? GROUP BY status",
+            params=(table,), label="integrated rollup"
+        )
+    else:
+        count_column = next((name for name in COUNT_COLUMNS if name in columns), None)
+        volume = f'SUM("{count_column}")' if count_column else 'COUNT(*)'
+        grouped = read_sql(
+            database, f'SELECT status, COUNT(*) AS n, {volume} AS volume FROM "{table}" GROUP BY status',
+            label="integrated group by"
+        )
+    # Status nulos entram no total, mas não na distribuição
+    total = int(grouped['n'].sum())
+    grouped = grouped[grouped['status'].notna()]
+    return (total, dict(zip(grouped['status'], grouped['n'].astype(int))),
+            dict(zip(grouped['status'], grouped['volume'].fillna(0).astype(int))))
+
+
+def cached_counts(database, table):
+    """
+    table_counts com cache pela assinatura do banco
+
+    Reruns dos dashboards reaproveitam as contagens enquanto o arquivo
+    (e o WAL) não mudam.
+    """
+    signature = database_signature(database)
+    key = (database, table)
+    cached = _cache.get(key)
+    if cached is None or cached[0] != signature:
+        cached = _cache[key] = (signature,) + table_counts(database, table)
+        _cache_stats['misses'] += 1
+    else:
+        _cache_stats['hits'] += 1
+    return cached[1:]
+
+
+def cache_stats():
+    """Acertos e faltas acumulados do cache de contagens (dict hits/misses)"""
+    return dict(_cache_stats)
+
+
+def clear_cache():
+    """Descarta as contagens em cache (usado pelo benchmark para medir a leitura a frio)"""
+    _cache.clear()
+
+
+def frame_counts(df):
+    """
+    Total de linhas, contagem e volume por status de um DataFrame já carregado
+
+    Returns:
+        Tupla (total de linhas, dict status -> linhas, dict status -> volume);
+        os dicts são None sem coluna status
+    """
+    if 'status' not in df.columns:
+        return len(df), None, None
+    counts = df['status'].value_counts(sort=False)
+    count_column = next((name for name in COUNT_COLUMNS if name in df.columns), None)
+    volumes = df.groupby('status', sort=False, observed=True)[count_column].sum() if count_column else counts
+    return (len(df), {status: int(n) for status, n in counts.items()},
+            {status: int(n) for status, n in volumes.items()})
+
+
+def summarize(counts, rules=None, failures=None):
+    """
+    Monta a análise consolidada a partir das contagens de cada dataset
+
+    As regras de Core/alert_rules.json são avaliadas sobre o volume por
+    status (como no Alert_Incident), não sobre o número de linhas.
+
+    Args:
+        counts: dict chave -> (total de linhas, linhas por status, volume por status)
+        rules: RuleSet (padrão: Core/alert_rules.json)
+        failures: dict chave -> erro das fontes que não puderam ser lidas
+
+    Returns:
+        Dict com total_datasets, total_transactions, status_distribution,
+        status_volume, failed_sources, alerts, alert_records,
+        evaluated_sources e health_score
+    """
+    analysis = {
+        'total_datasets': 0,
+        'total_transactions': 0,
+        'status_distribution': {},
+        'status_volume': {},
+        'failed_sources': dict(failures or {}),
+        'alerts': [],
+        'alert_records': [],
+        'evaluated_sources': [],
+        'health_score': 100
+    }
+    for key, (total, distribution, volume) in counts.items():
+        if not total:
+            continue
+        analysis['total_datasets'] += 1
+        analysis['total_transactions'] += total
+        if distribution is not None:
+            analysis['status_distribution'][key] = distribution
+            analysis['status_volume'][key] = volume
+            analysis['evaluated_sources'].append(key)
+
+    # Fonte que falhou não é uma fonte saudável e vazia: aparece nos alertas
+    for key, error in analysis['failed_sources'].items():
+        analysis['alerts'].append(f"⚠️ {key}: fonte indisponível ({error})")
+
+    # Limites de Core/alert_rules.json, avaliados para todos os datasets de uma vez
+    if analysis['status_volume']:
+        fired = (rules or load_rules()).evaluate_totals(analysis['status_volume'])
+        for row in fired.itertuples():
+            analysis['alerts'].append(f"{SEVERITY_ICONS[row.severity]} {row.source}: {row.message}")
+            analysis['alert_records'].append({
+                'source': row.source, 'status': row.status, 'rule': row.rule,
+                'severity': row.severity, 'value': row.value, 'message': row.message
+            })
+            analysis['health_score'] -= row.penalty
+
+    analysis['health_score'] = max(analysis['health_score'], 0)
+    return analysis
+
+
+def analyze_sources(sources=None, rules=None):
+    """
+    Análise consolidada lida diretamente dos bancos (contagens agrupadas e em cache)
+
+    Uma fonte que não pode ser lida (banco ou tabela ausente, erro de
+    leitura) é registrada em failed_sources, com aviso no log, em vez de
+    parecer um dataset vazio.
+
+    Args:
+        sources: dict chave -> (banco, tabela) (padrão: SOURCE_TABLES)
+        rules: RuleSet (padrão: Core/alert_rules.json)
+
+    Returns:
+        Dict no formato de summarize()
+    """
+    counts, failures = {}, {}
+    for key, (database, table) in (SOURCE_TABLES if sources is None else sources).items():
+        try:
+            counts[key] = cached_counts(database, table)
+        except Exception as e:
+            failures[key] = f"{type(e).__name__}: {e}"
+            print(f"⚠️ Fonte '{key}' ({database}.{table}) indisponível: {failures[key]}")
+    return summarize(counts, rules, failures)
+
+
+def analyze_frames(data, rules=None):
+    """
+    Análise consolidada de DataFrames já carregados (dict chave -> DataFrame)
+
+    Returns:
+        Dict no formato de summarize()
+    """
+    counts = {key: frame_counts(df) for key, df in data.items() if df is not None}
+    return summarize(counts, rules)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análise consolidada dos datasets (contagens agrupadas por status)")
+    parser.add_argument('--rules', default=RULES_PATH, help="Arquivo JSON de regras")
+    parser.add_argument('--repeat', type=int, default=2, help="Execuções (a partir da segunda, com cache)")
+    args = parser.parse_args(argv)
+
+    rules = load_rules(args.rules)
+    for run in range(max(args.repeat, 1)):
+        start = time.perf_counter()
+        analysis = analyze_sources(rules=rules)
+        elapsed = time.perf_counter() - start
+        print(f"⏱️ Execução {run + 1} ({'a frio' if run == 0 else 'com cache'}): {elapsed * 1000:.2f} ms")
+
+    print(f"\n📋 Datasets: {analysis['total_datasets']} | 🔢 Linhas: {analysis['total_transactions']:,} | "
+          f"💚 Saúde: {analysis['health_score']}/100")
+    for key, distribution in analysis['status_distribution'].items():
+        print(f"   {key}: " + ", ".join(f"{status}={n:,}" for status, n in sorted(distribution.items())))
+    for alert in analysis['alerts']:
+        print(f"   {alert}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,393 @@
+import os
+import sys
+import math
+import time
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from db_access import DATABASES, read_sql, query_stats
+from integrated_analysis import analyze_sources, cache_stats
+from health_snapshots import latest_snapshot, TIME_FORMAT
+from incident_store import open_incidents
+from notifier import OUTBOX_STATES
+
+
+METRICS_PORT = 9108
+
+# Formato de exposição em texto (o mesmo lido pelos coletores Prometheus)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Tempos de renderização observados neste processo: página -> contadores
+_renders = {}
+_renders_lock = threading.Lock()
+
+
+def observe_render(page, seconds):
+    """
+    Registra o tempo de uma execução de página (chamado no fim do script Streamlit)
+
+    Só atualiza contadores em memória; o valor aparece no /metrics na
+    próxima coleta do exportador do mesmo processo.
+    """
+    with _renders_lock:
+        stats = _renders.get(page)
+        if stats is None:
+            stats = _renders[page] = {'count': 0, 'sum': 0.0, 'max': 0.0, 'last': 0.0}
+        stats['count'] += 1
+        stats['sum'] += seconds
+        stats['max'] = max(stats['max'], seconds)
+        stats['last'] = seconds
+
+
+def render_stats():
+    """Cópia dos contadores de renderização (dict página -> count/sum/max/last)"""
+    with _renders_lock:
+        return {page: dict(stats) for page, stats in _renders.items()}
+
+
+# 🧾 Formato de exposição
+def _escape(value, quote=True):
+    value = str(value).replace('\\', '\\\\').replace('\n', '\\n')
+    return value.replace('"', '\\"') if quote else value
+
+
+def format_value(value):
+    """Número no formato de exposição (inteiros sem casas, NaN/+Inf por extenso)"""
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def render_metrics(families):
+    """
+    Texto de exposição de uma lista de famílias de métricas
+
+    Args:
+        families: Lista de (nome, tipo, ajuda, amostras); cada amostra é
+            (sufixo, dict de labels, valor) — o sufixo ('', '_sum', '_count')
+            é somado ao nome
+
+    Returns:
+        String terminada em quebra de linha
+    """
+    lines = []
+    for name, kind, help_text, samples in families:
+        lines.append(f"# HELP {name} {_escape(help_text, quote=False)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+            lines.append(f"{name}{suffix}{{{label_text}}} {format_value(value)}" if label_text
+                         else f"{name}{suffix} {format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+def _gauge(name, help_text, samples):
+    return (name, 'gauge', help_text, [('', labels, value) for labels, value in samples])
+
+
+def _counter(name, help_text, samples):
+    return (name, 'counter', help_text, [('', labels, value) for labels, value in samples])
+
+
+# 📥 Coleta
+def data_age(name, now=None):
+    """Segundos desde a última escrita de um banco (arquivo principal ou WAL), ou None se não existe"""
+    path = DATABASES[name][0]
+    mtimes = [os.stat(candidate).st_mtime for candidate in (path, path + '-wal') if os.path.exists(candidate)]
+    if not mtimes:
+        return None
+    return max((now or time.time()) - max(mtimes), 0.0)
+
+
+def collect_metrics(daemon=None, worker=None):
+    """
+    Lê os valores atuais e monta as famílias de métricas
+
+    A análise vem do último snapshot de saúde (uma linha do database.db);
+    só sem snapshot ela é recalculada pelas contagens em cache. Incidentes
+    e outbox são consultas agrupadas; nada aqui carrega os datasets.
+
+    Args:
+        daemon: MonitorDaemon opcional (ciclos, atrasos e tempo por etapa)
+        worker: HealthWorker opcional (snapshots gravados e erros)
+
+    Returns:
+        Lista de famílias no formato de render_metrics()
+    """
+    now = time.time()
+    families = []
+
+    snapshot = latest_snapshot()
+    analysis = snapshot or analyze_sources()
+    families.append(_gauge('monitoring_health_score', "Pontuação de saúde da análise consolidada (0-100)",
+                           [({}, analysis['health_score'])]))
+    families.append(_gauge('monitoring_alerts_fired', "Regras disparadas na última análise",
+                           [({}, len(analysis['alerts']))]))
+    families.append(_gauge('monitoring_datasets', "Datasets com linhas na última análise",
+                           [({}, analysis['total_datasets'])]))
+    families.append(_gauge('monitoring_rows', "Linhas analisadas no total",
+                           [({}, analysis['total_transactions'])]))
+    families.append(_gauge('monitoring_failed_sources', "Fontes que não puderam ser lidas na última análise",
+                           [({}, len(analysis.get('failed_sources', {})))]))
+    if snapshot is not None:
+        created = datetime.strptime(snapshot['created_at'], TIME_FORMAT).timestamp()
+        families.append(_gauge('monitoring_snapshot_version', "Versão do último snapshot de saúde",
+                               [({}, snapshot['version'])]))
+        families.append(_gauge('monitoring_snapshot_age_seconds', "Idade do último snapshot de saúde",
+                               [({}, max(now - created, 0.0))]))
+        families.append(_gauge('monitoring_snapshot_compute_seconds', "Tempo de cálculo do último snapshot",
+                               [({}, snapshot['elapsed_ms'] / 1000)]))
+
+    # Distribuição por status: linhas e fração de cada fonte
+    status_rows, status_ratio = [], []
+    for source, distribution in sorted(analysis['status_distribution'].items()):
+        total = sum(distribution.values())
+        for status, count in sorted(distribution.items()):
+            labels = {'source': source, 'status': status}
+            status_rows.append((labels, count))
+            status_ratio.append((labels, count / total if total else 0.0))
+    families.append(_gauge('monitoring_status_rows', "Linhas por fonte e status", status_rows))
+    families.append(_gauge('monitoring_status_ratio', "Fração das linhas da fonte em cada status (0-1)",
+                           status_ratio))
+
+    # Incidentes abertos/reconhecidos por severidade
+    incidents = open_incidents()
+    grouped = incidents.groupby(['severity', 'state']).size() if not incidents.empty else {}
+    families.append(_gauge('monitoring_active_incidents', "Incidentes não resolvidos por severidade e estado",
+                           [({'severity': severity, 'state': state}, count)
+                            for (severity, state), count in dict(grouped).items()]))
+
+    if os.path.exists(DATABASES['notifications'][0]):
+        try:
+            outbox = read_sql('notifications', "SELECT state, COUNT(*) AS n FROM notification_outbox GROUP BY state",
+                              label='metrics outbox')
+            counts = dict(zip(outbox['state'], outbox['n']))
+            families.append(_gauge('monitoring_outbox_messages', "Mensagens no outbox de notificações por estado",
+                                   [({'state': state}, counts.get(state, 0)) for state in OUTBOX_STATES]))
+        except Exception:
+            pass
+
+    # Frescor dos dados: segundos desde a última escrita de cada banco
+    ages = {name: data_age(name, now) for name in DATABASES}
+    families.append(_gauge('monitoring_data_age_seconds', "Segundos desde a última escrita do banco",
+                           [({'database': name}, age) for name, age in ages.items() if age is not None]))
+
+    # Cache da análise consolidada e consultas SQLite deste processo
+    hits = cache_stats()
+    families.append(_counter('monitoring_analysis_cache_hits_total', "Contagens servidas do cache da análise",
+                             [({}, hits['hits'])]))
+    families.append(_counter('monitoring_analysis_cache_misses_total', "Contagens recalculadas (banco mudou)",
+                             [({}, hits['misses'])]))
+    lookups = hits['hits'] + hits['misses']
+    families.append(_gauge('monitoring_analysis_cache_hit_ratio', "Fração das contagens servidas do cache",
+                           [({}, hits['hits'] / lookups if lookups else 0.0)]))
+
+    stats = query_stats()
+    families.append(_counter('monitoring_query_calls_total', "Consultas SQLite executadas",
+                             [({'database': row.database, 'query': row.query}, row.calls)
+                              for row in stats.itertuples()]))
+    families.append(_counter('monitoring_query_seconds_total', "Tempo acumulado das consultas SQLite",
+                             [({'database': row.database, 'query': row.query}, row.total_ms / 1000)
+                              for row in stats.itertuples()]))
+
+    # Renderização das páginas (apenas no processo do Streamlit)
+    renders = render_stats()
+    if renders:
+        families.append(('monitoring_render_seconds', 'summary', "Tempo de execução das páginas", [
+            sample for page, values in sorted(renders.items())
+            for sample in (('_sum', {'page': page}, values['sum']), ('_count', {'page': page}, values['count']))
+        ]))
+        families.append(_gauge('monitoring_render_last_seconds', "Tempo da última execução da página",
+                               [({'page': page}, values['last']) for page, values in sorted(renders.items())]))
+        families.append(_gauge('monitoring_render_max_seconds', "Maior tempo de execução da página",
+                               [({'page': page}, values['max']) for page, values in sorted(renders.items())]))
+
+    if daemon is not None:
+        families.append(_counter('monitoring_cycles_total', "Ciclos concluídos pelo daemon", [({}, daemon.cycles)]))
+        families.append(_counter('monitoring_cycle_overruns_total', "Ciclos mais longos que o intervalo",
+                                 [({}, daemon.overruns)]))
+        families.append(_gauge('monitoring_cycle_seconds', "Duração de cada etapa do último ciclo",
+                               [({'step': step}, seconds) for step, seconds in daemon.last_timings.items()]))
+
+    if worker is not None:
+        families.append(_counter('monitoring_worker_snapshots_total', "Snapshots gravados pelo worker de saúde",
+                                 [({}, worker.stats['snapshots'])]))
+        families.append(_counter('monitoring_worker_errors_total', "Falhas do worker de saúde",
+                                 [({}, worker.stats['errors'])]))
+
+    return families
+
+
+class MetricsExporter:
+    """
+    Endpoint HTTP local com as métricas em formato de exposição de texto
+
+    A coleta (collect_metrics) roda a cada `interval` segundos numa thread
+    própria — ou a cada ciclo do daemon, com interval=None e refresh()
+    chamado de fora — e o texto pronto fica em memória. Um GET /metrics
+    só devolve esses bytes: o scrape custa microssegundos e nunca lê os
+    bancos.
+    """
+
+    def __init__(self, port=METRICS_PORT, host='127.0.0.1', interval=15.0, daemon=None, worker=None):
+        """
+        Args:
+            port: Porta HTTP (0 = escolher uma livre)
+            host: Interface de escuta (padrão apenas localhost)
+            interval: Segundos entre coletas (None = só via refresh())
+            daemon: MonitorDaemon cujos ciclos entram nas métricas
+            worker: HealthWorker cujos contadores entram nas métricas
+        """
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.daemon = daemon
+        self.worker = worker
+
+        self.stats = {'collections': 0, 'errors': 0, 'scrapes': 0}
+        self.last_error = None
+        self._payload = b''
+        self._server = None
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Coleta os valores e troca o texto servido
+
+        Uma coleta com erro mantém o texto anterior (com o contador de erros
+        atualizado na próxima coleta bem-sucedida).
+
+        Returns:
+            True se o texto foi atualizado
+        """
+        start = time.perf_counter()
+        try:
+            families = collect_metrics(self.daemon, self.worker)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            self.stats['errors'] += 1
+            return False
+
+        self.stats['collections'] += 1
+        families.append(_gauge('monitoring_exporter_collect_seconds', "Duração da última coleta",
+                               [({}, time.perf_counter() - start)]))
+        families.append(_gauge('monitoring_exporter_last_collect_timestamp_seconds', "Horário da última coleta",
+                               [({}, time.time())]))
+        families.append(_counter('monitoring_exporter_collect_errors_total', "Coletas que falharam",
+                                 [({}, self.stats['errors'])]))
+        families.append(_counter('monitoring_exporter_scrapes_total', "Requisições a /metrics",
+                                 [({}, self.stats['scrapes'])]))
+        # Troca da referência é atômica: o handler lê sempre um texto completo
+        self._payload = render_metrics(families).encode('utf-8')
+        return True
+
+    @property
+    def payload(self):
+        """Texto de exposição atual (bytes)"""
+        return self._payload
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def _handler(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                exporter.stats['scrapes'] += 1
+                body = exporter._payload
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    # 🧵 Ciclo de vida
+    def start(self):
+        """Faz a primeira coleta, abre a porta e inicia as threads (idempotente)"""
+        with self._lock:
+            if self._server is not None:
+                return self
+            self.refresh()
+            self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True)]
+            if self.interval:
+                self._threads.append(threading.Thread(target=self._run, name='metrics-collector', daemon=True))
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def stop(self, timeout=5):
+        """Fecha a porta e encerra as threads"""
+        with self._lock:
+            if self._server is None:
+                return
+            self._stop.set()
+            self._server.shutdown()
+            self._server.server_close()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._server = None
+            self._threads = []
+
+    @property
+    def running(self):
+        return self._server is not None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exportador de métricas (saúde, alertas, frescor e caches) via HTTP")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="Servir /metrics em primeiro plano")
+    serve_parser.add_argument('--port', type=int, default=METRICS_PORT)
+    serve_parser.add_argument('--host', default='127.0.0.1', help="Interface de escuta")
+    serve_parser.add_argument('--interval', type=float, default=15.0, help="Segundos entre coletas")
+
+    subparsers.add_parser('show', help="Imprimir uma coleta e sair")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'show':
+        print(render_metrics(collect_metrics()), end='')
+        return 0
+
+    exporter = MetricsExporter(args.port, args.host, args.interval).start()
+    print(f"📈 Métricas em {exporter.url} (coleta a cada {args.interval:g}s). Ctrl+C para sair")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("🛑 Exportador encerrado")
+    finally:
+        exporter.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+from datetime import datetime
+from db_access import database_path, read_sql
+from health_snapshots import HealthWorker
+from incident_store import open_incidents
+from alert_rules import SEVERITIES
+from notifier import NotificationDispatcher, make_sink
+from metrics_exporter import MetricsExporter
+
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Etapas de cada ciclo, na ordem em que rodam
+CYCLE_STEPS = ['ingest', 'analysis', 'incidents', 'notify']
+
+
+def log(message):
+    """Linha de log com horário (stdout sem buffer, para journald/docker logs)"""
+    print(f"[{datetime.now().strftime(TIME_FORMAT)}] {message}", flush=True)
+
+
+def notified_levels(db_name='notifications'):
+    """
+    Maior severidade já notificada por incidente, lida do outbox
+
+    Permite reiniciar o daemon sem reenviar incidentes que já foram
+    notificados (a chave das mensagens é "incident:<id>").
+
+    Returns:
+        dict id do incidente -> nível (índice em SEVERITIES)
+    """
+    if not os.path.exists(database_path(db_name)):
+        return {}
+    try:
+        frame = read_sql(db_name, "SELECT key, severity FROM notification_outbox WHERE key LIKE 'incident:%'",
+                         label='notified incidents')
+    except Exception:
+        return {}
+    levels = {}
+    for key, severity in zip(frame['key'], frame['severity']):
+        incident_id = int(key.split(':', 1)[1])
+        level = SEVERITIES.index(severity) if severity in SEVERITIES else 0
+        levels[incident_id] = max(level, levels.get(incident_id, -1))
+    return levels
+
+
+class MonitorDaemon:
+    """
+    Ciclo carregar → analisar → registrar incidentes → notificar, fora do Streamlit
+
+    Os ciclos seguem uma grade fixa (início + k × intervalo), então a
+    cadência não deriva com a duração de cada ciclo. Um ciclo mais longo
+    que o intervalo gera um aviso de atraso e os horários perdidos são
+    pulados (sem rajada de ciclos para compensar). stop() — chamado
+    pelos sinais SIGINT/SIGTERM — deixa o ciclo atual terminar, aguarda
+    a fila de notificações e encerra.
+    """
+
+    def __init__(self, interval=60.0, destination=None, sink=None, min_severity='warning',
+                 ingest=True, snapshot_db=None, metrics_port=None):
+        """
+        Args:
+            interval: Segundos entre o início de dois ciclos
+            destination: Destino das notificações (None = não notificar)
+            sink: Destino de entrega do notifier (objeto com `async send`)
+            min_severity: Severidade mínima notificada
+            ingest: Importar as linhas novas dos CSVs de alerta a cada ciclo
+            snapshot_db: Banco dos snapshots de saúde (padrão: database.db)
+            metrics_port: Porta do endpoint /metrics, atualizado ao fim de cada ciclo (None = desligado)
+        """
+        self.interval = interval
+        self.destination = destination
+        self.min_level = SEVERITIES.index(min_severity)
+        self.ingest = ingest
+        self.snapshot_db = snapshot_db or database_path('database')
+        # Ingestão, análise, snapshot e incidentes: o mesmo refresh() do worker das páginas
+        self.worker = HealthWorker(self.snapshot_db, ingest=ingest)
+
+        self.dispatcher = (NotificationDispatcher(sink, database_path('notifications')).start()
+                           if destination and sink else None)
+        self.notified = notified_levels() if self.dispatcher else {}
+        self.cycles = 0
+        self.overruns = 0
+        self.last_timings = {}
+        self.exporter = (MetricsExporter(metrics_port, interval=None, daemon=self, worker=self.worker)
+                         if metrics_port is not None else None)
+        self._stop = threading.Event()
+
+    # 🔁 Um ciclo
+    def run_cycle(self):
+        """
+        Executa um ciclo completo
+
+        Ingestão, análise, snapshot e incidentes são o HealthWorker.refresh()
+        (a mesma sequência do worker das páginas); o daemon só acrescenta
+        as notificações e o agendamento.
+
+        Returns:
+            dict etapa -> segundos, mais 'total' e os contadores do ciclo
+        """
+        self.worker.refresh('daemon')
+        cycle = dict(self.worker.last_cycle)
+
+        start = time.perf_counter()
+        cycle['notified'] = self.notify()
+        cycle['notify'] = time.perf_counter() - start
+
+        timings = {step: cycle[step] for step in CYCLE_STEPS}
+        cycle['total'] = timings['total'] = sum(timings.values())
+        self.last_timings = timings
+        self.cycles += 1
+        return cycle
+
+    def notify(self):
+        """Enfileira os incidentes abertos ainda não notificados (ou que subiram de severidade)"""
+        if self.dispatcher is None:
+            return 0
+        incidents = open_incidents(states=('open',))
+        queued = 0
+        for incident in incidents.itertuples():
+            level = SEVERITIES.index(incident.severity)
+            if level < self.min_level or self.notified.get(incident.id, -1) >= level:
+                continue
+            self.dispatcher.submit(self.destination, f"ALERTA SISTEMA: {incident.source}: {incident.message}",
+                                   key=f"incident:{incident.id}", severity=incident.severity)
+            self.notified[incident.id] = level
+            queued += 1
+        return queued
+
+    # ⏱️ Agendamento
+    def run(self, max_cycles=None):
+        """
+        Roda ciclos na cadência configurada até stop() (ou max_cycles)
+
+        Returns:
+            Número de ciclos executados
+        """
+        log(f"🛰️ Daemon de monitoramento ativo (intervalo {self.interval:g}s"
+            f"{', notificando ' + self.destination if self.dispatcher else ', sem notificações'})")
+        if self.exporter is not None:
+            self.exporter.start()
+            log(f"📈 Métricas em {self.exporter.url}")
+        origin = time.monotonic()
+        tick = 0
+        attempts = 0
+        while not self._stop.is_set():
+            cycle_start = time.monotonic()
+            attempts += 1
+            try:
+                cycle = self.run_cycle()
+                steps = ' '.join(f"{step}={cycle[step] * 1000:.0f}ms" for step in CYCLE_STEPS)
+                log(f"✅ Ciclo {self.cycles}: {cycle['total'] * 1000:.0f} ms ({steps}) | saúde {cycle['health']}/100, "
+                    f"{cycle['alerts']} alertas, {cycle['auto_resolved']} resolvidos, "
+                    f"{cycle['notified']} notificações, snapshot v{cycle['version']}")
+            except Exception as e:
+                log(f"❌ Ciclo falhou: {type(e).__name__}: {e}")
+            if self.exporter is not None:
+                self.exporter.refresh()
+
+            if self._stop.is_set() or (max_cycles is not None and attempts >= max_cycles):
+                break
+
+            # Próximo horário da grade; ciclos perdidos são pulados com aviso
+            elapsed = time.monotonic() - origin
+            next_tick = int(elapsed // self.interval) + 1
+            if next_tick > tick + 1:
+                self.overruns += 1
+                log(f"⚠️ Ciclo atrasado: {time.monotonic() - cycle_start:.1f}s > intervalo de "
+                    f"{self.interval:g}s ({next_tick - tick - 1} horário(s) pulado(s))")
+            tick = next_tick
+            self._stop.wait(max(origin + tick * self.interval - time.monotonic(), 0))
+
+        self.shutdown()
+        return self.cycles
+
+    def stop(self, *args):
+        """Pede o encerramento (o ciclo em andamento termina); compatível com signal.signal"""
+        if not self._stop.is_set():
+            log("🛑 Encerrando após o ciclo atual...")
+        self._stop.set()
+
+    def shutdown(self, timeout=30):
+        """Aguarda a fila de notificações (até `timeout` s) e libera os recursos"""
+        if self.dispatcher is not None:
+            if not self.dispatcher.flush(timeout):
+                log(f"⚠️ {self.dispatcher.queued} notificações ainda na fila (ficam no outbox para o próximo início)")
+            self.dispatcher.close(timeout=0)
+            self.dispatcher = None
+        if self.exporter is not None:
+            self.exporter.stop()
+        log(f"👋 Daemon encerrado após {self.cycles} ciclos ({self.overruns} atrasos)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Daemon de monitoramento (ingestão, análise, incidentes e SMS sem Streamlit)")
+    parser.add_argument('--interval', type=float, default=60.0, help="Segundos entre o início de dois ciclos")
+    parser.add_argument('--cycles', type=int, default=None, help="Encerrar após N ciclos")
+    parser.add_argument('--notify', default=None, metavar='DESTINO', help="Número de destino dos alertas")
+    parser.add_argument('--sink', default='twilio', help="twilio, file:CAMINHO ou http://...")
+    parser.add_argument('--min-severity', choices=SEVERITIES, default='warning')
+    parser.add_argument('--no-ingest', action='store_true', help="Não importar os CSVs de alerta")
+    parser.add_argument('--metrics-port', type=int, default=None, help="Servir /metrics nesta porta")
+    args = parser.parse_args(argv)
+
+    daemon = MonitorDaemon(
+        interval=args.interval, destination=args.notify,
+        sink=make_sink(args.sink) if args.notify else None,
+        min_severity=args.min_severity, ingest=not args.no_ingest, metrics_port=args.metrics_port
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, daemon.stop)
+    daemon.run(args.cycles)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
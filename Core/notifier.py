@@ -0,0 +1,546 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import urllib.request
+from collections import OrderedDict
+from contextlib import closing
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+import pandas as pd
+from db_access import database_path, read_sql
+from transaction_ingest import connect_writer
+
+
+NOTIFY_DB_PATH = database_path('notifications')
+
+# Estados da fila persistida
+OUTBOX_STATES = ['pending', 'sent', 'failed']
+
+OUTBOX_COLUMNS = [
+    'id', 'destination', 'key', 'severity', 'message', 'state', 'attempts',
+    'last_error', 'provider_id', 'created_at', 'sent_at'
+]
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Limite de caracteres de um SMS concatenado
+MAX_MESSAGE_LENGTH = 1600
+
+# Segundos máximos de espera pela abertura do outbox em start()
+START_TIMEOUT = 10.0
+
+
+def create_outbox_table(conn):
+    """Cria a fila persistida de notificações"""
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS notification_outbox (
+            id INTEGER PRIMARY KEY,
+            destination TEXT NOT NULL,
+            key TEXT,
+            severity TEXT,
+            message TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending'
+                CHECK (state IN ('pending', 'sent', 'failed')),
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            provider_id TEXT,
+            created_at TEXT NOT NULL,
+            sent_at TEXT
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_outbox_state
+            ON notification_outbox (state, created_at);
+    """)
+
+
+# 📤 Destinos de entrega (sinks)
+class FileSink:
+    """Grava cada mensagem como uma linha JSON (teste e modo sem Twilio)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    async def send(self, destination, body):
+        record = {'at': datetime.now().strftime(TIME_FORMAT), 'to': destination, 'body': body}
+        with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+            handle.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return f"file:{os.path.basename(self.path)}"
+
+
+class HttpSink:
+    """POST JSON para um endpoint HTTP (ex.: o stub local de `notifier.py serve`)"""
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, destination, body):
+        payload = json.dumps({'to': destination, 'body': body}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=payload,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            reply = response.read().decode('utf-8') or '{}'
+        return json.loads(reply).get('id', str(response.status))
+
+    async def send(self, destination, body):
+        return await asyncio.get_running_loop().run_in_executor(None, self._post, destination, body)
+
+
+class TwilioSink:
+    """SMS via Twilio; a chamada bloqueante do cliente roda fora do event loop"""
+
+    def __init__(self, account_sid, token, sender):
+        from twilio.rest import Client
+        self.client = Client(account_sid, token)
+        self.sender = sender
+
+    @classmethod
+    def from_credentials(cls):
+        """Credenciais do módulo `credenciais` (Monitoring/credenciais.py)"""
+        import credenciais
+        return cls(credenciais.account_sid, credenciais.token, credenciais.remetente)
+
+    def _create(self, destination, body):
+        return self.client.messages.create(to=destination, from_=self.sender, body=body).sid
+
+    async def send(self, destination, body):
+        return await asyncio.get_running_loop().run_in_executor(None, self._create, destination, body)
+
+
+def make_sink(spec):
+    """
+    Cria um sink a partir de uma especificação textual
+
+    Args:
+        spec: 'twilio', 'file:CAMINHO' ou uma URL http(s)://
+    """
+    if spec == 'twilio':
+        return TwilioSink.from_credentials()
+    if spec.startswith('file:'):
+        return FileSink(spec[len('file:'):])
+    if spec.startswith(('http://', 'https://')):
+        return HttpSink(spec)
+    raise ValueError(f"Sink desconhecido: '{spec}' (use twilio, file:CAMINHO ou http://...)")
+
+
+class TokenBucket:
+    """Limite de envios por destino: `rate` mensagens/minuto com rajada `burst`"""
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _Destination:
+    """Mensagens aguardando envio para um destino, coalescidas por chave"""
+
+    def __init__(self, bucket):
+        self.pending = OrderedDict()
+        self.ready = asyncio.Event()
+        self.bucket = bucket
+        self.task = None
+
+
+class NotificationDispatcher:
+    """
+    Fila assíncrona de notificações com lotes, limites e novas tentativas
+
+    O event loop roda em uma thread própria: `submit()` grava a mensagem
+    no outbox e retorna, então a renderização nunca espera pela entrega.
+    Cada destino tem um worker que junta as mensagens de uma janela
+    (`batch_window` segundos) em um único envio — mensagens com a mesma
+    chave (ex.: o mesmo incidente) são coalescidas com um contador —,
+    respeita um token bucket por destino e repete falhas com backoff
+    exponencial. Toda mensagem já está no outbox quando `submit()`
+    retorna; as não entregues continuam lá ('pending' ou 'failed') e voltam para
+    a fila no próximo start() ou em redeliver().
+    """
+
+    def __init__(self, sink, db_path=NOTIFY_DB_PATH, batch_window=5.0, rate_per_minute=6, burst=3,
+                 max_attempts=5, backoff=2.0, max_backoff=300.0, max_length=MAX_MESSAGE_LENGTH):
+        """
+        Args:
+            sink: Objeto com `async send(destination, body)` que retorna um id
+            db_path: Banco SQLite do outbox
+            batch_window: Segundos de espera para juntar mensagens de um destino
+            rate_per_minute, burst: Token bucket por destino
+            max_attempts: Tentativas antes de marcar como 'failed'
+            backoff, max_backoff: Espera base e máxima entre tentativas (s)
+            max_length: Tamanho máximo do corpo enviado
+        """
+        self.sink = sink
+        self.db_path = db_path
+        self.batch_window = batch_window
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_length = max_length
+
+        self.stats = {'queued': 0, 'coalesced': 0, 'batches': 0, 'sent': 0, 'retries': 0, 'failed': 0}
+        self.last_error = None
+        self._loop = None
+        self._thread = None
+        self._conn = None
+        self._destinations = {}
+        self._inflight = 0
+        self._start_error = None
+        self._started = threading.Event()
+        self._start_lock = threading.Lock()
+
+    # 🧵 Ciclo de vida
+    def start(self, timeout=START_TIMEOUT):
+        """
+        Inicia o event loop em uma thread daemon (idempotente)
+
+        Uma falha ao abrir o outbox (diretório inexistente, banco travado)
+        é relançada aqui em vez de deixar a chamada bloqueada; a próxima
+        chamada tenta de novo.
+
+        Raises:
+            TimeoutError: O outbox não abriu em `timeout` segundos
+        """
+        with self._start_lock:
+            if self._thread is None:
+                self._start_error = None
+                self._started.clear()
+                self._thread = threading.Thread(target=self._run, name='notifier', daemon=True)
+                self._thread.start()
+            if not self._started.wait(timeout):
+                raise TimeoutError(f"Outbox de notificações não abriu em {timeout:g}s ({self.db_path})")
+            if self._start_error is not None:
+                self._thread.join(timeout)
+                self._thread = None
+                raise self._start_error
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._conn = connect_writer(self.db_path)
+            create_outbox_table(self._conn)
+            self._conn.commit()
+            self._requeue("state = 'pending'")
+        except Exception as e:
+            self._start_error = e
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._loop.close()
+            self._started.set()
+            return
+        self._started.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._conn.close()
+
+    def close(self, timeout=None):
+        """Aguarda a fila esvaziar (até `timeout` s) e encerra a thread"""
+        if self._thread is None:
+            return
+        self.flush(timeout)
+        asyncio.run_coroutine_threadsafe(self._stop_workers(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._thread = None
+        self._started.clear()
+
+    def flush(self, timeout=None):
+        """Bloqueia até todas as mensagens serem entregues ou falharem"""
+        future = asyncio.run_coroutine_threadsafe(self._drain(), self._loop)
+        try:
+            future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+        return self._inflight == 0
+
+    async def _stop_workers(self):
+        # Mensagens ainda na fila continuam 'pending' no outbox
+        tasks = [target.task for target in self._destinations.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._destinations.clear()
+        self._inflight = 0
+
+    async def _drain(self):
+        while self._inflight:
+            await asyncio.sleep(0.05)
+
+    @property
+    def queued(self):
+        """Mensagens ainda não entregues nem descartadas"""
+        return self._inflight
+
+    # 📥 Entrada
+    def submit(self, destination, message, key=None, severity='warning'):
+        """
+        Grava a mensagem no outbox e agenda a entrega sem esperar por ela
+
+        A inserção é feita na thread de quem chama, em uma conexão própria:
+        quando submit() retorna a mensagem já está persistida e, se o
+        processo cair antes da entrega, volta para a fila no próximo start().
+
+        Args:
+            destination: Destino (ex.: número de telefone)
+            message: Texto da mensagem
+            key: Chave de coalescência (mensagens com a mesma chave no mesmo
+                lote viram uma só, com contador); padrão: o próprio texto
+            severity: Severidade registrada no outbox
+
+        Returns:
+            Id da mensagem no outbox
+        """
+        self.start()
+        key = key or message
+        with closing(connect_writer(self.db_path)) as conn, conn:
+            row_id = conn.execute(
+                "INSERT INTO notification_outbox (destination, key, severity, message, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (destination, key, severity, message, datetime.now().strftime(TIME_FORMAT))
+            ).lastrowid
+        self.stats['queued'] += 1
+        self._loop.call_soon_threadsafe(self._enqueue, row_id, destination, key, message)
+        return row_id
+
+    def redeliver(self):
+        """Recoloca na fila as mensagens marcadas como 'failed'"""
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(self._redeliver(), self._loop)
+        return future.result()
+
+    async def _redeliver(self):
+        return self._requeue("state = 'failed'")
+
+    def _requeue(self, condition):
+        rows = self._conn.execute(
+            f"SELECT id, destination, key, message FROM notification_outbox WHERE {condition} ORDER BY id"
+        ).fetchall()
+        if rows:
+            self._conn.execute(f"UPDATE notification_outbox SET state = 'pending' WHERE {condition}")
+            self._conn.commit()
+        for row in rows:
+            self._enqueue(*row)
+        return len(rows)
+
+    def _enqueue(self, row_id, destination, key, message):
+        target = self._destinations.get(destination)
+        if target is None:
+            target = _Destination(TokenBucket(self.rate_per_minute, self.burst))
+            target.task = self._loop.create_task(self._worker(destination, target))
+            self._destinations[destination] = target
+
+        entry = target.pending.get(key)
+        if entry is None:
+            target.pending[key] = {'message': message, 'count': 1, 'ids': [row_id]}
+        else:
+            entry['message'] = message
+            entry['count'] += 1
+            entry['ids'].append(row_id)
+            self.stats['coalesced'] += 1
+        self._inflight += 1
+        target.ready.set()
+
+    # 📤 Entrega
+    async def _worker(self, destination, target):
+        while True:
+            await target.ready.wait()
+            await asyncio.sleep(self.batch_window)
+            batch = list(target.pending.values())
+            target.pending.clear()
+            target.ready.clear()
+            await target.bucket.acquire()
+            await self._deliver(destination, batch)
+
+    def compose(self, batch):
+        """Corpo único para um lote: uma linha por chave, com contador"""
+        lines = [
+            entry['message'] + (f" (x{entry['count']})" if entry['count'] > 1 else '')
+            for entry in batch
+        ]
+        if len(lines) == 1:
+            return lines[0][:self.max_length]
+
+        body = f"{len(lines)} alertas:"
+        for i, line in enumerate(lines):
+            suffix = f"\n…(+{len(lines) - i})"
+            if len(body) + len(line) + 3 + len(suffix) > self.max_length:
+                return body + suffix
+            body += f"\n- {line}"
+        return body
+
+    async def _deliver(self, destination, batch):
+        ids = [row_id for entry in batch for row_id in entry['ids']]
+        body = self.compose(batch)
+        self.stats['batches'] += 1
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                provider_id = await self.sink.send(destination, body)
+            except Exception as e:
+                self.last_error = f"{destination}: {str(e)}"
+                state = 'failed' if attempt == self.max_attempts else 'pending'
+                self._mark(ids, state, attempt, error=str(e))
+                if state == 'failed':
+                    self.stats['failed'] += len(ids)
+                    break
+                self.stats['retries'] += 1
+                delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            else:
+                self._mark(ids, 'sent', attempt, provider_id=str(provider_id))
+                self.stats['sent'] += len(ids)
+                break
+        self._inflight -= len(ids)
+
+    def _mark(self, ids, state, attempts, error=None, provider_id=None):
+        sent_at = datetime.now().strftime(TIME_FORMAT) if state == 'sent' else None
+        self._conn.executemany(
+            "UPDATE notification_outbox SET state = ?, attempts = attempts + 1, last_error = ?, "
+            "provider_id = ?, sent_at = ? WHERE id = ?",
+            [(state, error, provider_id, sent_at, row_id) for row_id in ids]
+        )
+        self._conn.commit()
+
+
+def outbox(states=None, limit=50, db_name='notifications'):
+    """
+    Mensagens do outbox pela conexão somente leitura (dashboards)
+
+    Returns:
+        DataFrame com OUTBOX_COLUMNS, mais recentes primeiro (vazio se o
+        banco ainda não existe)
+    """
+    if not os.path.exists(database_path(db_name)):
+        return pd.DataFrame(columns=OUTBOX_COLUMNS)
+    query = f"SELECT {', '.join(OUTBOX_COLUMNS)} FROM notification_outbox"
+    params = []
+    if states:
+        query += f" WHERE state IN ({', '.join('?' * len(states))})"
+        params.extend(states)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    return read_sql(db_name, query, params=params, label='outbox')
+
+
+def serve_stub(port=8025, fail_rate=0.0):
+    """
+    Stub HTTP local que aceita POSTs do HttpSink e imprime as mensagens
+
+    Args:
+        port: Porta em localhost
+        fail_rate: Fração de requisições respondidas com 503 (testar retry)
+    """
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    counter = {'id': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if random.random() < fail_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+            counter['id'] += 1
+            print(f"📨 #{counter['id']} → {payload.get('to')}: {payload.get('body')}", flush=True)
+            reply = json.dumps({'id': f"stub-{counter['id']}"}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', port), Handler)
+    print(f"📡 Stub de notificações em http://127.0.0.1:{port}/ (Ctrl+C para sair)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Stub encerrado")
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fila assíncrona de notificações (SMS)")
+    parser.add_argument('--db', default=NOTIFY_DB_PATH, help="Banco SQLite do outbox")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    send_parser = subparsers.add_parser('send', help="Enviar mensagens e aguardar a entrega")
+    send_parser.add_argument('destination')
+    send_parser.add_argument('messages', nargs='+')
+    send_parser.add_argument('--sink', default='twilio', help="twilio, file:CAMINHO ou http://...")
+    send_parser.add_argument('--batch-window', type=float, default=1.0)
+    send_parser.add_argument('--timeout', type=float, default=60.0)
+
+    subparsers.add_parser('redeliver', help="Reenviar mensagens com falha").add_argument(
+        '--sink', default='twilio', help="twilio, file:CAMINHO ou http://...")
+
+    list_parser = subparsers.add_parser('list', help="Listar o outbox")
+    list_parser.add_argument('--state', choices=OUTBOX_STATES, default=None)
+    list_parser.add_argument('--limit', type=int, default=50)
+
+    serve_parser = subparsers.add_parser('serve', help="Stub HTTP local para testes")
+    serve_parser.add_argument('--port', type=int, default=8025)
+    serve_parser.add_argument('--fail-rate', type=float, default=0.0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve_stub(args.port, args.fail_rate)
+        return 0
+
+    if args.command == 'list':
+        conn = connect_writer(args.db)
+        create_outbox_table(conn)
+        query = f"SELECT {', '.join(OUTBOX_COLUMNS)} FROM notification_outbox"
+        params = ()
+        if args.state:
+            query += " WHERE state = ?"
+            params = (args.state,)
+        frame = pd.read_sql_query(query + f" ORDER BY id DESC LIMIT {int(args.limit)}", conn, params=params)
+        conn.close()
+        print(frame.to_string(index=False) if len(frame) else "📭 Outbox vazio")
+        return 0
+
+    if args.command == 'send':
+        dispatcher = NotificationDispatcher(make_sink(args.sink), args.db, batch_window=args.batch_window)
+        for message in args.messages:
+            dispatcher.submit(args.destination, message)
+    else:
+        dispatcher = NotificationDispatcher(make_sink(args.sink), args.db, batch_window=0)
+        print(f"🔁 {dispatcher.redeliver()} mensagens recolocadas na fila")
+
+    delivered = dispatcher.flush(getattr(args, 'timeout', 60.0))
+    dispatcher.close(timeout=0)
+    print(f"📤 {dispatcher.stats}")
+    if dispatcher.last_error:
+        print(f"⚠️ Último erro: {dispatcher.last_error}")
+    return 0 if delivered and not dispatcher.stats['failed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
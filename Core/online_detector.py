@@ -0,0 +1,401 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from transaction_store import STATUS_CATEGORIES, MINUTES_PER_DAY, format_minutes
+from db_access import read_sql
+
+
+# Direção ruim de cada status: +1 quando subir é ruim, -1 quando cair é ruim
+BAD_DIRECTION = {'approved': -1}
+
+ALERT_COLUMNS = [
+    'source', 'minute', 'time', 'status', 'rate', 'baseline', 'ewma',
+    'z_window', 'z_ewma', 'volume', 'severity', 'message'
+]
+
+
+class _SourceState:
+    """Estado O(1) de uma fonte: janela deslizante (Welford) e EWMA por status"""
+
+    def __init__(self, n_statuses, window):
+        self.buffer = np.zeros((window, n_statuses))
+        self.position = 0
+        self.n = 0
+        self.mean = np.zeros(n_statuses)
+        self.m2 = np.zeros(n_statuses)
+        self.ewma = np.zeros(n_statuses)
+        self.ewvar = np.zeros(n_statuses)
+        self.seen = 0
+        self.last_minute = None
+        self.last_alert = np.full(n_statuses, -np.inf)
+
+
+class OnlineDetector:
+    """
+    Detector online de anomalias nas taxas de status por minuto
+
+    Para cada fonte e status mantém média/variância de uma janela
+    deslizante (Welford com inclusão e remoção, O(1) por minuto) e uma
+    EWMA com variância exponencial. Um minuto gera alerta quando a taxa
+    se afasta das duas linhas de base, na direção ruim do status. Cada
+    minuto novo atualiza o estado sem reprocessar o histórico.
+    """
+
+    def __init__(self, statuses=None, window=60, alpha=0.05, z_threshold=4.0,
+                 min_periods=30, min_volume=20, min_std=0.5, min_status_volume=3, cooldown=15):
+        """
+        Inicializa o detector
+
+        Args:
+            statuses: Status acompanhados (padrão: STATUS_CATEGORIES)
+            window: Tamanho da janela deslizante em minutos
+            alpha: Fator de suavização da EWMA
+            z_threshold: Desvios (z-score) para alertar nas duas linhas de base
+            min_periods: Minutos observados antes do primeiro alerta
+            min_volume: Volume mínimo no minuto para avaliar (e atualizar) o estado
+            min_std: Desvio mínimo em pontos percentuais (evita z infinito em séries constantes)
+            min_status_volume: Transações mínimas do status no minuto para alertar alta
+            cooldown: Minutos sem repetir alerta do mesmo status/fonte
+        """
+        self.statuses = list(STATUS_CATEGORIES if statuses is None else statuses)
+        self.window = window
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_periods = min_periods
+        self.min_volume = min_volume
+        self.min_std = min_std
+        self.min_status_volume = min_status_volume
+        self.cooldown = cooldown
+        self.direction = np.array([BAD_DIRECTION.get(s, 1) for s in self.statuses], dtype=np.float64)
+        self._states = {}
+
+    def state(self, source):
+        """Estado da fonte (criado na primeira atualização)"""
+        if source not in self._states:
+            self._states[source] = _SourceState(len(self.statuses), self.window)
+        return self._states[source]
+
+    def reset(self, source=None):
+        """Descarta o estado de uma fonte (ou de todas)"""
+        if source is None:
+            self._states.clear()
+        else:
+            self._states.pop(source, None)
+
+    def align(self, volumes):
+        """Converte um dict/Series status -> volume em array na ordem de self.statuses"""
+        if isinstance(volumes, (dict, pd.Series)):
+            return np.array([float(volumes.get(s, 0) or 0) for s in self.statuses])
+        return np.asarray(volumes, dtype=np.float64)
+
+    def update(self, source, minute, volumes):
+        """
+        Processa um minuto de uma fonte
+
+        Args:
+            source: Nome da fonte (ex.: 'transactions_2')
+            minute: Minuto (inteiro crescente; minuto do dia nos exports)
+            volumes: Volume por status (dict, Series ou array alinhado a statuses)
+
+        Returns:
+            Lista de alertas (dicts com as chaves de ALERT_COLUMNS)
+        """
+        state = self.state(source)
+        volumes = self.align(volumes)
+        total = volumes.sum()
+        state.last_minute = minute
+        if total < self.min_volume:
+            return []
+
+        rate = volumes / total * 100
+        alerts = []
+
+        if state.seen >= self.min_periods and state.n > 1:
+            # Piso do desvio: ruído binomial esperado da taxa com o volume deste minuto
+            p = np.clip(state.ewma / 100, 1 / total, 1.0)
+            noise = np.maximum(np.sqrt(p * (1 - p) / total) * 100, self.min_std)
+            z_window = (rate - state.mean) / np.maximum(np.sqrt(state.m2 / (state.n - 1)), noise)
+            z_ewma = (rate - state.ewma) / np.maximum(np.sqrt(state.ewvar), noise)
+            enough = (self.direction < 0) | (volumes >= self.min_status_volume)
+            flagged = ((z_window * self.direction >= self.z_threshold) &
+                       (z_ewma * self.direction >= self.z_threshold) &
+                       enough & (minute - state.last_alert >= self.cooldown))
+
+            for i in np.flatnonzero(flagged):
+                state.last_alert[i] = minute
+                alerts.append(self._alert(source, minute, i, rate[i], state.mean[i], state.ewma[i],
+                                          z_window[i], z_ewma[i], total))
+
+        self._learn(state, rate)
+        return alerts
+
+    def _learn(self, state, rate):
+        """Atualiza janela (inclusão/remoção de Welford) e EWMA com a taxa do minuto"""
+        if state.n == self.window:
+            old = state.buffer[state.position].copy()
+            delta = old - state.mean
+            state.mean -= delta / (state.n - 1)
+            state.m2 -= delta * (old - state.mean)
+            state.n -= 1
+
+        state.buffer[state.position] = rate
+        state.position = (state.position + 1) % self.window
+        state.n += 1
+        delta = rate - state.mean
+        state.mean += delta / state.n
+        state.m2 = np.maximum(state.m2 + delta * (rate - state.mean), 0.0)
+
+        if state.seen == 0:
+            state.ewma = rate.copy()
+        else:
+            diff = rate - state.ewma
+            state.ewma += self.alpha * diff
+            state.ewvar = (1 - self.alpha) * (state.ewvar + self.alpha * diff * diff)
+        state.seen += 1
+
+    def _alert(self, source, minute, i, rate, baseline, ewma, z_window, z_ewma, total):
+        status = self.statuses[i]
+        z = min(abs(z_window), abs(z_ewma))
+        severity = 'critical' if z >= 2 * self.z_threshold else 'warning'
+        movement = 'queda' if self.direction[i] < 0 else 'alta'
+        return {
+            'source': source,
+            'minute': int(minute),
+            'time': format_minutes([minute])[0],
+            'status': status,
+            'rate': round(float(rate), 2),
+            'baseline': round(float(baseline), 2),
+            'ewma': round(float(ewma), 2),
+            'z_window': round(float(z_window), 2),
+            'z_ewma': round(float(z_ewma), 2),
+            'volume': int(total),
+            'severity': severity,
+            'message': f"{movement} de {status}: {rate:.1f}% (base {baseline:.1f}%)"
+        }
+
+    def process(self, source, matrix, minutes=None):
+        """
+        Processa uma sequência de minutos (ex.: o dia inteiro de um export)
+
+        Equivale a chamar update() minuto a minuto, mas calcula o lote de
+        uma vez: médias da janela por somas acumuladas e EWMA como
+        recorrência linear. O estado final é o mesmo, então lotes e
+        minutos avulsos podem ser intercalados.
+
+        Args:
+            source: Nome da fonte
+            matrix: Array (minutos, statuses) de volumes
+            minutes: Minuto de cada linha (padrão: 0..n-1)
+
+        Returns:
+            DataFrame de alertas (colunas ALERT_COLUMNS)
+        """
+        state = self.state(source)
+        matrix = np.asarray(matrix, dtype=np.float64)
+        minutes = np.arange(len(matrix)) if minutes is None else np.asarray(minutes)
+        if len(matrix) == 0:
+            return pd.DataFrame(columns=ALERT_COLUMNS)
+        state.last_minute = minutes[-1]
+
+        totals = matrix.sum(axis=1)
+        valid = totals >= self.min_volume
+        volumes, totals, minutes = matrix[valid], totals[valid], minutes[valid]
+        m = len(volumes)
+        if m == 0:
+            return pd.DataFrame(columns=ALERT_COLUMNS)
+        rates = volumes / totals[:, np.newaxis] * 100
+
+        # Janela antes de cada minuto: histórico do buffer + lote, por somas acumuladas
+        history = state.buffer[(state.position - state.n + np.arange(state.n)) % self.window]
+        series = np.vstack([history, rates])
+        h = state.n
+        s1 = np.vstack([np.zeros((1, series.shape[1])), np.cumsum(series, axis=0)])
+        s2 = np.vstack([np.zeros((1, series.shape[1])), np.cumsum(series * series, axis=0)])
+        end = h + np.arange(m)
+        start = np.maximum(end - self.window, 0)
+        count = (end - start)[:, np.newaxis].astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (s1[end] - s1[start]) / count
+            var = np.maximum((s2[end] - s2[start] - count * mean * mean) / (count - 1), 0.0)
+
+        # EWMA antes de cada minuto
+        ewma_before, ewvar_before, ewma, ewvar = self._ewma(state, rates)
+
+        seen = state.seen + np.arange(m)
+        p = np.clip(ewma_before / 100, 1 / totals[:, np.newaxis], 1.0)
+        noise = np.maximum(np.sqrt(p * (1 - p) / totals[:, np.newaxis]) * 100, self.min_std)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_window = (rates - mean) / np.maximum(np.sqrt(var), noise)
+        z_ewma = (rates - ewma_before) / np.maximum(np.sqrt(ewvar_before), noise)
+        enough = (self.direction < 0) | (volumes >= self.min_status_volume)
+        ready = ((seen >= self.min_periods) & (count[:, 0] > 1))[:, np.newaxis]
+        flagged = (ready & enough &
+                   (z_window * self.direction >= self.z_threshold) &
+                   (z_ewma * self.direction >= self.z_threshold))
+
+        alerts = []
+        for j, i in zip(*np.nonzero(flagged)):
+            if minutes[j] - state.last_alert[i] < self.cooldown:
+                continue
+            state.last_alert[i] = minutes[j]
+            alerts.append(self._alert(source, minutes[j], i, rates[j, i], mean[j, i], ewma_before[j, i],
+                                      z_window[j, i], z_ewma[j, i], totals[j]))
+
+        # Estado final: últimos `window` minutos, EWMA e contadores
+        last = series[-self.window:]
+        state.buffer[:] = 0.0
+        state.buffer[:len(last)] = last
+        state.n = len(last)
+        state.position = state.n % self.window
+        state.mean = last.mean(axis=0)
+        state.m2 = ((last - state.mean) ** 2).sum(axis=0)
+        state.ewma, state.ewvar = ewma, ewvar
+        state.seen += m
+
+        return pd.DataFrame(alerts, columns=ALERT_COLUMNS)
+
+    def _ewma(self, state, rates):
+        """
+        EWMA e variância exponencial antes de cada minuto do lote
+
+        Returns:
+            Tupla (ewma_antes, ewvar_antes, ewma_final, ewvar_final)
+        """
+        a = self.alpha
+        ewma, ewvar = state.ewma.copy(), state.ewvar.copy()
+        first = 0
+        if state.seen == 0:
+            ewma = rates[0].copy()
+            first = 1
+
+        # e_t = (1-a) e_{t-1} + a x_t ; v_t = (1-a) v_{t-1} + (1-a) a d_t^2, d_t = x_t - e_{t-1}
+        tail = rates[first:]
+        e_after = _linear_recurrence(a * tail, 1 - a, ewma)
+        e_prev = np.vstack([ewma[np.newaxis, :], e_after[:-1]])
+        d = tail - e_prev
+        v_after = _linear_recurrence((1 - a) * a * d * d, 1 - a, ewvar)
+        v_prev = np.vstack([ewvar[np.newaxis, :], v_after[:-1]])
+
+        if first:
+            e_prev = np.vstack([state.ewma[np.newaxis, :], e_prev])
+            v_prev = np.vstack([state.ewvar[np.newaxis, :], v_prev])
+
+        e_final = e_after[-1] if len(e_after) else ewma
+        v_final = v_after[-1] if len(v_after) else ewvar
+        return e_prev, v_prev, e_final, v_final
+
+    def process_aggregate(self, source, aggregate):
+        """Processa os 1440 minutos de um StatusAggregate (ver stream_aggregate.py)"""
+        return self.process(source, aggregate.volume_matrix(self.statuses))
+
+
+def _linear_recurrence(u, c, y0, block=512):
+    """
+    y_t = c * y_{t-1} + u_t para cada coluna, sem laço por linha
+
+    Resolvida em blocos (y_t = c^t (y_0 + soma u_i c^-i)) para que as
+    potências de c não estourem em lotes longos.
+    """
+    out = np.empty_like(u)
+    y = np.asarray(y0, dtype=np.float64)
+    for start in range(0, len(u), block):
+        chunk = u[start:start + block]
+        powers = c ** np.arange(1, len(chunk) + 1)[:, np.newaxis]
+        values = powers * (y + np.cumsum(chunk / powers, axis=0))
+        out[start:start + block] = values
+        y = values[-1]
+    return out
+
+
+class RollupFeed:
+    """
+    Alimenta o detector com os minutos novos do rollup de 1 minuto
+
+    A cada poll lê apenas os buckets posteriores ao último processado;
+    o minuto mais recente fica pendente até chegar um minuto seguinte,
+    pois a ingestão ainda pode acrescentar linhas a ele.
+    """
+
+    def __init__(self, detector, sources=('transactions_1', 'transactions_2'), db_name='alert_data'):
+        self.detector = detector
+        self.sources = list(sources)
+        self.db_name = db_name
+        self.processed = {source: -1 for source in self.sources}
+
+    def poll(self, final=False):
+        """
+        Processa os minutos completos ainda não vistos
+
+        Args:
+            final: Processar também o último minuto (fim do arquivo)
+
+        Returns:
+            DataFrame de alertas
+        """
+        frames = []
+        for source in self.sources:
+            rollup = read_sql(
+                self.db_name,
+                "SELECT bucket, status, count FROM rollup_1m WHERE source = ? AND bucket > ? ORDER BY bucket",
+                params=(source, self.processed[source]), label="detector feed"
+            )
+            if rollup.empty:
+                continue
+
+            pivot = rollup.pivot(index='bucket', columns='status', values='count').fillna(0)
+            if not final:
+                pivot = pivot.iloc[:-1]
+            if pivot.empty:
+                continue
+
+            matrix = pivot.reindex(columns=self.detector.statuses, fill_value=0).to_numpy()
+            frames.append(self.detector.process(source, matrix, pivot.index.to_numpy()))
+            self.processed[source] = int(pivot.index[-1])
+
+        if not frames:
+            return pd.DataFrame(columns=ALERT_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+
+def main(argv=None):
+    from stream_aggregate import aggregate_csv
+    from transaction_ingest import ALERT_SOURCES, TailIngester
+
+    parser = argparse.ArgumentParser(description="Detector online de anomalias por minuto")
+    parser.add_argument('--watch', action='store_true',
+                        help="Acompanhar a ingestão do alert_data.db (alertas a cada lote)")
+    parser.add_argument('--interval', type=float, default=5.0, help="Intervalo entre rodadas (s)")
+    parser.add_argument('--window', type=int, default=60, help="Janela deslizante (minutos)")
+    parser.add_argument('--alpha', type=float, default=0.05, help="Suavização da EWMA")
+    parser.add_argument('--z', type=float, default=4.0, help="Limite de z-score")
+    args = parser.parse_args(argv)
+
+    detector = OnlineDetector(window=args.window, alpha=args.alpha, z_threshold=args.z)
+
+    def report(alerts):
+        for alert in alerts.itertuples():
+            icon = '🔴' if alert.severity == 'critical' else '🟡'
+            print(f"{icon} {alert.source} {alert.time}: {alert.message} (z={alert.z_window:.1f})")
+
+    if not args.watch:
+        for source, csv_path in ALERT_SOURCES.items():
+            aggregate = aggregate_csv(csv_path)
+            start = time.perf_counter()
+            alerts = detector.process_aggregate(source, aggregate)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"⏱️ {source}: {MINUTES_PER_DAY} minutos em {elapsed:.1f} ms, {len(alerts)} alertas")
+            report(alerts)
+        return 0
+
+    feed = RollupFeed(detector, ALERT_SOURCES)
+    try:
+        TailIngester().run(args.interval, on_batch=lambda results: report(feed.poll()))
+    except KeyboardInterrupt:
+        print("🛑 Detector encerrado")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
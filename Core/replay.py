@@ -0,0 +1,385 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import date
+import numpy as np
+import pandas as pd
+from transaction_store import STATUS_CATEGORIES, MINUTES_PER_DAY, format_minutes, parse_minutes
+from alert_rules import RuleSet, RULES_PATH
+from seasonal_baseline import daily_matrices
+from db_access import read_sql
+
+
+# Minutos após o fim de uma janela rotulada em que um alerta ainda conta como detecção
+DEFAULT_GRACE = 15
+
+EPISODE_COLUMNS = [
+    'rule', 'source', 'severity', 'start', 'end', 'day', 'start_time', 'end_time',
+    'minutes', 'peak', 'message'
+]
+
+
+class ReplayData:
+    """
+    Histórico minuto x status de várias fontes, em minutos absolutos
+
+    Cada dia de cada fonte vira uma linha do tensor (fonte-dia, 1440,
+    status); o minuto absoluto é dia * 1440 + minuto do dia, contado a
+    partir do primeiro dia do histórico (o mesmo eixo das janelas
+    rotuladas de synthetic_data.py). Status fora de STATUS_CATEGORIES
+    ocupam colunas extras e entram apenas no volume total.
+    """
+
+    def __init__(self):
+        self.statuses = list(STATUS_CATEGORIES)
+        self.series = {}
+
+    def add(self, source, matrices):
+        """
+        Args:
+            source: Nome da fonte
+            matrices: Dict data -> array (1440, status)
+        """
+        self.series.setdefault(source, {}).update(matrices)
+
+    def add_csv(self, csv_path, source=None, default_day=None):
+        """Fonte a partir de um CSV de transações (um ou vários dias)"""
+        source = source or os.path.splitext(os.path.basename(csv_path))[0]
+        self.add(source, daily_matrices(csv_path, default_day, statuses=self.statuses))
+
+    def add_table(self, table, db_name='alert_data', day=None):
+        """Fonte a partir do rollup de 1 minuto do alert_data.db (um dia)"""
+        rollup = read_sql(
+            db_name, "SELECT bucket, status, count FROM rollup_1m WHERE source = ?",
+            params=(table,), label="replay rollup"
+        )
+        if rollup.empty:
+            raise ValueError(f"Sem rollup de 1 minuto para '{table}' (rode transaction_ingest.py)")
+        pivot = rollup.pivot_table(index='bucket', columns='status', values='count', aggfunc='sum')
+        extra = [status for status in pivot.columns if status not in self.statuses]
+        pivot = pivot.reindex(columns=self.statuses + extra).fillna(0)
+
+        matrix = np.zeros((MINUTES_PER_DAY, pivot.shape[1]))
+        np.add.at(matrix, pivot.index.to_numpy(dtype=np.int64) % MINUTES_PER_DAY, pivot.to_numpy())
+        self.add(table, {pd.Timestamp(day or date.today()).date(): matrix})
+
+    def tensor(self):
+        """
+        Returns:
+            (volumes, statuses, sources, days): volumes (fonte-dia, 1440, status),
+            status de cada coluna, nome da fonte e índice do dia de cada linha
+        """
+        all_days = sorted({day for matrices in self.series.values() for day in matrices})
+        width = max([len(self.statuses)] + [m.shape[1] for ms in self.series.values() for m in ms.values()])
+        statuses = self.statuses + [f"?{i}" for i in range(width - len(self.statuses))]
+        if not all_days:
+            return np.zeros((0, MINUTES_PER_DAY, width)), statuses, [], np.zeros(0, dtype=np.int64)
+
+        rows, sources, days = [], [], []
+        for source, matrices in self.series.items():
+            for day in sorted(matrices):
+                matrix = matrices[day]
+                rows.append(np.pad(matrix, ((0, 0), (0, width - matrix.shape[1]))))
+                sources.append(source)
+                days.append((day - all_days[0]).days)
+        return np.stack(rows), statuses, sources, np.array(days, dtype=np.int64)
+
+
+def episodes(fired, sources, days, rules, value):
+    """
+    Converte a máscara (regra, fonte-dia, minuto) em episódios de alerta
+
+    Um episódio começa no primeiro minuto em que a regra dispara e termina
+    no último minuto consecutivo disparado. Episódios que atravessam a
+    meia-noite continuam no dia seguinte da mesma fonte.
+
+    Returns:
+        DataFrame com EPISODE_COLUMNS (start/end em minutos absolutos, end inclusivo)
+    """
+    if fired.size == 0:
+        return pd.DataFrame(columns=EPISODE_COLUMNS)
+
+    # Linha do tempo contínua por (regra, fonte): dias concatenados em minutos absolutos
+    padded = np.zeros(fired.shape[:2] + (fired.shape[2] + 2,), dtype=np.int8)
+    padded[:, :, 1:-1] = fired
+    edges = np.diff(padded, axis=2)
+    rule_idx, row_idx, starts = np.nonzero(edges == 1)
+    _, _, ends = np.nonzero(edges == -1)
+
+    offsets = days[row_idx] * MINUTES_PER_DAY
+    frame = pd.DataFrame({
+        'r': rule_idx, 'row': row_idx,
+        'rule': [rules[r]['name'] for r in rule_idx],
+        'source': np.asarray(sources, dtype=object)[row_idx] if len(row_idx) else [],
+        'start': offsets + starts,
+        'end': offsets + ends - 1,
+        'local_start': starts, 'local_end': ends - 1
+    })
+    if frame.empty:
+        return pd.DataFrame(columns=EPISODE_COLUMNS)
+
+    frame['peak'] = [
+        float(np.nanmax(np.abs(value[r, row, a:b + 1])))
+        for r, row, a, b in zip(frame['r'], frame['row'], frame['local_start'], frame['local_end'])
+    ]
+
+    # Junta episódios contíguos entre dias (fim às 23h 59, início às 00h 00)
+    frame = frame.sort_values(['rule', 'source', 'start']).reset_index(drop=True)
+    group_key = frame['rule'] + '\x00' + frame['source'].astype(str)
+    new_group = (group_key != group_key.shift()) | (frame['start'] != frame['end'].shift() + 1)
+    frame['episode'] = new_group.cumsum()
+    merged = frame.groupby('episode').agg(
+        r=('r', 'first'), rule=('rule', 'first'), source=('source', 'first'),
+        start=('start', 'min'), end=('end', 'max'), peak=('peak', 'max')
+    ).reset_index(drop=True)
+
+    merged['severity'] = [rules[r]['severity'] for r in merged['r']]
+    merged['day'] = merged['start'] // MINUTES_PER_DAY
+    merged['start_time'] = format_minutes(merged['start'].to_numpy())
+    merged['end_time'] = format_minutes(merged['end'].to_numpy())
+    merged['minutes'] = merged['end'] - merged['start'] + 1
+    merged['message'] = [
+        rules[r]['message'].format(value=peak, threshold=rules[r]['threshold'], source=source,
+                                   status=rules[r]['status'], window=rules[r]['window'])
+        for r, peak, source in zip(merged['r'], merged['peak'], merged['source'])
+    ]
+    return merged.sort_values('start').reset_index(drop=True)[EPISODE_COLUMNS]
+
+
+def load_labels(path):
+    """
+    Janelas de incidente rotuladas (anomaly_windows.csv do synthetic_data.py)
+
+    Colunas: source, start, end (minutos absolutos a partir do primeiro dia,
+    end exclusivo); ou source, day, start_time, end_time ("HH MM", end inclusivo).
+    """
+    labels = pd.read_csv(path)
+    if 'start' not in labels.columns:
+        labels['start'] = labels['day'] * MINUTES_PER_DAY + parse_minutes(labels['start_time'])
+        labels['end'] = labels['day'] * MINUTES_PER_DAY + parse_minutes(labels['end_time']) + 1
+    return labels
+
+
+def score(alerts, labels, grace=DEFAULT_GRACE):
+    """
+    Precisão, cobertura e latência dos alertas contra as janelas rotuladas
+
+    Um alerta é verdadeiro quando se sobrepõe a uma janela da mesma fonte
+    (estendida por `grace` minutos após o fim). Uma janela é detectada
+    pelo primeiro alerta que a toca; a latência é o início desse alerta
+    menos o início da janela (0 se o alerta já estava ativo).
+
+    Returns:
+        (resumo, janelas): dict com alerts, true_alerts, precision, windows,
+        detected, recall, latency_mean e latency_median; e as janelas com
+        detected e latency
+    """
+    labels = labels.copy()
+    alert_start = alerts['start'].to_numpy()
+    alert_end = alerts['end'].to_numpy()
+    alert_source = alerts['source'].to_numpy()
+
+    label_start = labels['start'].to_numpy()
+    label_end = labels['end'].to_numpy() - 1 + grace
+    label_source = labels['source'].to_numpy()
+
+    # Matriz (alerta, janela) de sobreposição na mesma fonte
+    overlap = ((alert_source[:, None] == label_source[None, :]) &
+               (alert_start[:, None] <= label_end[None, :]) &
+               (alert_end[:, None] >= label_start[None, :]))
+
+    true_alerts = int(overlap.any(axis=1).sum())
+    detected = overlap.any(axis=0)
+    first_start = np.where(overlap, alert_start[:, None], np.iinfo(np.int64).max).min(axis=0) \
+        if len(alerts) else np.full(len(labels), np.iinfo(np.int64).max)
+    latency = np.where(detected, np.maximum(first_start - label_start, 0), np.nan)
+
+    labels['detected'] = detected
+    labels['latency'] = latency
+    summary = {
+        'alerts': int(len(alerts)),
+        'true_alerts': true_alerts,
+        'precision': true_alerts / len(alerts) if len(alerts) else None,
+        'windows': int(len(labels)),
+        'detected': int(detected.sum()),
+        'recall': float(detected.mean()) if len(labels) else None,
+        'latency_mean': float(np.nanmean(latency)) if detected.any() else None,
+        'latency_median': float(np.nanmedian(latency)) if detected.any() else None
+    }
+    return summary, labels
+
+
+class Replay:
+    """
+    Reprodução headless do histórico pelas regras de alerta
+
+    As regras são causais (cada minuto só usa dados até ele), então o
+    histórico inteiro é avaliado de uma vez pelo RuleSet vetorizado e o
+    resultado é idêntico a alimentar minuto a minuto; com `speed` os
+    eventos são emitidos no ritmo do relógio (ex.: 60 = 1 minuto de
+    dados por segundo). A janela 'total' é acumulada desde o início de
+    cada dia, como nos exports diários que os dashboards leem.
+    """
+
+    def __init__(self, rules, data):
+        self.rules = rules
+        self.volumes, self.statuses, self.sources, self.days = data.tensor()
+        self.value, self.total = rules.metric_values(self.volumes, self.statuses, running_total=True)
+
+    @property
+    def minutes(self):
+        return len(self.sources) * MINUTES_PER_DAY
+
+    def run(self, thresholds=None):
+        """Episódios de alerta com os limites do arquivo (ou os informados)"""
+        fired = self.rules.compare(self.value, self.total, self.sources, thresholds)
+        return episodes(fired, self.sources, self.days, self.rules.rules, self.value)
+
+    def sweep(self, rule, values, labels=None, grace=DEFAULT_GRACE):
+        """
+        Varre limites de uma regra reaproveitando o tensor de métricas
+
+        Args:
+            rule: Nome da regra
+            values: Limites testados
+            labels: Janelas rotuladas (None = só contagem de alertas)
+
+        Returns:
+            DataFrame com threshold e as métricas de score()
+        """
+        index = self.rules.names.index(rule)
+        rows = []
+        for value in values:
+            thresholds = self.rules.threshold.copy()
+            thresholds[index] = value
+            alerts = self.run(thresholds)
+            alerts = alerts[alerts['rule'] == rule]
+            summary = score(alerts, labels, grace)[0] if labels is not None else {'alerts': len(alerts)}
+            rows.append({'threshold': value, **summary})
+        return pd.DataFrame(rows)
+
+    def stream(self, alerts, speed, emit):
+        """
+        Emite início e fim dos alertas no ritmo do relógio
+
+        Args:
+            alerts: Saída de run()
+            speed: Minutos de dados por minuto de relógio (ex.: 60 = 1 min/s)
+            emit: Função chamada com (evento, alerta)
+        """
+        events = pd.concat([
+            alerts.assign(event='raised', at=alerts['start']),
+            alerts.assign(event='cleared', at=alerts['end'] + 1)
+        ]).sort_values(['at', 'event'], kind='stable')
+        origin = time.perf_counter()
+        first = int(events['at'].min()) if len(events) else 0
+        for alert in events.itertuples():
+            delay = (alert.at - first) * 60 / speed - (time.perf_counter() - origin)
+            if delay > 0:
+                time.sleep(delay)
+            emit(alert.event, alert)
+
+
+def parse_values(text):
+    """'10,12,15' ou 'início:fim:passo' (fim inclusivo)"""
+    if ':' in text:
+        start, stop, step = (float(part) for part in text.split(':'))
+        return list(np.round(np.arange(start, stop + step / 2, step), 6))
+    return [float(part) for part in text.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay headless do histórico pelas regras de alerta")
+    parser.add_argument('--csv', action='append', default=[], metavar='[FONTE=]CSV',
+                        help="CSV de transações (coluna 'date' opcional); pode repetir")
+    parser.add_argument('--table', action='append', default=[],
+                        help="Fonte do alert_data.db (rollup de 1 minuto); pode repetir")
+    parser.add_argument('--day', default=None, help="Data dos CSVs/tabelas sem coluna 'date'")
+    parser.add_argument('--rules', default=RULES_PATH, help="Arquivo JSON de regras")
+    parser.add_argument('--labels', default=None, help="Janelas rotuladas (anomaly_windows.csv)")
+    parser.add_argument('--grace', type=int, default=DEFAULT_GRACE,
+                        help="Minutos após a janela em que um alerta ainda conta")
+    parser.add_argument('--speed', type=float, default=0,
+                        help="Minutos de dados por minuto de relógio (0 = o mais rápido possível)")
+    parser.add_argument('--sweep', default=None, metavar='REGRA=VALORES',
+                        help="Varrer limites de uma regra (ex.: denied_rate=10:20:1)")
+    parser.add_argument('--out', default=None, help="Gravar a linha do tempo de alertas em CSV")
+    parser.add_argument('--json', action='store_true', help="Resumo em JSON")
+    args = parser.parse_args(argv)
+
+    if not args.csv and not args.table:
+        parser.error("informe ao menos um --csv ou --table")
+
+    load_start = time.perf_counter()
+    data = ReplayData()
+    for item in args.csv:
+        source, _, path = item.rpartition('=')
+        data.add_csv(path, source or None, args.day)
+    for table in args.table:
+        data.add_table(table, day=args.day)
+    rules = RuleSet.from_file(args.rules)
+    labels = load_labels(args.labels) if args.labels else None
+    load_elapsed = time.perf_counter() - load_start
+
+    start = time.perf_counter()
+    replay = Replay(rules, data)
+    if labels is not None:
+        labels = labels[labels['source'].isin(replay.sources)]
+
+    if args.sweep:
+        rule, _, values = args.sweep.partition('=')
+        result = replay.sweep(rule, parse_values(values), labels, args.grace)
+        elapsed = time.perf_counter() - start
+        print(result.to_json(orient='records') if args.json else result.to_string(index=False))
+        print(f"🔁 {replay.minutes:,} minutos x {len(result)} limites em {elapsed * 1000:.0f} ms",
+              file=sys.stderr)
+        return 0
+
+    alerts = replay.run()
+    elapsed = time.perf_counter() - start
+
+    if args.speed > 0:
+        def emit(event, alert):
+            icon = '🚨' if event == 'raised' else '✅'
+            print(f"{icon} dia {alert.day} {format_minutes([alert.at])[0]} {alert.source} "
+                  f"{alert.rule}: {alert.message}", flush=True)
+        replay.stream(alerts, args.speed, emit)
+    elif not args.json:
+        print(alerts.to_string(index=False) if len(alerts) else "✅ Nenhum alerta")
+
+    summary = {
+        'sources': sorted(set(replay.sources)),
+        'days': int(len(set(replay.days.tolist()))),
+        'minutes': replay.minutes,
+        'load_seconds': round(load_elapsed, 3),
+        'replay_seconds': round(elapsed, 4)
+    }
+    if labels is not None:
+        summary.update(score(alerts, labels, args.grace)[0])
+    else:
+        summary['alerts'] = int(len(alerts))
+
+    if args.out:
+        alerts.to_csv(args.out, index=False)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print(f"🔁 {summary['minutes']:,} minutos ({summary['days']} dias, {len(summary['sources'])} fontes) "
+              f"reproduzidos em {elapsed * 1000:.1f} ms (leitura {load_elapsed:.2f}s)")
+        if labels is not None:
+            precision = summary['precision']
+            recall = summary['recall']
+            print(f"🎯 precisão {precision:.1%} ({summary['true_alerts']}/{summary['alerts']} alertas)"
+                  if precision is not None else "🎯 precisão: sem alertas")
+            print(f"🎯 cobertura {recall:.1%} ({summary['detected']}/{summary['windows']} janelas)"
+                  if recall is not None else "🎯 cobertura: sem janelas rotuladas")
+            if summary['latency_median'] is not None:
+                print(f"⏱️ latência média {summary['latency_mean']:.1f} min, "
+                      f"mediana {summary['latency_median']:.1f} min")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
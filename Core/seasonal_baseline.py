@@ -0,0 +1,468 @@
+import os
+import sys
+import json
+import argparse
+import warnings
+from datetime import date
+import numpy as np
+import pandas as pd
+from db_access import PROJECT_ROOT, read_sql
+from transaction_store import (
+    STATUS_CATEGORIES, MINUTES_PER_DAY, parse_minutes, format_minutes, find_count_column
+)
+from status_engine import StatusEngine
+
+
+BASELINE_PATH = os.path.join(PROJECT_ROOT, 'Alert_Incident', 'seasonal_baseline.npz')
+
+# Canal extra com o volume total do minuto (queda de volume = indisponibilidade)
+TOTAL_CHANNEL = 'total'
+
+# Direção ruim de cada canal: +1 quando subir é ruim, -1 quando cair é ruim
+BAD_DIRECTION = {'approved': -1, TOTAL_CHANNEL: -1}
+
+# Fator que torna o MAD comparável ao desvio padrão de uma normal
+MAD_SCALE = 1.4826
+
+DEVIATION_COLUMNS = ['source', 'minute', 'time', 'channel', 'value', 'median', 'z', 'severity']
+
+
+def _ordinal(day):
+    return pd.Timestamp(day).date().toordinal()
+
+
+def _weekday(day):
+    return pd.Timestamp(day).weekday()
+
+
+class SeasonalBaseline:
+    """
+    Linha de base sazonal por (fonte, status, minuto do dia, dia da semana)
+
+    Guarda as últimas observações de cada chave em anéis de tamanho fixo
+    (semanas para o dia da semana, dias para o minuto do dia em geral) e
+    mantém mediana e MAD pré-calculadas. Atualizar um dia recalcula apenas
+    os minutos tocados; pontuar minutos novos é uma indexação vetorizada.
+
+    Os canais são a taxa (%) de cada status e o volume total do minuto.
+    """
+
+    def __init__(self, statuses=None, weeks=8, days=28, neighborhood=2, min_samples=5, min_std=0.5,
+                 min_status_volume=3):
+        """
+        Inicializa um índice vazio
+
+        Args:
+            statuses: Status indexados (padrão: STATUS_CATEGORIES)
+            weeks: Semanas guardadas por dia da semana
+            days: Dias guardados no índice geral (usado quando falta histórico do dia da semana)
+            neighborhood: Minutos vizinhos (±) incluídos em cada mediana
+            min_samples: Amostras mínimas para a linha de base ser usada
+            min_std: Desvio mínimo das taxas em pontos percentuais
+            min_status_volume: Transações mínimas do status no minuto para apontar alta
+        """
+        self.statuses = list(STATUS_CATEGORIES if statuses is None else statuses)
+        self.channels = self.statuses + [TOTAL_CHANNEL]
+        self.weeks = weeks
+        self.days = days
+        self.neighborhood = neighborhood
+        self.min_samples = min_samples
+        self.min_std = min_std
+        self.min_status_volume = min_status_volume
+        self.direction = np.array([BAD_DIRECTION.get(c, 1) for c in self.channels], dtype=np.float64)
+        self.sources = []
+
+        c = len(self.channels)
+        self.week_values = np.empty((0, 7, weeks, MINUTES_PER_DAY, c), dtype=np.float32)
+        self.week_slots = np.empty((0, 7, weeks), dtype=np.int64)
+        self.day_values = np.empty((0, days, MINUTES_PER_DAY, c), dtype=np.float32)
+        self.day_slots = np.empty((0, days), dtype=np.int64)
+        self.week_median = np.empty((0, 7, MINUTES_PER_DAY, c), dtype=np.float32)
+        self.week_mad = np.empty_like(self.week_median)
+        self.week_count = np.empty((0, 7, MINUTES_PER_DAY, c), dtype=np.int16)
+        self.day_median = np.empty((0, MINUTES_PER_DAY, c), dtype=np.float32)
+        self.day_mad = np.empty_like(self.day_median)
+        self.day_count = np.empty((0, MINUTES_PER_DAY, c), dtype=np.int16)
+
+    # ------------------------------------------------------------------
+    # Estrutura
+    # ------------------------------------------------------------------
+
+    def source_index(self, source, create=False):
+        """Índice da fonte nas matrizes (criando as linhas se create=True)"""
+        if source in self.sources:
+            return self.sources.index(source)
+        if not create:
+            raise KeyError(f"Fonte '{source}' sem linha de base")
+
+        c = len(self.channels)
+
+        def grow(array, shape, fill):
+            return np.concatenate([array, np.full((1,) + shape, fill, dtype=array.dtype)])
+
+        self.week_values = grow(self.week_values, (7, self.weeks, MINUTES_PER_DAY, c), np.nan)
+        self.week_slots = grow(self.week_slots, (7, self.weeks), -1)
+        self.day_values = grow(self.day_values, (self.days, MINUTES_PER_DAY, c), np.nan)
+        self.day_slots = grow(self.day_slots, (self.days,), -1)
+        self.week_median = grow(self.week_median, (7, MINUTES_PER_DAY, c), np.nan)
+        self.week_mad = grow(self.week_mad, (7, MINUTES_PER_DAY, c), np.nan)
+        self.week_count = grow(self.week_count, (7, MINUTES_PER_DAY, c), 0)
+        self.day_median = grow(self.day_median, (MINUTES_PER_DAY, c), np.nan)
+        self.day_mad = grow(self.day_mad, (MINUTES_PER_DAY, c), np.nan)
+        self.day_count = grow(self.day_count, (MINUTES_PER_DAY, c), 0)
+        self.sources.append(source)
+        return len(self.sources) - 1
+
+    def channel_values(self, volumes):
+        """
+        Converte volumes (minutos, statuses) nos canais indexados
+
+        Returns:
+            Array (minutos, canais): taxa % de cada status e volume total
+        """
+        volumes = np.asarray(volumes, dtype=np.float64)
+        total = volumes.sum(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = np.where(total > 0, volumes / total * 100, np.nan)
+        return np.hstack([rates, total])
+
+    # ------------------------------------------------------------------
+    # Atualização
+    # ------------------------------------------------------------------
+
+    def update(self, source, day, minutes, volumes, recompute=True):
+        """
+        Incorpora (ou substitui) minutos de um dia ao índice
+
+        Args:
+            source: Nome da fonte
+            day: Data dos minutos
+            minutes: Minuto do dia de cada linha
+            volumes: Array (minutos, statuses) de volumes
+            recompute: Recalcular mediana/MAD dos minutos tocados (False ao
+                carregar muitos dias; chame recompute() no final)
+
+        Returns:
+            Número de minutos incorporados
+        """
+        s = self.source_index(source, create=True)
+        minutes = np.asarray(minutes, dtype=np.int64) % MINUTES_PER_DAY
+        values = self.channel_values(volumes).astype(np.float32)
+        ordinal = _ordinal(day)
+        weekday = _weekday(day)
+
+        # Slot do anel: um dia novo no slot descarta o dia antigo inteiro
+        day_slot = ordinal % self.days
+        if self.day_slots[s, day_slot] != ordinal:
+            self.day_values[s, day_slot] = np.nan
+            self.day_slots[s, day_slot] = ordinal
+        self.day_values[s, day_slot, minutes] = values
+
+        week = ordinal // 7
+        week_slot = week % self.weeks
+        if self.week_slots[s, weekday, week_slot] != week:
+            self.week_values[s, weekday, week_slot] = np.nan
+            self.week_slots[s, weekday, week_slot] = week
+        self.week_values[s, weekday, week_slot, minutes] = values
+
+        if recompute:
+            self._recompute(s, weekday, minutes)
+        return len(minutes)
+
+    def _neighbors(self, minutes):
+        offsets = np.arange(-self.neighborhood, self.neighborhood + 1)
+        return (np.asarray(minutes)[:, np.newaxis] + offsets) % MINUTES_PER_DAY
+
+    @staticmethod
+    def _robust(samples):
+        """Mediana, MAD e contagem ao longo do último eixo (ignorando NaN)"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            median = np.nanmedian(samples, axis=-1)
+            mad = np.nanmedian(np.abs(samples - median[..., np.newaxis]), axis=-1)
+        count = np.count_nonzero(~np.isnan(samples), axis=-1)
+        return median, mad, count
+
+    def _recompute(self, s, weekday, minutes):
+        """Recalcula as estatísticas dos minutos afetados (e seus vizinhos)"""
+        touched = np.unique(self._neighbors(minutes))
+        window = self._neighbors(touched)                     # (m, 2r+1)
+
+        # (slots, m, 2r+1, c) -> (m, c, slots * (2r+1))
+        samples = self.week_values[s, weekday][:, window]
+        samples = samples.transpose(1, 3, 0, 2).reshape(len(touched), len(self.channels), -1)
+        median, mad, count = self._robust(samples)
+        self.week_median[s, weekday, touched] = median
+        self.week_mad[s, weekday, touched] = mad
+        self.week_count[s, weekday, touched] = count
+
+        samples = self.day_values[s][:, window]
+        samples = samples.transpose(1, 3, 0, 2).reshape(len(touched), len(self.channels), -1)
+        median, mad, count = self._robust(samples)
+        self.day_median[s, touched] = median
+        self.day_mad[s, touched] = mad
+        self.day_count[s, touched] = count
+
+    def recompute(self):
+        """Recalcula todas as estatísticas (após cargas com recompute=False)"""
+        all_minutes = np.arange(MINUTES_PER_DAY)
+        for s in range(len(self.sources)):
+            for weekday in range(7):
+                self._recompute(s, weekday, all_minutes)
+
+    # ------------------------------------------------------------------
+    # Pontuação
+    # ------------------------------------------------------------------
+
+    def lookup(self, source, day, minutes):
+        """
+        Mediana, escala robusta e contagem das chaves (fonte, dia da semana, minuto)
+
+        Usa a linha de base do dia da semana quando ela tem amostras
+        suficientes e, caso contrário, a do minuto do dia em geral.
+
+        Returns:
+            Tupla (mediana, escala, contagem), arrays (minutos, canais)
+        """
+        s = self.source_index(source)
+        minutes = np.asarray(minutes, dtype=np.int64) % MINUTES_PER_DAY
+        weekday = _weekday(day)
+
+        week_count = self.week_count[s, weekday, minutes]
+        use_week = week_count >= self.min_samples
+        median = np.where(use_week, self.week_median[s, weekday, minutes], self.day_median[s, minutes])
+        mad = np.where(use_week, self.week_mad[s, weekday, minutes], self.day_mad[s, minutes])
+        count = np.where(use_week, week_count, self.day_count[s, minutes])
+        return median.astype(np.float64), MAD_SCALE * mad.astype(np.float64), count
+
+    def score(self, source, day, minutes, volumes):
+        """
+        z-score robusto de cada minuto e canal contra a linha de base
+
+        O desvio mínimo das taxas é o ruído binomial esperado para o volume
+        do minuto; o do volume total é o ruído de Poisson da mediana.
+
+        Returns:
+            Tupla (valores, medianas, z), arrays (minutos, canais); z é NaN
+            onde não há amostras suficientes
+        """
+        values = self.channel_values(volumes)
+        median, scale, count = self.lookup(source, day, minutes)
+
+        total = np.maximum(values[:, -1:], 1.0)
+        # Com mediana 0 (status raros) o ruído é o de uma transação no minuto
+        p = np.clip(np.nan_to_num(median[:, :-1]) / 100, 1 / total, 1.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate_floor = np.sqrt(p * (1 - p) / total) * 100
+        floor = np.hstack([
+            np.maximum(rate_floor, self.min_std),
+            np.sqrt(np.maximum(np.nan_to_num(median[:, -1:]), 1.0))
+        ])
+
+        with np.errstate(invalid='ignore'):
+            z = (values - median) / np.maximum(np.nan_to_num(scale), floor)
+        z[count < self.min_samples] = np.nan
+        return values, median, z
+
+    def deviations(self, source, day, minutes, volumes, z_threshold=4.0):
+        """
+        Minutos e canais que desviam da linha de base na direção ruim
+
+        Returns:
+            DataFrame (colunas DEVIATION_COLUMNS) ordenado por minuto
+        """
+        minutes = np.asarray(minutes, dtype=np.int64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        values, median, z = self.score(source, day, minutes, volumes)
+        enough = np.hstack([
+            (self.direction[:-1] < 0) | (volumes >= self.min_status_volume),
+            np.ones((len(volumes), 1), dtype=bool)
+        ])
+        with np.errstate(invalid='ignore'):
+            flagged = (z * self.direction >= z_threshold) & enough
+        rows, cols = np.nonzero(flagged)
+        severity = np.where(np.abs(z[rows, cols]) >= 2 * z_threshold, 'critical', 'warning')
+        return pd.DataFrame({
+            'source': source,
+            'minute': minutes[rows],
+            'time': format_minutes(minutes[rows]),
+            'channel': np.array(self.channels, dtype=object)[cols],
+            'value': values[rows, cols].round(2),
+            'median': median[rows, cols].round(2),
+            'z': z[rows, cols].round(2),
+            'severity': severity
+        }, columns=DEVIATION_COLUMNS)
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    _ARRAYS = (
+        'week_values', 'week_slots', 'day_values', 'day_slots',
+        'week_median', 'week_mad', 'week_count', 'day_median', 'day_mad', 'day_count'
+    )
+
+    def save(self, path=BASELINE_PATH):
+        """Grava o índice em .npz (escrita atômica)"""
+        meta = {
+            'statuses': self.statuses, 'sources': self.sources, 'weeks': self.weeks,
+            'days': self.days, 'neighborhood': self.neighborhood,
+            'min_samples': self.min_samples, 'min_std': self.min_std,
+            'min_status_volume': self.min_status_volume
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)),
+                     **{name: getattr(self, name) for name in self._ARRAYS})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=BASELINE_PATH):
+        """Carrega um índice gravado com save()"""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            baseline = cls(meta['statuses'], meta['weeks'], meta['days'], meta['neighborhood'],
+                           meta['min_samples'], meta['min_std'], meta['min_status_volume'])
+            baseline.sources = list(meta['sources'])
+            for name in cls._ARRAYS:
+                setattr(baseline, name, data[name])
+        return baseline
+
+
+def daily_matrices(csv_path, default_day=None, statuses=None, chunk_rows=500_000):
+    """
+    Volumes minuto x status de cada dia de um CSV de transações, lido em blocos
+
+    Args:
+        csv_path: CSV no formato transactions_*.csv (coluna 'date' opcional)
+        default_day: Data usada quando o CSV não tem a coluna 'date'
+        statuses: Ordem dos status nas colunas
+
+    Returns:
+        Dict data -> array (1440, statuses)
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    count_column = find_count_column(header)
+    columns = ['time', 'status', count_column] + (['date'] if 'date' in header else [])
+    engine = StatusEngine(statuses)
+    default_day = pd.Timestamp(default_day or date.today()).date()
+
+    matrices = {}
+    reader = pd.read_csv(csv_path, usecols=columns, chunksize=chunk_rows,
+                         dtype={'time': 'category', 'status': 'category', 'date': 'category'})
+    for chunk in reader:
+        minute_lookup = parse_minutes(chunk['time'].cat.categories.astype(str))
+        minutes = minute_lookup[chunk['time'].cat.codes.to_numpy()]
+        codes = engine.encode(chunk['status'])
+        weights = chunk[count_column].to_numpy(dtype=np.float64)
+
+        if 'date' in chunk:
+            day_codes = chunk['date'].cat.codes.to_numpy()
+            days = [pd.Timestamp(d).date() for d in chunk['date'].cat.categories]
+        else:
+            day_codes = np.zeros(len(chunk), dtype=np.int64)
+            days = [default_day]
+
+        for i, day in enumerate(days):
+            mask = day_codes == i
+            if not mask.any():
+                continue
+            counts = engine.counts(codes[mask], weights[mask], minutes[mask], MINUTES_PER_DAY)
+            previous = matrices.get(day)
+            if previous is not None and previous.shape[1] < counts.shape[1]:
+                previous = np.pad(previous, ((0, 0), (0, counts.shape[1] - previous.shape[1])))
+            matrices[day] = counts if previous is None else previous + counts
+
+    k = len(engine.statuses)
+    return {day: np.pad(m, ((0, 0), (0, k - m.shape[1]))) for day, m in matrices.items()}
+
+
+def build_from_csv(sources, default_day=None, baseline=None):
+    """
+    Constrói (ou completa) o índice a partir de CSVs de histórico
+
+    Args:
+        sources: Dict fonte -> caminho do CSV
+        default_day: Data dos CSVs sem coluna 'date'
+        baseline: Índice existente (padrão: novo)
+
+    Returns:
+        SeasonalBaseline
+    """
+    baseline = baseline or SeasonalBaseline()
+    minutes = np.arange(MINUTES_PER_DAY)
+    for source, csv_path in sources.items():
+        for day, matrix in sorted(daily_matrices(csv_path, default_day, baseline.statuses).items()):
+            observed = matrix.sum(axis=1) > 0
+            baseline.update(source, day, minutes[observed], matrix[observed, :len(baseline.statuses)],
+                            recompute=False)
+    baseline.recompute()
+    return baseline
+
+
+def rollup_matrix(source, statuses, db_name='alert_data'):
+    """Volumes minuto x status de uma fonte lidos do rollup_1m"""
+    rollup = read_sql(db_name, "SELECT bucket, status, count FROM rollup_1m WHERE source = ?",
+                      params=(source,), label="baseline rollup")
+    pivot = rollup.pivot(index='bucket', columns='status', values='count').fillna(0)
+    pivot = pivot.reindex(columns=statuses, fill_value=0)
+    return pivot.index.to_numpy(dtype=np.int64) % MINUTES_PER_DAY, pivot.to_numpy(dtype=np.float64)
+
+
+def update_from_rollups(baseline, day=None, sources=('transactions_1', 'transactions_2'), db_name='alert_data'):
+    """Incorpora ao índice o dia ingerido no alert_data.db (atualização incremental)"""
+    day = day or date.today()
+    written = 0
+    for source in sources:
+        minutes, volumes = rollup_matrix(source, baseline.statuses, db_name)
+        if len(minutes):
+            written += baseline.update(source, day, minutes, volumes)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Linha de base sazonal (mediana/MAD por minuto do dia)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Construir a partir de CSVs de histórico")
+    build_parser.add_argument('--source', action='append', required=True, metavar='FONTE=CSV',
+                              help="Fonte e CSV (ex.: transactions_1=/tmp/carga/transactions_1.csv)")
+    build_parser.add_argument('--day', default=None, help="Data dos CSVs sem coluna 'date'")
+
+    update_parser = subparsers.add_parser('update', help="Incorporar o dia ingerido no alert_data.db")
+    update_parser.add_argument('--day', default=None, help="Data dos dados ingeridos (padrão: hoje)")
+
+    score_parser = subparsers.add_parser('score', help="Pontuar o dia ingerido no alert_data.db")
+    score_parser.add_argument('--day', default=None, help="Data dos dados ingeridos (padrão: hoje)")
+    score_parser.add_argument('--z', type=float, default=4.0, help="Limite de z-score")
+
+    for sub in (build_parser, update_parser, score_parser):
+        sub.add_argument('--path', default=BASELINE_PATH, help="Arquivo do índice")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        sources = dict(item.split('=', 1) for item in args.source)
+        baseline = build_from_csv(sources, args.day)
+        baseline.save(args.path)
+        print(f"📐 Linha de base de {', '.join(baseline.sources)} gravada em {args.path}")
+        return 0
+
+    baseline = SeasonalBaseline.load(args.path)
+    if args.command == 'update':
+        written = update_from_rollups(baseline, args.day)
+        baseline.save(args.path)
+        print(f"📐 {written} minutos incorporados à linha de base")
+        return 0
+
+    day = args.day or date.today()
+    for source in baseline.sources:
+        minutes, volumes = rollup_matrix(source, baseline.statuses)
+        found = baseline.deviations(source, day, minutes, volumes, args.z)
+        print(f"📐 {source}: {len(found)} desvios")
+        if len(found):
+            print(found.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
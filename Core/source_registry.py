@@ -0,0 +1,279 @@
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import pandas as pd
+from db_access import read_sql
+from integrated_analysis import SOURCE_TABLES, database_signature
+from event_store import EVENT_TABLE, EVENT_COLUMNS, read_events
+
+
+# Segundos máximos de espera por fonte em load()
+LOAD_TIMEOUT = 10.0
+
+# Threads de carregamento compartilhadas por todas as fontes
+MAX_WORKERS = 8
+
+# Colunas mínimas de cada tabela conhecida
+TABLE_SCHEMAS = {
+    'data_table': ['time', 'today', 'yesterday', 'same_day_last_week', 'avg_last_week', 'avg_last_month'],
+    'data_table_1': ['time', 'today', 'yesterday', 'same_day_last_week', 'avg_last_week', 'avg_last_month'],
+    'data_table_2': ['time', 'today', 'yesterday', 'same_day_last_week', 'avg_last_week', 'avg_last_month'],
+    'transactions_1': ['time', 'status'],
+    'transactions_2': ['time', 'status'],
+    EVENT_TABLE: EVENT_COLUMNS
+}
+
+STATUS_COLUMNS = ['source', 'state', 'rows', 'elapsed_ms', 'loaded_at', 'error', 'description']
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class DataSource:
+    """
+    Fonte de dados declarada no registro
+
+    loader() devolve um DataFrame; columns são as colunas obrigatórias
+    (validadas após cada carga); freshness() devolve uma assinatura
+    barata (ex.: mtime/tamanho do banco) — enquanto ela não muda, o
+    DataFrame carregado é reaproveitado. Sem freshness a fonte é
+    recarregada a cada pedido.
+    """
+
+    def __init__(self, name, loader, columns=None, freshness=None, timeout=LOAD_TIMEOUT, description=''):
+        self.name = name
+        self.loader = loader
+        self.columns = list(columns or [])
+        self.freshness = freshness
+        self.timeout = timeout
+        self.description = description
+
+    def signature(self):
+        """Assinatura atual (None = sem verificação de frescor)"""
+        return self.freshness() if self.freshness is not None else None
+
+    def check_schema(self, df):
+        """Levanta ValueError se faltar alguma coluna declarada"""
+        missing = [column for column in self.columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"Colunas ausentes em '{self.name}': {', '.join(missing)}")
+
+
+class SourceRegistry:
+    """
+    Registro de fontes com carregamento sob demanda, concorrente e em cache
+
+    Nada é carregado no registro: cada página pede apenas as fontes que
+    vai exibir (load/get). As cargas pendentes rodam juntas num pool de
+    threads e cada fonte espera no máximo o seu timeout, então o tempo
+    de um pedido é o da fonte mais lenta, não a soma de todas. Uma fonte
+    que estoura o timeout continua carregando em segundo plano e fica
+    disponível no pedido seguinte; enquanto isso (ou após um erro) é
+    devolvida a última versão carregada, se houver.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self.sources = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='source-loader')
+
+    def register(self, name, loader, columns=None, freshness=None, timeout=LOAD_TIMEOUT, description=''):
+        """
+        Registra (ou substitui) uma fonte
+
+        Args:
+            name: Chave da fonte
+            loader: Função sem argumentos que devolve um DataFrame
+            columns: Colunas obrigatórias
+            freshness: Função sem argumentos que devolve a assinatura do dado
+            timeout: Segundos máximos de espera em load()
+            description: Texto exibido no status
+
+        Returns:
+            DataSource registrada
+        """
+        source = DataSource(name, loader, columns, freshness, timeout, description)
+        with self._lock:
+            self.sources[name] = source
+            self._entries.pop(name, None)
+        return source
+
+    def _entry(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self._entries[name] = {
+                'frame': None, 'signature': None, 'future': None, 'pending': None,
+                'state': 'idle', 'rows': 0, 'elapsed_ms': None, 'loaded_at': None, 'error': None
+            }
+        return entry
+
+    def _run(self, source, signature):
+        start = time.perf_counter()
+        try:
+            frame = source.loader()
+            source.check_schema(frame)
+        except Exception as e:
+            with self._lock:
+                entry = self._entry(source.name)
+                entry.update(state='error', error=f"{type(e).__name__}: {e}",
+                             elapsed_ms=(time.perf_counter() - start) * 1000)
+            raise
+        with self._lock:
+            entry = self._entry(source.name)
+            entry.update(frame=frame, signature=signature, state='ok', rows=len(frame), error=None,
+                         elapsed_ms=(time.perf_counter() - start) * 1000,
+                         loaded_at=datetime.now().strftime(TIME_FORMAT))
+        return frame
+
+    def prefetch(self, names=None):
+        """
+        Dispara (sem esperar) a carga das fontes desatualizadas
+
+        Fontes cuja assinatura não mudou não são recarregadas, e uma carga
+        já em andamento para a mesma assinatura é reaproveitada.
+
+        Returns:
+            dict nome -> (future ou None se o cache vale, instante do disparo)
+        """
+        started = {}
+        for name in (self.sources if names is None else names):
+            source = self.sources[name]
+            try:
+                signature = source.signature()
+            except Exception:
+                signature = None
+            with self._lock:
+                entry = self._entry(name)
+                if source.freshness is not None and entry['frame'] is not None and entry['signature'] == signature:
+                    entry['state'] = 'cached'
+                    started[name] = (None, time.monotonic())
+                    continue
+                future = entry['future']
+                if future is None or future.done() or entry['pending'] != signature or source.freshness is None:
+                    future = entry['future'] = self._executor.submit(self._run, source, signature)
+                    entry['pending'] = signature
+                    entry['state'] = 'loading'
+                started[name] = (future, time.monotonic())
+        return started
+
+    def load(self, names=None, timeout=None):
+        """
+        Carrega as fontes pedidas em paralelo
+
+        Args:
+            names: Fontes (padrão: todas as registradas)
+            timeout: Sobrepõe o timeout de cada fonte
+
+        Returns:
+            dict nome -> DataFrame (vazio se a fonte falhou sem versão anterior)
+        """
+        started = self.prefetch(names)
+        results = {}
+        for name, (future, submitted) in started.items():
+            source = self.sources[name]
+            if future is not None:
+                limit = source.timeout if timeout is None else timeout
+                try:
+                    future.result(timeout=max(submitted + limit - time.monotonic(), 0))
+                except FutureTimeout:
+                    with self._lock:
+                        entry = self._entry(name)
+                        if not future.done():
+                            entry.update(state='timeout', error=f"Sem resposta em {limit:g}s (segue carregando)")
+                except Exception:
+                    pass
+            with self._lock:
+                frame = self._entry(name)['frame']
+            results[name] = frame if frame is not None else pd.DataFrame(columns=source.columns)
+        return results
+
+    def get(self, name, timeout=None):
+        """DataFrame de uma fonte (ver load)"""
+        return self.load([name], timeout)[name]
+
+    def errors(self, names=None):
+        """dict nome -> mensagem das fontes cuja última carga falhou ou estourou o timeout"""
+        with self._lock:
+            return {name: entry['error'] for name, entry in self._entries.items()
+                    if entry['error'] and (names is None or name in names)}
+
+    def status(self):
+        """
+        Situação de cada fonte registrada
+
+        Returns:
+            DataFrame com source, state (idle/loading/ok/cached/timeout/error),
+            rows, elapsed_ms (última carga), loaded_at, error e description
+        """
+        with self._lock:
+            rows = [{
+                'source': name, **{key: self._entry(name)[key] for key in STATUS_COLUMNS[1:-1]},
+                'description': source.description
+            } for name, source in self.sources.items()]
+        return pd.DataFrame(rows, columns=STATUS_COLUMNS)
+
+    def invalidate(self, names=None):
+        """Descarta os DataFrames em cache (a próxima carga lê de novo)"""
+        with self._lock:
+            for name in (list(self._entries) if names is None else names):
+                self._entries.pop(name, None)
+
+    def close(self):
+        """Encerra o pool (cargas em andamento terminam em segundo plano)"""
+        self._executor.shutdown(wait=False)
+
+
+def table_loader(database, table, key):
+    """Loader que lê a tabela inteira pelo pool somente leitura"""
+    return lambda: read_sql(database, f'SELECT * FROM "{table}"', label=f"source {key}")
+
+
+def default_registry(sources=None, max_workers=MAX_WORKERS):
+    """
+    Registro com os datasets da análise consolidada
+
+    Cada chave de SOURCE_TABLES vira uma fonte com frescor pela assinatura
+    do banco. Os eventos de monitoramento trazem apenas os mais recentes
+    (a tabela pode ter milhões de linhas).
+
+    Args:
+        sources: dict chave -> (banco, tabela) (padrão: SOURCE_TABLES)
+
+    Returns:
+        SourceRegistry
+    """
+    registry = SourceRegistry(max_workers)
+    for key, (database, table) in (SOURCE_TABLES if sources is None else sources).items():
+        loader = (lambda db=database: read_events(limit=500, db_name=db)) if table == EVENT_TABLE \
+            else table_loader(database, table, key)
+        registry.register(key, loader, columns=TABLE_SCHEMAS.get(table),
+                          freshness=lambda db=database: database_signature(db),
+                          description=f"{database}.{table}")
+    return registry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registro de fontes de dados (carga concorrente com timeout por fonte)")
+    parser.add_argument('sources', nargs='*', help="Fontes a carregar (padrão: todas)")
+    parser.add_argument('--timeout', type=float, default=None, help="Timeout por fonte em segundos")
+    parser.add_argument('--repeat', type=int, default=2, help="Execuções (a partir da segunda, com cache)")
+    args = parser.parse_args(argv)
+
+    registry = default_registry()
+    names = args.sources or None
+    for run in range(max(args.repeat, 1)):
+        start = time.perf_counter()
+        frames = registry.load(names, args.timeout)
+        elapsed = time.perf_counter() - start
+        print(f"⏱️ Execução {run + 1}: {len(frames)} fontes em {elapsed * 1000:.2f} ms")
+
+    print(registry.status().round(2).to_string(index=False))
+    registry.close()
+    return 0 if not registry.errors(names) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
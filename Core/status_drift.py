@@ -0,0 +1,250 @@
+import os
+import sys
+import time
+import argparse
+from datetime import date
+import numpy as np
+import pandas as pd
+from transaction_store import STATUS_CATEGORIES, MINUTES_PER_DAY, format_minutes
+
+
+DRIFT_COLUMNS = [
+    'source', 'start', 'time', 'end_time', 'volume', 'chi2', 'df', 'z', 'js',
+    'top_status', 'observed_share', 'expected_share', 'reference', 'severity'
+]
+
+# Pseudo-contagem por status na referência (status nunca vistos não explodem o qui-quadrado)
+PSEUDO_COUNT = 0.5
+
+
+def window_counts(volumes, width):
+    """
+    Volumes por janela fixa de `width` minutos
+
+    Args:
+        volumes: Array (fonte, minuto, status)
+        width: Minutos por janela (o último bloco incompleto é descartado)
+
+    Returns:
+        Array (fonte, janela, status)
+    """
+    volumes = np.asarray(volumes, dtype=np.float64)
+    n_sources, n_minutes, n_statuses = volumes.shape
+    n_windows = n_minutes // width
+    return volumes[:, :n_windows * width].reshape(n_sources, n_windows, width, n_statuses).sum(axis=2)
+
+
+def expected_volumes(baseline, sources, day, statuses):
+    """
+    Volume esperado de cada status por minuto segundo a linha de base sazonal
+
+    Taxa mediana (%) x volume total mediano do minuto; NaN onde a linha de
+    base não tem amostras suficientes ou a fonte não está indexada.
+
+    Returns:
+        Array (fonte, minuto, status)
+    """
+    expected = np.full((len(sources), MINUTES_PER_DAY, len(statuses)), np.nan)
+    if baseline is None:
+        return expected
+    minutes = np.arange(MINUTES_PER_DAY)
+    columns = [baseline.statuses.index(s) if s in baseline.statuses else None for s in statuses]
+    for i, source in enumerate(sources):
+        if source not in baseline.sources:
+            continue
+        median, _, count = baseline.lookup(source, day, minutes)
+        total = median[:, -1]
+        for j, column in enumerate(columns):
+            if column is None:
+                expected[i, :, j] = 0.0
+                continue
+            values = np.nan_to_num(median[:, column]) / 100 * total
+            expected[i, :, j] = np.where(count[:, column] >= baseline.min_samples, values, np.nan)
+    return expected
+
+
+def jensen_shannon(p, q):
+    """Divergência de Jensen-Shannon (base 2, entre 0 e 1) ao longo do último eixo"""
+    m = (p + q) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kl_p = np.where(p > 0, p * np.log2(p / m), 0.0).sum(axis=-1)
+        kl_q = np.where(q > 0, q * np.log2(q / m), 0.0).sum(axis=-1)
+    return np.clip((kl_p + kl_q) / 2, 0.0, 1.0)
+
+
+def chi2_to_z(chi2, df):
+    """Qui-quadrado -> z pela aproximação de Wilson-Hilferty (sem scipy)"""
+    df = np.maximum(df, 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (np.cbrt(chi2 / df) - (1 - 2 / (9 * df))) / np.sqrt(2 / (9 * df))
+
+
+def drift_scores(observed, reference, min_volume=30):
+    """
+    Qui-quadrado, z e Jensen-Shannon do mix observado contra a referência
+
+    Todas as janelas e fontes são pontuadas de uma vez. O qui-quadrado é
+    dividido pelo fator de sobredispersão de cada fonte (mediana de
+    chi2/df nas janelas com volume, no mínimo 1): volumes agregados por
+    linha variam bem mais que o ruído multinomial.
+
+    Args:
+        observed: Array (fonte, janela, status) com os volumes observados
+        reference: Array de mesmo formato com os volumes de referência
+            (só as proporções importam)
+        min_volume: Volume mínimo da janela para ser pontuada
+
+    Returns:
+        Dict com chi2, df, z, js, dispersion, q (proporções esperadas) e
+        contribution (parcela de cada status no qui-quadrado)
+    """
+    observed = np.asarray(observed, dtype=np.float64)
+    reference = np.nan_to_num(np.asarray(reference, dtype=np.float64))
+    n_statuses = observed.shape[-1]
+
+    n = observed.sum(axis=-1, keepdims=True)
+    q = (reference + PSEUDO_COUNT) / (reference.sum(axis=-1, keepdims=True) + PSEUDO_COUNT * n_statuses)
+    expected = n * q
+    with np.errstate(invalid='ignore', divide='ignore'):
+        contribution = np.where(expected > 0, (observed - expected) ** 2 / expected, 0.0)
+        p = np.where(n > 0, observed / n, 0.0)
+
+    present = (observed > 0) | (reference > 0)
+    df = np.maximum(present.sum(axis=-1) - 1, 1)
+    chi2 = contribution.sum(axis=-1)
+    scored = n[..., 0] >= min_volume
+
+    with np.errstate(invalid='ignore'):
+        ratio = np.where(scored, chi2 / df, np.nan)
+    dispersion = np.ones(observed.shape[0])
+    for s in range(observed.shape[0]):
+        if np.isfinite(ratio[s]).any():
+            dispersion[s] = max(1.0, float(np.nanmedian(ratio[s])))
+
+    z = chi2_to_z(chi2 / dispersion[:, None], df)
+    return {
+        'chi2': np.where(scored, chi2, np.nan),
+        'df': df,
+        'z': np.where(scored, z, np.nan),
+        'js': np.where(scored, jensen_shannon(p, q), np.nan),
+        'dispersion': dispersion,
+        'q': q,
+        'p': p,
+        'contribution': contribution
+    }
+
+
+def status_drift(volumes, sources, statuses, width=15, baseline=None, day=None,
+                 z_threshold=4.0, min_js=0.01, min_volume=30):
+    """
+    Desvio do mix de status de cada janela contra a linha de base sazonal
+
+    A referência de cada janela é o mix esperado pela linha de base
+    (quando ela cobre ao menos metade dos minutos da janela) ou, sem
+    histórico, o mix do próprio dia da fonte.
+
+    Args:
+        volumes: Array (fonte, minuto, status) — ex.: StatusAggregate.volume_matrix()
+        sources: Nome de cada fonte
+        statuses: Status de cada coluna
+        width: Minutos por janela
+        baseline: SeasonalBaseline (opcional)
+        day: Dia dos dados (define o dia da semana na linha de base)
+        z_threshold: z mínimo para marcar desvio ('critical' a partir do dobro)
+        min_js: Divergência de Jensen-Shannon mínima (tamanho do efeito)
+        min_volume: Volume mínimo da janela
+
+    Returns:
+        DataFrame com DRIFT_COLUMNS, uma linha por fonte e janela
+    """
+    volumes = np.asarray(volumes, dtype=np.float64)
+    observed = window_counts(volumes, width)
+    n_sources, n_windows, _ = observed.shape
+
+    expected = expected_volumes(baseline, sources, day or date.today(), statuses)
+    coverage = window_counts(np.isfinite(expected[..., :1]).astype(np.float64), width)[..., 0] / width
+    from_baseline = window_counts(np.nan_to_num(expected), width)
+    day_mix = np.broadcast_to(volumes.sum(axis=1, keepdims=True), observed.shape)
+    use_baseline = (coverage >= 0.5) & (from_baseline.sum(axis=-1) > 0)
+    reference = np.where(use_baseline[..., None], from_baseline, day_mix)
+
+    scores = drift_scores(observed, reference, min_volume)
+    top = scores['contribution'].argmax(axis=-1)
+    rows = np.arange(n_sources)[:, None]
+    cols = np.arange(n_windows)[None, :]
+
+    z = scores['z']
+    with np.errstate(invalid='ignore'):
+        flagged = (z >= z_threshold) & (scores['js'] >= min_js)
+    severity = np.where(flagged, np.where(z >= 2 * z_threshold, 'critical', 'warning'), None)
+
+    starts = np.arange(n_windows) * width
+    frame = pd.DataFrame({
+        'source': np.repeat(np.asarray(sources, dtype=object), n_windows),
+        'start': np.tile(starts, n_sources),
+        'time': np.tile(format_minutes(starts), n_sources),
+        'end_time': np.tile(format_minutes(starts + width - 1), n_sources),
+        'volume': observed.sum(axis=-1).ravel(),
+        'chi2': scores['chi2'].ravel(),
+        'df': scores['df'].ravel(),
+        'z': z.ravel(),
+        'js': scores['js'].ravel(),
+        'top_status': np.asarray(statuses, dtype=object)[top].ravel(),
+        'observed_share': (scores['p'][rows, cols, top] * 100).ravel(),
+        'expected_share': (scores['q'][rows, cols, top] * 100).ravel(),
+        'reference': np.where(use_baseline, 'linha de base', 'dia').ravel(),
+        'severity': severity.ravel()
+    }, columns=DRIFT_COLUMNS)
+    return frame
+
+
+def drift_summary(frame, source):
+    """
+    Resumo dos desvios de uma fonte para o painel de anomalias
+
+    Returns:
+        (severidade, mensagem) da janela com maior z, ou None sem desvios
+    """
+    drifted = frame[(frame['source'] == source) & frame['severity'].notna()]
+    if drifted.empty:
+        return None
+    worst = drifted.loc[drifted['z'].idxmax()]
+    severity = 'critical' if (drifted['severity'] == 'critical').any() else 'warning'
+    message = (f"Mudança no mix de status em {len(drifted)} janelas (maior às {worst['time']}: "
+               f"{worst['top_status']} {worst['observed_share']:.1f}% vs {worst['expected_share']:.1f}% esperado)")
+    return severity, message
+
+
+def main(argv=None):
+    from stream_aggregate import aggregate_csv
+    from transaction_ingest import ALERT_SOURCES
+    from seasonal_baseline import SeasonalBaseline, BASELINE_PATH
+
+    parser = argparse.ArgumentParser(description="Desvio do mix de status por janela (qui-quadrado / Jensen-Shannon)")
+    parser.add_argument('--width', type=int, default=15, help="Minutos por janela")
+    parser.add_argument('--day', default=None, help="Dia dos dados (dia da semana da linha de base)")
+    parser.add_argument('--z', type=float, default=4.0, help="z mínimo para marcar desvio")
+    parser.add_argument('--min-js', type=float, default=0.01, help="Jensen-Shannon mínimo")
+    parser.add_argument('--all', action='store_true', help="Listar todas as janelas")
+    args = parser.parse_args(argv)
+
+    baseline = SeasonalBaseline.load(BASELINE_PATH) if os.path.exists(BASELINE_PATH) else None
+    aggregates = {source: aggregate_csv(path) for source, path in ALERT_SOURCES.items()}
+    statuses = list(baseline.statuses if baseline else STATUS_CATEGORIES)
+    statuses += [s for a in aggregates.values() for s in a.statuses if s not in statuses]
+    volumes = np.stack([a.volume_matrix(statuses) for a in aggregates.values()])
+
+    start = time.perf_counter()
+    frame = status_drift(volumes, list(aggregates), statuses, args.width, baseline,
+                         pd.Timestamp(args.day).date() if args.day else None, args.z, args.min_js)
+    elapsed = time.perf_counter() - start
+
+    shown = frame if args.all else frame[frame['severity'].notna()]
+    print(shown.round(3).to_string(index=False) if len(shown) else "✅ Nenhum desvio no mix de status")
+    print(f"\n🧪 {len(frame)} janelas de {args.width} min "
+          f"({'linha de base sazonal' if baseline else 'mix do dia'}) em {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
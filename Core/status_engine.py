@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from transaction_store import STATUS_CATEGORIES, encode_statuses
+
+
+class StatusEngine:
+    """
+    Contagens e taxas de status ponderadas pelo volume
+
+    Os status são codificados uma única vez (códigos estáveis de
+    transaction_store) e as contagens por grupo saem de um único
+    np.bincount sobre o índice combinado grupo x status, sem
+    comparações de string por status.
+    """
+
+    def __init__(self, statuses=None):
+        """
+        Inicializa o motor
+
+        Args:
+            statuses: Dicionário de status (padrão: STATUS_CATEGORIES)
+        """
+        self.statuses = list(STATUS_CATEGORIES if statuses is None else statuses)
+
+    @property
+    def n_statuses(self):
+        return len(self.statuses)
+
+    def code(self, status):
+        """Código de um status (ValueError se desconhecido)"""
+        return self.statuses.index(status)
+
+    def encode(self, values):
+        """
+        Codifica uma coluna de status
+
+        Colunas categóricas são convertidas pelas categorias (uma
+        operação por categoria, não por linha). Status novos são
+        incorporados ao dicionário do motor.
+
+        Args:
+            values: Series/array de status
+
+        Returns:
+            Array int64 de códigos (-1 para valores ausentes)
+        """
+        if isinstance(values, pd.Series) and isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories.astype(str).to_numpy()
+            lookup, self.statuses = encode_statuses(categories, self.statuses)
+            codes = values.cat.codes.to_numpy()
+            return np.where(codes >= 0, lookup.astype(np.int64)[codes], -1)
+
+        values = pd.Series(values)
+        missing = values.isna().to_numpy()
+        codes, self.statuses = encode_statuses(values.fillna('').to_numpy(), self.statuses)
+        codes = codes.astype(np.int64)
+        codes[missing] = -1
+        return codes
+
+    def counts(self, codes, weights=None, groups=None, n_groups=None):
+        """
+        Matriz de contagens grupo x status
+
+        Args:
+            codes: Códigos de status (ver encode)
+            weights: Volume de cada linha (padrão: 1 por linha)
+            groups: Id inteiro do grupo de cada linha (0..n_groups-1)
+            n_groups: Número de grupos (padrão: max(groups) + 1)
+
+        Returns:
+            Array float64 (n_groups, n_statuses); 1D se groups for None
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        valid = codes >= 0
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+            valid &= ~np.isnan(weights)
+
+        if not valid.all():
+            codes = codes[valid]
+            weights = weights[valid] if weights is not None else None
+            groups = np.asarray(groups)[valid] if groups is not None else None
+
+        k = self.n_statuses
+        if groups is None:
+            return np.bincount(codes, weights=weights, minlength=k).astype(np.float64)
+
+        groups = np.asarray(groups, dtype=np.int64)
+        if n_groups is None:
+            n_groups = int(groups.max()) + 1 if groups.size else 0
+
+        flat = np.bincount(groups * k + codes, weights=weights, minlength=n_groups * k)
+        return flat.astype(np.float64).reshape(n_groups, k)
+
+    @staticmethod
+    def rates(counts):
+        """
+        Taxas percentuais a partir da matriz de contagens
+
+        Grupos sem volume recebem taxa 0.
+        """
+        counts = np.asarray(counts, dtype=np.float64)
+        totals = counts.sum(axis=-1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates = np.where(totals > 0, counts / totals * 100, 0.0)
+        return rates
+
+    def summarize(self, df, by=None, status_column='status', count_column='count'):
+        """
+        Volume e taxas por status, opcionalmente por grupo
+
+        Args:
+            df: DataFrame com status e volume
+            by: None, nome de coluna ou array com a chave de cada linha
+                (ex.: df['minute'] // 60 para agrupar por hora)
+            status_column: Coluna de status
+            count_column: Coluna de volume (None = uma transação por linha)
+
+        Returns:
+            DataFrame (uma linha por grupo) com o volume de cada status,
+            'total' e as taxas '<status>_rate' em %
+        """
+        codes = self.encode(df[status_column])
+        weights = df[count_column].to_numpy() if count_column else None
+
+        if by is None:
+            matrix = self.counts(codes, weights)[np.newaxis, :]
+            index = pd.Index(['total'])
+        else:
+            keys = df[by].to_numpy() if isinstance(by, str) else np.asarray(by)
+            group_ids, uniques = pd.factorize(keys, sort=True)
+            matrix = self.counts(codes, weights, group_ids, len(uniques))
+            index = pd.Index(uniques, name=by if isinstance(by, str) else None)
+
+        used = matrix.sum(axis=0) > 0
+        statuses = [s for s, u in zip(self.statuses, used) if u]
+        matrix = matrix[:, used]
+
+        result = pd.DataFrame(matrix, index=index, columns=statuses)
+        result['total'] = matrix.sum(axis=1)
+        rates = self.rates(matrix)
+        for i, status in enumerate(statuses):
+            result[f"{status}_rate"] = rates[:, i]
+        return result
+
+
+def status_volume(df, status_column='status', count_column='count'):
+    """
+    Volume total por status (Series ordenada do maior para o menor)
+
+    Substitui value_counts(), que conta linhas e ignora o volume.
+    """
+    engine = StatusEngine()
+    counts = engine.counts(engine.encode(df[status_column]), df[count_column].to_numpy())
+    volume = pd.Series(counts, index=engine.statuses, name=count_column)
+    volume = volume[volume > 0].astype(np.int64).sort_values(ascending=False)
+    volume.index.name = status_column
+    return volume
+
+
+def status_rate(volume, status):
+    """Taxa percentual de um status dado o volume por status"""
+    total = volume.sum()
+    if total == 0:
+        return 0.0
+    return float(volume.get(status, 0)) / total * 100
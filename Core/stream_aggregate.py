@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import pandas as pd
+from transaction_store import MINUTES_PER_DAY, parse_minutes, format_minutes, find_count_column
+from status_engine import StatusEngine
+from alert_store import ROLLUP_RESOLUTIONS
+
+
+# Linhas lidas por bloco; a memória de pico depende do bloco, não do arquivo
+CHUNK_ROWS = 500_000
+
+
+class StatusAggregate:
+    """
+    Volume e número de linhas por minuto do dia x status
+
+    Matrizes de tamanho fixo (1440 x status) alimentadas bloco a bloco,
+    sem guardar as linhas. Com exports de vários dias os minutos do dia
+    são somados, como no eixo "00h 00" dos gráficos.
+    """
+
+    def __init__(self, statuses=None):
+        self.engine = StatusEngine(statuses)
+        k = self.engine.n_statuses
+        self.volume = np.zeros((MINUTES_PER_DAY, k), dtype=np.int64)
+        self.rows = np.zeros((MINUTES_PER_DAY, k), dtype=np.int64)
+        self.total_rows = 0
+        self.chunks = 0
+
+    @property
+    def statuses(self):
+        return self.engine.statuses
+
+    def _grow(self):
+        """Acompanha status novos incorporados pelo motor"""
+        extra = self.engine.n_statuses - self.volume.shape[1]
+        if extra > 0:
+            padding = np.zeros((MINUTES_PER_DAY, extra), dtype=np.int64)
+            self.volume = np.hstack([self.volume, padding])
+            self.rows = np.hstack([self.rows, padding])
+
+    def add(self, minutes, status_values, counts):
+        """
+        Acumula um bloco de linhas
+
+        Args:
+            minutes: Minuto do dia de cada linha
+            status_values: Status de cada linha (strings ou categórico)
+            counts: Volume de cada linha
+        """
+        codes = self.engine.encode(status_values)
+        self._grow()
+        minutes = np.asarray(minutes, dtype=np.int64) % MINUTES_PER_DAY
+        self.volume += self.engine.counts(codes, counts, minutes, MINUTES_PER_DAY).astype(np.int64)
+        self.rows += self.engine.counts(codes, None, minutes, MINUTES_PER_DAY).astype(np.int64)
+        self.total_rows += len(codes)
+        self.chunks += 1
+
+    def volume_matrix(self, statuses):
+        """Volumes (1440, len(statuses)) na ordem pedida; status ausentes ficam zerados"""
+        matrix = np.zeros((MINUTES_PER_DAY, len(statuses)))
+        for i, status in enumerate(statuses):
+            if status in self.statuses:
+                matrix[:, i] = self.volume[:, self.statuses.index(status)]
+        return matrix
+
+    def _used_statuses(self):
+        used = self.rows.sum(axis=0) > 0
+        return [s for s, u in zip(self.statuses, used) if u], used
+
+    def frame(self):
+        """
+        Formato longo, compatível com os gráficos de distribuição
+
+        Returns:
+            DataFrame com time ("00h 00"), status (categórico), count e rows
+            (apenas combinações com linhas)
+        """
+        minute, code = np.nonzero(self.rows)
+        return pd.DataFrame({
+            'time': format_minutes(minute),
+            'status': pd.Categorical.from_codes(code, categories=self.statuses).remove_unused_categories(),
+            'count': self.volume[minute, code],
+            'rows': self.rows[minute, code],
+            'minute': minute
+        })
+
+    def totals(self):
+        """
+        Totais por status (mesmo formato de alert_store.status_totals)
+
+        Returns:
+            DataFrame indexado por status com as colunas count e rows
+        """
+        statuses, used = self._used_statuses()
+        return pd.DataFrame({
+            'count': self.volume[:, used].sum(axis=0),
+            'rows': self.rows[:, used].sum(axis=0)
+        }, index=pd.Index(statuses, name='status'))
+
+    def pivot(self, resolution='1m', value='count'):
+        """
+        Série temporal por status (mesmo formato de alert_store.rollup_pivot)
+
+        Args:
+            resolution: Chave de ROLLUP_RESOLUTIONS ('1m', '15m', '1h')
+            value: 'count' (volume) ou 'rows'
+
+        Returns:
+            DataFrame com a coluna time ("00h 00") e uma coluna por status
+        """
+        width = ROLLUP_RESOLUTIONS[resolution]
+        matrix = self.volume if value == 'count' else self.rows
+        statuses, used = self._used_statuses()
+        buckets = matrix[:, used].reshape(MINUTES_PER_DAY // width, width, -1).sum(axis=1)
+        present = self.rows.reshape(MINUTES_PER_DAY // width, width, -1).sum(axis=(1, 2)) > 0
+
+        pivot = pd.DataFrame(buckets[present], columns=pd.Index(statuses, name='status'))
+        pivot.insert(0, 'time', format_minutes(np.flatnonzero(present) * width))
+        return pivot
+
+    @classmethod
+    def from_rollup(cls, rollup):
+        """
+        Reconstrói os agregados a partir do rollup de 1 minuto
+
+        Args:
+            rollup: DataFrame de alert_store.load_rollup(conn, source, '1m')
+        """
+        aggregate = cls()
+        codes = aggregate.engine.encode(rollup['status'])
+        aggregate._grow()
+        minutes = rollup['bucket'].to_numpy(dtype=np.int64) % MINUTES_PER_DAY
+        np.add.at(aggregate.volume, (minutes, codes), rollup['count'].to_numpy(dtype=np.int64))
+        np.add.at(aggregate.rows, (minutes, codes), rollup['rows'].to_numpy(dtype=np.int64))
+        aggregate.total_rows = int(rollup['rows'].sum())
+        return aggregate
+
+
+def aggregate_csv(csv_path, chunk_rows=CHUNK_ROWS, aggregate=None):
+    """
+    Agrega um CSV de transações em blocos, com memória constante
+
+    Cada bloco é lido com tipos fixos (horário e status categóricos,
+    volume float64), convertido por categoria e somado às matrizes.
+
+    Args:
+        csv_path: CSV no formato transactions_*.csv
+        chunk_rows: Linhas por bloco
+        aggregate: StatusAggregate existente para continuar acumulando
+
+    Returns:
+        StatusAggregate
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    count_column = find_count_column(header)
+    aggregate = aggregate or StatusAggregate()
+
+    reader = pd.read_csv(
+        csv_path,
+        usecols=['time', 'status', count_column],
+        dtype={'time': 'category', 'status': 'category', count_column: 'float64'},
+        chunksize=chunk_rows
+    )
+    for chunk in reader:
+        times = chunk['time']
+        minute_lookup = parse_minutes(times.cat.categories.astype(str))
+        time_codes = times.cat.codes.to_numpy()
+        valid = time_codes >= 0
+        if not valid.all():
+            chunk = chunk[valid]
+            time_codes = time_codes[valid]
+        aggregate.add(minute_lookup[time_codes], chunk['status'], chunk[count_column].to_numpy())
+
+    return aggregate
+
+
+def file_signature(path):
+    """Assinatura (mtime, tamanho) usada como chave de cache dos agregados"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agregação em blocos de CSVs de transações")
+    parser.add_argument('csv', nargs='+', help="Arquivos CSV de transações")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Linhas por bloco")
+    args = parser.parse_args(argv)
+
+    for csv_path in args.csv:
+        tracemalloc.start()
+        start = time.perf_counter()
+        aggregate = aggregate_csv(csv_path, args.chunk_rows)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        size_mb = os.path.getsize(csv_path) / (1024 * 1024)
+        print(f"🌊 {csv_path}: {aggregate.total_rows:,} linhas ({size_mb:.1f} MB) em "
+              f"{elapsed:.2f}s, {aggregate.chunks} blocos, pico {peak / (1024 * 1024):.1f} MB")
+        print(aggregate.totals().to_string())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
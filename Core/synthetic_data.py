@@ -0,0 +1,371 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+from transaction_store import STATUS_CATEGORIES, MINUTES_PER_DAY, format_minutes
+from event_store import to_epoch
+
+
+# Participação de cada status no volume (aproximada de transactions_2.csv)
+BASE_STATUS_MIX = {
+    'approved': 0.889,
+    'denied': 0.098,
+    'failed': 0.0041,
+    'refunded': 0.0019,
+    'reversed': 0.0055,
+    'backend_reversed': 0.0012,
+    'processing': 0.0002
+}
+
+# Tipos de anomalia injetáveis: status afetado e multiplicadores
+ANOMALY_KINDS = {
+    'failed_spike': {'status': 'failed', 'factor': 25.0, 'volume': 1.0},
+    'denied_spike': {'status': 'denied', 'factor': 4.0, 'volume': 1.0},
+    'outage': {'status': None, 'factor': 1.0, 'volume': 0.1}
+}
+
+HOURLY_COLUMNS = ['time', 'today', 'yesterday', 'same_day_last_week', 'avg_last_week', 'avg_last_month']
+EVENT_COLUMNS = ['timestamp', 'source', 'event_type', 'severity', 'message', 'value']
+
+
+def daily_profile():
+    """
+    Formato diário do tráfego por minuto (média 1)
+
+    Madrugada com pouco movimento, pico no meio da tarde, como nos
+    exports reais de checkout.
+    """
+    minutes = np.arange(MINUTES_PER_DAY)
+    shape = 0.08 + np.exp(-((minutes - 15 * 60) / (4.5 * 60)) ** 2) + \
+        0.35 * np.exp(-((minutes - 10 * 60) / (1.5 * 60)) ** 2)
+    return shape / shape.mean()
+
+
+class SyntheticDataGenerator:
+    """
+    Gerador vetorizado de dados sintéticos nos formatos do projeto
+
+    Produz linhas minuto/status/volume (transactions_*.csv), tabelas
+    horárias de comparação (data_table_*) e eventos de monitoramento
+    (monitoring_events), com janelas de anomalia injetadas e rotuladas.
+    """
+
+    def __init__(self, days=1, checkouts=2, merchants=1, anomalies=0,
+                 volume_per_minute=40.0, seed=42):
+        """
+        Inicializa o gerador
+
+        Args:
+            days: Número de dias gerados
+            checkouts: Número de fontes (transactions_1..N / data_table_1..N)
+            merchants: Lojistas por checkout (multiplica o número de linhas)
+            anomalies: Número de janelas de anomalia sorteadas
+            volume_per_minute: Volume médio por minuto e lojista
+            seed: Semente do gerador aleatório
+        """
+        self.days = days
+        self.checkouts = checkouts
+        self.merchants = merchants
+        self.volume_per_minute = volume_per_minute
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.profile = daily_profile()
+        self.status_mix = np.array([BASE_STATUS_MIX[s] for s in STATUS_CATEGORIES])
+        self.status_mix = self.status_mix / self.status_mix.sum()
+        self.anomaly_windows = self.sample_anomalies(anomalies)
+
+    def sample_anomalies(self, n):
+        """
+        Sorteia janelas de anomalia
+
+        Returns:
+            DataFrame com source, kind, start e end (minutos absolutos,
+            end exclusivo) e os rótulos de dia/horário
+        """
+        if n <= 0:
+            return pd.DataFrame(columns=['source', 'kind', 'start', 'end', 'day', 'start_time', 'end_time'])
+
+        total_minutes = self.days * MINUTES_PER_DAY
+        durations = self.rng.integers(10, 91, n)
+        starts = self.rng.integers(0, np.maximum(total_minutes - durations, 1))
+        kinds = self.rng.choice(list(ANOMALY_KINDS), n)
+        sources = self.rng.integers(1, self.checkouts + 1, n)
+
+        windows = pd.DataFrame({
+            'source': [f"transactions_{s}" for s in sources],
+            'kind': kinds,
+            'start': starts,
+            'end': starts + durations
+        }).sort_values('start').reset_index(drop=True)
+        windows['day'] = windows['start'] // MINUTES_PER_DAY
+        windows['start_time'] = format_minutes(windows['start'])
+        windows['end_time'] = format_minutes(windows['end'] - 1)
+        return windows
+
+    def _anomaly_effects(self, checkout, first_minute, n_minutes):
+        """Multiplicadores de volume e de status para um bloco de minutos"""
+        volume = np.ones(n_minutes)
+        status = np.ones((n_minutes, len(STATUS_CATEGORIES)))
+        source = f"transactions_{checkout}"
+
+        for window in self.anomaly_windows.itertuples():
+            if window.source != source:
+                continue
+            start = max(window.start - first_minute, 0)
+            end = min(window.end - first_minute, n_minutes)
+            if start >= end:
+                continue
+            effect = ANOMALY_KINDS[window.kind]
+            volume[start:end] *= effect['volume']
+            if effect['status'] is not None:
+                status[start:end, STATUS_CATEGORIES.index(effect['status'])] *= effect['factor']
+
+        return volume, status
+
+    def transaction_chunks(self, checkout, chunk_days=1, count_column='count'):
+        """
+        Gera as linhas minuto/status/volume de um checkout em blocos de dias
+
+        Apenas combinações com volume > 0 viram linhas, como nos exports.
+
+        Args:
+            checkout: Número do checkout (1..checkouts)
+            chunk_days: Dias por bloco (limita o uso de memória)
+            count_column: Nome da coluna de volume (f0_ ou count)
+
+        Yields:
+            DataFrames com date (se days > 1), merchant (se merchants > 1),
+            time, status e a coluna de volume
+        """
+        k = len(STATUS_CATEGORIES)
+        status_labels = np.array(STATUS_CATEGORIES, dtype=object)
+        checkout_factor = 1.0 if checkout == 1 else 0.8
+
+        for first_day in range(0, self.days, chunk_days):
+            n_days = min(chunk_days, self.days - first_day)
+            n_minutes = n_days * MINUTES_PER_DAY
+            first_minute = first_day * MINUTES_PER_DAY
+
+            absolute = first_minute + np.arange(n_minutes)
+            weekday = (absolute // MINUTES_PER_DAY) % 7
+            weekly = np.where(weekday >= 5, 0.8, 1.0)
+            volume_effect, status_effect = self._anomaly_effects(checkout, first_minute, n_minutes)
+
+            lam = (self.volume_per_minute * checkout_factor *
+                   self.profile[absolute % MINUTES_PER_DAY] * weekly * volume_effect)
+            totals = self.rng.poisson(np.broadcast_to(lam, (self.merchants, n_minutes)))
+
+            pvals = self.status_mix * status_effect
+            pvals = pvals / pvals.sum(axis=1, keepdims=True)
+            counts = self.rng.multinomial(totals, np.broadcast_to(pvals, (self.merchants, n_minutes, k)))
+
+            # Ordem minuto -> lojista -> status, como nos exports
+            counts = counts.transpose(1, 0, 2)
+            minute_idx, merchant_idx, status_idx = np.nonzero(counts)
+            minute_abs = absolute[minute_idx]
+
+            chunk = {}
+            if self.days > 1:
+                day_labels = (pd.Timestamp('2024-01-01') +
+                              pd.to_timedelta(np.arange(first_day, first_day + n_days), unit='D'))
+                day_labels = np.asarray(day_labels.strftime('%Y-%m-%d'), dtype=object)
+                chunk['date'] = day_labels[minute_idx // MINUTES_PER_DAY]
+            if self.merchants > 1:
+                chunk['merchant'] = merchant_idx + 1
+            chunk['time'] = format_minutes(minute_abs)
+            chunk['status'] = status_labels[status_idx]
+            chunk[count_column] = counts[minute_idx, merchant_idx, status_idx]
+
+            df = pd.DataFrame(chunk)
+            yield df
+
+    def hourly_series(self, checkout):
+        """
+        Série horária de volume do checkout, com 30 dias de histórico antes do período
+
+        Returns:
+            Array (dias_totais, 24) de transações por hora
+        """
+        history_days = self.days + 30
+        hourly_profile = self.profile.reshape(24, 60).mean(axis=1)
+        weekday = np.arange(history_days) % 7
+        weekly = np.where(weekday >= 5, 0.8, 1.0)
+        # Escala das tabelas horárias reais (dezenas de transações por hora)
+        lam = (self.volume_per_minute * self.merchants * 60 / 100 *
+               hourly_profile[np.newaxis, :] * weekly[:, np.newaxis])
+        if checkout != 1:
+            lam = lam * 0.8
+        return self.rng.poisson(lam)
+
+    def hourly_comparison(self, checkout):
+        """
+        Tabela horária de comparação do último dia (formato data_table_*)
+
+        Returns:
+            DataFrame com time, today, yesterday, same_day_last_week,
+            avg_last_week e avg_last_month
+        """
+        series = self.hourly_series(checkout)
+        today = len(series) - 1
+        return pd.DataFrame({
+            'time': [f"{h:02d}h" for h in range(24)],
+            'today': series[today],
+            'yesterday': series[today - 1],
+            'same_day_last_week': series[today - 7],
+            'avg_last_week': series[today - 7:today].mean(axis=0).round(2),
+            'avg_last_month': series[today - 28:today].mean(axis=0).round(2)
+        })
+
+    def monitoring_events(self, start=None):
+        """
+        Eventos de monitoramento horários por checkout (formato monitoring_events)
+
+        A severidade reflete as janelas de anomalia que tocam cada hora.
+
+        Args:
+            start: Meia-noite do primeiro dia (padrão: `days - 1` dias antes de hoje)
+
+        Returns:
+            DataFrame com timestamp em epoch (s), pronto para event_store.EventStore.record()
+        """
+        n_hours = self.days * 24
+        hours = np.tile(np.arange(n_hours), self.checkouts)
+        checkouts = np.repeat(np.arange(1, self.checkouts + 1), n_hours)
+        hourly_profile = self.profile.reshape(24, 60).mean(axis=1)
+        values = self.rng.poisson(self.volume_per_minute * self.merchants * hourly_profile[hours % 24])
+
+        severity = np.full(len(hours), 'info', dtype=object)
+        message = np.full(len(hours), 'Transações processadas', dtype=object)
+        for window in self.anomaly_windows.itertuples():
+            checkout = int(window.source.rsplit('_', 1)[1])
+            affected = ((checkouts == checkout) &
+                        (hours >= window.start // 60) & (hours <= (window.end - 1) // 60))
+            critical = window.kind != 'denied_spike'
+            severity[affected] = 'critical' if critical else 'warning'
+            message[affected] = 'Checkout com problemas' if critical else 'Volume de negações elevado'
+
+        if start is None:
+            start = pd.Timestamp.today().normalize() - pd.Timedelta(days=self.days - 1)
+        origin = to_epoch([start])[0]
+
+        return pd.DataFrame({
+            'timestamp': origin + hours * 3600,
+            'source': [f"checkout{c}" for c in checkouts],
+            'event_type': 'transaction_count',
+            'severity': severity,
+            'message': message,
+            'value': values.astype(float)
+        })
+
+
+def count_column_for(checkout):
+    """Coluna de volume usada por cada export (transactions_1 usa f0_)"""
+    return 'f0_' if checkout == 1 else 'count'
+
+
+def write_transactions(generator, out, fmt='csv', chunk_days=1):
+    """
+    Grava as transações de todos os checkouts
+
+    Args:
+        generator: SyntheticDataGenerator
+        out: Diretório (csv) ou arquivo .db (sqlite)
+        fmt: 'csv' ou 'sqlite'
+        chunk_days: Dias por bloco gravado
+
+    Returns:
+        Número total de linhas gravadas
+    """
+    total = 0
+    conn = sqlite3.connect(out) if fmt == 'sqlite' else None
+    if conn is None:
+        os.makedirs(out, exist_ok=True)
+
+    try:
+        for checkout in range(1, generator.checkouts + 1):
+            name = f"transactions_{checkout}"
+            column = count_column_for(checkout)
+            path = os.path.join(out, f"{name}.csv") if conn is None else None
+            first = True
+
+            for chunk in generator.transaction_chunks(checkout, chunk_days, column):
+                if conn is None:
+                    chunk.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+                else:
+                    chunk.to_sql(name, conn, if_exists='replace' if first else 'append', index=False)
+                first = False
+                total += len(chunk)
+
+        labels = generator.anomaly_windows
+        if conn is None:
+            labels.to_csv(os.path.join(out, 'anomaly_windows.csv'), index=False)
+        else:
+            labels.to_sql('anomaly_windows', conn, if_exists='replace', index=False)
+            conn.commit()
+    finally:
+        if conn is not None:
+            conn.close()
+
+    return total
+
+
+def write_frames(frames, out, fmt='csv'):
+    """Grava um dict nome -> DataFrame como CSVs em um diretório ou tabelas SQLite"""
+    if fmt == 'sqlite':
+        conn = sqlite3.connect(out)
+        try:
+            for name, df in frames.items():
+                df.to_sql(name, conn, if_exists='replace', index=False)
+        finally:
+            conn.close()
+    else:
+        os.makedirs(out, exist_ok=True)
+        for name, df in frames.items():
+            df.to_csv(os.path.join(out, f"{name}.csv"), index=False)
+    return sum(len(df) for df in frames.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gerador de dados sintéticos nos formatos do projeto"
+    )
+    parser.add_argument('kind', choices=['transactions', 'hourly', 'events'],
+                        help="transactions_*.csv, data_table_* ou monitoring_events")
+    parser.add_argument('--out', required=True, help="Diretório (csv) ou arquivo .db (sqlite)")
+    parser.add_argument('--format', choices=['csv', 'sqlite'], default='csv')
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--checkouts', type=int, default=2)
+    parser.add_argument('--merchants', type=int, default=1)
+    parser.add_argument('--anomalies', type=int, default=0, help="Janelas de anomalia injetadas")
+    parser.add_argument('--volume', type=float, default=40.0, help="Volume médio por minuto e lojista")
+    parser.add_argument('--chunk-days', type=int, default=1, help="Dias por bloco gravado")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    generator = SyntheticDataGenerator(
+        days=args.days, checkouts=args.checkouts, merchants=args.merchants,
+        anomalies=args.anomalies, volume_per_minute=args.volume, seed=args.seed
+    )
+
+    start = time.perf_counter()
+    if args.kind == 'transactions':
+        rows = write_transactions(generator, args.out, args.format, args.chunk_days)
+    elif args.kind == 'hourly':
+        frames = {
+            f"data_table_{c}": generator.hourly_comparison(c)
+            for c in range(1, args.checkouts + 1)
+        }
+        rows = write_frames(frames, args.out, args.format)
+    else:
+        rows = write_frames({'monitoring_events': generator.monitoring_events()}, args.out, args.format)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {rows:,} linhas geradas em {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} linhas/s) → {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,291 @@
+import os
+import io
+import sys
+import hashlib
+import time
+import sqlite3
+import argparse
+import pandas as pd
+import alert_store
+from db_access import PROJECT_ROOT, database_path
+from transaction_store import COUNT_COLUMNS
+
+
+ALERT_DB_PATH = database_path('alert_data')
+
+# Tabela de destino -> CSV de origem
+ALERT_SOURCES = {
+    'transactions_1': os.path.join(PROJECT_ROOT, 'Alert_Incident', 'data', 'transactions_1.csv'),
+    'transactions_2': os.path.join(PROJECT_ROOT, 'Alert_Incident', 'data', 'transactions_2.csv')
+}
+
+# Bytes iniciais de dados (linhas completas) cujo hash identifica o conteúdo do arquivo
+HEAD_BYTES = 4096
+
+
+def connect_writer(db_path):
+    """
+    Abre uma conexão de escrita com WAL habilitado
+
+    Com WAL os leitores dos dashboards continuam lendo enquanto a
+    ingestão grava, sem bloqueios de "database is locked".
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class TailIngester:
+    """
+    Ingestão incremental (append-only) dos CSVs de transações no SQLite
+
+    Para cada arquivo de origem é mantido um checkpoint com o offset em
+    bytes e o número de linhas já importadas. A cada execução apenas o
+    trecho novo do arquivo é lido e inserido em uma única transação,
+    junto com a atualização dos rollups (ver alert_store.py). O checkpoint
+    também guarda a identidade do arquivo (dispositivo:inode) e o hash
+    das primeiras linhas de dados: um CSV rotacionado ou reexportado é
+    reimportado do início, mesmo que tenha o mesmo tamanho ou seja maior.
+    """
+
+    def __init__(self, db_path=ALERT_DB_PATH, sources=None):
+        """
+        Inicializa o ingestor
+
+        Args:
+            db_path: Caminho do banco SQLite de destino
+            sources: Dict tabela -> caminho do CSV (padrão: ALERT_SOURCES)
+        """
+        self.db_path = db_path
+        self.sources = dict(ALERT_SOURCES if sources is None else sources)
+
+    def _ensure_checkpoint_table(self, conn):
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                source TEXT PRIMARY KEY,
+                table_name TEXT NOT NULL,
+                header TEXT NOT NULL,
+                byte_offset INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                file_id TEXT,
+                head_bytes INTEGER,
+                head_hash TEXT,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Checkpoints gravados antes da identificação do arquivo: colunas nulas forçam a reimportação
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(ingest_checkpoints)")}
+        for name, column_type in (('file_id', 'TEXT'), ('head_bytes', 'INTEGER'), ('head_hash', 'TEXT')):
+            if name not in existing:
+                conn.execute(f"ALTER TABLE ingest_checkpoints ADD COLUMN {name} {column_type}")
+
+    def _get_checkpoint(self, conn, csv_path):
+        row = conn.execute(
+            "SELECT table_name, header, byte_offset, rows, file_id, head_bytes, head_hash "
+            "FROM ingest_checkpoints WHERE source = ?",
+            (os.path.abspath(csv_path),)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'table': row[0], 'header': row[1].split(','), 'offset': row[2], 'rows': row[3],
+                'file_id': row[4], 'head_bytes': row[5], 'head_hash': row[6]}
+
+    def _save_checkpoint(self, conn, csv_path, table, header, offset, rows, file_id, head):
+        conn.execute('''
+            INSERT INTO ingest_checkpoints (source, table_name, header, byte_offset, rows,
+                                            file_id, head_bytes, head_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(source) DO UPDATE SET
+                table_name = excluded.table_name,
+                header = excluded.header,
+                byte_offset = excluded.byte_offset,
+                rows = excluded.rows,
+                file_id = excluded.file_id,
+                head_bytes = excluded.head_bytes,
+                head_hash = excluded.head_hash,
+                updated_at = excluded.updated_at
+        ''', (os.path.abspath(csv_path), table, ','.join(header), offset, rows, file_id, *head))
+
+    def _file_id(self, csv_path):
+        """Identidade do arquivo (dispositivo:inode); muda quando o CSV é rotacionado/substituído"""
+        stat = os.stat(csv_path)
+        return f"{stat.st_dev}:{stat.st_ino}"
+
+    def _read_head(self, csv_path, data_offset, end, length=None):
+        """
+        Hash das primeiras linhas de dados
+
+        Args:
+            data_offset: Início dos dados (após o cabeçalho)
+            end: Offset máximo considerado (linhas já importadas)
+            length: Bytes a considerar (padrão: até HEAD_BYTES, cortado na última linha completa)
+
+        Returns:
+            Tupla (bytes considerados, sha1 hexadecimal)
+        """
+        with open(csv_path, 'rb') as f:
+            f.seek(data_offset)
+            chunk = f.read(min(end - data_offset, HEAD_BYTES) if length is None else length)
+        if length is None:
+            chunk = chunk[:chunk.rfind(b'\n') + 1]
+        return len(chunk), hashlib.sha1(chunk).hexdigest()
+
+    def _same_file(self, csv_path, checkpoint, data_offset, size):
+        """True se o arquivo é o mesmo do checkpoint (mesma identidade e mesmas linhas iniciais)"""
+        if checkpoint['file_id'] != self._file_id(csv_path) or checkpoint['head_bytes'] is None:
+            return False
+        if data_offset + checkpoint['head_bytes'] > size:
+            return False
+        head = self._read_head(csv_path, data_offset, size, checkpoint['head_bytes'])
+        return head == (checkpoint['head_bytes'], checkpoint['head_hash'])
+
+    def _reset_table(self, conn, table, header):
+        """Descarta o conteúdo da tabela (e seus rollups) para uma reimportação completa"""
+        alert_store.clear_source(conn, table)
+        alert_store.create_transactions_table(conn, table, header)
+
+    def _read_header(self, csv_path):
+        """Lê o cabeçalho do CSV e retorna (colunas, offset do primeiro dado)"""
+        with open(csv_path, 'rb') as f:
+            first_line = f.readline()
+        if not first_line.endswith(b'\n'):
+            return None, 0
+        header = first_line.decode('utf-8').strip().split(',')
+        return header, len(first_line)
+
+    def _read_new_rows(self, csv_path, offset, header):
+        """
+        Lê as linhas completas adicionadas após o offset
+
+        Uma última linha sem quebra de linha ainda está sendo escrita e
+        fica para a próxima execução.
+
+        Returns:
+            Tupla (DataFrame com as linhas novas, novo offset)
+        """
+        with open(csv_path, 'rb') as f:
+            f.seek(offset)
+            chunk = f.read()
+
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            return pd.DataFrame(columns=header), offset
+
+        chunk = chunk[:end + 1]
+        dtypes = {name: str for name in header if name not in COUNT_COLUMNS}
+        df = pd.read_csv(io.BytesIO(chunk), header=None, names=header, dtype=dtypes)
+        return df, offset + len(chunk)
+
+    def _ingest_source(self, conn, table, csv_path):
+        """Importa o trecho novo de um CSV; retorna o número de linhas inseridas"""
+        header, data_offset = self._read_header(csv_path)
+        if header is None:
+            return 0
+
+        checkpoint = self._get_checkpoint(conn, csv_path)
+        size = os.path.getsize(csv_path)
+
+        # Sem checkpoint, arquivo truncado, rotacionado/reexportado (outro inode ou outras
+        # linhas iniciais, mesmo com tamanho igual ou maior) ou cabeçalho diferente:
+        # o conteúdo da tabela não é confiável e a importação recomeça do início
+        if (checkpoint is None or checkpoint['table'] != table or
+                checkpoint['header'] != header or checkpoint['offset'] > size or
+                not self._same_file(csv_path, checkpoint, data_offset, size)):
+            self._reset_table(conn, table, header)
+            checkpoint = {'table': table, 'header': header, 'offset': data_offset, 'rows': 0}
+
+        if checkpoint['offset'] == size:
+            return 0
+
+        df, new_offset = self._read_new_rows(csv_path, checkpoint['offset'], header)
+        if not df.empty:
+            alert_store.insert_transactions(conn, table, df)
+
+        self._save_checkpoint(
+            conn, csv_path, table, header, new_offset, checkpoint['rows'] + len(df),
+            self._file_id(csv_path), self._read_head(csv_path, data_offset, new_offset)
+        )
+        return len(df)
+
+    def ingest_once(self):
+        """
+        Executa uma rodada de ingestão para todas as fontes
+
+        Todas as inserções de uma rodada acontecem em uma única transação.
+
+        Returns:
+            Dict tabela -> número de linhas inseridas
+        """
+        results = {}
+        conn = connect_writer(self.db_path)
+        try:
+            with conn:
+                self._ensure_checkpoint_table(conn)
+
+                # Schema antigo (sem minute/rollups): reimportar todas as fontes
+                if alert_store.migrate_schema(conn):
+                    conn.execute("DELETE FROM ingest_checkpoints")
+
+                for table, csv_path in self.sources.items():
+                    if os.path.exists(csv_path):
+                        results[table] = self._ingest_source(conn, table, csv_path)
+        finally:
+            conn.close()
+        return results
+
+    def run(self, interval=5.0, stop_event=None, on_batch=None):
+        """
+        Executa a ingestão continuamente
+
+        Args:
+            interval: Intervalo entre rodadas (segundos)
+            stop_event: threading.Event opcional para encerrar o loop
+            on_batch: Callback chamado com o resultado de cada rodada
+        """
+        while stop_event is None or not stop_event.is_set():
+            results = self.ingest_once()
+            if on_batch is not None:
+                on_batch(results)
+
+            if stop_event is not None:
+                stop_event.wait(interval)
+            else:
+                time.sleep(interval)
+
+
+def ingest_alert_sources(db_path=ALERT_DB_PATH):
+    """Rodada única de ingestão dos CSVs da Tarefa 2 no alert_data.db"""
+    return TailIngester(db_path).ingest_once()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Ingestão incremental dos CSVs de transações no alert_data.db"
+    )
+    parser.add_argument('--db', default=ALERT_DB_PATH, help="Banco SQLite de destino")
+    parser.add_argument('--watch', action='store_true', help="Executar continuamente")
+    parser.add_argument('--interval', type=float, default=5.0, help="Intervalo entre rodadas (s)")
+    args = parser.parse_args(argv)
+
+    ingester = TailIngester(args.db)
+
+    def report(results):
+        total = sum(results.values())
+        if total or not args.watch:
+            details = ', '.join(f"{table}: +{rows}" for table, rows in results.items())
+            print(f"📥 {time.strftime('%H:%M:%S')} {total} linhas importadas ({details})")
+
+    if not args.watch:
+        report(ingester.ingest_once())
+        return 0
+
+    try:
+        ingester.run(args.interval, on_batch=report)
+    except KeyboardInterrupt:
+        print("🛑 Ingestão encerrada")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
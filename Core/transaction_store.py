@@ -0,0 +1,383 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+
+# Status conhecidos - a ordem fixa garante o mesmo código em todos os arquivos
+STATUS_CATEGORIES = [
+    'approved', 'denied', 'failed', 'refunded',
+    'reversed', 'backend_reversed', 'processing'
+]
+
+# Nomes usados para a coluna de volume nos exports (transactions_1 usa f0_)
+COUNT_COLUMNS = ('f0_', 'count')
+
+MINUTES_PER_DAY = 1440
+STORE_SUFFIX = '.colstore'
+STORE_VERSION = 1
+
+# Tipos compactos de cada coluna do armazenamento
+COLUMN_DTYPES = {
+    'day': np.int32,       # dia relativo (0 = exportação mais antiga)
+    'minute': np.int16,    # minuto do dia (0-1439)
+    'status': np.uint8,    # código do status (índice em statuses)
+    'count': np.int32      # volume de transações
+}
+
+# Tabela de formatação "00h 00" para cada minuto do dia
+_TIME_LABELS = np.array(
+    [f"{m // 60:02d}h {m % 60:02d}" for m in range(MINUTES_PER_DAY)],
+    dtype=object
+)
+
+
+def parse_minutes(time_values):
+    """
+    Converte horários no formato "00h 00" (ou "00h") para minuto do dia
+
+    Cada horário distinto é interpretado uma única vez; o resultado é
+    redistribuído por índice, o que mantém o custo baixo mesmo com
+    milhões de linhas.
+
+    Args:
+        time_values: Sequência de strings de horário
+
+    Returns:
+        Array int16 com o minuto do dia de cada linha
+    """
+    values = np.asarray(time_values, dtype=str)
+    if values.size == 0:
+        return np.empty(0, dtype=COLUMN_DTYPES['minute'])
+
+    uniques, inverse = np.unique(values, return_inverse=True)
+    parts = pd.Series(uniques).str.extract(r'^\s*(\d{1,2})h\s*(\d{1,2})?\s*$')
+
+    if parts[0].isna().any():
+        invalid = uniques[parts[0].isna().to_numpy()][:3].tolist()
+        raise ValueError(f"Horário em formato inválido: {invalid}")
+
+    hours = parts[0].astype(int).to_numpy()
+    minutes = parts[1].fillna(0).astype(int).to_numpy()
+    parsed = (hours * 60 + minutes).astype(COLUMN_DTYPES['minute'])
+
+    return parsed[inverse]
+
+
+def format_minutes(minutes):
+    """
+    Converte minutos do dia de volta para o formato "00h 00"
+
+    Args:
+        minutes: Array de minutos do dia
+
+    Returns:
+        Array de strings no formato original dos CSVs
+    """
+    return _TIME_LABELS[np.asarray(minutes, dtype=np.int64) % MINUTES_PER_DAY]
+
+
+def encode_statuses(status_values, statuses=None):
+    """
+    Codifica a coluna de status como dicionário (códigos uint8)
+
+    Args:
+        status_values: Sequência de strings de status
+        statuses: Dicionário existente (lista); novos status são anexados
+
+    Returns:
+        Tupla (códigos, lista de status)
+    """
+    statuses = list(STATUS_CATEGORIES if statuses is None else statuses)
+    values = np.asarray(status_values, dtype=str)
+    if values.size == 0:
+        return np.empty(0, dtype=COLUMN_DTYPES['status']), statuses
+
+    uniques, inverse = np.unique(values, return_inverse=True)
+    lookup = np.empty(len(uniques), dtype=COLUMN_DTYPES['status'])
+
+    for i, status in enumerate(uniques):
+        status = status.strip()
+        if status not in statuses:
+            statuses.append(status)
+        lookup[i] = statuses.index(status)
+
+    if len(statuses) > np.iinfo(COLUMN_DTYPES['status']).max:
+        raise ValueError("Número de status distintos excede o limite do dicionário")
+
+    return lookup[inverse], statuses
+
+
+def find_count_column(columns):
+    """Retorna o nome da coluna de volume (f0_ ou count) presente no export"""
+    for name in COUNT_COLUMNS:
+        if name in columns:
+            return name
+    raise ValueError(f"Coluna de volume não encontrada (esperado: {', '.join(COUNT_COLUMNS)})")
+
+
+def get_store_path(csv_path):
+    """Caminho do armazenamento colunar associado a um CSV"""
+    return os.path.splitext(csv_path)[0] + STORE_SUFFIX
+
+
+class TransactionStore:
+    """
+    Armazenamento colunar e memory-mapped das transações por minuto
+
+    Cada coluna é gravada como um arquivo .npy dentro de um diretório
+    (<nome>.colstore) e aberta com mmap, então abrir o armazenamento não
+    lê os dados do disco e o uso de RAM fica restrito ao que é acessado.
+    """
+
+    def __init__(self, path, columns, statuses, meta=None):
+        """
+        Inicializa o armazenamento
+
+        Args:
+            path: Diretório do armazenamento
+            columns: Dict com os arrays de cada coluna
+            statuses: Lista de status (dicionário dos códigos)
+            meta: Metadados gravados junto aos dados
+        """
+        self.path = path
+        self.columns = columns
+        self.statuses = statuses
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(self.columns['minute'])
+
+    @property
+    def day(self):
+        return self.columns['day']
+
+    @property
+    def minute(self):
+        return self.columns['minute']
+
+    @property
+    def status(self):
+        return self.columns['status']
+
+    @property
+    def count(self):
+        return self.columns['count']
+
+    @property
+    def nbytes(self):
+        """Tamanho total dos dados em bytes"""
+        return sum(array.nbytes for array in self.columns.values())
+
+    @classmethod
+    def write(cls, path, day, minute, status, count, statuses, source=None):
+        """
+        Grava as colunas em disco de forma atômica
+
+        Args:
+            path: Diretório de destino
+            day, minute, status, count: Arrays das colunas
+            statuses: Lista de status
+            source: Metadados do arquivo de origem (caminho, mtime, tamanho)
+
+        Returns:
+            TransactionStore aberto sobre os arquivos gravados
+        """
+        arrays = {
+            'day': np.asarray(day, dtype=COLUMN_DTYPES['day']),
+            'minute': np.asarray(minute, dtype=COLUMN_DTYPES['minute']),
+            'status': np.asarray(status, dtype=COLUMN_DTYPES['status']),
+            'count': np.asarray(count, dtype=COLUMN_DTYPES['count'])
+        }
+
+        sizes = {len(array) for array in arrays.values()}
+        if len(sizes) > 1:
+            raise ValueError("Colunas com tamanhos diferentes")
+
+        tmp_path = path + '.tmp'
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+
+        meta = {
+            'version': STORE_VERSION,
+            'rows': sizes.pop() if sizes else 0,
+            'statuses': list(statuses),
+            'source': source
+        }
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        # Substituir a versão anterior apenas depois da gravação completa
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+        return cls.open(path)
+
+    @classmethod
+    def build(cls, csv_path, store_path=None, day=0):
+        """
+        Constrói o armazenamento a partir de um export CSV
+
+        Exports de vários dias (coluna date, ver synthetic_data.py) têm o
+        dia de cada linha contado a partir da primeira data do arquivo.
+
+        Args:
+            csv_path: Caminho do CSV (time, status, f0_/count e, opcional, date)
+            store_path: Diretório de destino (padrão: ao lado do CSV)
+            day: Dia relativo da primeira data (ou de todas as linhas, sem coluna date)
+
+        Returns:
+            TransactionStore aberto
+        """
+        store_path = store_path or get_store_path(csv_path)
+        df = pd.read_csv(csv_path, dtype={'time': str, 'status': str})
+        count_column = find_count_column(df.columns)
+
+        minute = parse_minutes(df['time'].to_numpy())
+        status, statuses = encode_statuses(df['status'].to_numpy())
+        count = df[count_column].fillna(0).to_numpy()
+        days = np.full(len(df), day, dtype=COLUMN_DTYPES['day'])
+        if 'date' in df.columns:
+            dates = pd.to_datetime(df['date'], errors='coerce')
+            # Datas ilegíveis ficam no dia `day`
+            offset = (dates - dates.min()).dt.days
+            days = (day + offset.fillna(0)).to_numpy().astype(COLUMN_DTYPES['day'])
+
+        stat = os.stat(csv_path)
+        source = {
+            'path': os.path.abspath(csv_path),
+            'mtime': stat.st_mtime,
+            'size': stat.st_size
+        }
+
+        return cls.write(store_path, days, minute, status, count, statuses, source=source)
+
+    @classmethod
+    def open(cls, store_path):
+        """
+        Abre um armazenamento existente via memory-map
+
+        Args:
+            store_path: Diretório do armazenamento
+
+        Returns:
+            TransactionStore com as colunas mapeadas (somente leitura)
+        """
+        with open(os.path.join(store_path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Versão do armazenamento incompatível: {meta.get('version')}")
+
+        columns = {
+            name: np.load(os.path.join(store_path, f"{name}.npy"), mmap_mode='r')
+            for name in COLUMN_DTYPES
+        }
+        return cls(store_path, columns, meta['statuses'], meta)
+
+    @staticmethod
+    def is_fresh(store_path, csv_path):
+        """Verifica se o armazenamento corresponde à versão atual do CSV"""
+        try:
+            with open(os.path.join(store_path, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            stat = os.stat(csv_path)
+        except (OSError, ValueError):
+            return False
+
+        source = meta.get('source') or {}
+        return (
+            meta.get('version') == STORE_VERSION and
+            source.get('mtime') == stat.st_mtime and
+            source.get('size') == stat.st_size
+        )
+
+    @classmethod
+    def load(cls, csv_path, store_path=None):
+        """
+        Abre o armazenamento do CSV, reconstruindo-o se estiver desatualizado
+
+        Args:
+            csv_path: Caminho do CSV de origem
+            store_path: Diretório do armazenamento (padrão: ao lado do CSV)
+
+        Returns:
+            TransactionStore aberto
+        """
+        store_path = store_path or get_store_path(csv_path)
+        if cls.is_fresh(store_path, csv_path):
+            return cls.open(store_path)
+        return cls.build(csv_path, store_path)
+
+    def status_codes(self, names):
+        """Códigos dos status informados (status ausentes são ignorados)"""
+        return [self.statuses.index(name) for name in names if name in self.statuses]
+
+    def to_frame(self, start=0, stop=None):
+        """
+        Materializa um trecho do armazenamento como DataFrame normalizado
+
+        Só as linhas [start, stop) saem do mmap; time é categórica sobre os
+        1440 rótulos do dia (códigos int16), sem uma string Python por linha.
+
+        Args:
+            start: Primeira linha
+            stop: Linha final exclusiva (padrão: até o fim)
+
+        Returns:
+            DataFrame com colunas time (categórica), status (categórica), count, minute e day
+        """
+        window = slice(start, stop)
+        minute = np.array(self.minute[window])
+        time = pd.Categorical.from_codes(minute, categories=_TIME_LABELS)
+        status = pd.Categorical.from_codes(
+            np.asarray(self.status[window], dtype=np.int16),
+            categories=self.statuses
+        ).remove_unused_categories()
+
+        return pd.DataFrame({
+            'time': time,
+            'status': status,
+            'count': np.array(self.count[window]),
+            'minute': minute,
+            'day': np.array(self.day[window])
+        })
+
+    def present_statuses(self):
+        """Status com pelo menos uma linha (contagem direto nos códigos)"""
+        counts = np.bincount(np.asarray(self.status), minlength=len(self.statuses))
+        return [name for name, n in zip(self.statuses, counts) if n]
+
+    def describe(self):
+        """
+        Estatísticas descritivas das colunas numéricas sem materializar o DataFrame
+
+        Returns:
+            DataFrame no formato de DataFrame.describe() para count, minute e day
+        """
+        return pd.DataFrame({
+            name: pd.Series(self.columns[name], copy=False).describe()
+            for name in ('count', 'minute', 'day')
+        })
+
+
+def load_transactions(csv_path):
+    """
+    Carrega um export de transações no formato normalizado
+
+    Usa o armazenamento colunar quando ele está atualizado e o reconstrói
+    automaticamente quando o CSV muda.
+
+    Args:
+        csv_path: Caminho do CSV (transactions_1.csv / transactions_2.csv)
+
+    Returns:
+        DataFrame com colunas time, status, count, minute e day
+    """
+    return TransactionStore.load(csv_path).to_frame()
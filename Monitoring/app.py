@@ -5,9 +5,34 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime, timedelta
-import sqlite3
 import time
 import os
+import sys
+import threading
+
+# Adicionar o diretório Core ao path (módulos compartilhados entre as tarefas)
+for core_path in (os.path.join(os.getcwd(), 'Core'), os.path.join(os.getcwd(), '..', 'Core')):
+    if os.path.exists(core_path):
+        core_path = os.path.abspath(core_path)
+        if core_path not in sys.path:
+            sys.path.append(core_path)
+        break
+
+from db_access import database_path, read_sql, query_stats
+from transaction_store import format_minutes
+from seasonal_baseline import SeasonalBaseline, BASELINE_PATH, rollup_matrix
+from incident_store import IncidentStore, open_incidents
+from alert_rules import SEVERITY_ICONS
+from integrated_analysis import analyze_sources, database_signature
+from health_snapshots import HealthWorker, latest_snapshot, snapshot_history
+from event_store import EventStore, EVENT_COLUMNS, read_events, read_series, event_total, schema_ready
+from notifier import NotificationDispatcher, TwilioSink, FileSink, outbox
+from forecast import VolumeForecaster, FORECAST_PATH, BREACH_COLUMNS, update_from_rollups
+from metrics_exporter import MetricsExporter, observe_render
+from source_registry import default_registry
+
+# ⏱️ Início da execução da página (tempo exportado em /metrics)
+_render_start = time.perf_counter()
 
 # Função para detectar o caminho correto dos bancos de dados
 def get_db_path(db_filename, task_folder=None):
@@ -94,148 +119,78 @@ def get_data_path(relative_path):
     return relative_path  # Retornar original se nada funcionar
 
 
-def create_alert_database_from_csv():
-    """Cria banco SQLite a partir dos CSVs da Tarefa 2"""
+def create_monitoring_table(db_path):
+    """Cria/migra a tabela de eventos de monitoramento e grava dados de exemplo (conexão de escrita)"""
+    store = EventStore(db_path)
     try:
-        task2_db_path = 'Alert_Incident/alert_data.db'
-        csv_path1 = 'Alert_Incident/data/transactions_1.csv'
-        csv_path2 = 'Alert_Incident/data/transactions_2.csv'
-        
-        conn = sqlite3.connect(task2_db_path)
-        
-        # Carregar CSV 1 se existir
-        if os.path.exists(csv_path1):
-            df1 = pd.read_csv(csv_path1)
-            df1.to_sql('transactions_1', conn, if_exists='replace', index=False)
-        
-        # Carregar CSV 2 se existir
-        if os.path.exists(csv_path2):
-            df2 = pd.read_csv(csv_path2)
-            df2.to_sql('transactions_2', conn, if_exists='replace', index=False)
-        
-        conn.close()
-        
-    except Exception as e:
-        # Se houver erro, não quebrar a aplicação
-        pass
-
-
-def load_integrated_data():
-    """Carrega dados integrados de todas as tarefas via SQLite - versão ultra-robusta sem cache"""
-    data = {
-        'checkout1': pd.DataFrame(),
-        'checkout2': pd.DataFrame(),
-        'general': pd.DataFrame(),
-        'monitoring_logs': pd.DataFrame(),
-        'alert_transactions_1': pd.DataFrame(),
-        'alert_transactions_2': pd.DataFrame()
-    }
-    
-    # Carregar dados da Tarefa 1 (Analyze_data) 
-    try:
-        task1_db_path = 'Analyze_data/data.db'
-        if os.path.exists(task1_db_path):
-            conn1 = sqlite3.connect(task1_db_path)
-            try:
-                data['checkout1'] = pd.read_sql_query("SELECT * FROM data_table_1", conn1)
-            except Exception:
-                pass
-            try:
-                data['checkout2'] = pd.read_sql_query("SELECT * FROM data_table_2", conn1)
-            except Exception:
-                pass
-            try:
-                data['general'] = pd.read_sql_query("SELECT * FROM data_table", conn1)
-            except Exception:
-                pass
-            conn1.close()
-    except Exception:
-        pass
-    
-    # Carregar dados do banco local de monitoramento
-    try:
-        monitoring_db_path = get_db_path('database.db')
-        if monitoring_db_path:
-            data['monitoring_logs'] = load_or_create_monitoring_data(monitoring_db_path)
-    except Exception:
-        pass
-    
-    # Carregar dados da Tarefa 2 (Alert_Incident) - convertendo CSV para SQLite
-    try:
-        task2_db_path = 'Alert_Incident/alert_data.db'
-        
-        # Se o banco não existir, criar a partir dos CSVs
-        if not os.path.exists(task2_db_path):
-            create_alert_database_from_csv()
-        
-        # Carregar usando SQL
-        if os.path.exists(task2_db_path):
-            conn2 = sqlite3.connect(task2_db_path)
-            try:
-                data['alert_transactions_1'] = pd.read_sql_query("SELECT * FROM transactions_1", conn2)
-            except Exception:
-                pass
-            try:
-                data['alert_transactions_2'] = pd.read_sql_query("SELECT * FROM transactions_2", conn2)
-            except Exception:
-                pass
-            conn2.close()
-    except Exception:
-        pass
-    
-    return data
-
-def load_or_create_monitoring_data(db_path):
-    """Carrega ou cria dados de monitoramento"""
-    try:
-        conn = sqlite3.connect(db_path)
-        
-        # Criar tabela se não existir
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS monitoring_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                source TEXT NOT NULL,
-                event_type TEXT NOT NULL,
-                severity TEXT NOT NULL,
-                message TEXT NOT NULL,
-                value REAL,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Verificar se há dados
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM monitoring_events")
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            # Inserir dados de exemplo
+        if store.count() == 0:
+            # Dados de exemplo nas últimas horas (epoch inteiro)
+            hour = int(time.time()) // 3600 * 3600
             sample_data = [
-                ('00h', 'checkout1', 'transaction_count', 'info', 'Transações processadas', 6),
-                ('01h', 'checkout1', 'transaction_count', 'info', 'Transações processadas', 3),
-                ('02h', 'checkout1', 'transaction_count', 'warning', 'Volume baixo detectado', 3),
-                ('00h', 'checkout2', 'transaction_count', 'critical', 'Checkout com problemas', 2),
-                ('01h', 'checkout2', 'transaction_count', 'critical', 'Sistema instável', 1),
-                ('02h', 'checkout2', 'transaction_count', 'warning', 'Recuperação parcial', 4),
+                (hour - 7200, 'checkout1', 'transaction_count', 'info', 'Transações processadas', 6),
+                (hour - 3600, 'checkout1', 'transaction_count', 'info', 'Transações processadas', 3),
+                (hour, 'checkout1', 'transaction_count', 'warning', 'Volume baixo detectado', 3),
+                (hour - 7200, 'checkout2', 'transaction_count', 'critical', 'Checkout com problemas', 2),
+                (hour - 3600, 'checkout2', 'transaction_count', 'critical', 'Sistema instável', 1),
+                (hour, 'checkout2', 'transaction_count', 'warning', 'Recuperação parcial', 4),
             ]
-            
-            for item in sample_data:
-                conn.execute('''
-                    INSERT INTO monitoring_events (timestamp, source, event_type, severity, message, value)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', item)
-            
-            conn.commit()
-        
-        # Carregar dados
-        df = pd.read_sql_query("SELECT * FROM monitoring_events ORDER BY timestamp", conn)
-        conn.close()
-        return df
-        
-    except Exception as e:
-        st.error(f"Erro ao acessar banco de monitoramento: {str(e)}")
-        return pd.DataFrame()
+            store.record(pd.DataFrame(sample_data, columns=EVENT_COLUMNS))
+    finally:
+        store.close()
+
+@st.cache_resource
+def load_seasonal_baseline(mtime):
+    """Índice sazonal pré-calculado (recarregado apenas quando o arquivo muda)"""
+    return SeasonalBaseline.load(BASELINE_PATH)
+
+@st.cache_resource
+def get_health_worker():
+    """Worker de saúde compartilhado entre as sessões (um por servidor Streamlit)"""
+    return HealthWorker().start()
+
+@st.cache_resource
+def get_metrics_exporter():
+    """Endpoint /metrics deste servidor Streamlit (opcional: variável MONITORING_METRICS_PORT)"""
+    port = os.environ.get('MONITORING_METRICS_PORT')
+    if not port:
+        return None
+    try:
+        return MetricsExporter(int(port), worker=get_health_worker()).start()
+    except OSError as e:
+        print(f"⚠️ Porta de métricas {port} indisponível: {e}")
+        return None
+
+@st.cache_resource
+def load_forecaster():
+    """Modelo de previsão persistido; cada execução só incorpora os minutos novos do alert_data.db"""
+    forecaster = VolumeForecaster.load(FORECAST_PATH) if os.path.exists(FORECAST_PATH) else VolumeForecaster()
+    return {'model': forecaster, 'lock': threading.Lock(), 'breaches': pd.DataFrame(columns=BREACH_COLUMNS)}
+
+def load_or_create_monitoring_data(limit=500):
+    """Eventos de monitoramento mais recentes (índice por fonte e horário; nunca a tabela inteira)"""
+    # Só tabela ausente ou no formato antigo abre a conexão de escrita (criar/migrar);
+    # bruto vazio após a retenção de 7 dias é apenas "sem eventos recentes"
+    if not schema_ready():
+        create_monitoring_table(database_path('database'))
+    return read_events(limit=limit)
+
+@st.cache_resource
+def get_source_registry():
+    """Registro de fontes compartilhado entre as sessões (Core/source_registry.py)"""
+    registry = default_registry()
+    # Eventos: criar/migrar a tabela na primeira carga
+    registry.register('monitoring_logs', load_or_create_monitoring_data, columns=EVENT_COLUMNS,
+                      freshness=lambda: database_signature('database'),
+                      description='database.monitoring_events')
+    return registry
+
+def load_sources(*names):
+    """DataFrames das fontes pedidas (em paralelo, com timeout por fonte); falhas aparecem por fonte"""
+    registry = get_source_registry()
+    frames = registry.load(names)
+    for name, error in registry.errors(names).items():
+        st.warning(f"⚠️ Fonte '{name}' indisponível: {error}")
+    return frames
 
 # 🎨 Configuração da página (apenas quando executado individualmente)
 try:
@@ -250,99 +205,28 @@ except st.errors.StreamlitAPIException:
     pass
 
 # 🚨 Sistema de alertas SMS (opcional)
-def enviar_sms(mensagem):
-    """Sistema de SMS usando Twilio (opcional)"""
-    try:
-        from twilio.rest import Client
-        import credenciais
-        
-        account_sid = credenciais.account_sid
-        token = credenciais.token
-        client = Client(account_sid, token)
-        
-        remetente = credenciais.remetente
-        destino = '+5535998022002'
-        
-        message = client.messages.create(
-            to=destino,
-            from_=remetente,
-            body=mensagem
-        )
-        return f"SMS enviado! ID: {message.sid}"
-    except ImportError:
-        return "⚠️ Twilio não configurado. Alerta registrado no log."
-    except Exception as e:
-        return f"❌ Erro ao enviar SMS: {str(e)}"
+SMS_DESTINO = '+5535998022002'
+SMS_LOG_PATH = os.path.join(os.path.dirname(database_path('notifications')), 'sms_log.jsonl')
 
-# 📊 Análise integrada dos dados
-def analyze_integrated_data(data):
-    """Análise integrada usando APENAS operações básicas Python - versão final"""
-    analysis = {
-        'total_datasets': 0,
-        'total_transactions': 0,
-        'status_distribution': {},
-        'alerts': [],
-        'health_score': 100
-    }
-    
+@st.cache_resource
+def get_notifier():
+    """Fila assíncrona de SMS compartilhada entre as sessões (Twilio ou log local)"""
     try:
-        for key, df in data.items():
-            if df is not None and len(df) > 0:
-                analysis['total_datasets'] += 1
-                analysis['total_transactions'] += len(df)
-                
-                # Análise de status APENAS com Python básico
-                if 'status' in df.columns:
-                    try:
-                        # Converter para lista Python básica
-                        status_values = []
-                        for index, row in df.iterrows():
-                            status_values.append(row['status'])
-                        
-                        # Contar manualmente
-                        status_counts = {}
-                        for status in status_values:
-                            if status in status_counts:
-                                status_counts[status] += 1
-                            else:
-                                status_counts[status] = 1
-                        
-                        analysis['status_distribution'][key] = status_counts
-                        
-                        # Análise de saúde usando contagem manual
-                        total_records = len(status_values)
-                        if total_records > 0:
-                            failed_count = 0
-                            denied_count = 0
-                            
-                            for status in status_values:
-                                if status == 'failed':
-                                    failed_count += 1
-                                elif status == 'denied':
-                                    denied_count += 1
-                            
-                            failed_rate = (failed_count / total_records) * 100
-                            denied_rate = (denied_count / total_records) * 100
-                            
-                            if failed_rate > 10:
-                                analysis['alerts'].append(f"🔴 {key}: Alta taxa de falhas ({failed_rate:.1f}%)")
-                                analysis['health_score'] -= 20
-                            
-                            if denied_rate > 15:
-                                analysis['alerts'].append(f"🟡 {key}: Taxa elevada de negações ({denied_rate:.1f}%)")
-                                analysis['health_score'] -= 10
-                    except Exception:
-                        # Se houver qualquer erro, pular este dataset
-                        continue
+        sink, mode = TwilioSink.from_credentials(), "Twilio"
     except Exception:
-        # Se houver qualquer erro geral, retornar análise básica
-        pass
-    
-    # Garantir que health_score não seja negativo
-    if analysis['health_score'] < 0:
-        analysis['health_score'] = 0
-    
-    return analysis
+        sink, mode = FileSink(SMS_LOG_PATH), "log local"
+    return NotificationDispatcher(sink).start(), mode
+
+def enviar_sms(mensagem, destino=SMS_DESTINO, chave=None, severidade='warning'):
+    """Enfileira um SMS; a entrega (lotes, limite por destino, novas tentativas) roda em segundo plano"""
+    try:
+        notifier, mode = get_notifier()
+        notifier.submit(destino, mensagem, key=chave, severity=severidade)
+        if mode == "Twilio":
+            return f"📤 SMS enfileirado para {destino}"
+        return "⚠️ Twilio não configurado. Alerta registrado no log."
+    except Exception as e:
+        return f"❌ Erro ao enfileirar SMS: {str(e)}"
 
 # 🎨 Header moderno
 st.markdown("""
@@ -356,23 +240,28 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Carregar dados
+# 🔌 Fontes de dados: cada aba pede só o que exibe. As cargas das abas são
+# disparadas aqui em paralelo e cada aba espera apenas as suas fontes.
+TAB_SOURCES = {
+    'checkouts': ['checkout1', 'checkout2'],
+    'monitoring': ['monitoring_logs']
+}
 try:
-    data = load_integrated_data()
+    get_source_registry().prefetch([name for names in TAB_SOURCES.values() for name in names])
 except Exception as e:
-    st.error(f"❌ Erro ao carregar dados integrados: {str(e)}")
-    # Fallback com dados vazios
-    data = {
-        'checkout1': pd.DataFrame(),
-        'checkout2': pd.DataFrame(),
-        'general': pd.DataFrame(),
-        'monitoring_logs': pd.DataFrame(),
-        'alert_transactions_1': pd.DataFrame(),
-        'alert_transactions_2': pd.DataFrame()
-    }
+    st.error(f"❌ Erro ao iniciar o carregamento das fontes: {str(e)}")
 
+# 🩺 Análise integrada: snapshot pré-calculado pelo worker de saúde (Core/health_snapshots.py).
+# A página só lê a versão mais recente; o recálculo, a ingestão dos CSVs e o
+# registro dos incidentes acontecem em segundo plano.
 try:
-    analysis = analyze_integrated_data(data)
+    health_worker = get_health_worker()
+    get_metrics_exporter()
+    analysis = latest_snapshot()
+    if analysis is None:
+        # Primeira execução: gravar o snapshot inicial antes de renderizar
+        health_worker.refresh('inicial')
+        analysis = latest_snapshot() or analyze_sources()
 except Exception as e:
     st.error(f"❌ Erro na análise consolidada: {str(e)}")
     # Fallback com análise vazia
@@ -380,10 +269,26 @@ except Exception as e:
         'total_datasets': 0,
         'total_transactions': 0,
         'status_distribution': {},
+        'status_volume': {},
+        'failed_sources': {},
         'alerts': [],
+        'alert_records': [],
+        'evaluated_sources': [],
         'health_score': 100
     }
 
+# 🚨 Incidentes: os alertas de cada snapshot já foram deduplicados no banco pelo worker
+
+try:
+    incidents = open_incidents()
+except Exception as e:
+    st.warning(f"⚠️ Banco de incidentes indisponível: {str(e)}")
+    incidents = pd.DataFrame([
+        {**record, 'id': None, 'state': 'open', 'occurrences': 1, 'opened_at': None}
+        for record in analysis['alert_records']
+    ], columns=['id', 'source', 'status', 'rule', 'severity', 'state', 'message',
+                'occurrences', 'opened_at'])
+
 # 📊 Dashboard de métricas principais
 st.header("📊 Visão Geral do Sistema")
 
@@ -412,7 +317,7 @@ with col3:
     )
 
 with col4:
-    alert_count = len(analysis['alerts'])
+    alert_count = len(incidents)
     alert_color = "🟢" if alert_count == 0 else "🟡" if alert_count < 3 else "🔴"
     st.metric(
         f"{alert_color} Alertas Ativos", 
@@ -420,18 +325,56 @@ with col4:
         delta="Tudo OK" if alert_count == 0 else f"{alert_count} problemas"
     )
 
-# 🚨 Sistema de alertas
-if analysis['alerts']:
+if 'version' in analysis:
+    worker_note = f" — ⚠️ último erro do worker: {health_worker.last_error}" if health_worker.last_error else ""
+    st.caption(f"🩺 Snapshot v{analysis['version']} calculado em {analysis['created_at']} "
+               f"({analysis['elapsed_ms']:.0f} ms) pelo worker de saúde{worker_note}")
+    history = snapshot_history(200)
+    if len(history) > 1:
+        with st.expander(f"📈 Histórico de saúde ({len(history)} snapshots)"):
+            fig_health = px.line(history.iloc[::-1], x='created_at', y='health_score', markers=True,
+                                 hover_data=['version', 'alert_count', 'trigger'])
+            fig_health.update_layout(height=250, margin=dict(t=10, b=10), yaxis_range=[0, 105])
+            st.plotly_chart(fig_health, use_container_width=True)
+
+# 🚨 Sistema de alertas (incidentes abertos e reconhecidos)
+if len(incidents) > 0:
     st.markdown("---")
     st.header("🚨 Alertas do Sistema")
     
-    for alert in analysis['alerts']:
-        if "🔴" in alert:
-            st.error(alert)
-        elif "🟡" in alert:
-            st.warning(alert)
-        else:
-            st.info(alert)
+    for _, incident in incidents.iterrows():
+        icon = SEVERITY_ICONS.get(incident['severity'], '🟠')
+        text = f"{icon} {incident['source']}: {incident['message']}"
+        if incident['id'] is not None and not pd.isna(incident['id']):
+            state = "👀 reconhecido" if incident['state'] == 'acknowledged' else "🆕 aberto"
+            text += (f" — #{int(incident['id'])} {state}, {int(incident['occurrences'])} ocorrências "
+                     f"desde {incident['opened_at']}")
+        
+        col_alert, col_ack, col_resolve = st.columns([6, 1, 1])
+        with col_alert:
+            if incident['severity'] == 'critical':
+                st.error(text)
+            elif incident['severity'] == 'warning':
+                st.warning(text)
+            else:
+                st.info(text)
+        
+        if incident['id'] is None or pd.isna(incident['id']):
+            continue
+        incident_id = int(incident['id'])
+        with col_ack:
+            if incident['state'] == 'open' and st.button("👀 Reconhecer", key=f"ack_{incident_id}"):
+                incident_store = IncidentStore()
+                incident_store.acknowledge(incident_id, user='dashboard')
+                incident_store.close()
+                st.rerun()
+        with col_resolve:
+            if st.button("✅ Resolver", key=f"resolve_{incident_id}"):
+                # Suprime a mesma condição por 1h para não reabrir no próximo refresh
+                incident_store = IncidentStore()
+                incident_store.resolve(incident_id, user='dashboard', suppress_minutes=60)
+                incident_store.close()
+                st.rerun()
 
 # 📊 Análise por tarefa
 st.markdown("---")
@@ -446,6 +389,7 @@ tab1, tab2, tab3, tab_sms = st.tabs([
 
 with tab1:
     st.subheader("📊 Análise de Checkouts - Integração Tarefa 1")
+    data = load_sources(*TAB_SOURCES['checkouts'])
     
     if 'checkout1' in data and not data['checkout1'].empty:
         checkout_col1, checkout_col2 = st.columns(2)
@@ -487,52 +431,90 @@ with tab1:
 with tab2:
     st.subheader("🚨 Sistema de Alertas - Integração Tarefa 2")
     
-    if 'alert_transactions_1' in data and not data['alert_transactions_1'].empty:
-        alert_data = data['alert_transactions_1']
-        
-        # Status distribution - versão robusta
-        if 'status' in alert_data.columns:
-            try:
-                # Contar status usando Python básico
-                status_list = alert_data['status'].tolist()
-                status_counts = {}
-                
-                for status in status_list:
-                    if status in status_counts:
-                        status_counts[status] += 1
-                    else:
-                        status_counts[status] = 1
-                
-                if status_counts:
-                    fig_alert = px.pie(
-                        values=list(status_counts.values()),
-                        names=list(status_counts.keys()),
-                        title="Distribuição de Status - Dados de Alerta",
-                        hole=0.4,
-                        color_discrete_sequence=px.colors.qualitative.Set3
-                    )
-                    st.plotly_chart(fig_alert, use_container_width=True)
-                
-                # Métricas de alerta - contagem manual
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    approved = status_list.count('approved')
-                    st.metric("✅ Aprovadas", approved)
-                with col2:
-                    failed = status_list.count('failed')
-                    st.metric("❌ Falhas", failed)
-                with col3:
-                    denied = status_list.count('denied')
-                    st.metric("⛔ Negadas", denied)
-            except Exception as e:
-                st.error(f"❌ Erro na análise de status: {str(e)}")
-        else:
-            st.info("📋 Estrutura de dados não compatível com análise de status.")
+    status_counts = analysis['status_distribution'].get('alert_transactions_1', {})
+    if status_counts:
+        try:
+            fig_alert = px.pie(
+                values=list(status_counts.values()),
+                names=list(status_counts.keys()),
+                title="Distribuição de Status - Dados de Alerta",
+                hole=0.4,
+                color_discrete_sequence=px.colors.qualitative.Set3
+            )
+            st.plotly_chart(fig_alert, use_container_width=True)
+            
+            # Métricas de alerta (contagens agrupadas)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("✅ Aprovadas", status_counts.get('approved', 0))
+            with col2:
+                st.metric("❌ Falhas", status_counts.get('failed', 0))
+            with col3:
+                st.metric("⛔ Negadas", status_counts.get('denied', 0))
+        except Exception as e:
+            st.error(f"❌ Erro na análise de status: {str(e)}")
     else:
         st.info("📋 Dados da Tarefa 2 não disponíveis para monitoramento.")
+    
+    # 🔮 Previsão de volume (Holt-Winters incremental) e valores fora da faixa prevista
+    st.markdown("#### 🔮 Previsão de Volume por Status")
+    try:
+        forecast_state = load_forecaster()
+        forecaster = forecast_state['model']
+        with forecast_state['lock']:
+            consumed, breaches = update_from_rollups(forecaster, datetime.now())
+            if consumed:
+                forecaster.save(FORECAST_PATH)
+                forecast_state['breaches'] = pd.concat(
+                    [forecast_state['breaches'], breaches], ignore_index=True
+                ).tail(200)
+        
+        horizon = st.select_slider("⏩ Horizonte da previsão (min):", options=[15, 30, 45, 60], value=60)
+        forecast_cols = st.columns(len(forecaster.sources) or 1)
+        for column, source in zip(forecast_cols, forecaster.sources):
+            with column:
+                prediction = forecaster.forecast(source, horizon)
+                if prediction.empty:
+                    continue
+                totals = prediction.groupby('status')[['forecast', 'lower', 'upper']].sum()
+                st.metric(f"🔮 {source}: próximos {horizon} min",
+                          f"{totals['forecast'].sum():,.0f} transações",
+                          delta=f"faixa {totals['lower'].sum():,.0f} – {totals['upper'].sum():,.0f}",
+                          delta_color="off")
+                
+                # Últimas 2h observadas + faixa prevista
+                minutes, volumes = rollup_matrix(source, forecaster.statuses)
+                recent = minutes >= (minutes.max() - 120 if len(minutes) else 0)
+                fig_forecast = go.Figure()
+                for k, status in enumerate(forecaster.statuses):
+                    color = {'approved': '#2ecc71', 'denied': '#f39c12', 'failed': '#e74c3c'}.get(status)
+                    band = prediction[prediction['status'] == status]
+                    fig_forecast.add_trace(go.Scatter(x=format_minutes(minutes[recent]), y=volumes[recent, k],
+                                                      name=status, line=dict(color=color)))
+                    fig_forecast.add_trace(go.Scatter(
+                        x=list(band['time']) + list(band['time'][::-1]),
+                        y=list(band['upper']) + list(band['lower'][::-1]),
+                        fill='toself', fillcolor=color, opacity=0.2, line=dict(width=0),
+                        name=f"{status} (faixa 95%)", hoverinfo='skip'
+                    ))
+                    fig_forecast.add_trace(go.Scatter(x=band['time'], y=band['forecast'], name=f"{status} previsto",
+                                                      line=dict(color=color, dash='dash')))
+                fig_forecast.update_layout(height=350, margin=dict(t=30, b=10), showlegend=False,
+                                           title=f"{source}: observado e previsto")
+                st.plotly_chart(fig_forecast, use_container_width=True)
+        
+        recent_breaches = forecast_state['breaches']
+        if len(recent_breaches) > 0:
+            with st.expander(f"📉 Fora da faixa prevista ({len(recent_breaches)} recentes)"):
+                st.dataframe(recent_breaches.round(1).iloc[::-1], use_container_width=True, hide_index=True)
+        if not forecaster.sources:
+            st.info("📋 Sem minutos no alert_data.db para ajustar o modelo (Core/forecast.py build).")
+    except Exception as e:
+        st.warning(f"⚠️ Previsão indisponível: {str(e)}")
 
 with tab3:
     st.subheader("📱 Monitoramento Local - Tarefa 3")
+    data = load_sources(*TAB_SOURCES['monitoring'])
     
     if 'monitoring_logs' in data and not data['monitoring_logs'].empty:
         monitoring_data = data['monitoring_logs']
@@ -598,8 +580,60 @@ with tab3:
         else:
             st.info("📋 Dados locais não possuem coluna 'status' para monitoramento.")
             st.dataframe(monitoring_data.head())
+        
+    elif schema_ready() and event_total() > 0:
+        st.info("📭 Sem eventos recentes: os eventos brutos expiram após 7 dias. "
+                "O histórico segue nos níveis agregados (série abaixo, em períodos maiores).")
     else:
         st.error("❌ Dados de monitoramento local não encontrados!")
+    
+    # 🗂️ Série de eventos: cada período é lido do nível agregado mais grosso que o atende
+    st.markdown("#### 🗂️ Eventos ao Longo do Tempo")
+    periods = {"1 hora": 3600, "24 horas": 86400, "7 dias": 7 * 86400,
+               "30 dias": 30 * 86400, "1 ano": 365 * 86400}
+    col_period, col_metric = st.columns(2)
+    with col_period:
+        period = st.select_slider("📅 Período:", options=list(periods), value="24 horas")
+    with col_metric:
+        series_metric = st.radio("📏 Métrica:", ["events", "value", "critical"], horizontal=True,
+                                 format_func={'events': "Eventos", 'value': "Valor médio",
+                                              'critical': "Críticos"}.get)
+    try:
+        now = int(time.time())
+        series = read_series(now - periods[period], now + 1)
+        if len(series) > 0:
+            fig_events = px.line(series, x='time', y=series_metric, color='source', line_shape='hv',
+                                 title=f"Eventos de monitoramento ({period})")
+            fig_events.update_layout(height=350, margin=dict(t=40, b=10))
+            st.plotly_chart(fig_events, use_container_width=True)
+            step = series.attrs['step']
+            step_label = f"{step // 3600}h" if step >= 3600 else f"{step // 60} min" if step >= 60 else f"{step}s"
+            st.caption(f"🗂️ Nível `{series.attrs['tier']}`, um ponto a cada {step_label}")
+        else:
+            st.info(f"📭 Nenhum evento no período ({period}).")
+    except Exception as e:
+        st.warning(f"⚠️ Série de eventos indisponível: {str(e)}")
+    
+    # Limites sazonais: o mesmo volume é normal à tarde e anômalo de madrugada
+    st.markdown("#### 📐 Linha de Base Sazonal (minuto do dia)")
+    if os.path.exists(BASELINE_PATH):
+        try:
+            baseline = load_seasonal_baseline(os.path.getmtime(BASELINE_PATH))
+            baseline_cols = st.columns(len(baseline.sources) or 1)
+            for column, source in zip(baseline_cols, baseline.sources):
+                with column:
+                    minutes, volumes = rollup_matrix(source, baseline.statuses)
+                    deviations = baseline.deviations(source, datetime.now(), minutes, volumes)
+                    critical = int((deviations['severity'] == 'critical').sum())
+                    st.metric(f"📐 {source}", f"{deviations['minute'].nunique()} min fora do padrão",
+                              delta=f"{critical} críticos", delta_color="inverse")
+                    if not deviations.empty:
+                        st.dataframe(deviations[['time', 'channel', 'value', 'median', 'z']].tail(10),
+                                     use_container_width=True, hide_index=True)
+        except Exception as e:
+            st.warning(f"⚠️ Linha de base sazonal indisponível: {str(e)}")
+    else:
+        st.info("📋 Linha de base sazonal ainda não construída (Core/seasonal_baseline.py build).")
 
 with tab_sms:
     st.subheader("📱 Sistema de Alertas SMS")
@@ -610,12 +644,12 @@ with tab_sms:
     sms_enabled = st.checkbox("📱 Ativar alertas SMS", value=False)
     
     if sms_enabled:
-        phone_number = st.text_input("📞 Número de destino", value="+5535998022002")
+        phone_number = st.text_input("📞 Número de destino", value=SMS_DESTINO)
         
         # Teste de SMS
         if st.button("🧪 Testar SMS"):
             test_message = f"🧪 Teste do sistema de monitoramento - {datetime.now().strftime('%H:%M:%S')}"
-            result = enviar_sms(test_message)
+            result = enviar_sms(test_message, phone_number)
             st.success(result)
         
         # Alertas automáticos
@@ -623,11 +657,36 @@ with tab_sms:
         
         auto_alerts = st.checkbox("🤖 Ativar alertas automáticos", value=False)
         
-        if auto_alerts and analysis['alerts']:
+        pending = incidents[incidents['state'] == 'open']
+        if auto_alerts and len(pending) > 0:
             if st.button("📤 Enviar Alertas Pendentes"):
-                for alert in analysis['alerts'][:3]:  # Limitar a 3 alertas
-                    result = enviar_sms(f"ALERTA SISTEMA: {alert}")
-                    st.info(result)
+                # Mesmo incidente = mesma chave: cliques repetidos são coalescidos no lote
+                for _, incident in pending.iterrows():
+                    enviar_sms(f"ALERTA SISTEMA: {incident['source']}: {incident['message']}", phone_number,
+                               chave=f"incident:{incident['id']}", severidade=incident['severity'])
+                st.info(f"📤 {len(pending)} alertas enfileirados (agrupados em lotes por destino)")
+        
+        # Situação da fila (leitura do outbox, sem esperar entregas)
+        st.markdown("#### 📬 Fila de Envio")
+        try:
+            notifier, mode = get_notifier()
+            col_q, col_s, col_f = st.columns(3)
+            col_q.metric("⏳ Na fila", notifier.queued)
+            col_s.metric("✅ Entregues", notifier.stats['sent'])
+            col_f.metric("❌ Falhas", notifier.stats['failed'], delta=f"{notifier.stats['retries']} novas tentativas",
+                         delta_color="off")
+            st.caption(f"Destino: {mode}")
+            if notifier.last_error:
+                st.caption(f"⚠️ Último erro: {notifier.last_error}")
+            
+            recent = outbox(limit=20)
+            if len(recent) > 0:
+                st.dataframe(recent[['created_at', 'destination', 'message', 'state', 'attempts', 'last_error']],
+                             use_container_width=True, hide_index=True)
+            if (recent['state'] == 'failed').any() and st.button("🔁 Reenviar falhas"):
+                st.info(f"🔁 {notifier.redeliver()} mensagens recolocadas na fila")
+        except Exception as e:
+            st.warning(f"⚠️ Fila de SMS indisponível: {str(e)}")
     else:
         st.info("📱 SMS desativado. Configure Twilio para ativar.")
 
@@ -665,7 +724,7 @@ recommendations = [
     "🔄 **Integração Completa**: Todos os datasets estão sendo monitorados",
     "📊 **Dashboard Unificado**: Visão centralizada de todas as tarefas",
     "🚨 **Alertas Inteligentes**: Sistema automático de detecção de anomalias",
-    "📱 **Notificações SMS**: Alertas críticos via Twilio (opcional)",
+    "📱 **Notificações SMS**: Fila assíncrona com lotes e novas tentativas via Twilio (opcional)",
     "📈 **Análise Consolidada**: Correlação entre diferentes fontes de dados",
     "🎯 **Monitoramento Real-time**: Acompanhamento contínuo de métricas"
 ]
@@ -673,6 +732,18 @@ recommendations = [
 for rec in recommendations:
     st.markdown(f"• {rec}")
 
+# ⏱️ Tempo das consultas SQLite
+with st.expander("⏱️ Tempo das Consultas SQLite"):
+    stats_df = query_stats()
+    if stats_df.empty:
+        st.info("Nenhuma consulta registrada nesta sessão.")
+    else:
+        st.dataframe(stats_df.round(2), use_container_width=True)
+
+# 🔌 Situação das fontes de dados
+with st.expander("🔌 Fontes de Dados"):
+    st.dataframe(get_source_registry().status().round(2), use_container_width=True, hide_index=True)
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -681,3 +752,5 @@ st.markdown("""
     <p>Sistema inteligente de monitoramento com alertas automáticos e análise consolidada</p>
 </div>
 """, unsafe_allow_html=True)
+
+observe_render('monitoring', time.perf_counter() - _render_start)
@@ -902,9 +902,17 @@ elif current_route == "task3":
     # Código direto da Task 3 sem imports dinâmicos
     try:
         # Importar módulos necessários
-        import sqlite3
+        import sys
         import time
         
+        # Adicionar o diretório Core ao path (módulos compartilhados entre as tarefas)
+        core_path = os.path.join(os.getcwd(), 'Core')
+        if core_path not in sys.path:
+            sys.path.append(core_path)
+        
+        from integrated_analysis import analyze_sources
+        from health_snapshots import latest_snapshot
+        
         # 🎨 Header moderno
         st.markdown("""
         <div style='background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 2rem; border-radius: 15px; margin-bottom: 2rem; box-shadow: 0 8px 32px rgba(0,0,0,0.1);'>
@@ -917,116 +925,9 @@ elif current_route == "task3":
         </div>
         """, unsafe_allow_html=True)
         
-        # Função para carregar dados reais de forma segura
-        def load_real_data_safely():
-            """Carrega dados reais evitando operações problemáticas do Pandas"""
-            data = {
-                'checkout1': pd.DataFrame(),
-                'checkout2': pd.DataFrame(),
-                'general': pd.DataFrame(),
-                'monitoring_logs': pd.DataFrame(),
-                'alert_transactions_1': pd.DataFrame(),
-                'alert_transactions_2': pd.DataFrame()
-            }
-            
-            try:
-                # Carregar dados da Tarefa 1 (Analyze_data)
-                task1_db_path = 'Analyze_data/data.db'
-                if os.path.exists(task1_db_path):
-                    conn1 = sqlite3.connect(task1_db_path)
-                    try:
-                        data['checkout1'] = pd.read_sql_query("SELECT * FROM data_table_1 LIMIT 100", conn1)
-                    except Exception:
-                        pass
-                    try:
-                        data['checkout2'] = pd.read_sql_query("SELECT * FROM data_table_2 LIMIT 100", conn1)
-                    except Exception:
-                        pass
-                    conn1.close()
-                
-                # Carregar dados da Tarefa 2 (Alert_Incident)
-                task2_db_path = 'Alert_Incident/alert_data.db'
-                if os.path.exists(task2_db_path):
-                    conn2 = sqlite3.connect(task2_db_path)
-                    try:
-                        data['alert_transactions_1'] = pd.read_sql_query("SELECT * FROM transactions_1 LIMIT 100", conn2)
-                    except Exception:
-                        pass
-                    try:
-                        data['alert_transactions_2'] = pd.read_sql_query("SELECT * FROM transactions_2 LIMIT 100", conn2)
-                    except Exception:
-                        pass
-                    conn2.close()
-                    
-            except Exception:
-                pass
-            
-            return data
-        
-        # Função de análise ultra-segura
-        def ultra_safe_analysis(data):
-            """Análise usando APENAS operações básicas Python"""
-            analysis = {
-                'total_datasets': 0,
-                'total_transactions': 0,
-                'status_distribution': {},
-                'alerts': [],
-                'health_score': 100
-            }
-            
-            try:
-                for key, df in data.items():
-                    if df is not None and len(df) > 0:
-                        analysis['total_datasets'] += 1
-                        analysis['total_transactions'] += len(df)
-                        
-                        # Análise de status usando iteração manual
-                        if 'status' in df.columns:
-                            status_counts = {}
-                            failed_count = 0
-                            denied_count = 0
-                            total_count = 0
-                            
-                            # Iterar através de cada linha individualmente
-                            for idx in range(len(df)):
-                                try:
-                                    status = df.iloc[idx]['status']
-                                    total_count += 1
-                                    
-                                    if status in status_counts:
-                                        status_counts[status] += 1
-                                    else:
-                                        status_counts[status] = 1
-                                    
-                                    if status == 'failed':
-                                        failed_count += 1
-                                    elif status == 'denied':
-                                        denied_count += 1
-                                        
-                                except Exception:
-                                    continue
-                            
-                            analysis['status_distribution'][key] = status_counts
-                            
-                            if total_count > 0:
-                                failed_rate = (failed_count / total_count) * 100
-                                denied_rate = (denied_count / total_count) * 100
-                                
-                                if failed_rate > 10:
-                                    analysis['alerts'].append(f"🔴 {key}: Alta taxa de falhas ({failed_rate:.1f}%)")
-                                    analysis['health_score'] -= 20
-                                
-                                if denied_rate > 15:
-                                    analysis['alerts'].append(f"🟡 {key}: Taxa elevada de negações ({denied_rate:.1f}%)")
-                                    analysis['health_score'] -= 10
-            except Exception:
-                pass
-                
-            return analysis
-        
-        # Carregar dados reais
-        data = load_real_data_safely()
-        analysis = ultra_safe_analysis(data)
+        # Análise consolidada: último snapshot do worker de saúde; sem
+        # snapshot, contagens agrupadas sobre as tabelas completas
+        analysis = latest_snapshot() or analyze_sources()
         
         # 📊 Dashboard de métricas principais
         st.header("📊 Visão Geral do Sistema")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Módulos compartilhados (Core/) importáveis pelos testes, como nas páginas
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Core'))
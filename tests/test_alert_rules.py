@@ -0,0 +1,109 @@
+import json
+import numpy as np
+import pytest
+from alert_rules import RuleSet, load_rules, parse_window
+from stream_aggregate import StatusAggregate
+
+
+RULES = [
+    {'name': 'denied_rate', 'metric': 'rate', 'status': 'denied', 'window': 'total',
+     'comparator': '>', 'threshold': 50, 'severity': 'warning'},
+    {'name': 'denied_15m', 'metric': 'rate', 'status': 'denied', 'window': '15m',
+     'comparator': '>', 'threshold': 50, 'severity': 'critical'}
+]
+
+
+def test_evaluate_windows_only_reports_windowed_rules():
+    # 100 aprovadas por minuto e meia hora com 75% de negações
+    minutes = np.arange(1440)
+    aggregate = StatusAggregate(['approved', 'denied'])
+    aggregate.add(minutes, ['approved'] * 1440, np.full(1440, 100))
+    aggregate.add(minutes[600:630], ['denied'] * 30, np.full(30, 300))
+
+    rules = RuleSet(RULES)
+    fired = rules.evaluate_windows({'transactions_1': aggregate})
+
+    assert set(fired['rule']) == {'denied_15m'}
+    assert fired['minute'].min() >= 600
+    # A regra 'total' do mesmo status não dispara no dia inteiro
+    assert rules.evaluate_totals({'transactions_1': aggregate.totals()['count']}).empty
+
+
+def rule(**overrides):
+    base = {'name': 'regra', 'metric': 'volume', 'status': 'failed', 'comparator': '>', 'threshold': 10}
+    base.update(overrides)
+    return base
+
+
+def fired_names(rules, totals):
+    return sorted(rules.evaluate_totals(totals)['rule'])
+
+
+@pytest.mark.parametrize('overrides, message', [
+    ({'threshold': None}, "campo 'threshold'"),
+    ({'metric': 'media'}, "Métrica desconhecida"),
+    ({'status': None}, "precisa de 'status'"),
+    ({'comparator': '=='}, "Comparador desconhecido"),
+    ({'severity': 'fatal'}, "Severidade desconhecida"),
+    ({'window': '0m'}, "Janela inválida"),
+])
+def test_invalid_rules_are_rejected(overrides, message):
+    invalid = {key: value for key, value in rule(**overrides).items() if value is not None}
+    with pytest.raises(ValueError, match=message):
+        RuleSet([invalid])
+
+
+def test_duplicate_rule_names_are_rejected():
+    with pytest.raises(ValueError, match="duplicados"):
+        RuleSet([rule(), rule(threshold=20)])
+
+
+@pytest.mark.parametrize('window, minutes', [
+    ('total', 0), (None, 0), (0, 0), ('15m', 15), ('1h', 60), (' 2H ', 120), (30, 30), ('45', 45)
+])
+def test_parse_window(window, minutes):
+    assert parse_window(window) == minutes
+
+
+def test_defaults_are_filled():
+    compiled = RuleSet([{'name': 'total_baixo', 'metric': 'total', 'comparator': '<', 'threshold': 5}])
+    normalized = compiled.rules[0]
+    assert normalized['status'] == '*'
+    assert (normalized['severity'], normalized['window_minutes'], normalized['sources']) == ('warning', 0, ['*'])
+
+
+def test_comparators_at_the_threshold():
+    rules = RuleSet([
+        rule(name='gt', comparator='>'), rule(name='ge', comparator='>='),
+        rule(name='lt', comparator='<'), rule(name='le', comparator='<=')
+    ])
+    assert fired_names(rules, {'t1': {'failed': 10}}) == ['ge', 'le']
+    assert fired_names(rules, {'t1': {'failed': 11}}) == ['ge', 'gt']
+    assert fired_names(rules, {'t1': {'failed': 9}}) == ['le', 'lt']
+
+
+def test_rate_needs_volume_and_min_volume():
+    rules = RuleSet([rule(name='taxa', metric='rate', threshold=10, min_volume=100)])
+    # Sem volume a taxa é indefinida e não dispara
+    assert fired_names(rules, {'t1': {'approved': 0, 'failed': 0}}) == []
+    # 50% de falhas, mas abaixo do volume mínimo
+    assert fired_names(rules, {'t1': {'approved': 40, 'failed': 40}}) == []
+    fired = rules.evaluate_totals({'t1': {'approved': 60, 'failed': 60}})
+    assert fired['value'].tolist() == [50.0]
+
+
+def test_source_patterns_and_message():
+    rules = RuleSet([rule(sources=['transactions_*'], message="{source}: {value:.0f} > {threshold}")])
+    fired = rules.evaluate_totals({'transactions_1': {'failed': 12}, 'checkout1': {'failed': 50}})
+    assert fired['source'].tolist() == ['transactions_1']
+    assert fired['message'].tolist() == ["transactions_1: 12 > 10"]
+
+
+def test_load_rules_recompiles_when_the_file_changes(tmp_path):
+    path = tmp_path / 'alert_rules.json'
+    path.write_text(json.dumps({'rules': [rule()]}))
+    first = load_rules(str(path))
+    assert load_rules(str(path)) is first
+
+    path.write_text(json.dumps({'rules': [rule(), rule(name='outra', threshold=99)]}))
+    assert load_rules(str(path)).names == ['regra', 'outra']
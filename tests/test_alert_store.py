@@ -0,0 +1,15 @@
+import sqlite3
+import alert_store
+
+
+def test_rollups_ready_requires_tables_and_buckets():
+    conn = sqlite3.connect(':memory:')
+    # Banco distribuído com o repositório: sem tabelas de rollup
+    assert not alert_store.rollups_ready(conn, ['transactions_1'])
+
+    alert_store.migrate_schema(conn)
+    assert not alert_store.rollups_ready(conn, ['transactions_1'])
+
+    alert_store.update_rollups(conn, 'transactions_1', [0, 1], ['approved', 'denied'], [5, 2])
+    assert alert_store.rollups_ready(conn, ['transactions_1'])
+    assert not alert_store.rollups_ready(conn, ['transactions_1', 'transactions_2'])
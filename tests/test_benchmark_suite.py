@@ -0,0 +1,22 @@
+from benchmark_suite import find_regressions
+
+
+def run(seconds, peak_mb):
+    return {'results': [{'case': 'detect_anomalies', 'size': 'small', 'seconds': seconds, 'peak_mb': peak_mb}]}
+
+
+def test_peak_memory_regression_is_reported():
+    history = [run(0.010, 50.0) for _ in range(3)]
+    regressions = find_regressions(history, run(0.010, 80.0)['results'])
+    assert [(r['metric'], round(r['change_pct'])) for r in regressions] == [('peak_mb', 60)]
+
+
+def test_small_absolute_memory_changes_are_ignored():
+    history = [run(0.010, 0.2) for _ in range(3)]
+    assert find_regressions(history, run(0.010, 0.5)['results']) == []
+
+
+def test_time_regression_is_reported():
+    history = [run(0.010, 50.0) for _ in range(3)]
+    regressions = find_regressions(history, run(0.020, 50.0)['results'])
+    assert [r['metric'] for r in regressions] == ['seconds']
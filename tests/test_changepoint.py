@@ -0,0 +1,26 @@
+import numpy as np
+from changepoint import CusumDetector
+
+
+STATUSES = ['approved', 'denied', 'failed']
+
+
+def volumes(minutes, denied_rate, total=200, seed=0):
+    """Matriz (minutos, STATUSES) com `total` transações por minuto e 'failed' sempre zero"""
+    rng = np.random.default_rng(seed)
+    denied = rng.binomial(total, denied_rate, size=minutes)
+    return np.column_stack([total - denied, denied, np.zeros(minutes, dtype=int)])
+
+
+def test_all_zero_status_has_no_changepoint():
+    # Volume alto: com a taxa no piso do clip cada minuto somava ganho à soma para baixo
+    changes = CusumDetector().process('checkout', volumes(600, 0.1, total=20000), STATUSES)
+    assert changes[changes['status'] == 'failed'].empty
+
+
+def test_real_drop_is_still_detected():
+    matrix = np.vstack([volumes(120, 0.2, seed=1), volumes(120, 0.05, seed=2)])
+    changes = CusumDetector().process('checkout', matrix, STATUSES)
+    drops = changes[(changes['status'] == 'denied') & (changes['direction'] == 'queda')]
+    assert len(drops) >= 1
+    assert 110 <= drops['minute'].iloc[0] <= 130
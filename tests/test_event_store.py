@@ -0,0 +1,116 @@
+import sqlite3
+import pytest
+from db_access import register_database
+from event_store import EventStore, EVENT_TABLE, local_offset, schema_ready, read_events, event_total
+
+
+LEGACY_ROWS = [
+    ('00h', 'checkout1', 'transaction_count', 'info', 'Transações processadas', 6.0, '2025-10-18 14:51:02'),
+    ('01h', 'checkout1', 'transaction_count', 'warning', 'Volume baixo detectado', 3.0, '2025-10-18 14:51:02'),
+    ('2025-10-18 03:30:00', 'checkout2', 'transaction_count', 'critical', 'Checkout com problemas', 2.0,
+     '2025-10-18 14:51:02'),
+    ('horário inválido', 'checkout2', 'transaction_count', 'warning', 'Recuperação parcial', 4.0,
+     '2025-10-18 14:51:02')
+]
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """database.db no formato antigo (timestamp TEXT com rótulos "00h")"""
+    path = str(tmp_path / 'database.db')
+    conn = sqlite3.connect(path)
+    conn.execute(f'''
+        CREATE TABLE {EVENT_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            source TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            message TEXT NOT NULL,
+            value REAL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.executemany(f"INSERT INTO {EVENT_TABLE} (timestamp, source, event_type, severity, message, value, "
+                     "created_at) VALUES (?, ?, ?, ?, ?, ?, ?)", LEGACY_ROWS)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def epoch(text):
+    conn = sqlite3.connect(':memory:')
+    return conn.execute("SELECT CAST(strftime('%s', ?) AS INTEGER)", (text,)).fetchone()[0] - local_offset()
+
+
+def test_legacy_migration_keeps_every_row(legacy_db):
+    store = EventStore(legacy_db, retention={'raw': None, '1m': None, '1h': None, '1d': None})
+    try:
+        assert store.converted == len(LEGACY_ROWS)
+        rows = store.conn.execute(f"SELECT timestamp, source, value FROM {EVENT_TABLE} ORDER BY id").fetchall()
+        totals = store.conn.execute(f"SELECT SUM(events) FROM {EVENT_TABLE}_1d").fetchone()[0]
+    finally:
+        store.close()
+
+    assert [row[1] for row in rows] == [row[1] for row in LEGACY_ROWS]
+    assert totals == len(LEGACY_ROWS)
+    # Rótulos ancorados no dia de created_at; data legível mantida; ilegível recebe o created_at
+    assert rows[0][0] == epoch('2025-10-18 00:00:00')
+    assert rows[1][0] == epoch('2025-10-18 01:00:00')
+    assert rows[2][0] == epoch('2025-10-18 03:30:00')
+    assert rows[3][0] == epoch('2025-10-18 14:51:02')
+
+
+def test_failed_migration_keeps_legacy_table(legacy_db, monkeypatch):
+    import event_store
+
+    def broken(conn, events):
+        raise RuntimeError("falha no meio da migração")
+
+    monkeypatch.setattr(event_store, 'insert_events', broken)
+    with pytest.raises(RuntimeError):
+        EventStore(legacy_db)
+
+    conn = sqlite3.connect(legacy_db)
+    columns = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({EVENT_TABLE})")}
+    count = conn.execute(f"SELECT COUNT(*) FROM {EVENT_TABLE}").fetchone()[0]
+    conn.close()
+    assert columns['timestamp'] == 'TEXT'
+    assert count == len(LEGACY_ROWS)
+
+
+def test_schema_ready_only_after_migration(legacy_db, tmp_path):
+    register_database('events_test', str(tmp_path / 'ausente.db'))
+    assert not schema_ready('events_test')
+
+    register_database('events_test', legacy_db)
+    assert not schema_ready('events_test')
+
+    EventStore(legacy_db).close()
+    assert schema_ready('events_test')
+
+
+def test_expired_raw_events_keep_schema_and_totals(legacy_db):
+    store = EventStore(legacy_db)
+    store.apply_retention()
+    store.close()
+
+    register_database('events_test', legacy_db)
+    # Bruto expirado (eventos de 2025 > 7 dias): sem eventos recentes, mas nada a criar/migrar
+    assert read_events(db_name='events_test').empty
+    assert schema_ready('events_test')
+    assert event_total('events_test') == len(LEGACY_ROWS)
+
+
+def test_first_record_applies_retention_regardless_of_uptime(legacy_db, monkeypatch):
+    # Host recém-iniciado: o relógio monotônico ainda está abaixo de RETENTION_CHECK
+    monkeypatch.setattr('event_store.time.monotonic', lambda: 10.0)
+    store = EventStore(legacy_db)
+    store.record([{'timestamp': '2025-10-18 15:00:00', 'source': 'checkout1', 'event_type': 'transaction_count',
+                   'severity': 'info', 'message': 'Transações processadas', 'value': 1.0}])
+    raw = store.conn.execute(f"SELECT COUNT(*) FROM {EVENT_TABLE}").fetchone()[0]
+    store.close()
+    # Bruto de 2025 expirado já na primeira gravação; os agregados continuam
+    assert raw == 0
+    register_database('events_test', legacy_db)
+    assert event_total('events_test') == len(LEGACY_ROWS) + 1
@@ -0,0 +1,129 @@
+import sqlite3
+from datetime import date
+import numpy as np
+import pytest
+import alert_store
+from db_access import register_database
+from forecast import VolumeForecaster, update_from_rollups
+from transaction_store import MINUTES_PER_DAY
+
+
+SOURCE = 'transactions_1'
+
+
+@pytest.fixture
+def alert_db(tmp_path):
+    """alert_data.db com as tabelas de rollup, registrado no pool de leitura"""
+    path = str(tmp_path / 'alert_data.db')
+    conn = sqlite3.connect(path)
+    alert_store.migrate_schema(conn)
+    conn.commit()
+    register_database('forecast_test', path)
+    yield conn
+    conn.close()
+
+
+def ingest(conn, minutes, count=10):
+    """Grava um lote no rollup como a ingestão faria"""
+    alert_store.update_rollups(conn, SOURCE, list(minutes), ['approved'] * len(minutes), [count] * len(minutes))
+    conn.commit()
+
+
+def update(forecaster, day):
+    return update_from_rollups(forecaster, day, sources=(SOURCE,), db_name='forecast_test', final=True)[0]
+
+
+def last_day(forecaster):
+    return date.fromordinal(int(forecaster.last_time[forecaster.source_index(SOURCE)]) // MINUTES_PER_DAY)
+
+
+def test_new_calendar_day_does_not_replay_ingested_rollup(alert_db):
+    forecaster = VolumeForecaster()
+    ingest(alert_db, range(10))
+
+    assert update(forecaster, date(2025, 10, 18)) == 10
+    assert update(forecaster, date(2025, 10, 19)) == 0
+    assert last_day(forecaster) == date(2025, 10, 18)
+    assert forecaster.observed[0] == 10
+
+
+def test_new_buckets_continue_on_the_ingested_day(alert_db):
+    forecaster = VolumeForecaster()
+    ingest(alert_db, range(10))
+    update(forecaster, date(2025, 10, 18))
+
+    ingest(alert_db, range(10, 15))
+    assert update(forecaster, date(2025, 10, 19)) == 5
+    assert last_day(forecaster) == date(2025, 10, 18)
+    assert forecaster.last_minute(SOURCE) == 14
+
+
+def test_reimported_day_replaces_its_observation(alert_db):
+    fresh = VolumeForecaster()
+    ingest(alert_db, range(5), count=20)
+    update(fresh, date(2025, 10, 18))
+
+    forecaster = VolumeForecaster()
+    alert_store.clear_source(alert_db, SOURCE)
+    ingest(alert_db, range(10), count=10)
+    update(forecaster, date(2025, 10, 18))
+
+    # Reimportação com outro conteúdo: o dia é incorporado de novo desde o minuto 0
+    alert_store.clear_source(alert_db, SOURCE)
+    ingest(alert_db, range(5), count=20)
+    assert update(forecaster, date(2025, 10, 18)) == 5
+    assert last_day(forecaster) == date(2025, 10, 18)
+    assert forecaster.last_minute(SOURCE) == 4
+    # O dia anterior foi descartado: o estado é o de quem só viu o conteúdo novo
+    assert forecaster.observed[0] == fresh.observed[0] == 5
+    np.testing.assert_array_equal(forecaster.level, fresh.level)
+    np.testing.assert_array_equal(forecaster.previous, fresh.previous)
+
+
+def test_reimport_with_more_rows_is_not_skipped(alert_db):
+    forecaster = VolumeForecaster()
+    ingest(alert_db, range(10), count=10)
+    update(forecaster, date(2025, 10, 18))
+
+    alert_store.clear_source(alert_db, SOURCE)
+    ingest(alert_db, range(10), count=30)
+    assert update(forecaster, date(2025, 10, 18)) == 10
+    assert forecaster.observed[0] == 10
+    assert forecaster.previous[0, 9, 0] == 30
+
+
+def test_identical_reimport_only_adds_new_buckets(alert_db):
+    forecaster = VolumeForecaster()
+    ingest(alert_db, range(10))
+    update(forecaster, date(2025, 10, 18))
+
+    alert_store.clear_source(alert_db, SOURCE)
+    ingest(alert_db, range(12))
+    assert update(forecaster, date(2025, 10, 18)) == 2
+    assert forecaster.observed[0] == 12
+
+
+def test_reimport_on_a_later_date_becomes_a_new_day(alert_db):
+    forecaster = VolumeForecaster()
+    ingest(alert_db, range(10))
+    update(forecaster, date(2025, 10, 18))
+
+    alert_store.clear_source(alert_db, SOURCE)
+    ingest(alert_db, range(5), count=20)
+    assert update(forecaster, date(2025, 10, 19)) == 5
+    assert last_day(forecaster) == date(2025, 10, 19)
+    assert forecaster.last_minute(SOURCE) == 4
+    assert forecaster.previous_day[0, 9] == date(2025, 10, 18).toordinal()
+
+
+def test_rollup_state_survives_save_and_load(alert_db, tmp_path):
+    forecaster = VolumeForecaster()
+    ingest(alert_db, range(10))
+    update(forecaster, date(2025, 10, 18))
+    path = str(tmp_path / 'forecast_state.npz')
+    forecaster.save(path)
+
+    loaded = VolumeForecaster.load(path)
+    assert update(loaded, date(2025, 10, 20)) == 0
+    assert loaded.rollup_bucket[0] == 9
+    np.testing.assert_array_equal(loaded.day_start_observed, [0])
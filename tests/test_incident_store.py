@@ -0,0 +1,95 @@
+import pytest
+from incident_store import IncidentStore
+
+
+ALERT = {'source': 'transactions_1', 'status': 'failed', 'rule': 'failed_rate', 'severity': 'warning',
+         'message': 'Taxa de falhas alta', 'value': 12.0}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = IncidentStore(str(tmp_path / 'incidents.db'))
+    yield store
+    store.close()
+
+
+def test_same_alert_twice_updates_one_incident(store):
+    store.record([ALERT], now='2025-10-18 10:00:00')
+    result = store.record([dict(ALERT, severity='critical', value=20.0)], now='2025-10-18 10:05:00')
+
+    incidents = store.incidents()
+    assert result['recorded'] == 1
+    assert len(incidents) == 1
+    incident = incidents.iloc[0]
+    assert incident['occurrences'] == 2
+    assert incident['opened_at'] == '2025-10-18 10:00:00'
+    assert incident['last_seen'] == '2025-10-18 10:05:00'
+    assert (incident['severity'], incident['last_value']) == ('critical', 20.0)
+
+
+def test_severity_only_escalates(store):
+    store.record([dict(ALERT, severity='critical')], now='2025-10-18 10:00:00')
+    store.record([ALERT], now='2025-10-18 10:01:00')
+    assert store.incidents().iloc[0]['severity'] == 'critical'
+
+
+def test_cleared_condition_is_auto_resolved_and_reopens_as_new(store):
+    store.record([ALERT], now='2025-10-18 10:00:00', evaluated_sources=['transactions_1'])
+    # Fonte de outra avaliação não resolve nada
+    assert store.record([], now='2025-10-18 10:01:00', evaluated_sources=['transactions_2'])['auto_resolved'] == 0
+    result = store.record([], now='2025-10-18 10:02:00', evaluated_sources=['transactions_1'])
+
+    assert result['auto_resolved'] == 1
+    resolved = store.incidents(states=('resolved',)).iloc[0]
+    assert (resolved['resolved_by'], resolved['resolved_at']) == ('auto', '2025-10-18 10:02:00')
+    assert store.incidents().empty
+
+    store.record([ALERT], now='2025-10-18 10:03:00')
+    assert len(store.incidents(states=('open', 'acknowledged', 'resolved'))) == 2
+    assert store.incidents().iloc[0]['occurrences'] == 1
+
+
+def test_acknowledged_incident_keeps_counting(store):
+    store.record([ALERT], now='2025-10-18 10:00:00')
+    incident_id = int(store.incidents().iloc[0]['id'])
+    assert store.acknowledge(incident_id, 'operador')
+    assert not store.acknowledge(incident_id, 'operador')
+
+    store.record([ALERT], now='2025-10-18 10:01:00')
+    incident = store.incidents().iloc[0]
+    assert (incident['state'], incident['occurrences']) == ('acknowledged', 2)
+
+
+def test_suppressed_key_stays_silent(store):
+    store.suppress(source='transactions_1', rule='failed_rate', minutes=30, now='2025-10-18 10:00:00')
+    other = dict(ALERT, source='transactions_2')
+
+    result = store.record([ALERT, other], now='2025-10-18 10:10:00')
+    assert (result['received'], result['suppressed'], result['recorded']) == (2, 1, 1)
+    assert store.incidents()['source'].tolist() == ['transactions_2']
+
+    # Após a janela o alerta volta a abrir incidente
+    store.record([ALERT], now='2025-10-18 10:31:00')
+    assert sorted(store.incidents()['source']) == ['transactions_1', 'transactions_2']
+
+
+def test_resolve_with_suppression(store):
+    store.record([ALERT], now='2025-10-18 10:00:00')
+    incident_id = int(store.incidents().iloc[0]['id'])
+    assert store.resolve(incident_id, 'operador', now='2025-10-18 10:05:00', suppress_minutes=15)
+    assert not store.resolve(incident_id)
+
+    assert store.record([ALERT], now='2025-10-18 10:10:00')['suppressed'] == 1
+    assert store.incidents().empty
+
+
+def test_resolve_stale(store):
+    store.record([ALERT], now='2025-10-18 10:00:00')
+    store.record([dict(ALERT, source='transactions_2')], now='2025-10-18 10:50:00')
+    assert store.resolve_stale(30, now='2025-10-18 11:00:00') == 1
+    assert store.incidents()['source'].tolist() == ['transactions_2']
+
+
+def test_unknown_severity_is_rejected(store):
+    with pytest.raises(ValueError, match="Severidade desconhecida"):
+        store.record([dict(ALERT, severity='fatal')])
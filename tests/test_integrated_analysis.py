@@ -0,0 +1,65 @@
+import sqlite3
+import pandas as pd
+import pytest
+import alert_store
+import integrated_analysis
+from alert_rules import RuleSet
+from db_access import register_database
+from integrated_analysis import analyze_sources, analyze_frames, table_counts
+
+
+RULES = RuleSet([{
+    'name': 'failed_volume', 'metric': 'volume', 'status': 'failed', 'window': 'total',
+    'comparator': '>', 'threshold': 100, 'severity': 'critical'
+}])
+
+
+@pytest.fixture
+def data_db(tmp_path):
+    """Banco com uma tabela bruta (f0_) e uma fonte ingerida com rollups"""
+    path = str(tmp_path / 'analysis.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE raw (time TEXT, status TEXT, f0_ INTEGER)')
+    conn.executemany('INSERT INTO raw VALUES (?, ?, ?)',
+                     [('00h 00', 'approved', 500), ('00h 00', 'failed', 60), ('00h 01', 'failed', 60)])
+    alert_store.migrate_schema(conn)
+    alert_store.create_transactions_table(conn, 'ingested', ['time', 'status', 'count'])
+    alert_store.insert_transactions(conn, 'ingested', pd.DataFrame({
+        'time': ['00h 00', '00h 01'], 'status': ['failed', 'approved'], 'count': [30, 70]
+    }))
+    conn.commit()
+    conn.close()
+    register_database('analysis_test', path)
+    integrated_analysis._cache.clear()
+    return path
+
+
+def test_table_counts_return_rows_and_volume(data_db):
+    assert table_counts('analysis_test', 'raw') == (3, {'approved': 1, 'failed': 2}, {'approved': 500, 'failed': 120})
+    assert table_counts('analysis_test', 'ingested') == (2, {'approved': 1, 'failed': 1}, {'approved': 70, 'failed': 30})
+
+
+def test_rules_are_evaluated_on_volume_not_rows(data_db):
+    analysis = analyze_sources({'raw': ('analysis_test', 'raw')}, rules=RULES)
+    assert analysis['status_distribution'] == {'raw': {'approved': 1, 'failed': 2}}
+    assert analysis['status_volume'] == {'raw': {'approved': 500, 'failed': 120}}
+    assert [record['value'] for record in analysis['alert_records']] == [120]
+
+
+def test_frames_use_the_same_volume(data_db):
+    df = pd.DataFrame({'status': ['approved', 'failed', 'failed'], 'f0_': [500, 60, 60]})
+    analysis = analyze_frames({'raw': df}, rules=RULES)
+    assert analysis['status_volume'] == {'raw': {'approved': 500, 'failed': 120}}
+    assert len(analysis['alert_records']) == 1
+
+
+def test_failed_source_is_recorded_not_treated_as_empty(data_db, capsys):
+    analysis = analyze_sources({
+        'raw': ('analysis_test', 'raw'),
+        'missing': ('analysis_test', 'no_such_table')
+    }, rules=RULES)
+    assert 'missing' in analysis['failed_sources']
+    assert 'missing' not in analysis['evaluated_sources']
+    assert analysis['evaluated_sources'] == ['raw']
+    assert any('missing' in alert for alert in analysis['alerts'])
+    assert 'missing' in capsys.readouterr().out
@@ -0,0 +1,49 @@
+import sqlite3
+import pytest
+import db_access
+import health_snapshots
+from monitor_daemon import MonitorDaemon, CYCLE_STEPS
+
+
+ANALYSIS = {
+    'total_datasets': 1, 'total_transactions': 120, 'status_distribution': {'transactions_1': {'failed': 20}},
+    'alerts': ['🟡 transactions_1: falhas'], 'evaluated_sources': ['transactions_1'], 'health_score': 90,
+    'alert_records': [{'source': 'transactions_1', 'status': 'failed', 'rule': 'failed_rate',
+                       'severity': 'warning', 'value': 16.7, 'message': 'falhas'}]
+}
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    monkeypatch.setitem(db_access.DATABASES, 'incidents', (str(tmp_path / 'incidents.db'), False))
+    calls = []
+    monkeypatch.setattr(health_snapshots, 'analyze_sources', lambda sources=None: calls.append(sources) or ANALYSIS)
+    daemon = MonitorDaemon(ingest=False, snapshot_db=str(tmp_path / 'database.db'))
+    daemon.calls = calls
+    return daemon
+
+
+def test_cycle_runs_the_health_worker_refresh(daemon, tmp_path):
+    cycle = daemon.run_cycle()
+
+    assert len(daemon.calls) == 1
+    assert (cycle['version'], cycle['health'], cycle['alerts'], cycle['auto_resolved']) == (1, 90, 1, 0)
+    assert daemon.worker.stats['snapshots'] == 1
+    assert set(daemon.last_timings) == set(CYCLE_STEPS) | {'total'}
+    assert cycle['total'] == pytest.approx(sum(cycle[step] for step in CYCLE_STEPS))
+
+    conn = sqlite3.connect(str(tmp_path / 'database.db'))
+    trigger = conn.execute("SELECT trigger FROM health_snapshots").fetchone()[0]
+    conn.close()
+    conn = sqlite3.connect(str(tmp_path / 'incidents.db'))
+    occurrences = conn.execute("SELECT occurrences FROM incidents").fetchall()
+    conn.close()
+    assert trigger == 'daemon'
+    assert occurrences == [(1,)]
+
+
+def test_repeated_cycles_deduplicate_incidents(daemon):
+    daemon.run_cycle()
+    cycle = daemon.run_cycle()
+    assert (cycle['version'], daemon.cycles) == (2, 2)
+    assert cycle['alerts'] == 1
@@ -0,0 +1,44 @@
+import sqlite3
+import pytest
+from notifier import NotificationDispatcher, FileSink
+
+
+def test_start_raises_when_outbox_cannot_open(tmp_path):
+    dispatcher = NotificationDispatcher(FileSink(str(tmp_path / 'sms.jsonl')),
+                                        db_path=str(tmp_path / 'inexistente' / 'n.db'))
+    # Falha imediata (sem bloquear) a cada tentativa
+    for _ in range(2):
+        with pytest.raises(sqlite3.OperationalError):
+            dispatcher.submit('+5500000000', 'teste')
+
+
+def test_submit_delivers_after_start(tmp_path):
+    sms_log = tmp_path / 'sms.jsonl'
+    dispatcher = NotificationDispatcher(FileSink(str(sms_log)), db_path=str(tmp_path / 'n.db'), batch_window=0.05)
+    try:
+        dispatcher.submit('+5500000000', 'teste')
+        assert dispatcher.flush(5)
+    finally:
+        dispatcher.close(timeout=1)
+    assert 'teste' in sms_log.read_text(encoding='utf-8')
+
+
+def test_submitted_message_is_persisted_before_delivery(tmp_path):
+    db_path = str(tmp_path / 'n.db')
+    sms_log = tmp_path / 'sms.jsonl'
+    dispatcher = NotificationDispatcher(FileSink(str(sms_log)), db_path=db_path, batch_window=60)
+    row_id = dispatcher.submit('+5500000000', 'teste')
+    # Já está no outbox quando submit() retorna, antes de qualquer envio
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT state FROM notification_outbox WHERE id = ?", (row_id,)).fetchone() == ('pending',)
+    dispatcher.close(timeout=0)
+    assert not sms_log.exists()
+
+    # O próximo start() entrega o que ficou pendente
+    restarted = NotificationDispatcher(FileSink(str(sms_log)), db_path=db_path, batch_window=0.05)
+    try:
+        restarted.start()
+        assert restarted.flush(5)
+    finally:
+        restarted.close(timeout=1)
+    assert 'teste' in sms_log.read_text(encoding='utf-8')
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from online_detector import OnlineDetector, ALERT_COLUMNS
+
+
+STATUSES = ['approved', 'denied', 'failed']
+
+
+def synthetic_day(seed=3):
+    """Dia de volumes por minuto com madrugada fraca e dois incidentes"""
+    rng = np.random.default_rng(seed)
+    minutes = np.arange(1440)
+    traffic = 20 + 180 * np.sin(np.pi * minutes / 1440) ** 2
+    matrix = np.column_stack([
+        rng.poisson(traffic * 0.90), rng.poisson(traffic * 0.08), rng.poisson(traffic * 0.02)
+    ]).astype(np.float64)
+    matrix[:60] = rng.poisson(2, size=(60, 3))     # abaixo do min_volume: não avalia nem aprende
+    matrix[700:720, 2] += 60                        # pico de falhas
+    matrix[1000:1010, 0] //= 3                      # queda de aprovadas
+    return matrix
+
+
+def minute_by_minute(detector, source, matrix, minutes):
+    alerts = []
+    for minute, volumes in zip(minutes, matrix):
+        alerts.extend(detector.update(source, minute, volumes))
+    return pd.DataFrame(alerts, columns=ALERT_COLUMNS)
+
+
+def assert_same_state(batch, single, source='t1'):
+    a, b = batch.state(source), single.state(source)
+    assert (a.n, a.seen, a.last_minute) == (b.n, b.seen, b.last_minute)
+    for name in ('mean', 'm2', 'ewma', 'ewvar'):
+        np.testing.assert_allclose(getattr(a, name), getattr(b, name), rtol=1e-7, atol=1e-7, err_msg=name)
+    np.testing.assert_array_equal(a.last_alert, b.last_alert)
+    # Mesma janela (a ordem física do anel pode diferir)
+    window_a = a.buffer[(a.position - a.n + np.arange(a.n)) % batch.window]
+    window_b = b.buffer[(b.position - b.n + np.arange(b.n)) % single.window]
+    np.testing.assert_allclose(window_a, window_b, rtol=1e-9, atol=1e-9)
+
+
+def assert_same_alerts(batch_alerts, single_alerts):
+    assert len(single_alerts) > 0
+    pd.testing.assert_frame_equal(batch_alerts.reset_index(drop=True), single_alerts,
+                                  check_dtype=False, check_exact=False, atol=0.011)
+
+
+def test_process_matches_update_loop():
+    matrix, minutes = synthetic_day(), np.arange(1440)
+    batch, single = OnlineDetector(STATUSES), OnlineDetector(STATUSES)
+
+    assert_same_alerts(batch.process('t1', matrix, minutes), minute_by_minute(single, 't1', matrix, minutes))
+    assert_same_state(batch, single)
+
+
+@pytest.mark.parametrize('split', [45, 400, 1200])
+def test_batches_and_single_minutes_can_be_interleaved(split):
+    matrix, minutes = synthetic_day(seed=11), np.arange(1440)
+    mixed, single = OnlineDetector(STATUSES, window=30), OnlineDetector(STATUSES, window=30)
+
+    first = mixed.process('t1', matrix[:split], minutes[:split])
+    rest = minute_by_minute(mixed, 't1', matrix[split:], minutes[split:])
+    tail = mixed.process('t1', matrix[split:][:0], minutes[split:][:0])
+
+    expected = minute_by_minute(single, 't1', matrix, minutes)
+    assert tail.empty
+    assert_same_alerts(pd.concat([first, rest], ignore_index=True), expected)
+    assert_same_state(mixed, single)
+
+
+def test_long_batch_ewma_stays_stable():
+    # Vários dias num único lote: a recorrência em blocos não pode divergir
+    matrix = np.vstack([synthetic_day(seed) for seed in range(5)])
+    minutes = np.arange(len(matrix))
+    batch, single = OnlineDetector(STATUSES, alpha=0.01), OnlineDetector(STATUSES, alpha=0.01)
+
+    batch.process('t1', matrix, minutes)
+    minute_by_minute(single, 't1', matrix, minutes)
+    assert_same_state(batch, single)
@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from seasonal_baseline import SeasonalBaseline, MAD_SCALE
+
+
+START = date(2025, 10, 6)
+MINUTE = np.array([600])
+
+
+def volumes(approved, failed=0):
+    return np.array([[approved, failed]], dtype=np.float64)
+
+
+def baseline_with_history(totals, **kwargs):
+    options = dict(statuses=['approved', 'failed'], neighborhood=0, min_samples=5)
+    options.update(kwargs)
+    baseline = SeasonalBaseline(**options)
+    for offset, total in enumerate(totals):
+        baseline.update('t1', START + timedelta(days=offset), MINUTE, volumes(total))
+    return baseline
+
+
+def test_day_ring_drops_the_oldest_day():
+    baseline = baseline_with_history([100, 200, 300, 400], days=3)
+    s = baseline.source_index('t1')
+    ordinals = sorted(baseline.day_slots[s].tolist())
+    assert ordinals == [(START + timedelta(days=d)).toordinal() for d in (1, 2, 3)]
+    assert baseline.day_count[s, 600, -1] == 3
+    # Mediana de 200, 300, 400: o dia 100 saiu do anel
+    assert baseline.day_median[s, 600, -1] == 300
+
+
+def test_week_ring_keeps_only_the_last_weeks():
+    baseline = SeasonalBaseline(statuses=['approved', 'failed'], weeks=2, neighborhood=0)
+    for week in range(3):
+        baseline.update('t1', START + timedelta(weeks=week), MINUTE, volumes(100 + week))
+    s = baseline.source_index('t1')
+    weekday = START.weekday()
+    assert baseline.week_count[s, weekday, 600, -1] == 2
+    assert baseline.week_median[s, weekday, 600, -1] == pytest.approx(101.5)
+
+
+def test_replacing_a_minute_of_the_same_day_does_not_add_a_sample():
+    baseline = baseline_with_history([100])
+    baseline.update('t1', START, MINUTE, volumes(120))
+    s = baseline.source_index('t1')
+    assert baseline.day_count[s, 600, -1] == 1
+    assert baseline.day_median[s, 600, -1] == 120
+
+
+def test_median_mad_score_and_bad_direction():
+    baseline = baseline_with_history([100, 102, 98, 101, 99])
+    median, scale, count = baseline.lookup('t1', START + timedelta(days=5), MINUTE)
+    assert median[0, -1] == 100
+    assert scale[0, -1] == pytest.approx(MAD_SCALE * 1)
+    assert count[0, -1] == 5
+
+    # Escala robusta < ruído de Poisson da mediana (sqrt(100)): z = (50 - 100) / 10
+    _, _, z = baseline.score('t1', START + timedelta(days=5), MINUTE, volumes(50))
+    assert z[0, -1] == pytest.approx(-5)
+
+    day = START + timedelta(days=5)
+    drop = baseline.deviations('t1', day, MINUTE, volumes(50))
+    assert drop[['channel', 'severity']].values.tolist() == [['total', 'warning']]
+    # Volume acima do normal não é a direção ruim do total
+    assert baseline.deviations('t1', day, MINUTE, volumes(150)).empty
+
+
+def test_not_enough_samples_gives_no_score():
+    baseline = baseline_with_history([100, 101, 99])
+    _, _, z = baseline.score('t1', START + timedelta(days=3), MINUTE, volumes(10))
+    assert np.isnan(z).all()
+
+
+def test_save_and_load_round_trip(tmp_path):
+    baseline = baseline_with_history([100, 102, 98, 101, 99])
+    baseline.update('t2', START, MINUTE, volumes(10, 5))
+    path = str(tmp_path / 'seasonal_baseline.npz')
+    baseline.save(path)
+
+    loaded = SeasonalBaseline.load(path)
+    assert loaded.sources == ['t1', 't2']
+    assert (loaded.statuses, loaded.neighborhood, loaded.min_samples) == (['approved', 'failed'], 0, 5)
+    for name in SeasonalBaseline._ARRAYS:
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(baseline, name))
+    day = START + timedelta(days=5)
+    np.testing.assert_array_equal(loaded.score('t1', day, MINUTE, volumes(50))[2],
+                                  baseline.score('t1', day, MINUTE, volumes(50))[2])
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from status_engine import StatusEngine, status_volume, status_rate
+
+
+FRAME = pd.DataFrame({
+    'status': ['approved', 'failed', 'approved', 'denied', None],
+    'count': [90, 5, 10, 5, 100],
+    'hour': [0, 0, 1, 1, 1]
+})
+
+
+def test_rates_are_weighted_by_volume_not_rows():
+    summary = StatusEngine().summarize(FRAME)
+    # 2 de 4 linhas válidas são approved, mas o volume é 100 de 110
+    assert summary.loc['total', 'total'] == 110
+    assert summary.loc['total', 'approved_rate'] == pytest.approx(100 / 110 * 100)
+    assert summary.loc['total', 'failed_rate'] == pytest.approx(5 / 110 * 100)
+
+
+def test_summarize_by_group_ignores_missing_status():
+    summary = StatusEngine().summarize(FRAME, by='hour')
+    assert summary['total'].tolist() == [95, 15]
+    assert summary.loc[1, 'denied_rate'] == pytest.approx(5 / 15 * 100)
+    assert 'refunded' not in summary.columns
+
+
+def test_unknown_status_and_categorical_encoding():
+    engine = StatusEngine(['approved'])
+    codes = engine.encode(pd.Series(['approved', 'chargeback', None], dtype='category'))
+    assert codes.tolist() == [0, 1, -1]
+    assert engine.statuses == ['approved', 'chargeback']
+
+
+def test_empty_groups_get_zero_rate():
+    rates = StatusEngine.rates(np.array([[0.0, 0.0], [3.0, 1.0]]))
+    assert rates.tolist() == [[0.0, 0.0], [75.0, 25.0]]
+
+
+def test_status_volume_and_rate():
+    volume = status_volume(FRAME.dropna())
+    assert volume.to_dict() == {'approved': 100, 'failed': 5, 'denied': 5}
+    assert status_rate(volume, 'failed') == pytest.approx(5 / 110 * 100)
+    assert status_rate(volume.iloc[:0], 'failed') == 0.0
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import pytest
+from transaction_ingest import TailIngester
+
+
+HEADER = 'time,status,f0_\n'
+
+
+def write_csv(path, rows):
+    with open(path, 'w') as f:
+        f.write(HEADER + ''.join(f"{time},{status},{count}\n" for time, status, count in rows))
+
+
+def table_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute('SELECT time, status, f0_ FROM "transactions_1" ORDER BY rowid').fetchall()
+    conn.close()
+    return rows
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / 'alert_data.db'), str(tmp_path / 'transactions_1.csv')
+
+
+def test_appended_rows_are_ingested_once(paths):
+    db_path, csv_path = paths
+    ingester = TailIngester(db_path, {'transactions_1': csv_path})
+    write_csv(csv_path, [('00h 00', 'approved', 9), ('00h 00', 'denied', 6)])
+    assert ingester.ingest_once() == {'transactions_1': 2}
+
+    with open(csv_path, 'a') as f:
+        f.write('00h 01,approved,7\n')
+    assert ingester.ingest_once() == {'transactions_1': 1}
+    assert ingester.ingest_once() == {'transactions_1': 0}
+    assert len(table_rows(db_path)) == 3
+
+
+def test_replaced_file_of_same_size_is_reimported(paths, tmp_path):
+    db_path, csv_path = paths
+    ingester = TailIngester(db_path, {'transactions_1': csv_path})
+    write_csv(csv_path, [('00h 00', 'approved', 9), ('00h 00', 'denied', 6)])
+    ingester.ingest_once()
+
+    # Exportação do dia seguinte gravada ao lado e movida por cima (outro inode)
+    rotated = str(tmp_path / 'novo.csv')
+    write_csv(rotated, [('00h 00', 'approved', 8), ('00h 00', 'denied', 5)])
+    assert os.path.getsize(rotated) == os.path.getsize(csv_path)
+    os.replace(rotated, csv_path)
+
+    assert ingester.ingest_once() == {'transactions_1': 2}
+    assert table_rows(db_path) == [('00h 00', 'approved', 8), ('00h 00', 'denied', 5)]
+
+
+def test_rewritten_in_place_and_larger_is_reimported(paths):
+    db_path, csv_path = paths
+    ingester = TailIngester(db_path, {'transactions_1': csv_path})
+    write_csv(csv_path, [('00h 00', 'approved', 9)])
+    ingester.ingest_once()
+
+    # Mesmo inode, conteúdo novo e maior: sem o hash seria lido a partir do offset antigo
+    write_csv(csv_path, [('00h 00', 'approved', 3), ('00h 00', 'failed', 1), ('00h 01', 'approved', 4)])
+    assert ingester.ingest_once() == {'transactions_1': 3}
+    assert table_rows(db_path)[0] == ('00h 00', 'approved', 3)
+
+
+def test_checkpoint_without_file_identity_is_reimported(paths):
+    db_path, csv_path = paths
+    write_csv(csv_path, [('00h 00', 'approved', 9)])
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE ingest_checkpoints (
+            source TEXT PRIMARY KEY, table_name TEXT NOT NULL, header TEXT NOT NULL,
+            byte_offset INTEGER NOT NULL, rows INTEGER NOT NULL, updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute("INSERT INTO ingest_checkpoints (source, table_name, header, byte_offset, rows) "
+                 "VALUES (?, 'transactions_1', 'time,status,f0_', ?, 1)",
+                 (os.path.abspath(csv_path), os.path.getsize(csv_path)))
+    conn.commit()
+    conn.close()
+
+    assert TailIngester(db_path, {'transactions_1': csv_path}).ingest_once() == {'transactions_1': 1}
+    assert table_rows(db_path) == [('00h 00', 'approved', 9)]
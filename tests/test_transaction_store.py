@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from synthetic_data import SyntheticDataGenerator
+from transaction_store import TransactionStore, MINUTES_PER_DAY
+
+
+def test_build_keeps_each_day_of_a_multi_day_export(tmp_path):
+    generator = SyntheticDataGenerator(days=3, checkouts=1, seed=7)
+    csv_path = tmp_path / 'transactions.csv'
+    pd.concat(generator.transaction_chunks(1)).to_csv(csv_path, index=False)
+
+    store = TransactionStore.build(str(csv_path), str(tmp_path / 'store'))
+
+    assert np.unique(store.day).tolist() == [0, 1, 2]
+    assert store.minute.max() < MINUTES_PER_DAY
+
+
+def test_build_without_date_uses_day_argument(tmp_path):
+    csv_path = tmp_path / 'transactions.csv'
+    pd.DataFrame({'time': ['00h 00', '00h 01'], 'status': ['approved', 'failed'], 'count': [5, 1]}).to_csv(
+        csv_path, index=False)
+
+    store = TransactionStore.build(str(csv_path), str(tmp_path / 'store'), day=4)
+
+    assert np.unique(store.day).tolist() == [4]
+
+
+def test_to_frame_slices_with_categorical_time(tmp_path):
+    csv_path = tmp_path / 'transactions.csv'
+    pd.DataFrame({'time': ['00h 00', '00h 01', '23h 59'], 'status': ['approved', 'failed', 'approved'],
+                  'count': [5, 1, 2]}).to_csv(csv_path, index=False)
+    store = TransactionStore.build(str(csv_path), str(tmp_path / 'store'))
+
+    frame = store.to_frame(1, 3)
+
+    assert frame['time'].dtype == 'category'
+    assert frame['time'].tolist() == ['00h 01', '23h 59']
+    assert frame['count'].tolist() == [1, 2]
+    assert store.present_statuses() == ['approved', 'failed']
+    assert store.describe().loc['max', 'count'] == 5